@@ -63,6 +63,7 @@ LOG_FILE=/app/logs/ansible_llm.log
 # Ansible Settings
 ANSIBLE_CALLBACK_PLUGINS=/app/src/ansible_plugins/callbacks
 ANSIBLE_LIBRARY=/app/src/ansible_plugins/modules
+ANSIBLE_MODULE_UTILS=/app/src/ansible_plugins/module_utils
 ANSIBLE_FILTER_PLUGINS=/app/src/ansible_plugins/filters
 
 # Monitoring
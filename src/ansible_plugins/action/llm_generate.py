@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2025, Your Name <your.email@example.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import sys
+import time
+
+from ansible.errors import AnsibleActionFail
+from ansible.module_utils.common.text.converters import to_text
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.plugins.action import ActionBase
+
+# Add project root to path to allow importing the shared client
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+
+try:
+    from src.ansible_plugins.llm_client import PromptBatcher, batch_directory, cache_key, get_client
+    HAS_CLIENT = True
+    CLIENT_IMPORT_ERROR = None
+except ImportError as e:
+    HAS_CLIENT = False
+    CLIENT_IMPORT_ERROR = str(e)
+
+try:
+    from src.config import load_config
+    from src.llm_engine.inference_daemon import DaemonClient, DaemonError, get_daemon_settings, start_daemon
+    HAS_DAEMON = True
+except ImportError:
+    HAS_DAEMON = False
+
+
+def _send_grouped(payloads, generate):
+    """Generate results for payloads, one call per distinct set of generation parameters."""
+    groups = {}
+    for i, payload in enumerate(payloads):
+        groups.setdefault((payload['max_tokens'], payload['temperature']), []).append(i)
+    results = [None] * len(payloads)
+    for (max_tokens, temperature), indexes in groups.items():
+        outputs = generate([payloads[i]['prompt'] for i in indexes], max_tokens, temperature)
+        for i, output in zip(indexes, outputs):
+            results[i] = output
+    return results
+
+
+def _daemon_generator(socket_path=None, auto_start=True):
+    """
+    Return a generate function backed by the controller's inference daemon.
+
+    The daemon keeps the model loaded across tasks and runs, and is started
+    on first use when ``auto_start`` is set. Only the worker sending a batch
+    calls it, so only that worker loads the configuration.
+    """
+    def generate(prompts, max_tokens, temperature):
+        config = load_config()
+        settings = get_daemon_settings(config)
+        if socket_path:
+            settings['socket_path'] = os.path.expanduser(socket_path)
+        llm_config = config.get('llm', {})
+
+        if auto_start:
+            client = start_daemon(model_name=llm_config.get('model_name'),
+                                  quantization=llm_config.get('quantization'), settings=settings)
+        else:
+            client = DaemonClient(settings['socket_path'], timeout=settings['request_timeout'])
+            if not client.is_running():
+                raise DaemonError(f"No inference daemon is running at {settings['socket_path']}; "
+                                  "start one with 'python -m src.main daemon start' or set auto_start")
+        outputs = client.generate_batch(prompts, max_new_tokens=max_tokens, temperature=temperature,
+                                        do_sample=temperature > 0)
+        return [{'text': output['text'], 'tokens_used': output['tokens_used']} for output in outputs]
+
+    return generate
+
+
+class ActionModule(ActionBase):
+    """
+    Run llm_generate on the controller.
+
+    Every host of a task sends its prompt to the same batch directory; one
+    worker sends all collected prompts, with duplicates removed, as a single
+    batch request and each host picks up its own result. Without an endpoint
+    the batch goes to the controller's inference daemon, so the model is
+    loaded once per controller rather than once per host. The module is
+    never copied to the targets.
+    """
+
+    TRANSFERS_FILES = False
+    _VALID_ARGS = frozenset(('prompt', 'max_tokens', 'temperature', 'endpoint', 'batch', 'batch_window',
+                             'socket_path', 'auto_start', 'stream', 'deadline', 'retries'))
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = dict()
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp  # tmp no longer has any effect
+
+        if not HAS_CLIENT:
+            raise AnsibleActionFail(f"The llm_generate batching client is not available: {CLIENT_IMPORT_ERROR}")
+
+        args = self._task.args
+        prompt = args.get('prompt')
+        if not prompt:
+            raise AnsibleActionFail("prompt is required")
+        try:
+            max_tokens = int(args.get('max_tokens', 1024))
+            temperature = float(args.get('temperature', 0.7))
+            batch_window = float(args.get('batch_window', 0.5))
+            deadline = float(args.get('deadline', 900))
+            retries = int(args.get('retries', 5))
+        except (TypeError, ValueError) as e:
+            raise AnsibleActionFail(f"Invalid numeric argument: {e}")
+        endpoint = args.get('endpoint')
+        batch = boolean(args.get('batch', True), strict=False)
+        stream = boolean(args.get('stream', False), strict=False)
+
+        result.update(changed=False, text='', tokens_used=0, completion_time=0)
+        if self._play_context.check_mode:
+            return result
+
+        if endpoint:
+            client = get_client()
+
+            def generate(prompts, group_max_tokens, group_temperature):
+                return client.generate(endpoint, prompts, group_max_tokens, group_temperature, batch=batch,
+                                       stream=stream, deadline=deadline, retries=retries)
+            target = endpoint
+        else:
+            if not HAS_DAEMON:
+                raise AnsibleActionFail("Local generation requires the project's inference daemon package")
+            target = args.get('socket_path') or 'daemon'
+            generate = _daemon_generator(args.get('socket_path'),
+                                         boolean(args.get('auto_start', True), strict=False))
+
+        # Only as many hosts as there are forks run the task at the same time
+        play_batch = len(task_vars.get('ansible_play_batch', [])) or 1
+        expected = min(int(task_vars.get('ansible_forks') or play_batch), play_batch)
+        batcher = PromptBatcher(batch_directory(self._task._uuid),
+                                lambda payloads: _send_grouped(payloads, generate), window=batch_window,
+                                expected=expected)
+        key = cache_key('generate', target, prompt, max_tokens, temperature)
+
+        start_time = time.time()
+        try:
+            response = batcher.request(key, {'prompt': prompt, 'max_tokens': max_tokens,
+                                             'temperature': temperature})
+        except Exception as e:
+            result.update(failed=True, msg=f"Error generating text: {to_text(e)}",
+                          completion_time=time.time() - start_time)
+            return result
+
+        result['text'] = response.get('text', '')
+        result['tokens_used'] = response.get('tokens_used', 0)
+        result['completion_time'] = time.time() - start_time
+        return result
@@ -0,0 +1,204 @@
+"""
+Background failure analysis for the llm_advisor callback.
+
+Ansible invokes callbacks on the controller's main thread, so anything slow
+done there delays every host. The advisor therefore only queues failures;
+a small pool of daemon threads sends them to the REST service and the
+callback prints whatever has finished at its next event.
+"""
+import time
+import queue
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+
+class AdvisorResult(NamedTuple):
+    """A finished analysis request."""
+    key: Any
+    payload: Dict
+    result: Optional[Dict]
+    error: Optional[str]
+
+
+class AdvisorClient:
+    """
+    Client for the REST advice endpoints.
+
+    Every worker thread gets its own ``requests.Session``, so each keeps one
+    keep-alive connection to the service instead of reconnecting per failure.
+
+    Args:
+        api_url: Base URL of the REST service
+        timeout: Seconds to wait for a single analysis
+    """
+
+    def __init__(self, api_url: str, timeout: float = 120):
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+    def analyze_failure(self, payload: Dict) -> Dict:
+        """
+        Request an analysis of a failed task.
+
+        Args:
+            payload: Request body for ``/analyze_failure``
+
+        Returns:
+            dict: The response with ``analysis`` and ``tokens_used``
+        """
+        return self._post("/analyze_failure", payload)
+
+    def suggest_optimizations(self, payload: Dict) -> Dict:
+        """
+        Request speed-up suggestions for measured tasks.
+
+        Args:
+            payload: Request body for ``/suggest_optimizations``
+
+        Returns:
+            dict: The response with ``analysis`` and ``tokens_used``
+        """
+        return self._post("/suggest_optimizations", payload)
+
+    def _post(self, path: str, payload: Dict) -> Dict:
+        response = self._session().post(f"{self.api_url}{path}", json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+class AdvisorWorkerPool:
+    """
+    Bounded pool of daemon threads running analysis requests.
+
+    Submitting never blocks: when ``max_pending`` requests are already waiting
+    the new one is dropped and counted. Worker threads are daemons, so a
+    service that stops answering cannot keep ansible-playbook from exiting.
+
+    Args:
+        analyze: Callable taking a payload and returning the analysis
+        workers: Number of worker threads
+        max_pending: Maximum number of queued requests
+    """
+
+    def __init__(self, analyze: Callable[[Dict], Dict], workers: int = 2, max_pending: int = 100):
+        self._analyze = analyze
+        self._tasks = queue.Queue(maxsize=max(1, max_pending))
+        self._results = queue.Queue()
+        self._condition = threading.Condition()
+        self._outstanding = 0
+        self._closed = False
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "dropped": 0, "abandoned": 0}
+
+        self._threads = []
+        for i in range(max(1, workers)):
+            thread = threading.Thread(target=self._work, name=f"llm-advisor-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, key: Any, payload: Dict, analyze: Optional[Callable[[Dict], Dict]] = None) -> bool:
+        """
+        Queue a request without blocking.
+
+        Args:
+            key: Identifier returned with the result
+            payload: Argument for the analyze callable
+            analyze: Callable to use instead of the pool's default
+
+        Returns:
+            bool: False when the request was dropped
+        """
+        with self._condition:
+            if self._closed:
+                return False
+            try:
+                self._tasks.put_nowait((key, payload, analyze or self._analyze))
+            except queue.Full:
+                self.stats["dropped"] += 1
+                return False
+            self._outstanding += 1
+            self.stats["submitted"] += 1
+        return True
+
+    @property
+    def pending(self) -> int:
+        """Number of requests queued or running."""
+        with self._condition:
+            return self._outstanding
+
+    def poll(self) -> List[AdvisorResult]:
+        """Return the results that have finished since the last call."""
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def drain(self, timeout: float) -> Tuple[List[AdvisorResult], int]:
+        """
+        Wait up to ``timeout`` seconds for outstanding requests.
+
+        Args:
+            timeout: Time budget in seconds
+
+        Returns:
+            tuple: (finished results, number of requests still outstanding)
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._outstanding:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            outstanding = self._outstanding
+        return self.poll(), outstanding
+
+    def shutdown(self):
+        """Stop accepting requests and discard the ones not yet started."""
+        with self._condition:
+            self._closed = True
+            while True:
+                try:
+                    self._tasks.get_nowait()
+                except queue.Empty:
+                    break
+                self._outstanding -= 1
+                self.stats["abandoned"] += 1
+            self.stats["abandoned"] += self._outstanding
+        for _ in self._threads:
+            try:
+                self._tasks.put_nowait(None)
+            except queue.Full:
+                break
+
+    def _work(self):
+        while True:
+            item = self._tasks.get()
+            if item is None:
+                return
+            key, payload, analyze = item
+            try:
+                result, error = analyze(payload), None
+            except Exception as e:
+                result, error = None, str(e)
+
+            self._results.put(AdvisorResult(key, payload, result, error))
+            with self._condition:
+                self._outstanding -= 1
+                self.stats["failed" if error else "completed"] += 1
+                self._condition.notify_all()
@@ -8,9 +8,16 @@ DOCUMENTATION = '''
     description:
         - This callback plugin uses TinyLlama 3 to analyze task failures and provide advice
         - It can also analyze successful tasks and suggest optimizations
+        - Failures are analyzed by the REST service in background threads, so playbook
+          execution never waits for the model; advice is printed as it arrives and
+          outstanding analyses are awaited at the end of the run, up to drain_timeout
+        - Failures are grouped by a signature of the task, its arguments and its error
+          with host names, addresses, timestamps and paths masked, so a failure repeated
+          across many hosts is analyzed once
     requirements:
         - Python 3.12+
-        - TinyLlama 3 components installed
+        - python requests
+        - A running ansible-llm REST service
     options:
       enable_failure_analysis:
         description: Whether to analyze failures 
@@ -22,7 +29,10 @@ DOCUMENTATION = '''
         env:
           - name: ANSIBLE_CALLBACK_LLM_ADVISOR_FAILURE_ANALYSIS
       enable_optimization:
-        description: Whether to suggest optimizations for successful tasks
+        description:
+          - Whether to record per-host task durations and suggest optimizations
+          - Durations are kept in timing_db across runs; the slowest and most skipped tasks
+            are reported at the end of the run and sent to the model for speed-up suggestions
         default: False
         type: bool
         ini:
@@ -30,9 +40,112 @@ DOCUMENTATION = '''
             key: enable_optimization
         env:
           - name: ANSIBLE_CALLBACK_LLM_ADVISOR_OPTIMIZATION
+      api_url:
+        description: Base URL of the ansible-llm REST service
+        default: http://127.0.0.1:8000
+        type: str
+        ini:
+          - section: callback_llm_advisor
+            key: api_url
+        env:
+          - name: ANSIBLE_CALLBACK_LLM_ADVISOR_API_URL
+      workers:
+        description: Number of background threads sending analysis requests
+        default: 2
+        type: int
+        ini:
+          - section: callback_llm_advisor
+            key: workers
+        env:
+          - name: ANSIBLE_CALLBACK_LLM_ADVISOR_WORKERS
+      max_pending:
+        description: Maximum number of queued analyses; further failures are not analyzed
+        default: 100
+        type: int
+        ini:
+          - section: callback_llm_advisor
+            key: max_pending
+        env:
+          - name: ANSIBLE_CALLBACK_LLM_ADVISOR_MAX_PENDING
+      request_timeout:
+        description: Seconds to wait for a single analysis
+        default: 120
+        type: float
+        ini:
+          - section: callback_llm_advisor
+            key: request_timeout
+        env:
+          - name: ANSIBLE_CALLBACK_LLM_ADVISOR_REQUEST_TIMEOUT
+      drain_timeout:
+        description: Seconds to wait for outstanding analyses when the playbook ends
+        default: 60
+        type: float
+        ini:
+          - section: callback_llm_advisor
+            key: drain_timeout
+        env:
+          - name: ANSIBLE_CALLBACK_LLM_ADVISOR_DRAIN_TIMEOUT
+      history_size:
+        description: Number of recent task results kept per host as context for failure analysis
+        default: 8
+        type: int
+        ini:
+          - section: callback_llm_advisor
+            key: history_size
+        env:
+          - name: ANSIBLE_CALLBACK_LLM_ADVISOR_HISTORY_SIZE
+      context_tokens:
+        description: Approximate token budget for the host details and previous results sent with a failure
+        default: 384
+        type: int
+        ini:
+          - section: callback_llm_advisor
+            key: context_tokens
+        env:
+          - name: ANSIBLE_CALLBACK_LLM_ADVISOR_CONTEXT_TOKENS
+      timing_db:
+        description: SQLite database storing task durations across runs
+        default: ~/.ansible_llm/task_timings.db
+        type: str
+        ini:
+          - section: callback_llm_advisor
+            key: timing_db
+        env:
+          - name: ANSIBLE_CALLBACK_LLM_ADVISOR_TIMING_DB
+      report_top:
+        description: Number of slowest and most skipped tasks to report and send to the model
+        default: 5
+        type: int
+        ini:
+          - section: callback_llm_advisor
+            key: report_top
+        env:
+          - name: ANSIBLE_CALLBACK_LLM_ADVISOR_REPORT_TOP
+      report_runs:
+        description: Number of recent runs of the playbook the timing report covers
+        default: 10
+        type: int
+        ini:
+          - section: callback_llm_advisor
+            key: report_runs
+        env:
+          - name: ANSIBLE_CALLBACK_LLM_ADVISOR_REPORT_RUNS
+      signature_cache:
+        description:
+          - File storing advice by failure signature, so failures seen in earlier runs
+            are explained without calling the model
+          - Set to an empty string to disable the cache
+        default: ~/.ansible_llm/cache/failure_advice.json
+        type: str
+        ini:
+          - section: callback_llm_advisor
+            key: signature_cache
+        env:
+          - name: ANSIBLE_CALLBACK_LLM_ADVISOR_SIGNATURE_CACHE
 '''
 
 import os
+import sys
 import json
 import time
 import traceback
@@ -41,11 +154,19 @@ from datetime import datetime
 
 from ansible.plugins.callback import CallbackBase
 
+# Add project root to path to allow importing the advisor worker
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+
 try:
-    # Import TinyLlama components
-    # This would be the actual import in a real implementation
-    TINYLLAMA_AVAILABLE = False
-    TINYLLAMA_IMPORT_ERROR = "TinyLlama components not available (this is expected in the initial setup)"
+    import requests  # noqa: F401
+    from src.ansible_plugins.advisor_worker import AdvisorClient, AdvisorWorkerPool
+    from src.ansible_plugins.failure_signatures import FailureGroups
+    from src.ansible_plugins.host_history import HostHistory
+    from src.ansible_plugins.task_timings import TaskTimingStore, format_timing_report
+    from src.llm_engine.analysis_cache import AnalysisCache, prompt_version
+    from src.llm_engine.prompt_templates import DECISION_MAKING_TEMPLATE
+    TINYLLAMA_AVAILABLE = True
+    TINYLLAMA_IMPORT_ERROR = None
 except ImportError as e:
     TINYLLAMA_AVAILABLE = False
     TINYLLAMA_IMPORT_ERROR = str(e)
@@ -63,11 +184,17 @@ class CallbackModule(CallbackBase):
         super(CallbackModule, self).__init__(display=display)
         self.playbook_name = None
         self.play_name = None
-        self.task_name = None
-        self.host_name = None
         self.failures = 0
         self.success = 0
         self.start_time = datetime.now()
+        self.client = None
+        self.worker_pool = None
+        self.failure_groups = None
+        self.history = None
+        self.timings = None
+        self.task_starts = {}
+        self.host_starts = {}
+        self.advice_received = 0
         
         # Check if TinyLlama is available
         if not TINYLLAMA_AVAILABLE:
@@ -81,66 +208,253 @@ class CallbackModule(CallbackBase):
         
         self._display.vv("LLM Advisor: Failure Analysis: {}".format("Enabled" if self.enable_failure_analysis else "Disabled"))
         self._display.vv("LLM Advisor: Optimization: {}".format("Enabled" if self.enable_optimization else "Disabled"))
+        
+        if not TINYLLAMA_AVAILABLE:
+            return
+        
+        if self.enable_failure_analysis or self.enable_optimization:
+            self.client = AdvisorClient(self.get_option('api_url'), timeout=self.get_option('request_timeout'))
+            self.worker_pool = AdvisorWorkerPool(self.client.analyze_failure,
+                                                 workers=self.get_option('workers'),
+                                                 max_pending=self.get_option('max_pending'))
+        
+        if self.enable_optimization:
+            try:
+                self.timings = TaskTimingStore(os.path.expanduser(self.get_option('timing_db')))
+            except Exception as e:
+                self._display.warning(f"LLM Advisor: Could not open timing database: {e}")
+        
+        if self.enable_failure_analysis:
+            cache = None
+            if self.get_option('signature_cache'):
+                # Advice depends on the service that produced it and the prompt it used
+                cache = AnalysisCache(os.path.expanduser(self.get_option('signature_cache')),
+                                      self.get_option('api_url'),
+                                      prompt_version(DECISION_MAKING_TEMPLATE)).load()
+            self.failure_groups = FailureGroups(cache)
+            self.history = HostHistory(size=self.get_option('history_size'))
 
     def v2_playbook_on_start(self, playbook):
         self.playbook_name = os.path.basename(playbook._file_name)
+        if self.timings is not None:
+            self.timings.start_run(self.playbook_name)
         self._display.display(f"LLM Advisor: Monitoring playbook {self.playbook_name}", color="blue")
 
     def v2_playbook_on_play_start(self, play):
+        self._report_advice()
         self.play_name = play.get_name()
         
     def v2_playbook_on_task_start(self, task, is_conditional):
-        self.task_name = task.get_name()
+        self._report_advice()
+        if self.timings is not None:
+            self.task_starts[task._uuid] = time.monotonic()
+        
+    def v2_playbook_on_handler_task_start(self, task):
+        self.v2_playbook_on_task_start(task, False)
+        
+    def v2_runner_on_start(self, host, task):
+        # Per-host start; without it durations are measured from the task start
+        if self.timings is not None:
+            self.host_starts[(host.get_name(), task._uuid)] = time.monotonic()
     
     def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._record_timing(result, "failed")
         if not self.enable_failure_analysis:
             return
         
-        self.host_name = result._host.get_name()
+        self._report_advice()
+        # Under the free strategy hosts run different tasks at the same time,
+        # so the host and task always come from the result itself
+        host_name = result._host.get_name()
         self.failures += 1
         
         if ignore_errors:
+            self._record_outcome(result, "failed")
             return
             
         # Extract useful information from the result
         task_args = result._task.args
         error_msg = self._get_error_message(result._result)
         
-        self._display.display("LLM Advisor: Analyzing failure...", color="yellow")
-        
-        # In a real implementation, here we would call the LLM to analyze the failure
-        # For now, we'll just show what information would be sent to the LLM
-        
         analysis_data = {
             "playbook": self.playbook_name,
             "play": self.play_name,
-            "task": self.task_name,
-            "host": self.host_name,
-            "error": error_msg,
+            "task": result._task.get_name(),
+            "module": result._task.action,
+            "host": host_name,
+            "error": str(error_msg),
             "task_args": task_args
         }
         
-        self._display.display(f"Would send to LLM for analysis: {json.dumps(analysis_data, indent=2)}", color="yellow")
-        self._display.display("LLM Advisor: This is a placeholder for actual TinyLlama analysis", color="cyan")
+        if self.worker_pool is None:
+            self._display.vv(f"LLM Advisor: analysis unavailable, failure data: {json.dumps(analysis_data, indent=2, default=str)}")
+            return
         
-    def v2_runner_on_ok(self, result):
-        self.host_name = result._host.get_name()
-        self.success += 1
+        address = result._host.vars.get('ansible_host')
+        group, is_new = self.failure_groups.add(host_name, analysis_data, [address])
+        if not is_new:
+            self._record_outcome(result, "failed")
+            self._display.vv(f"LLM Advisor: {analysis_data['task']} on {host_name} failed like "
+                             f"{len(group['hosts']) - 1} other host(s), not analyzing again")
+            return
         
-        if not self.enable_optimization:
+        if group["cached"]:
+            self._record_outcome(result, "failed")
+            self._display_group_advice(group)
             return
-            
-        # For successful tasks, we could suggest optimizations
-        # This would be implemented in a real version of the plugin
-        pass
+        
+        # Context only matters for failures that are actually analyzed
+        analysis_data["host_details"], analysis_data["previous_results"] = self.history.failure_context(
+            host_name, self.get_option('context_tokens'), exclude_uuid=result._task._uuid,
+            address=address, groups=[host_group.get_name() for host_group in result._host.get_groups()])
+        self._record_outcome(result, "failed")
+        
+        # Only queue the request here; the play must not wait for the model
+        if self.worker_pool.submit(group["signature"], analysis_data):
+            self._display.vv(f"LLM Advisor: Queued analysis of {analysis_data['task']} on {host_name}")
+        else:
+            # A later failure with the same signature gets another chance at analysis
+            self.failure_groups.release(group["signature"])
+            self._display.vv(f"LLM Advisor: Analysis queue full, skipping {analysis_data['task']} on {host_name}")
+        
+    def v2_runner_on_skipped(self, result):
+        self._record_timing(result, "skipped")
+        self._record_outcome(result, "skipped")
+        
+    def v2_runner_on_unreachable(self, result):
+        self._record_timing(result, "unreachable")
+        self._record_outcome(result, "unreachable")
+        
+    def v2_runner_on_ok(self, result):
+        self._record_timing(result, "ok")
+        self._report_advice()
+        self._record_outcome(result, "changed" if result._result.get('changed') else "ok")
+        self.success += 1
         
     def v2_playbook_on_stats(self, stats):
-        # Show summary at the end
+        # Playbook time is measured before waiting for outstanding advice
         duration = (datetime.now() - self.start_time).total_seconds()
+        
+        timing_report = self._timing_report()
+        if timing_report:
+            self._display.display("LLM Advisor: Task timing report:", color="blue")
+            self._display.display(timing_report)
+            if self.worker_pool is not None:
+                # Only the top-ranked tasks go to the model, not the raw timings
+                self.worker_pool.submit(None, {"playbook": self.playbook_name, "timing_report": timing_report},
+                                        analyze=self.client.suggest_optimizations)
+        
+        abandoned = 0
+        if self.worker_pool is not None:
+            self._report_advice()
+            if self.worker_pool.pending:
+                self._display.display(f"LLM Advisor: Waiting up to {self.get_option('drain_timeout'):.0f}s "
+                                      f"for {self.worker_pool.pending} pending analyses...", color="blue")
+            results, abandoned = self.worker_pool.drain(self.get_option('drain_timeout'))
+            self._display_advice(results)
+            self.worker_pool.shutdown()
+            if self.failure_groups is not None:
+                self._display_failure_groups()
+            if self.failure_groups is not None and self.failure_groups.cache is not None:
+                try:
+                    self.failure_groups.cache.save()
+                except OSError as e:
+                    self._display.warning(f"LLM Advisor: Could not save signature cache: {e}")
+        
+        # Show summary at the end
         self._display.display("LLM Advisor Summary:")
         self._display.display(f"  Duration: {duration:.2f} seconds")
         self._display.display(f"  Successful tasks: {self.success}")
         self._display.display(f"  Failed tasks: {self.failures}")
+        if self.failure_groups is not None:
+            self._display.display(f"  Failure signatures: {len(self.failure_groups.groups)} "
+                                  f"({self.failure_groups.host_count} failures)")
+            self._display.display(f"  Signatures analyzed: {self.advice_received}")
+        if self.worker_pool is not None:
+            skipped = self.worker_pool.stats["dropped"] + abandoned
+            if skipped:
+                self._display.display(f"  Analyses skipped or timed out: {skipped}", color="yellow")
+        
+    def _record_timing(self, result, status):
+        """Buffer the duration of a task on a host."""
+        if self.timings is None:
+            return
+        now = time.monotonic()
+        host_name = result._host.get_name()
+        task_uuid = result._task._uuid
+        start = self.host_starts.pop((host_name, task_uuid), None) or self.task_starts.get(task_uuid, now)
+        self.timings.add(self.play_name, result._task.get_name(), result._task.action, host_name,
+                         status, now - start)
+        
+    def _timing_report(self):
+        """Store this run's timings and rank tasks across recent runs."""
+        if self.timings is None:
+            return ""
+        try:
+            self.timings.finish_run()
+            top = self.get_option('report_top')
+            runs = self.get_option('report_runs')
+            return format_timing_report(self.timings.slowest_tasks(self.playbook_name, top, runs),
+                                        self.timings.most_skipped(self.playbook_name, top, runs))
+        except Exception as e:
+            self._display.warning(f"LLM Advisor: Could not update timing database: {e}")
+            return ""
+        finally:
+            self.timings.close()
+        
+    def _record_outcome(self, result, status):
+        """Add a task result to its host's history."""
+        if self.history is not None:
+            self.history.record(result._host.get_name(), result._task._uuid, result._task.get_name(),
+                                result._task.action, status, result._result)
+        
+    def _report_advice(self):
+        """Print the analyses that finished since the last callback event."""
+        if self.worker_pool is not None:
+            self._display_advice(self.worker_pool.poll())
+        
+    def _display_advice(self, results):
+        """Print finished analyses."""
+        for item in results:
+            if "timing_report" in item.payload:
+                self._display_optimizations(item)
+                continue
+            task = item.payload["task"]
+            if item.error:
+                self._display.warning(f"LLM Advisor: Analysis of {task} on {item.payload['host']} failed: {item.error}")
+                continue
+            self.advice_received += 1
+            self._display_group_advice(self.failure_groups.resolve(item.key, item.result))
+        
+    def _display_optimizations(self, item):
+        """Print speed-up suggestions for the timing report."""
+        if item.error:
+            self._display.warning(f"LLM Advisor: Optimization suggestions failed: {item.error}")
+            return
+        self._display.display("LLM Advisor: Suggested optimizations:", color="cyan")
+        self._display.display(item.result.get("analysis", ""), color="cyan")
+        
+    def _display_group_advice(self, group):
+        """Print the advice for a failure signature and the hosts it affects so far."""
+        hosts = group["hosts"]
+        affected = ", ".join(hosts[:5]) + (f" and {len(hosts) - 5} more" if len(hosts) > 5 else "")
+        source = " (cached)" if group["cached"] else ""
+        self._display.display(f"LLM Advisor: Advice for {group['payload']['task']} "
+                              f"[{len(hosts)} host(s): {affected}]{source}:", color="cyan")
+        self._display.display(group["advice"].get("analysis", ""), color="cyan")
+        
+    def _display_failure_groups(self):
+        """Print how many hosts share each failure signature."""
+        groups = sorted(self.failure_groups.groups.values(), key=lambda g: len(g["hosts"]), reverse=True)
+        if not groups:
+            return
+        self._display.display("LLM Advisor: Failures by signature:")
+        for group in groups:
+            status = "advice above" if group["advice"] is not None else "no advice"
+            error = group["normalized"]["error"]
+            if len(error) > 80:
+                error = error[:77] + "..."
+            self._display.display(f"  {len(group['hosts']):>5} x {group['payload']['task']}: {error} ({status})")
         
     def _get_error_message(self, result):
         """Extract error message from result."""
@@ -0,0 +1,169 @@
+"""
+Failure signatures for the llm_advisor callback.
+
+A task that fails the same way on many hosts only needs to be analyzed once.
+Failures are keyed by a signature built from the task, its module, its
+arguments and its error message, with host-specific details (host names, IP
+addresses, timestamps, paths and identifiers) masked out. Advice for a
+signature is kept in a persistent cache so later runs get it without a model
+call.
+"""
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+from src.llm_engine.analysis_cache import AnalysisCache, normalized_hash
+
+# Applied in order; earlier patterns must not be broken up by later ones
+_MASKS = [
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?\b"), "<TIME>"),
+    (re.compile(r"\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{1,2}\s+\d{2}:\d{2}:\d{2}\b"), "<TIME>"),
+    (re.compile(r"\b\d{2}:\d{2}:\d{2}(?:\.\d+)?\b"), "<TIME>"),
+    (re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"), "<ID>"),
+    (re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}(?::\d+)?\b"), "<IP>"),
+    (re.compile(r"\b(?:[0-9a-fA-F]{1,4}:){2,7}[0-9a-fA-F]{1,4}\b"), "<IP>"),
+    (re.compile(r"(?:[A-Za-z]:\\|~?/)[\w.@%+-]+(?:[/\\][\w.@%+-]+)*/?"), "<PATH>"),
+    (re.compile(r"\b[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)+\.[A-Za-z]{2,}\b"), "<HOST>"),
+    (re.compile(r"\b(?=[0-9a-fA-F]*\d)[0-9a-fA-F]{8,}\b"), "<ID>"),
+    (re.compile(r"\b\d{4,}\b"), "<N>"),
+]
+
+
+def normalize_failure_text(text: str, host_names: Iterable[str] = ()) -> str:
+    """
+    Mask host-specific details in an error message or argument value.
+
+    Args:
+        text: The text to normalize
+        host_names: Names of the failing host (inventory name, address) to mask
+
+    Returns:
+        str: The normalized text
+    """
+    text = str(text)
+    for name in sorted({str(n) for n in host_names if n}, key=len, reverse=True):
+        text = re.sub(rf"(?<![\w.-]){re.escape(name)}(?![\w-]|\.[\w-])", "<HOST>", text)
+    for pattern, replacement in _MASKS:
+        text = pattern.sub(replacement, text)
+    return " ".join(text.split())
+
+
+def _normalize_value(value, host_names):
+    if isinstance(value, dict):
+        return {str(k): _normalize_value(v, host_names) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_value(v, host_names) for v in value]
+    if isinstance(value, str):
+        return normalize_failure_text(value, host_names)
+    return value
+
+
+def failure_signature(task: str, module: Optional[str], task_args: Optional[Dict], error: str,
+                      host_names: Iterable[str] = ()) -> Tuple[str, Dict]:
+    """
+    Compute the signature of a task failure.
+
+    Args:
+        task: Task name
+        module: Module (action) the task ran
+        task_args: Arguments of the task
+        error: Error message of the failure
+        host_names: Names of the failing host to mask
+
+    Returns:
+        tuple: (hex signature, the normalized fields it was computed from)
+    """
+    host_names = list(host_names)
+    normalized = {
+        "task": task,
+        "module": module,
+        "args": _normalize_value(task_args or {}, host_names),
+        "error": normalize_failure_text(error, host_names),
+    }
+    return normalized_hash(normalized), normalized
+
+
+class FailureGroups:
+    """
+    Failures of one playbook run grouped by signature.
+
+    Each group records the first failure's payload, every affected host and,
+    once known, the advice. Advice found in the cache is attached when the
+    group is created.
+
+    Args:
+        cache: Optional AnalysisCache holding advice by signature
+    """
+
+    def __init__(self, cache: Optional[AnalysisCache] = None):
+        self.cache = cache
+        self.groups = {}
+
+    def add(self, host: str, payload: Dict, host_names: Iterable[str] = ()) -> Tuple[Dict, bool]:
+        """
+        Record a failure.
+
+        Args:
+            host: Inventory name of the failing host
+            payload: Failure data with ``task``, ``module``, ``task_args`` and ``error``
+            host_names: Additional names of the host to mask, e.g. its address
+
+        Returns:
+            tuple: (the failure's group, True if this is the first failure with
+            its signature, or the first since its analysis was released)
+        """
+        signature, normalized = failure_signature(payload.get("task"), payload.get("module"),
+                                                  payload.get("task_args"), payload.get("error", ""),
+                                                  [host, *host_names])
+        group = self.groups.get(signature)
+        if group is not None:
+            group["hosts"].append(host)
+            if group.pop("retry", False):
+                group["payload"] = payload
+                return group, True
+            return group, False
+
+        advice = self.cache.get(signature) if self.cache is not None else None
+        group = {
+            "signature": signature,
+            "normalized": normalized,
+            "payload": payload,
+            "hosts": [host],
+            "advice": advice,
+            "cached": advice is not None,
+        }
+        self.groups[signature] = group
+        return group, True
+
+    def release(self, signature: str):
+        """
+        Let the next failure with a signature be analyzed again.
+
+        Used when the analysis of the group's first failure could not be
+        queued, so the group would otherwise never get advice.
+
+        Args:
+            signature: The group's signature
+        """
+        self.groups[signature]["retry"] = True
+
+    def resolve(self, signature: str, advice: Dict) -> Dict:
+        """
+        Attach advice to a group and store it in the cache.
+
+        Args:
+            signature: The group's signature
+            advice: The analysis returned by the service
+
+        Returns:
+            dict: The updated group
+        """
+        group = self.groups[signature]
+        group["advice"] = advice
+        if self.cache is not None:
+            self.cache.put(signature, advice, source=group["payload"].get("playbook"))
+        return group
+
+    @property
+    def host_count(self) -> int:
+        """Total number of failures recorded."""
+        return sum(len(group["hosts"]) for group in self.groups.values())
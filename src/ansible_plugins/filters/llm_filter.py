@@ -14,6 +14,13 @@ DOCUMENTATION = '''
     description:
         - These filters use the TinyLlama model to process and transform text
         - Can be used for simplifying, explaining, or translating content
+        - Requests go to the ansible-llm REST service (ANSIBLE_LLM_API_URL, default
+          http://127.0.0.1:8000) over a pooled connection
+        - Results are memoized by operation and input, in memory and in an on-disk cache
+          on the controller (ANSIBLE_LLM_CACHE_DIR, empty to disable), so identical input
+          costs one inference per run no matter how many hosts template it
+        - Each filter also accepts a list (or the result of map) and returns a list in the
+          same order; duplicates are removed and the rest are sent as batched requests
     options:
         simplify:
             description: Simplify complex text
@@ -31,60 +38,64 @@ import traceback
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
 
 try:
-    from src.llm_engine.model_loader import load_model
+    from src.ansible_plugins.llm_client import get_client
     HAS_TINYLLAMA = True
 except ImportError:
     HAS_TINYLLAMA = False
 
 def _get_llm_client():
-    """Get LLM client for processing - placeholder implementation."""
-    # This would be implemented to actually load the model
-    # For now, we'll just return a placeholder function
-    def process_text(text, operation="simplify"):
-        """Process text using a placeholder instead of actual LLM."""
-        if operation == "simplify":
-            return f"[Simplified] {text}"
-        elif operation == "explain":
-            return f"[Explanation] {text}"
-        elif operation == "translate":
-            return f"[Translated] {text}"
-        else:
-            return text
-            
-    return {"process": process_text}
+    """Get the process-wide LLM client."""
+    return get_client()
+
+def _is_text_list(value):
+    """Check whether a filter input is a sequence of texts rather than one text."""
+    return not isinstance(value, (str, bytes, dict)) and hasattr(value, '__iter__')
+
+def _process(text, operation, style=None):
+    """Process one text, or a list of texts in batched requests."""
+    client = _get_llm_client()
+    if _is_text_list(text):
+        return client.process_texts(list(text), operation=operation, style=style)
+    return client.process_text(text, operation=operation, style=style)
+
+def _mark(text, prefix, suffix=""):
+    """Prefix one text, or every text of a list, with a status marker."""
+    if _is_text_list(text):
+        return [f"{prefix} {item}{suffix}" for item in text]
+    return f"{prefix} {text}{suffix}"
 
 def _simplify_filter(text):
     """Simplify complex text using LLM."""
     if not HAS_TINYLLAMA:
-        return f"[LLM NOT AVAILABLE - Simplification not performed] {text}"
+        return _mark(text, "[LLM NOT AVAILABLE - Simplification not performed]")
         
+    text = list(text) if _is_text_list(text) else text
     try:
-        client = _get_llm_client()
-        return client["process"](text, operation="simplify")
+        return _process(text, operation="simplify")
     except Exception:
-        return f"[ERROR DURING SIMPLIFICATION] {text}\n{traceback.format_exc()}"
+        return _mark(text, "[ERROR DURING SIMPLIFICATION]", f"\n{traceback.format_exc()}")
 
 def _explain_filter(text):
     """Explain technical text in simple terms using LLM."""
     if not HAS_TINYLLAMA:
-        return f"[LLM NOT AVAILABLE - Explanation not performed] {text}"
+        return _mark(text, "[LLM NOT AVAILABLE - Explanation not performed]")
         
+    text = list(text) if _is_text_list(text) else text
     try:
-        client = _get_llm_client()
-        return client["process"](text, operation="explain")
+        return _process(text, operation="explain")
     except Exception:
-        return f"[ERROR DURING EXPLANATION] {text}\n{traceback.format_exc()}"
+        return _mark(text, "[ERROR DURING EXPLANATION]", f"\n{traceback.format_exc()}")
 
 def _translate_filter(text, style="technical"):
     """Translate between explanation styles using LLM."""
     if not HAS_TINYLLAMA:
-        return f"[LLM NOT AVAILABLE - Translation not performed] {text}"
+        return _mark(text, "[LLM NOT AVAILABLE - Translation not performed]")
         
+    text = list(text) if _is_text_list(text) else text
     try:
-        client = _get_llm_client()
-        return client["process"](text, operation="translate")
+        return _process(text, operation="translate", style=style)
     except Exception:
-        return f"[ERROR DURING TRANSLATION] {text}\n{traceback.format_exc()}"
+        return _mark(text, "[ERROR DURING TRANSLATION]", f"\n{traceback.format_exc()}")
 
 class FilterModule(object):
     """LLM filters."""
@@ -0,0 +1,195 @@
+"""
+Recent task outcomes per host for the llm_advisor callback.
+
+Failure analysis is more useful with the host's recent history, but the
+advisor may watch thousands of hosts. Each host therefore keeps a fixed-size
+ring buffer of compact outcome records with truncated messages, and a few
+facts describing the host. Results are attributed by the host and task UUID
+carried on each result, never by "current task" state, so the history stays
+correct under the free strategy where hosts run different tasks at once.
+"""
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+from src.llm_engine.inventory_analysis import estimate_tokens
+
+# Facts kept per host to describe it in prompts
+HOST_DETAIL_FACTS = (
+    "distribution",
+    "distribution_version",
+    "os_family",
+    "pkg_mgr",
+    "service_mgr",
+    "architecture",
+    "virtualization_type",
+)
+
+
+def truncate(text, limit: int) -> str:
+    """Collapse whitespace and cut text to at most ``limit`` characters."""
+    text = " ".join(str(text).split())
+    if len(text) > limit:
+        return text[:max(0, limit - 3)] + "..."
+    return text
+
+
+def summarize_result(status: str, result: Dict) -> str:
+    """
+    Describe a task result in a few words.
+
+    Args:
+        status: Outcome of the task (ok, changed, failed, skipped, unreachable)
+        result: The module result dictionary
+
+    Returns:
+        str: A short, untruncated description
+    """
+    for key in ("msg", "stderr", "skip_reason", "stdout"):
+        if result.get(key):
+            return str(result[key])
+    if "rc" in result:
+        return f"rc={result['rc']}"
+    return status
+
+
+class TaskOutcome:
+    """A compact record of one task's result on one host."""
+    __slots__ = ("task_uuid", "task", "module", "status", "message")
+
+    def __init__(self, task_uuid: str, task: str, module: str, status: str, message: str):
+        self.task_uuid = task_uuid
+        self.task = task
+        self.module = module
+        self.status = status
+        self.message = message
+
+    def describe(self) -> str:
+        """Format the outcome as a single prompt line."""
+        return f"- {self.task} ({self.module}): {self.status}: {self.message}"
+
+
+class HostHistory:
+    """
+    Bounded per-host history of task outcomes.
+
+    Memory is bounded by ``hosts * size`` records of at most
+    ``message_chars`` characters each.
+
+    Args:
+        size: Number of outcomes kept per host
+        message_chars: Maximum length of each stored message
+    """
+
+    def __init__(self, size: int = 8, message_chars: int = 160):
+        self.size = max(1, size)
+        self.message_chars = message_chars
+        self.outcomes = {}
+        self.details = {}
+
+    def record(self, host: str, task_uuid: str, task: str, module: str, status: str, result: Dict):
+        """
+        Record a task result for a host.
+
+        A second result for the same task on the same host (for example the
+        final result after per-item results) replaces the earlier record.
+
+        Args:
+            host: Inventory name of the host
+            task_uuid: UUID of the task
+            task: Task name
+            module: Module (action) of the task
+            status: Outcome of the task
+            result: The module result dictionary
+        """
+        buffer = self.outcomes.get(host)
+        if buffer is None:
+            buffer = self.outcomes[host] = deque(maxlen=self.size)
+
+        message = truncate(summarize_result(status, result), self.message_chars)
+        if buffer and buffer[-1].task_uuid == task_uuid:
+            buffer[-1].status = status
+            buffer[-1].message = message
+        else:
+            buffer.append(TaskOutcome(task_uuid, truncate(task, 80), module, status, message))
+
+        facts = result.get("ansible_facts")
+        if facts:
+            self._record_facts(host, facts)
+
+    def _record_facts(self, host: str, facts: Dict):
+        details = self.details.setdefault(host, {})
+        for key in HOST_DETAIL_FACTS:
+            value = facts.get(key, facts.get(f"ansible_{key}"))
+            if value:
+                details[key] = truncate(value, 40)
+
+    def host_details(self, host: str, address: Optional[str] = None, groups=()) -> str:
+        """
+        Describe a host for a prompt.
+
+        Args:
+            host: Inventory name of the host
+            address: The host's ansible_host, if set
+            groups: Names of the groups the host belongs to
+
+        Returns:
+            str: One line of host details
+        """
+        parts = [host]
+        if address and address != host:
+            parts.append(f"address {address}")
+        groups = [g for g in groups if g not in ("all", "ungrouped")]
+        if groups:
+            parts.append("groups " + ", ".join(sorted(groups)[:5]))
+        parts.extend(f"{key} {value}" for key, value in self.details.get(host, {}).items())
+        return "; ".join(parts)
+
+    def previous_results(self, host: str, token_budget: int, exclude_uuid: Optional[str] = None) -> str:
+        """
+        Describe a host's recent outcomes within a token budget.
+
+        The most recent outcomes are kept when the budget is too small for
+        all of them; the result lists them oldest first.
+
+        Args:
+            host: Inventory name of the host
+            token_budget: Maximum estimated tokens of the result
+            exclude_uuid: Task to leave out, typically the failing one
+
+        Returns:
+            str: One line per outcome, or an empty string
+        """
+        lines = []
+        used = 0
+        for outcome in reversed(self.outcomes.get(host, ())):
+            if outcome.task_uuid == exclude_uuid:
+                continue
+            line = outcome.describe()
+            cost = estimate_tokens(line)
+            if used + cost > token_budget:
+                break
+            lines.append(line)
+            used += cost
+        return "\n".join(reversed(lines))
+
+    def failure_context(self, host: str, token_budget: int, exclude_uuid: Optional[str] = None,
+                        address: Optional[str] = None, groups=()) -> Tuple[str, str]:
+        """
+        Build the host_details and previous_results for a failure prompt.
+
+        Host details are always included; recent outcomes fill the rest of
+        the budget.
+
+        Args:
+            host: Inventory name of the failing host
+            token_budget: Maximum estimated tokens for both parts together
+            exclude_uuid: The failing task's UUID
+            address: The host's ansible_host, if set
+            groups: Names of the groups the host belongs to
+
+        Returns:
+            tuple: (host_details, previous_results)
+        """
+        details = self.host_details(host, address, groups)
+        remaining = token_budget - estimate_tokens(details)
+        return details, self.previous_results(host, remaining, exclude_uuid)
@@ -0,0 +1,566 @@
+"""
+Shared client for the Ansible plugins that call the REST service.
+
+Jinja filters run once per host, each time in a forked worker process, so a
+naive filter sends the same request for every host. The client keeps one
+pooled HTTP session per process and memoizes results by operation and input
+hash, first in an in-process LRU and then in an on-disk cache on the
+controller. Forks computing the same key serialize on a per-key file lock,
+so identical inputs are sent to the service once even when many forks
+template them at the same moment.
+"""
+import os
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.ansible_plugins.module_utils.llm_http import LLMClientError, post_with_retries
+
+DEFAULT_CLIENT_SETTINGS = {
+    "api_url": "http://127.0.0.1:8000",
+    "timeout": 120.0,
+    "deadline": 900.0,
+    "retries": 5,
+    "cache_dir": "~/.ansible_llm/cache/plugins",
+    "cache_ttl": 0,
+    "lru_size": 1024,
+}
+
+_ENV_OVERRIDES = {
+    "ANSIBLE_LLM_API_URL": ("api_url", str),
+    "ANSIBLE_LLM_TIMEOUT": ("timeout", float),
+    "ANSIBLE_LLM_DEADLINE": ("deadline", float),
+    "ANSIBLE_LLM_RETRIES": ("retries", int),
+    "ANSIBLE_LLM_CACHE_DIR": ("cache_dir", str),
+    "ANSIBLE_LLM_CACHE_TTL": ("cache_ttl", int),
+    "ANSIBLE_LLM_LRU_SIZE": ("lru_size", int),
+}
+
+# Unique texts sent per /process_text request; also bounds the locks held at once
+TEXT_BATCH_SIZE = 32
+
+# Batch directories of finished tasks are removed after this many seconds
+BATCH_DIRECTORY_MAX_AGE = 86400
+
+
+def get_client_settings() -> Dict:
+    """
+    Resolve the client settings from the environment.
+
+    Plugins run inside ansible-playbook, so settings come from environment
+    variables rather than the configuration file. An empty ANSIBLE_LLM_CACHE_DIR
+    disables the on-disk cache.
+
+    Returns:
+        dict: Settings with all keys of DEFAULT_CLIENT_SETTINGS present
+    """
+    settings = dict(DEFAULT_CLIENT_SETTINGS)
+    for env_name, (key, convert) in _ENV_OVERRIDES.items():
+        value = os.environ.get(env_name)
+        if value is None:
+            continue
+        try:
+            settings[key] = convert(value)
+        except ValueError:
+            pass
+    return settings
+
+
+def cache_key(operation: str, *parts) -> str:
+    """Hash an operation and its inputs into a cache key."""
+    canonical = json.dumps([operation, *parts], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    File-per-key result cache shared by all processes on the controller.
+
+    Args:
+        directory: Cache directory
+        ttl: Seconds an entry stays valid, 0 for no expiry
+    """
+
+    def __init__(self, directory, ttl: int = 0):
+        self.directory = os.path.expanduser(str(directory))
+        self.ttl = ttl
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key[:2], key + suffix)
+
+    def get(self, key: str, ttl: Optional[int] = None) -> Optional[Any]:
+        """Return the cached value for a key, or None if missing or older than ``ttl`` (default self.ttl)."""
+        try:
+            with open(self._path(key, ".json"), "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        ttl = self.ttl if ttl is None else ttl
+        if ttl and time.time() - entry.get("created", 0) > ttl:
+            return None
+        return entry.get("value")
+
+    def put(self, key: str, value: Any):
+        """Store a value atomically."""
+        path = self._path(key, ".json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".entry-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"created": time.time(), "value": value}, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @contextmanager
+    def lock(self, key: str):
+        """Hold an exclusive lock on a key across processes."""
+        path = self._path(key, ".lock")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class LLMClient:
+    """
+    Memoizing client for the REST service.
+
+    Requests that fail to connect or are answered with 429 or 503 are
+    retried with a jittered exponential backoff, honoring Retry-After, until
+    ``retries`` retries or the deadline run out.
+
+    Args:
+        api_url: Base URL of the REST service
+        timeout: Seconds a streaming response may stay silent before it is abandoned
+        deadline: Seconds a request may take in total, including retries
+        retries: Maximum number of retries of a request
+        cache_dir: Directory of the on-disk cache, or None to disable it
+        cache_ttl: Seconds on-disk entries stay valid, 0 for no expiry
+        lru_size: Number of results kept in memory
+    """
+
+    def __init__(self, api_url: str = DEFAULT_CLIENT_SETTINGS["api_url"],
+                 timeout: float = DEFAULT_CLIENT_SETTINGS["timeout"],
+                 cache_dir: Optional[str] = None, cache_ttl: int = 0,
+                 lru_size: int = DEFAULT_CLIENT_SETTINGS["lru_size"],
+                 deadline: float = DEFAULT_CLIENT_SETTINGS["deadline"],
+                 retries: int = DEFAULT_CLIENT_SETTINGS["retries"]):
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = max(0, retries)
+        self.disk_cache = DiskCache(cache_dir, cache_ttl) if cache_dir else None
+        self.lru_size = max(0, lru_size)
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "requests": 0, "retries": 0}
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._session = None
+        self._session_pid = None
+
+    @property
+    def session(self) -> requests.Session:
+        """The pooled session of the current process."""
+        # A forked worker must not share the parent's sockets
+        if self._session is None or self._session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._session = session
+            self._session_pid = os.getpid()
+        return self._session
+
+    def post(self, path: str, payload: Dict) -> Dict:
+        """
+        Send a request to the service.
+
+        Args:
+            path: Endpoint path, e.g. ``/process_text``
+            payload: JSON body
+
+        Returns:
+            dict: The decoded response
+
+        Raises:
+            LLMClientError: If the request fails
+        """
+        return self.post_url(f"{self.api_url}{path}", payload)
+
+    def post_url(self, url: str, payload: Dict, stream: bool = False, deadline: Optional[float] = None,
+                 retries: Optional[int] = None) -> Dict:
+        """
+        Send a request to an absolute URL over the pooled session.
+
+        Args:
+            url: Endpoint URL
+            payload: JSON body
+            stream: Read the response as a stream of JSON events (newline-delimited
+                or server-sent events) and assemble the completion from them
+            deadline: Seconds the request may take in total, default self.deadline
+            retries: Maximum number of retries, default self.retries
+
+        Returns:
+            dict: The decoded response; for a stream, ``text`` and ``tokens_used``
+
+        Raises:
+            LLMClientError: If the request fails, is still rejected after the
+                last retry, or does not finish before the deadline
+        """
+        def count(attempt):
+            self.stats["requests"] += 1
+            if attempt:
+                self.stats["retries"] += 1
+
+        deadline_at = time.monotonic() + (self.deadline if deadline is None else deadline)
+        return post_with_retries(self.session, url, payload, deadline_at,
+                                 retries=self.retries if retries is None else retries, stream=stream,
+                                 stream_timeout=self.timeout, on_attempt=count)
+
+    def generate(self, endpoint: str, prompts: List[str], max_tokens: int, temperature: float,
+                 batch: bool = True, stream: bool = False, deadline: Optional[float] = None,
+                 retries: Optional[int] = None) -> List[Dict]:
+        """
+        Generate completions for several prompts.
+
+        Args:
+            endpoint: URL of the generation endpoint
+            prompts: Unique prompts
+            max_tokens: Maximum tokens per completion
+            temperature: Sampling temperature
+            batch: Send all prompts in one ``prompts`` request; when False each
+                prompt is sent on its own, for endpoints without batch support
+            stream: The endpoint streams one completion per request, such as
+                ``/generate_stream``; prompts are sent one at a time
+            deadline: Seconds all prompts may take in total, default self.deadline
+            retries: Maximum number of retries per request, default self.retries
+
+        Returns:
+            list: One dict with ``text`` and ``tokens_used`` per prompt
+        """
+        params = {"max_tokens": max_tokens, "temperature": temperature}
+        deadline_at = time.monotonic() + (self.deadline if deadline is None else deadline)
+        if stream or not batch:
+            return [self.post_url(endpoint, dict(params, prompt=prompt), stream=stream,
+                                  deadline=deadline_at - time.monotonic(), retries=retries)
+                    for prompt in prompts]
+
+        results = self.post_url(endpoint, dict(params, prompts=prompts),
+                                deadline=deadline_at - time.monotonic(), retries=retries).get("results")
+        if not isinstance(results, list) or len(results) != len(prompts):
+            raise LLMClientError(f"{endpoint} did not return one result per prompt")
+        return results
+
+    def cached_generate(self, prompts: List[str], max_tokens: int = 256, temperature: float = 0.0,
+                        endpoint: Optional[str] = None, ttl: Optional[int] = None,
+                        offline: bool = False) -> List[str]:
+        """
+        Generate completions, reusing results cached by earlier calls and runs.
+
+        Results are keyed by endpoint, prompt and generation parameters. Prompts
+        without a valid cached result are sent together in one batch request.
+
+        Args:
+            prompts: The prompts to complete
+            max_tokens: Maximum tokens per completion
+            temperature: Sampling temperature
+            endpoint: URL of the generation endpoint, default ``<api_url>/generate``
+            ttl: Seconds a cached result stays valid, None for the cache's default
+                and 0 for no expiry
+            offline: Never contact the service; a prompt without a cached result
+                raises LLMClientError
+
+        Returns:
+            list: The completion texts, in prompt order
+
+        Raises:
+            LLMClientError: If the service fails, or on a cache miss in offline mode
+        """
+        if offline and self.disk_cache is None:
+            raise LLMClientError("Offline mode requires the on-disk cache (ANSIBLE_LLM_CACHE_DIR)")
+        endpoint = endpoint or f"{self.api_url}/generate"
+        prompts = [str(prompt) for prompt in prompts]
+        keys = [cache_key("generate", endpoint, prompt, max_tokens, temperature) for prompt in prompts]
+        found, missing = self._split_cached(keys, prompts)
+
+        def send(pending: List[str]) -> List[str]:
+            if offline:
+                raise LLMClientError(f"Offline mode: no cached result for prompt {pending[0][:60]!r}")
+            return [result["text"] for result in self.generate(endpoint, pending, max_tokens, temperature)]
+
+        pending = list(missing.items())
+        for start in range(0, len(pending), TEXT_BATCH_SIZE):
+            found.update(self._resolve_batch(dict(pending[start:start + TEXT_BATCH_SIZE]), send, ttl))
+        return [found[key] for key in keys]
+
+    def _lru_get(self, key: str):
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                return self._lru[key]
+        return None
+
+    def _lru_put(self, key: str, value):
+        if not self.lru_size:
+            return
+        with self._lock:
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def process_text(self, text: str, operation: str, style: Optional[str] = None) -> str:
+        """
+        Simplify, explain or translate a text.
+
+        Args:
+            text: The input text
+            operation: One of simplify, explain or translate
+            style: Target style for translate
+
+        Returns:
+            str: The processed text
+        """
+        return self.process_texts([text], operation, style)[0]
+
+    def process_texts(self, texts: List[str], operation: str, style: Optional[str] = None) -> List[str]:
+        """
+        Simplify, explain or translate several texts with batched requests.
+
+        Duplicates and cached texts are removed before sending; the remaining
+        texts go to the service TEXT_BATCH_SIZE at a time.
+
+        Args:
+            texts: The input texts
+            operation: One of simplify, explain or translate
+            style: Target style for translate
+
+        Returns:
+            list: The processed texts, in input order
+        """
+        texts = [str(text) for text in texts]
+        keys = [cache_key(operation, style, text) for text in texts]
+        found, missing = self._split_cached(keys, texts)
+
+        def send(pending: List[str]) -> List[str]:
+            payload = {"operation": operation, "texts": pending}
+            if style:
+                payload["style"] = style
+            return self.post("/process_text", payload)["results"]
+
+        pending = list(missing.items())
+        for start in range(0, len(pending), TEXT_BATCH_SIZE):
+            found.update(self._resolve_batch(dict(pending[start:start + TEXT_BATCH_SIZE]), send))
+
+        return [found[key] for key in keys]
+
+    def _split_cached(self, keys: List[str], inputs: List[str]):
+        """Split unique inputs into those found in the in-process LRU and those still missing."""
+        found = {}
+        missing = OrderedDict()
+        for key, item in zip(keys, inputs):
+            if key in found or key in missing:
+                continue
+            value = self._lru_get(key)
+            if value is not None:
+                self.stats["memory_hits"] += 1
+                found[key] = value
+            else:
+                missing[key] = item
+        return found, missing
+
+    def _resolve_batch(self, batch: Dict[str, str], send: Callable[[List[str]], List[Any]],
+                       ttl: Optional[int] = None) -> Dict[str, Any]:
+        """Resolve a batch of inputs not found in memory through the disk cache and one ``send`` call."""
+        results = {}
+        with ExitStack() as stack:
+            if self.disk_cache is not None:
+                # Sorted lock order keeps forks with overlapping batches from deadlocking
+                for key in sorted(batch):
+                    stack.enter_context(self.disk_cache.lock(key))
+                for key in list(batch):
+                    value = self.disk_cache.get(key, ttl)
+                    if value is not None:
+                        self.stats["disk_hits"] += 1
+                        results[key] = value
+                        del batch[key]
+
+            if batch:
+                outputs = send(list(batch.values()))
+                if len(outputs) != len(batch):
+                    raise LLMClientError(f"Expected {len(batch)} results, got {len(outputs)}")
+                for key, value in zip(batch, outputs):
+                    results[key] = value
+                    if self.disk_cache is not None:
+                        self.disk_cache.put(key, value)
+
+        for key, value in results.items():
+            self._lru_put(key, value)
+        return results
+
+
+class PromptBatcher:
+    """
+    Collects requests made by concurrent processes into shared batches.
+
+    Each process writes its request to the batch directory and then takes the
+    directory's leader lock. The process holding it waits up to ``window``
+    seconds for the other expected requests, sends every request that has no
+    result yet through ``send_batch`` and writes the results; processes that
+    get the lock afterwards find their result already written. Requests with
+    the same key are stored once, so duplicates are sent once. Failures are
+    not written: the leader raises the error, and the requests it could not
+    complete are sent again by the next process that takes the lock.
+
+    Args:
+        directory: Batch directory shared by the cooperating processes
+        send_batch: Callable taking a list of payloads and returning one
+            result per payload
+        window: Seconds the leader waits for more requests
+        expected: Number of requests expected in total; the leader stops
+            waiting once this many are present
+    """
+
+    def __init__(self, directory, send_batch: Callable[[List[Dict]], List[Any]],
+                 window: float = 0.2, expected: int = 1):
+        self.directory = str(directory)
+        self.send_batch = send_batch
+        self.window = window
+        self.expected = max(1, expected)
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.directory, kind, key + ".json")
+
+    def _write(self, path: str, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _read(self, path: str):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _requests(self) -> List[str]:
+        try:
+            names = os.listdir(os.path.join(self.directory, "requests"))
+        except FileNotFoundError:
+            return []
+        return [name[:-5] for name in names if name.endswith(".json") and not name.startswith(".")]
+
+    def _pending(self) -> List[str]:
+        return [key for key in self._requests() if not os.path.exists(self._path("results", key))]
+
+    def request(self, key: str, payload: Dict) -> Any:
+        """
+        Get the result for a request, batching it with concurrent ones.
+
+        Args:
+            key: Identifier of the request; equal keys share one result
+            payload: Request data passed to ``send_batch``
+
+        Returns:
+            The result for this request
+
+        Raises:
+            LLMClientError: If sending the batch containing the request failed
+        """
+        arrived = time.monotonic()
+        request_path = self._path("requests", key)
+        if not os.path.exists(request_path):
+            self._write(request_path, payload)
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "leader.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                entry = self._read(self._path("results", key))
+                if entry is None:
+                    deadline = arrived + self.window
+                    while len(self._requests()) < self.expected and time.monotonic() < deadline:
+                        time.sleep(0.01)
+                    self._send_pending()
+                    entry = self._read(self._path("results", key))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+        if entry is None:
+            raise LLMClientError("No result was produced for the request")
+        return entry["result"]
+
+    def _send_pending(self):
+        keys = self._pending()
+        payloads = [self._read(self._path("requests", key)) for key in keys]
+        try:
+            results = self.send_batch(payloads)
+        except LLMClientError:
+            raise
+        except Exception as e:
+            raise LLMClientError(str(e)) from e
+        if len(results) != len(keys):
+            raise LLMClientError(f"Expected {len(keys)} results, got {len(results)}")
+        for key, result in zip(keys, results):
+            self._write(self._path("results", key), {"result": result, "batch_size": len(keys)})
+
+
+def batch_directory(scope: str) -> str:
+    """
+    Return the batch directory for a task, pruning ones left by old runs.
+
+    Args:
+        scope: Identifier of the task, such as its UUID
+
+    Returns:
+        str: Path of the directory
+    """
+    cache_dir = get_client_settings()["cache_dir"]
+    if cache_dir:
+        root = os.path.join(os.path.expanduser(cache_dir), "batches")
+    else:
+        root = os.path.join(tempfile.gettempdir(), f"ansible_llm_batches-{os.getuid()}")
+    directory = os.path.join(root, scope)
+
+    if not os.path.isdir(directory) and os.path.isdir(root):
+        cutoff = time.time() - BATCH_DIRECTORY_MAX_AGE
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass
+    return directory
+
+
+_client = None
+
+
+def get_client() -> LLMClient:
+    """Return the process-wide client, creating it on first use."""
+    global _client
+    if _client is None:
+        settings = get_client_settings()
+        _client = LLMClient(settings["api_url"], timeout=settings["timeout"],
+                            cache_dir=settings["cache_dir"] or None,
+                            cache_ttl=settings["cache_ttl"], lru_size=settings["lru_size"],
+                            deadline=settings["deadline"], retries=settings["retries"])
+    return _client
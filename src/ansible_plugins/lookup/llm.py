@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2025, Your Name <your.email@example.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+    name: llm
+    author: Your Name (@yourgithubhandle)
+    short_description: Generate text with the LLM at templating time
+    description:
+        - Returns the completion of each prompt from the ansible-llm REST service
+          (ANSIBLE_LLM_API_URL, default http://127.0.0.1:8000).
+        - Runs on the controller. Results are cached on disk by prompt and generation
+          parameters (ANSIBLE_LLM_CACHE_DIR), so the same prompt is generated once for
+          all hosts and later playbook runs reuse it without inference.
+        - Prompts without a cached result are sent together in one batch request.
+    options:
+      _terms:
+        description: The prompts to complete.
+        required: true
+      max_tokens:
+        description: Maximum number of tokens to generate per prompt.
+        type: int
+        default: 256
+      temperature:
+        description:
+          - Sampling temperature. The default of 0 selects greedy decoding, so a cached
+            result is the same text the service would return again.
+        type: float
+        default: 0.0
+      endpoint:
+        description: URL of the generation endpoint. Defaults to the /generate endpoint of ANSIBLE_LLM_API_URL.
+        type: str
+      ttl:
+        description:
+          - Seconds a cached result stays valid; 0 keeps results until the cache is cleared.
+          - When not set, the client's ANSIBLE_LLM_CACHE_TTL applies.
+        type: int
+        env:
+          - name: ANSIBLE_LLM_LOOKUP_TTL
+        ini:
+          - section: llm_lookup
+            key: ttl
+      offline:
+        description:
+          - Only use cached results and fail on a prompt that is not cached, without contacting
+            the service. Useful in CI and air-gapped runs.
+        type: bool
+        default: false
+        env:
+          - name: ANSIBLE_LLM_OFFLINE
+        ini:
+          - section: llm_lookup
+            key: offline
+'''
+
+EXAMPLES = '''
+- name: Write a motd describing the host's role
+  copy:
+    content: "{{ lookup('llm', 'Write a one-line motd for a ' ~ server_role ~ ' server') }}"
+    dest: /etc/motd
+
+- name: Reuse yesterday's answers only, never calling the model
+  debug:
+    msg: "{{ lookup('llm', 'Summarize the nginx hardening checklist', offline=true, max_tokens=512) }}"
+
+- name: Several prompts in one batch request
+  set_fact:
+    descriptions: "{{ query('llm', 'Describe apt', 'Describe yum', ttl=86400) }}"
+'''
+
+RETURN = '''
+  _raw:
+    description: The generated text of each prompt.
+    type: list
+    elements: str
+'''
+
+import os
+import sys
+
+from ansible.errors import AnsibleError, AnsibleLookupError
+from ansible.module_utils.common.text.converters import to_text
+from ansible.plugins.lookup import LookupBase
+
+# Add project root to path to allow importing the shared client
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+
+try:
+    from src.ansible_plugins.llm_client import get_client
+    HAS_CLIENT = True
+    CLIENT_IMPORT_ERROR = None
+except ImportError as e:
+    HAS_CLIENT = False
+    CLIENT_IMPORT_ERROR = str(e)
+
+
+class LookupModule(LookupBase):
+
+    def run(self, terms, variables=None, **kwargs):
+        if not HAS_CLIENT:
+            raise AnsibleError(f"The llm lookup requires the ansible-llm client: {CLIENT_IMPORT_ERROR}")
+
+        self.set_options(var_options=variables, direct=kwargs)
+        try:
+            return get_client().cached_generate(
+                [to_text(term) for term in terms],
+                max_tokens=self.get_option('max_tokens'),
+                temperature=self.get_option('temperature'),
+                endpoint=self.get_option('endpoint'),
+                ttl=self.get_option('ttl'),
+                offline=self.get_option('offline'),
+            )
+        except Exception as e:
+            raise AnsibleLookupError(f"llm lookup failed: {to_text(e)}")
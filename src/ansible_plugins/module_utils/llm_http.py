@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2025, Your Name <your.email@example.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+HTTP helpers shared by the llm_generate module and the controller-side client.
+
+The module runs wherever Ansible sends it and imports this file as
+``ansible.module_utils.llm_http``; the plugins on the controller import it
+from the project. It therefore only depends on the standard library and,
+optionally, requests.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import time
+import random
+from email.utils import parsedate_to_datetime
+
+try:
+    import requests
+    HAS_REQUESTS = True
+except ImportError:
+    HAS_REQUESTS = False
+
+# Responses meaning the service is busy; the request is repeated after a backoff
+RETRY_STATUSES = (429, 503)
+
+# Seconds to wait for a connection; responses are bounded by the deadline
+CONNECT_TIMEOUT = 10.0
+
+# Exponential backoff: the n-th retry waits a random time up to min(BACKOFF_MAX, BACKOFF_BASE * 2**n)
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+# Errors of an interrupted streaming response
+_STREAM_ERRORS = (requests.RequestException,) if HAS_REQUESTS else ()
+
+
+class LLMClientError(RuntimeError):
+    """Raised when the REST service cannot produce a result."""
+
+
+def retry_delay(attempt, retry_after=None):
+    """
+    Compute how long to wait before retrying a request.
+
+    Args:
+        attempt: Number of the retry, starting at 0
+        retry_after: The Retry-After header of the response, if any
+
+    Returns:
+        float: Seconds to wait; the server's Retry-After when it is valid
+        (seconds or an HTTP date), otherwise a jittered exponential backoff
+    """
+    if retry_after:
+        retry_after = retry_after.strip()
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    # Full jitter keeps forks that were rejected together from retrying together
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def stream_event_text(event):
+    """Extract the text of one streaming event (this service, Ollama or TGI style)."""
+    for key in ("text", "response"):
+        if isinstance(event.get(key), str):
+            return event[key]
+    token = event.get("token")
+    if isinstance(token, dict) and isinstance(token.get("text"), str) and not token.get("special"):
+        return token["text"]
+    return ""
+
+
+def read_stream(response, url, deadline_at):
+    """
+    Assemble a completion from a streaming response.
+
+    Newline-delimited JSON and server-sent events are accepted. The response
+    is closed when reading ends.
+
+    Args:
+        response: Streaming requests.Response
+        url: Endpoint URL, for error messages
+        deadline_at: time.monotonic() value by which the stream must end
+
+    Returns:
+        dict: ``text`` and ``tokens_used`` of the completion
+
+    Raises:
+        LLMClientError: If the stream reports an error, contains an invalid
+            event, is interrupted or outlasts the deadline
+    """
+    response.encoding = response.encoding or "utf-8"
+    parts = []
+    tokens_used = None
+    try:
+        for line in response.iter_lines(decode_unicode=True):
+            if time.monotonic() > deadline_at:
+                raise LLMClientError(f"Streaming from {url} did not finish within the deadline")
+            line = line.strip()
+            if line.startswith("data:"):
+                line = line[5:].strip()
+                if line == "[DONE]":
+                    break
+            if not line or line.startswith(":") or not line.startswith("{"):
+                continue
+            try:
+                event = json.loads(line)
+            except ValueError as e:
+                raise LLMClientError(f"Invalid event in stream from {url}: {line[:100]}") from e
+            if event.get("error"):
+                raise LLMClientError(f"{url} failed while streaming: {event['error']}")
+            text = stream_event_text(event)
+            if text:
+                parts.append(text)
+            for key in ("tokens_used", "eval_count"):
+                if isinstance(event.get(key), int):
+                    tokens_used = event[key]
+            if event.get("done"):
+                break
+    except _STREAM_ERRORS as e:
+        raise LLMClientError(f"Stream from {url} was interrupted: {e}") from e
+    finally:
+        response.close()
+    return {"text": "".join(parts), "tokens_used": tokens_used if tokens_used is not None else len(parts)}
+
+
+def post_with_retries(session, url, payload, deadline_at, retries=5, stream=False, stream_timeout=None,
+                      on_attempt=None):
+    """
+    Post a JSON request, retrying while the service is busy or unreachable.
+
+    Connection errors and the statuses in RETRY_STATUSES are retried after
+    retry_delay(); other errors fail at once. Rejected responses are closed
+    before the next attempt so their connections return to the pool.
+
+    Args:
+        session: requests.Session the request is sent over
+        url: Endpoint URL
+        payload: JSON body
+        deadline_at: time.monotonic() value by which the request, including
+            retries, must finish
+        retries: Maximum number of retries
+        stream: Read the completion from a streaming response
+        stream_timeout: Seconds a stream may stay idle, default the deadline;
+            without streaming no data arrives before the whole completion, so
+            only the deadline bounds the wait for the response
+        on_attempt: Called with the attempt number (0 for the first request)
+            before each request
+
+    Returns:
+        dict: The decoded response; for a stream, ``text`` and ``tokens_used``
+
+    Raises:
+        LLMClientError: If the request fails, is still rejected after the
+            last retry, or does not finish before the deadline
+    """
+    attempt = 0
+    while True:
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise LLMClientError(f"Request to {url} did not finish within the deadline")
+        read_timeout = min(stream_timeout, remaining) if stream and stream_timeout else remaining
+        retry_after = None
+        if on_attempt is not None:
+            on_attempt(attempt)
+        try:
+            response = session.post(url, json=payload, stream=stream,
+                                    timeout=(min(CONNECT_TIMEOUT, remaining), read_timeout))
+        except requests.ConnectionError as e:
+            error = f"Request to {url} failed: {e}"
+        except requests.RequestException as e:
+            raise LLMClientError(f"Request to {url} failed: {e}") from e
+        else:
+            if response.status_code == 200:
+                if stream:
+                    return read_stream(response, url, deadline_at)
+                try:
+                    return response.json()
+                except ValueError as e:
+                    raise LLMClientError(f"{url} returned an invalid response: {response.text[:200]}") from e
+            error = f"{url} returned status {response.status_code}: {response.text[:200]}"
+            retry_after = response.headers.get("Retry-After")
+            response.close()
+            if response.status_code not in RETRY_STATUSES:
+                raise LLMClientError(error)
+
+        delay = retry_delay(attempt, retry_after)
+        if attempt >= retries or time.monotonic() + delay >= deadline_at:
+            raise LLMClientError(f"{error} (gave up after {attempt + 1} attempts)")
+        attempt += 1
+        time.sleep(delay)
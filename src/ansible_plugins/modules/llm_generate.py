@@ -11,6 +11,9 @@ short_description: Generate text using TinyLlama 3
 description:
     - This module uses a TinyLlama 3 model to generate text based on prompts.
     - Can be used to generate playbooks, analyze configurations, or make decisions.
+    - Without an endpoint, prompts are sent to the inference daemon over its Unix socket, so the
+      model stays loaded between tasks. With the llm_generate action plugin this is the daemon on
+      the controller, started on demand.
 options:
     prompt:
         description:
@@ -31,9 +34,64 @@ options:
         default: 0.7
     endpoint:
         description:
-            - The API endpoint for the LLM service. If not provided, uses local model.
+            - The API endpoint for the LLM service. If not provided, uses the local inference daemon.
+            - With an endpoint, the llm_generate action plugin runs the request on the
+              controller and sends the prompts of all hosts in the task as one batch
+              request, with identical prompts sent once.
         required: false
         type: str
+    batch:
+        description:
+            - Send the collected prompts in a single request with a C(prompts) list.
+            - Disable for endpoints that only accept a single C(prompt); prompts are then
+              still deduplicated but sent one at a time.
+            - Only applies when the llm_generate action plugin is enabled.
+        required: false
+        type: bool
+        default: true
+    batch_window:
+        description:
+            - Seconds to wait for the prompts of other hosts before sending a batch.
+            - Only applies when the llm_generate action plugin is enabled.
+        required: false
+        type: float
+        default: 0.5
+    socket_path:
+        description:
+            - Unix socket of the local inference daemon.
+            - Defaults to C(ANSIBLE_LLM_DAEMON_SOCKET) or C(~/.ansible_llm/inference.sock).
+        required: false
+        type: str
+    auto_start:
+        description:
+            - Start the controller's inference daemon when it is not running. Only applies when the
+              llm_generate action plugin is enabled.
+        required: false
+        type: bool
+        default: true
+    stream:
+        description:
+            - The endpoint streams the completion, like the service's C(/generate_stream) endpoint.
+            - Newline-delimited JSON and server-sent events are accepted. Data arrives while the
+              model works, so long generations are not cut off by idle timeouts.
+            - Streaming endpoints take one prompt per request, so prompts are not batched.
+        required: false
+        type: bool
+        default: false
+    deadline:
+        description:
+            - Seconds the request to the endpoint may take in total, including retries.
+        required: false
+        type: float
+        default: 900
+    retries:
+        description:
+            - How often a request is repeated when the endpoint cannot be reached or answers
+              429 or 503. Retries wait for the response's Retry-After, or a jittered
+              exponential backoff, as long as the deadline allows.
+        required: false
+        type: int
+        default: 5
 author:
     - Your Name (@yourgithubhandle)
 '''
@@ -61,6 +119,21 @@ EXAMPLES = r'''
     prompt: "Generate a Windows automation task using SSH"
     endpoint: "http://llm-service:8000/generate"
   register: remote_generation
+
+- name: Stream a long generation from the service
+  llm_generate:
+    prompt: "Write a complete hardening playbook for Ubuntu servers"
+    max_tokens: 2048
+    endpoint: "http://llm-service:8000/generate_stream"
+    stream: true
+    deadline: 1800
+  register: hardening_playbook
+
+- name: Describe every host with one batched request
+  llm_generate:
+    prompt: "Summarize the role of a {{ ansible_os_family }} host named {{ inventory_hostname }}"
+    endpoint: "http://llm-service:8000/generate"
+  register: host_summary
 '''
 
 RETURN = r'''
@@ -81,6 +154,7 @@ completion_time:
 import os
 import time
 import json
+import socket
 import traceback
 
 try:
@@ -90,6 +164,68 @@ except ImportError:
     HAS_REQUESTS = False
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.llm_http import LLMClientError, post_with_retries
+
+DEFAULT_SOCKET_PATH = '~/.ansible_llm/inference.sock'
+
+# Seconds to wait for the next chunk of a streaming response
+STREAM_IDLE_TIMEOUT = 120
+
+
+def endpoint_generate(url, payload, deadline=900, retries=5, stream=False):
+    """
+    Post a generation request, retrying while the service is busy.
+
+    Args:
+        url: The generation endpoint
+        payload: JSON body with prompt, max_tokens and temperature
+        deadline: Seconds the request may take in total, including retries
+        retries: Maximum number of retries on connection errors, 429 and 503
+        stream: Read the completion from a streaming response
+
+    Returns:
+        dict: The completion with ``text`` and ``tokens_used``
+
+    Raises:
+        LLMClientError: If the request fails, is still rejected after the
+            last retry, or does not finish before the deadline
+    """
+    with requests.Session() as session:
+        return post_with_retries(session, url, payload, time.monotonic() + deadline, retries=retries,
+                                 stream=stream, stream_timeout=STREAM_IDLE_TIMEOUT)
+
+
+def daemon_generate(socket_path, prompt, max_tokens, temperature, timeout=600):
+    """
+    Generate a completion on a running inference daemon.
+
+    Args:
+        socket_path: Unix socket the daemon listens on
+        prompt: The prompt to complete
+        max_tokens: Maximum number of tokens to generate
+        temperature: Sampling temperature; 0 selects greedy decoding
+        timeout: Seconds to wait for the completion
+
+    Returns:
+        dict: The completion with ``text`` and ``tokens_used``
+    """
+    request = {
+        'op': 'generate',
+        'prompts': [prompt],
+        'params': {'max_new_tokens': max_tokens, 'temperature': temperature, 'do_sample': temperature > 0},
+    }
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        with sock.makefile('rb') as stream:
+            line = stream.readline()
+    if not line:
+        raise RuntimeError('Inference daemon closed the connection without a response')
+    response = json.loads(line)
+    if not response.get('ok'):
+        raise RuntimeError(response.get('error', 'Unknown daemon error'))
+    return response['results'][0]
 
 def run_module():
     # Define the available arguments/parameters that a user can pass to the module
@@ -98,6 +234,10 @@ def run_module():
         max_tokens=dict(type='int', required=False, default=1024),
         temperature=dict(type='float', required=False, default=0.7),
         endpoint=dict(type='str', required=False, default=None),
+        socket_path=dict(type='str', required=False, default=None),
+        stream=dict(type='bool', required=False, default=False),
+        deadline=dict(type='float', required=False, default=900),
+        retries=dict(type='int', required=False, default=5),
     )
 
     # Seed the result dict
@@ -128,34 +268,39 @@ def run_module():
         
         if module.params['endpoint']:
             # Use remote API endpoint
-            response = requests.post(
+            response_data = endpoint_generate(
                 module.params['endpoint'],
-                json={
+                {
                     'prompt': module.params['prompt'],
                     'max_tokens': module.params['max_tokens'],
                     'temperature': module.params['temperature']
                 },
-                timeout=30
+                deadline=module.params['deadline'],
+                retries=module.params['retries'],
+                stream=module.params['stream']
             )
-            
-            if response.status_code == 200:
-                response_data = response.json()
-                result['text'] = response_data.get('text', '')
-                result['tokens_used'] = response_data.get('tokens_used', 0)
-            else:
+            result['text'] = response_data.get('text', '')
+            result['tokens_used'] = response_data.get('tokens_used', 0)
+        else:
+            # Use the resident model of a running inference daemon
+            socket_path = os.path.expanduser(module.params['socket_path'] or
+                                             os.environ.get('ANSIBLE_LLM_DAEMON_SOCKET', DEFAULT_SOCKET_PATH))
+            try:
+                completion = daemon_generate(socket_path, module.params['prompt'],
+                                             module.params['max_tokens'], module.params['temperature'])
+            except OSError as e:
                 module.fail_json(
-                    msg=f"API request failed with status code {response.status_code}: {response.text}",
+                    msg=f"Cannot reach the inference daemon at {socket_path}: {e}. Start it with "
+                        "'python -m src.main daemon start' or enable the llm_generate action plugin",
                     **result
                 )
-        else:
-            # Use local model - this is a placeholder for the actual implementation
-            # In a real implementation, we would load the model and generate text
-            module.warn("Local model implementation placeholder - actual model integration needed")
-            result['text'] = f"This is a placeholder response for: {module.params['prompt'][:30]}..."
-            result['tokens_used'] = len(module.params['prompt'].split())
+            result['text'] = completion.get('text', '')
+            result['tokens_used'] = completion.get('tokens_used', 0)
         
         result['completion_time'] = time.time() - start_time
         
+    except LLMClientError as e:
+        module.fail_json(msg=f"Error generating text: {str(e)}", **result)
     except Exception as e:
         module.fail_json(msg=f"Error generating text: {str(e)}", exception=traceback.format_exc(), **result)
 
@@ -0,0 +1,162 @@
+"""
+Task timing telemetry for the llm_advisor callback.
+
+Per-host task durations are buffered in memory during a run and written to a
+local SQLite database in batches, so recording a result costs one tuple
+append. The database keeps every run, which lets the report rank tasks by
+their typical cost across recent runs of the same playbook rather than by a
+single noisy measurement.
+"""
+import os
+import time
+import sqlite3
+from typing import Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    playbook TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS task_timings (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    play TEXT,
+    task TEXT NOT NULL,
+    module TEXT,
+    host TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS task_timings_run ON task_timings(run_id);
+CREATE INDEX IF NOT EXISTS runs_playbook ON runs(playbook, id);
+"""
+
+# Selects the ids of a playbook's most recent runs
+RECENT_RUNS = "SELECT id FROM runs WHERE playbook = ? ORDER BY id DESC LIMIT ?"
+
+# Rows buffered before they are written out mid-run
+FLUSH_ROWS = 5000
+
+
+class TaskTimingStore:
+    """
+    SQLite store of per-host task durations.
+
+    Args:
+        path: Location of the database file
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(SCHEMA)
+        self.run_id = None
+        self._rows = []
+
+    def start_run(self, playbook: str) -> int:
+        """Register a new run of a playbook and return its id."""
+        with self.connection:
+            cursor = self.connection.execute("INSERT INTO runs (playbook, started) VALUES (?, ?)",
+                                             (playbook, time.time()))
+        self.run_id = cursor.lastrowid
+        return self.run_id
+
+    def add(self, play: Optional[str], task: str, module: Optional[str], host: str, status: str,
+            duration: float):
+        """Buffer the duration of one task on one host."""
+        self._rows.append((self.run_id, play, task, module, host, status, duration))
+        if len(self._rows) >= FLUSH_ROWS:
+            self.flush()
+
+    def flush(self):
+        """Write buffered durations in a single transaction."""
+        if not self._rows:
+            return
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO task_timings (run_id, play, task, module, host, status, duration) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", self._rows)
+        self._rows = []
+
+    def finish_run(self):
+        """Flush buffered durations and mark the run finished."""
+        self.flush()
+        if self.run_id is not None:
+            with self.connection:
+                self.connection.execute("UPDATE runs SET finished = ? WHERE id = ?", (time.time(), self.run_id))
+
+    def close(self):
+        """Close the database."""
+        self.connection.close()
+
+    def slowest_tasks(self, playbook: str, limit: int = 5, runs: int = 10) -> List[Dict]:
+        """
+        Rank the tasks of a playbook by host-seconds spent per run.
+
+        Args:
+            playbook: Playbook name
+            limit: Number of tasks to return
+            runs: Number of most recent runs to consider
+
+        Returns:
+            list: Dicts with play, task, module, runs, hosts, seconds_per_run,
+            average and max per-host duration
+        """
+        rows = self.connection.execute(
+            "SELECT play, task, module, COUNT(DISTINCT run_id), COUNT(DISTINCT host), "
+            "SUM(duration) / COUNT(DISTINCT run_id), AVG(duration), MAX(duration) "
+            "FROM task_timings WHERE run_id IN (" + RECENT_RUNS + ") "
+            "AND status != 'skipped' GROUP BY play, task, module "
+            "ORDER BY 6 DESC LIMIT ?", (playbook, runs, limit)).fetchall()
+        keys = ("play", "task", "module", "runs", "hosts", "seconds_per_run", "average", "max")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def most_skipped(self, playbook: str, limit: int = 5, runs: int = 10) -> List[Dict]:
+        """
+        Rank the tasks of a playbook by how often they are skipped.
+
+        Args:
+            playbook: Playbook name
+            limit: Number of tasks to return
+            runs: Number of most recent runs to consider
+
+        Returns:
+            list: Dicts with play, task, module, skipped and total result counts
+        """
+        rows = self.connection.execute(
+            "SELECT play, task, module, SUM(status = 'skipped'), COUNT(*) "
+            "FROM task_timings WHERE run_id IN (" + RECENT_RUNS + ") "
+            "GROUP BY play, task, module HAVING SUM(status = 'skipped') > 0 "
+            "ORDER BY 4 DESC, 5 DESC LIMIT ?", (playbook, runs, limit)).fetchall()
+        keys = ("play", "task", "module", "skipped", "total")
+        return [dict(zip(keys, row)) for row in rows]
+
+
+def format_timing_report(slowest: List[Dict], skipped: List[Dict]) -> str:
+    """
+    Format ranked tasks as a compact report for display and prompts.
+
+    Args:
+        slowest: Result of TaskTimingStore.slowest_tasks
+        skipped: Result of TaskTimingStore.most_skipped
+
+    Returns:
+        str: The report, or an empty string when there is nothing to report
+    """
+    lines = []
+    if slowest:
+        lines.append("Slowest tasks (host-seconds per run):")
+        for item in slowest:
+            lines.append(f"- {item['task']} ({item['module']}, play {item['play']}): "
+                         f"{item['seconds_per_run']:.1f}s per run over {item['hosts']} host(s), "
+                         f"avg {item['average']:.1f}s, max {item['max']:.1f}s")
+    if skipped:
+        lines.append("Most skipped tasks:")
+        for item in skipped:
+            lines.append(f"- {item['task']} ({item['module']}, play {item['play']}): "
+                         f"skipped {item['skipped']} of {item['total']} results")
+    return "\n".join(lines)
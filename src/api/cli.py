@@ -42,11 +42,16 @@ def analyze_playbook(playbook_path):
 
 @cli.command()
 @click.argument("inventory_path", type=click.Path(exists=True))
-def analyze_inventory(inventory_path):
+@click.option("--token-budget", type=click.IntRange(min=64), default=1024, show_default=True,
+              help="Maximum tokens of summary sent to the LLM")
+@click.option("--format", "inventory_format", type=click.Choice(["ini", "yaml", "json"]),
+              help="Inventory format (detected by default)")
+@click.option("--no-llm", is_flag=True, help="Only compute composition statistics")
+def analyze_inventory(inventory_path, token_budget=1024, inventory_format=None, no_llm=False):
     """Analyze an Ansible inventory and provide insights."""
-    console.print(Panel.fit(f"Analyzing inventory: {inventory_path}"))
-    # TODO: Implement inventory analysis
-    console.print("Inventory analysis not yet implemented")
+    from src.api.direct_cli import analyze_inventory as run_inventory_analysis
+    run_inventory_analysis(inventory_path, token_budget=token_budget, use_llm=not no_llm,
+                           inventory_format=inventory_format)
 
 @cli.command()
 @click.option("--windows", is_flag=True, help="Configure for Windows SSH automation")
@@ -2,8 +2,10 @@
 """
 Simple CLI implementation that bypasses Click's argument parsing.
 """
+import os
 import sys
 from rich.console import Console
+from rich.markup import escape
 from rich.panel import Panel
 
 console = Console()
@@ -44,10 +46,46 @@ def generate_playbook(description, output=None):
     else:
         console.print("\n" + playbook)
     
-def analyze_playbook(playbook_path):
-    """Analyze an existing Ansible playbook and suggest improvements."""
-    from src.llm_engine.model_loader import load_model
-    from src.llm_engine.response_processor import extract_yaml_from_response, process_analysis_response
+def print_analysis(analysis):
+    """Print a structured analysis section by section."""
+    # Display summary
+    if "summary" in analysis and analysis["summary"].strip():
+        console.print("[bold]Summary:[/bold]")
+        console.print(analysis["summary"].strip(), markup=False)
+        console.print("")
+    
+    # Display issues
+    if "issues" in analysis and analysis["issues"]:
+        console.print("[bold]Potential Issues:[/bold]")
+        for issue in analysis["issues"]:
+            console.print(f"• {issue}", markup=False)
+        console.print("")
+    
+    # Display security concerns
+    if "security" in analysis and analysis["security"]:
+        console.print("[bold]Security Considerations:[/bold]")
+        for concern in analysis["security"]:
+            console.print(f"• {concern}", markup=False)
+        console.print("")
+    
+    # Display best practices
+    if "best_practices" in analysis and analysis["best_practices"]:
+        console.print("[bold]Best Practice Recommendations:[/bold]")
+        for practice in analysis["best_practices"]:
+            console.print(f"• {practice}", markup=False)
+    
+def analyze_playbook(playbook_path, use_llm=True):
+    """
+    Analyze an existing Ansible playbook and suggest improvements.
+    
+    Static rules run first; only what they cannot answer is left to the LLM,
+    with their findings summarised in the prompt. Returns the structured
+    analysis that was displayed, or None if the playbook could not be read.
+    """
+    from src.llm_engine.inference_daemon import get_generator
+    from src.llm_engine.prompt_templates import PLAYBOOK_FOCUSED_REVIEW_TEMPLATE
+    from src.llm_engine.response_processor import process_analysis_response
+    from src.llm_engine.static_analysis import analyze_statically, load_playbook, merge_analysis, summarize_findings
     import yaml
     import os.path
     import logging
@@ -59,51 +97,41 @@ def analyze_playbook(playbook_path):
     # Check if file exists
     if not os.path.exists(playbook_path):
         console.print(f"[red]Error: Playbook file not found: {playbook_path}[/red]")
-        return
+        return None
     
     try:
         with open(playbook_path, 'r') as f:
             playbook_content = f.read()
             
-        # Try to parse YAML to validate
+        # Parse the YAML to validate it and run the static rules
         try:
-            yaml.safe_load(playbook_content)
+            parsed = load_playbook(playbook_content)
         except yaml.YAMLError as e:
             console.print(f"[red]Error: Invalid YAML in playbook: {str(e)}[/red]")
-            return
+            return None
+        
+        static = analyze_statically(parsed, content=playbook_content)
+        static_analysis = static["structured_analysis"]
+        
+        if not use_llm:
+            console.print("\n[bold green]Playbook Analysis Results (static rules only):[/bold green]\n")
+            print_analysis(static_analysis)
+            return static_analysis
             
         # Initialize LLM
         try:
-            # Load model and tokenizer
+            # Use a resident inference daemon if one is running, otherwise load in-process
             # Try to use the chat-specific model which handles analysis tasks better
-            try:
-                model_name = os.environ.get("MODEL_NAME", "TinyLlama/TinyLlama-1.1B-Chat-v0.1")
-                console.print(f"[yellow]Using model: {model_name}[/yellow]")
-                model, tokenizer = load_model(model_name=model_name)
-            except Exception as e:
-                logger.error(f"Error loading specified model: {str(e)}")
-                console.print(f"[red]Error loading specified model: {str(e)}[/red]")
-                console.print("[yellow]Falling back to default model...[/yellow]")
-                model, tokenizer = load_model()
+            model_name = os.environ.get("MODEL_NAME", "TinyLlama/TinyLlama-1.1B-Chat-v0.1")
+            console.print(f"[yellow]Using model: {model_name}[/yellow]")
+            generator = get_generator(model_name=model_name)
+            console.print(f"[dim]Generation backend: {generator.describe()}[/dim]")
             
-            # Create prompt for analysis
-            prompt = f"""
-You are an expert Ansible consultant tasked with analyzing playbooks for best practices, optimizations, and potential issues.
-Please analyze the following Ansible playbook and provide:
-
-1. A brief overview of what the playbook does
-2. Potential issues or bugs you identify
-3. Optimization recommendations
-4. Security considerations
-5. Best practice improvements
-
-Playbook:
-```yaml
-{playbook_content}
-```
-
-Please provide a comprehensive analysis.
-"""
+            # Create prompt for analysis; the model does not need to repeat the rule findings
+            prompt = PLAYBOOK_FOCUSED_REVIEW_TEMPLATE.format(
+                static_findings=summarize_findings(static["findings"]),
+                playbook_content=playbook_content
+            )
             
             # Call the model
             console.print("[yellow]Analyzing playbook with LLM, please wait...[/yellow]")
@@ -111,31 +139,31 @@ Please provide a comprehensive analysis.
             # Generate response using tokenizer and model with better error handling
             try:
                 # Add temperature parameter to reduce randomness and increase coherence
-                inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
-                outputs = model.generate(
-                    **inputs, 
-                    max_new_tokens=1024,
+                result = generator.generate(
+                    prompt,
+                    max_new_tokens=512,  # Rule findings are not generated, so a shorter answer suffices
                     temperature=0.5,  # Lower temperature for more focused output
                     repetition_penalty=1.3,  # Penalize repetition more heavily
                     do_sample=True  # Enable sampling to avoid deterministic outputs
                 )
-                response = tokenizer.decode(outputs[0], skip_special_tokens=True)
                 
-                # Process the response using the proper function
-                llm_response = response[len(prompt):]  # Only use the response part, not the prompt
+                # Only the generated part is returned, not the prompt
+                llm_response = result["text"]
             except Exception as e:
                 logger.error(f"Error during model generation: {str(e)}")
                 console.print(f"[red]Error during model generation: {str(e)}[/red]")
-                console.print("[yellow]Try using a different model with './dev.sh analyze-playbook your_playbook.yml tiny'[/yellow]")
-                return
+                console.print("[yellow]Showing the static analysis only. Try a different model with "
+                              "'./dev.sh analyze-playbook your_playbook.yml tiny'[/yellow]\n")
+                print_analysis(static_analysis)
+                return static_analysis
             
             # Check if the response is empty or just whitespace
             if not llm_response or llm_response.strip() == "":
                 console.print("[red]No analysis results generated. The model returned an empty response.[/red]")
                 console.print("\n[yellow]This might be due to insufficient model capacity or memory constraints.[/yellow]")
-                console.print("[yellow]Try using a smaller playbook or running with the 'tiny' model option:[/yellow]")
-                console.print("./dev.sh analyze-playbook your_playbook.yml tiny")
-                return
+                console.print("[yellow]Showing the static analysis only.[/yellow]\n")
+                print_analysis(static_analysis)
+                return static_analysis
                 
             # Check for binary-like patterns directly
             import re
@@ -154,19 +182,9 @@ Please provide a comprehensive analysis.
                     
             if has_binary_pattern:
                 console.print("[red]Warning: The model produced binary-like output patterns.[/red]")
-                console.print("[yellow]Attempting to fix by switching to fallback analysis mode...[/yellow]")
-                # Create a simple analysis result for fallback
-                llm_response = f"""
-Summary: The playbook appears to be an Ansible playbook but detailed analysis couldn't be performed.
-
-Issues:
-- The model encountered difficulties analyzing this particular playbook
-
-Best Practices:
-- Consider breaking down complex playbooks into smaller components
-- Use standard Ansible modules and avoid custom scripts when possible
-- Follow Ansible's YAML formatting guidelines
-"""
+                console.print("[yellow]Showing the static analysis only.[/yellow]\n")
+                print_analysis(static_analysis)
+                return static_analysis
             
             # Enhanced error handling for response processing
             try:
@@ -192,57 +210,387 @@ Best Practices:
                     
                     if not has_content:
                         # If no structured content was extracted, fall back to raw display
-                        console.print("[yellow]Couldn't structure the analysis into sections. Showing raw output:[/yellow]\n")
+                        print_analysis(static_analysis)
+                        console.print("\n[yellow]Couldn't structure the LLM analysis into sections. Showing raw output:[/yellow]\n")
                         console.print(llm_response)
-                        return
-                    
-                    # Display summary
-                    if "summary" in analysis and analysis["summary"].strip():
-                        console.print("[bold]Summary:[/bold]")
-                        console.print(analysis["summary"].strip())
-                        console.print("")
-                    
-                    # Display issues
-                    if "issues" in analysis and analysis["issues"]:
-                        console.print("[bold]Potential Issues:[/bold]")
-                        for issue in analysis["issues"]:
-                            console.print(f"• {issue}")
-                        console.print("")
-                    
-                    # Display security concerns
-                    if "security" in analysis and analysis["security"]:
-                        console.print("[bold]Security Considerations:[/bold]")
-                        for concern in analysis["security"]:
-                            console.print(f"• {concern}")
-                        console.print("")
+                        return static_analysis
                     
-                    # Display best practices
-                    if "best_practices" in analysis and analysis["best_practices"]:
-                        console.print("[bold]Best Practice Recommendations:[/bold]")
-                        for practice in analysis["best_practices"]:
-                            console.print(f"• {practice}")
+                    merged = merge_analysis(static_analysis, analysis)
+                    print_analysis(merged)
+                    return merged
                 else:
                     # If structured analysis failed, display raw response
-                    console.print("[yellow]Couldn't parse structured analysis format. Showing raw output:[/yellow]\n")
+                    print_analysis(static_analysis)
+                    console.print("\n[yellow]Couldn't parse structured analysis format. Showing raw output:[/yellow]\n")
                     console.print(llm_response)
+                    return static_analysis
             except Exception as e:
                 # If processing fails, show raw response
                 logger.error(f"Error during response processing: {str(e)}")
-                console.print("[yellow]Error processing response into structured format. Showing raw output:[/yellow]\n")
+                print_analysis(static_analysis)
+                console.print("\n[yellow]Error processing response into structured format. Showing raw output:[/yellow]\n")
                 console.print(llm_response)
+                return static_analysis
             
         except Exception as e:
             logger.error(f"Error during playbook analysis: {str(e)}")
             console.print(f"[red]Error during analysis: {str(e)}[/red]")
-            console.print("[yellow]Playbook analysis implementation is in progress. The current feature is experimental.[/yellow]")
+            console.print("[yellow]Showing the static analysis only.[/yellow]\n")
+            print_analysis(static_analysis)
+            return static_analysis
     except Exception as e:
         console.print(f"[red]Error reading playbook file: {str(e)}[/red]")
+        return None
+    
+def batch_analyze(paths, output=None, workers=None, batch_size=4, cache_path=None, use_cache=True):
+    """Analyze every playbook and role task file under the given paths."""
+    import json
+    from rich.progress import Progress
+    from rich.table import Table
+    from src.llm_engine.analysis_cache import AnalysisCache, default_cache_path, prompt_version
+    from src.llm_engine.batch_analysis import BatchAnalyzer, discover_analysis_targets
+    from src.llm_engine.inference_daemon import get_generator
+    from src.llm_engine.prompt_templates import PLAYBOOK_REVIEW_TEMPLATE
+    
+    targets = discover_analysis_targets(paths)
+    if not targets:
+        console.print("[red]Error: No YAML files found to analyze[/red]")
+        return
+    
+    output = output or "analysis-results.jsonl"
+    console.print(Panel.fit(f"Analyzing {len(targets)} files, writing results to {output}"))
+    
+    model_name = os.environ.get("MODEL_NAME", "TinyLlama/TinyLlama-1.1B-Chat-v0.1")
+    generator = get_generator(model_name=model_name)
+    console.print(f"[dim]Generation backend: {generator.describe()}[/dim]")
+    
+    cache = None
+    if use_cache:
+        cache_path = cache_path or default_cache_path(paths)
+        cache_model = getattr(generator, "model_name", None) or model_name
+        cache = AnalysisCache(cache_path, cache_model, prompt_version(PLAYBOOK_REVIEW_TEMPLATE)).load()
+        console.print(f"[dim]Analysis cache: {cache_path} ({len(cache.entries)} entries)[/dim]")
     
-def analyze_inventory(inventory_path):
+    try:
+        with open(output, "w") as out, Progress(console=console) as progress:
+            task = progress.add_task("Analyzing", total=len(targets))
+            
+            def write_result(record):
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                progress.advance(task)
+            
+            analyzer = BatchAnalyzer(generator, workers=workers, batch_size=batch_size,
+                                     on_result=write_result, cache=cache)
+            summary = analyzer.run(targets)
+    except OSError as e:
+        console.print(f"[red]Error writing results: {str(e)}[/red]")
+        return
+    
+    table = Table(title="Batch Analysis Summary")
+    table.add_column("Metric")
+    table.add_column("Value", justify="right")
+    for key in ("total", "analyzed", "invalid", "skipped", "error", "issues", "security",
+                "units_generated", "units_cached", "tokens_used"):
+        table.add_row(key.replace("_", " ").capitalize(), str(summary[key]))
+    table.add_row("Elapsed", f"{summary['elapsed']:.1f}s")
+    console.print(table)
+    
+def batch_generate(input_path, output=None, batch_size=8, max_batch_tokens=None,
+                   max_tokens=None, restart=False, facts_path=None):
+    """Generate playbooks for every task description in a JSONL file."""
+    from rich.progress import Progress
+    from rich.table import Table
+    from src.llm_engine.batch_generation import BulkGenerator, read_generation_requests
+    from src.llm_engine.inference_daemon import get_generator
+    
+    if not os.path.exists(input_path):
+        console.print(f"[red]Error: Input file not found: {input_path}[/red]")
+        return
+    
+    requests, errors = read_generation_requests(input_path)
+    for error in errors:
+        console.print(f"[yellow]Skipping {error}[/yellow]")
+    if not requests:
+        console.print("[red]Error: No valid task descriptions found[/red]")
+        return
+    
+    if facts_path:
+        from src.llm_engine.linux_processor import LinuxProcessor
+        
+        context = LinuxProcessor().load_fact_context(facts_path)
+        if context["hosts"]:
+            console.print(f"[dim]Target environment: {context['environment_details']}[/dim]")
+            for request in requests:
+                request.setdefault("environment_details", context["environment_details"])
+        else:
+            console.print(f"[yellow]No fresh facts found in {facts_path}[/yellow]")
+    
+    output = output or os.path.splitext(input_path)[0] + ".results.jsonl"
+    console.print(Panel.fit(f"Generating {len(requests)} playbooks, writing results to {output}"))
+    
+    model_name = os.environ.get("MODEL_NAME", "TinyLlama/TinyLlama-1.1B-Chat-v0.1")
+    generator = get_generator(model_name=model_name)
+    console.print(f"[dim]Generation backend: {generator.describe()}[/dim]")
+    
+    generation_params = {"max_new_tokens": max_tokens} if max_tokens else None
+    with Progress(console=console) as progress:
+        task = progress.add_task("Generating", total=len(requests))
+        bulk = BulkGenerator(generator, batch_size=batch_size, max_batch_tokens=max_batch_tokens,
+                             generation_params=generation_params,
+                             on_result=lambda record: progress.advance(task))
+        try:
+            summary = bulk.run(requests, output, resume=not restart)
+        except OSError as e:
+            console.print(f"[red]Error writing results: {str(e)}[/red]")
+            return
+        progress.update(task, completed=len(requests))
+    
+    table = Table(title="Batch Generation Summary")
+    table.add_column("Metric")
+    table.add_column("Value", justify="right")
+    for key in ("total", "resumed", "generated", "valid", "invalid", "error", "batches",
+                "prompt_tokens", "padded_prompt_tokens", "tokens_used"):
+        table.add_row(key.replace("_", " ").capitalize(), str(summary[key]))
+    table.add_row("Elapsed", f"{summary['elapsed']:.1f}s")
+    console.print(table)
+    
+def generate_for_hosts(description, facts_path, output_dir, host_vars_path=None, profile_vars=()):
+    """Generate host-specific playbooks with one LLM call per distinct host profile."""
+    import yaml
+    from rich.table import Table
+    from src.llm_engine.host_profiles import ProfilePlaybookGenerator
+    from src.llm_engine.inference_daemon import get_generator
+    
+    if not os.path.isdir(facts_path):
+        console.print(f"[red]Error: Fact cache directory not found: {facts_path}[/red]")
+        return None
+    
+    host_vars = None
+    if host_vars_path:
+        try:
+            with open(host_vars_path, "r") as f:
+                host_vars = yaml.safe_load(f) or {}
+        except (OSError, yaml.YAMLError) as e:
+            console.print(f"[red]Error reading host variables: {str(e)}[/red]")
+            return None
+        if not isinstance(host_vars, dict):
+            console.print("[red]Error: Host variables must be a mapping of host to variables[/red]")
+            return None
+    
+    console.print(Panel.fit(f"Generating host-specific playbooks for: {description}"))
+    model_name = os.environ.get("MODEL_NAME", "TinyLlama/TinyLlama-1.1B-Chat-v0.1")
+    generator = get_generator(model_name=model_name)
+    console.print(f"[dim]Generation backend: {generator.describe()}[/dim]")
+    
+    result = ProfilePlaybookGenerator(generator, profile_vars=profile_vars).generate(
+        description, facts_path, host_vars=host_vars)
+    
+    table = Table(title="Host Profiles")
+    table.add_column("Profile")
+    table.add_column("Hosts", justify="right")
+    table.add_column("Status")
+    for cluster in result["clusters"]:
+        profile = ", ".join(f"{key}={value}" for key, value in cluster["profile"].items())
+        table.add_row(profile, str(len(cluster["hosts"])), cluster["error"] or "ok")
+    console.print(table)
+    
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        for host, playbook in result["playbooks"].items():
+            with open(os.path.join(output_dir, f"{host}.yml"), "w") as f:
+                f.write(playbook)
+    except OSError as e:
+        console.print(f"[red]Error writing playbooks: {str(e)}[/red]")
+        return result
+    
+    for host, error in result["errors"].items():
+        console.print(f"[yellow]{host}: {error}[/yellow]")
+    console.print(f"[green]{len(result['playbooks'])} playbooks written to {output_dir} "
+                  f"with {result['llm_calls']} LLM calls[/green]")
+    return result
+    
+def analyze_inventory(inventory_path, token_budget=1024, use_llm=True, inventory_format=None):
     """Analyze an Ansible inventory and provide insights."""
+    import logging
+    from rich.table import Table
+    from src.llm_engine.inference_daemon import get_generator
+    from src.llm_engine.inventory_analysis import analyze_inventory as index_inventory
+    from src.llm_engine.prompt_templates import INVENTORY_SUMMARY_ANALYSIS_TEMPLATE
+    from src.llm_engine.response_processor import process_binary_pattern
+    
+    logger = logging.getLogger("ansible_llm")
+    
     console.print(Panel.fit(f"Analyzing inventory: {inventory_path}"))
-    # TODO: Implement inventory analysis
-    console.print("Inventory analysis not yet implemented")
+    
+    if not os.path.exists(inventory_path):
+        console.print(f"[red]Error: Inventory not found: {inventory_path}[/red]")
+        return
+    
+    try:
+        stats, summary = index_inventory(inventory_path, token_budget=token_budget,
+                                         inventory_format=inventory_format)
+    except Exception as e:
+        logger.error(f"Error reading inventory: {str(e)}")
+        console.print(f"[red]Error reading inventory: {str(e)}[/red]")
+        return
+    
+    table = Table(title="Inventory Composition")
+    table.add_column("Metric")
+    table.add_column("Value", justify="right")
+    table.add_row("Hosts", str(stats["hosts"]))
+    table.add_row("Groups", str(stats["groups"]))
+    table.add_row("Empty groups", str(len(stats["empty_groups"])))
+    table.add_row("Max nesting depth", str(stats["max_depth"]))
+    table.add_row("Hosts in no group", str(stats["membership"]["ungrouped"]))
+    table.add_row("Hosts in several groups", str(stats["membership"]["multiple_groups"]))
+    table.add_row("Duplicate host definitions", str(stats["duplicate_definitions"]))
+    console.print(table)
+    
+    console.print("\n[bold]Summary sent to the LLM:[/bold]")
+    console.print(summary)
+    
+    if not use_llm:
+        return
+    
+    try:
+        model_name = os.environ.get("MODEL_NAME", "TinyLlama/TinyLlama-1.1B-Chat-v0.1")
+        generator = get_generator(model_name=model_name)
+        console.print(f"[dim]Generation backend: {generator.describe()}[/dim]")
+        console.print("[yellow]Analyzing inventory with LLM, please wait...[/yellow]")
+        result = generator.generate(
+            INVENTORY_SUMMARY_ANALYSIS_TEMPLATE.format(inventory_summary=summary),
+            max_new_tokens=1024,
+            temperature=0.5,
+            repetition_penalty=1.3,
+            do_sample=True
+        )
+    except Exception as e:
+        logger.error(f"Error during model generation: {str(e)}")
+        console.print(f"[red]Error during model generation: {str(e)}[/red]")
+        return
+    
+    console.print("\n[bold green]Inventory Analysis Results:[/bold green]\n")
+    console.print(process_binary_pattern(result["text"]).strip())
+    
+def optimize_playbook(playbook_path, output=None, inventory_path=None, host_count=None, convert_async=False):
+    """Apply deterministic performance rewrites to a playbook and report the savings."""
+    import logging
+    from rich.table import Table
+    from rich.syntax import Syntax
+    from src.llm_engine.inventory_analysis import build_inventory_index
+    from src.llm_engine.playbook_optimizer import optimize_playbook as optimize
+    
+    logger = logging.getLogger("ansible_llm")
+    
+    console.print(Panel.fit(f"Optimizing playbook: {playbook_path}"))
+    
+    if not os.path.exists(playbook_path):
+        console.print(f"[red]Error: Playbook not found: {playbook_path}[/red]")
+        return
+    
+    if inventory_path:
+        try:
+            host_count = len(build_inventory_index(inventory_path).host_ids)
+        except Exception as e:
+            logger.error(f"Error reading inventory: {str(e)}")
+            console.print(f"[red]Error reading inventory: {str(e)}[/red]")
+            return
+    
+    try:
+        with open(playbook_path, "r") as f:
+            result = optimize(f.read(), host_count=host_count, convert_async=convert_async,
+                              path=os.path.basename(playbook_path))
+    except (OSError, ValueError) as e:
+        console.print(f"[red]Error optimizing playbook: {str(e)}[/red]")
+        return
+    
+    if result["diff"]:
+        console.print(Syntax(result["diff"], "diff", theme="monokai"))
+    else:
+        console.print("[green]No rewrites apply to this playbook[/green]")
+    
+    if result["changes"]:
+        table = Table(title="Changes")
+        table.add_column("Play")
+        table.add_column("Task")
+        table.add_column("Change")
+        table.add_column("Saved per host", justify="right")
+        for change in result["changes"]:
+            saved = change["invocations_saved_per_host"]
+            table.add_row(escape(str(change["play"])), escape(str(change["task"] or "")), escape(change["detail"]),
+                          "?" if saved is None else str(saved))
+        console.print(table)
+    
+    console.print("\n[bold]Recommendations:[/bold]")
+    for recommendation in result["recommendations"]:
+        scope = f" (play: {recommendation['play']})" if recommendation["play"] else ""
+        console.print(f"  - {recommendation['setting']} = {recommendation['value']}{scope}: "
+                      f"{recommendation['reason']}", markup=False)
+    
+    hosts = f" across {result['host_count']} hosts" if result["host_count"] else " per host"
+    console.print(f"\n[bold green]Estimated module invocations saved{hosts}: "
+                  f"{result['invocations_saved']}[/bold green]")
+    
+    if output and result["diff"]:
+        try:
+            with open(output, "w") as f:
+                f.write(result["playbook"])
+            console.print(f"[green]Optimized playbook written to {output}[/green]")
+        except OSError as e:
+            console.print(f"[red]Error writing playbook: {str(e)}[/red]")
+    
+def scan_risks(paths):
+    """Scan playbooks, role trees or any text files for secrets and risky patterns."""
+    import time
+    from rich.table import Table
+    from src.llm_engine.risk_scanner import scan_paths
+    
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        console.print(f"[red]Error: Path not found: {', '.join(missing)}[/red]")
+        return None
+    
+    start_time = time.time()
+    findings = scan_paths(paths)
+    elapsed = time.time() - start_time
+    
+    if findings:
+        table = Table(title="Secrets and Risky Patterns")
+        table.add_column("Location")
+        table.add_column("Severity")
+        table.add_column("Rule")
+        table.add_column("Match")
+        for finding in findings:
+            # Rule ids such as [ssh-password-auth] and matched text would be parsed as markup
+            table.add_row(escape(f"{finding['path']}:{finding['line']}"), finding["severity"],
+                          escape(finding["rule"]), escape(finding["match"]))
+        console.print(table)
+    console.print(f"{len(findings)} findings in {elapsed * 1000:.0f} ms")
+    return findings
+    
+def facts_playbook(operations, hosts="all", output=None, cache_dir=None, ttl=None):
+    """Print or write a fact collection playbook limited to the facts some operations need."""
+    from src.llm_engine.fact_cache import DEFAULT_FACT_CACHE_DIR, DEFAULT_FACT_CACHE_TTL
+    from src.llm_engine.linux_processor import LinuxProcessor
+    
+    try:
+        playbook = LinuxProcessor().get_linux_facts_prompt(
+            operations, hosts=hosts, cache_dir=cache_dir or DEFAULT_FACT_CACHE_DIR,
+            ttl=DEFAULT_FACT_CACHE_TTL if ttl is None else ttl)
+    except ValueError as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+        return
+    
+    if output:
+        try:
+            with open(output, "w") as f:
+                f.write(playbook)
+            console.print(f"[green]Fact collection playbook written to {output}[/green]")
+        except OSError as e:
+            console.print(f"[red]Error writing playbook: {str(e)}[/red]")
+    else:
+        console.print(playbook, markup=False)
     
 def setup_examples(windows=False):
     """Set up example playbooks and configurations."""
@@ -271,8 +619,20 @@ def run_cli(args):
         handle_generate_playbook(args[1:])
     elif command == "analyze-playbook":
         handle_analyze_playbook(args[1:])
+    elif command == "batch-generate":
+        handle_batch_generate(args[1:])
+    elif command == "batch-analyze":
+        handle_batch_analyze(args[1:])
+    elif command == "generate-for-hosts":
+        handle_generate_for_hosts(args[1:])
     elif command == "analyze-inventory":
         handle_analyze_inventory(args[1:])
+    elif command == "optimize-playbook":
+        handle_optimize_playbook(args[1:])
+    elif command == "scan-risks":
+        handle_scan_risks(args[1:])
+    elif command == "facts-playbook":
+        handle_facts_playbook(args[1:])
     elif command == "setup-examples":
         handle_setup_examples(args[1:])
     else:
@@ -286,7 +646,13 @@ def show_help():
     console.print("Available commands:")
     console.print("  [bold]generate-playbook[/bold] - Generate an Ansible playbook from a description")
     console.print("  [bold]analyze-playbook[/bold] - Analyze an existing Ansible playbook")
+    console.print("  [bold]batch-generate[/bold] - Generate playbooks for every task description in a JSONL file")
+    console.print("  [bold]batch-analyze[/bold] - Analyze every playbook and role task file in a directory or glob")
+    console.print("  [bold]generate-for-hosts[/bold] - Generate host-specific playbooks, one LLM call per host profile")
     console.print("  [bold]analyze-inventory[/bold] - Analyze an Ansible inventory")
+    console.print("  [bold]optimize-playbook[/bold] - Apply deterministic performance rewrites to a playbook")
+    console.print("  [bold]scan-risks[/bold] - Scan playbooks and role trees for secrets and risky patterns")
+    console.print("  [bold]facts-playbook[/bold] - Generate a cached, minimal fact collection playbook")
     console.print("  [bold]setup-examples[/bold] - Set up example playbooks and configurations")
     console.print("\nRun [bold]python -m src.main cli COMMAND --help[/bold] for more information on a specific command.")
     
@@ -334,15 +700,208 @@ def handle_analyze_playbook(args):
         console.print("""
 Usage: ansible-llm analyze-playbook [OPTIONS] PLAYBOOK_PATH
 
-  Analyze an existing Ansible playbook and suggest improvements.
+  Analyze an existing Ansible playbook and suggest improvements. Static
+  rules (missing become, shell instead of a module, plaintext secrets,
+  missing handlers, ...) run first; the LLM only reviews what they cannot.
 
 Options:
-  --help  Show this message and exit.
+  --no-llm              Only run the static rules (fast, suitable for CI)
+  --fail-on-findings    Exit with status 1 when issues or security concerns are found
+  --help                Show this message and exit.
 """)
         return
         
-    playbook_path = args[0]
-    analyze_playbook(playbook_path)
+    paths = [arg for arg in args if not arg.startswith("-")]
+    if not paths:
+        console.print("[bold red]Error:[/bold red] Playbook path is required")
+        return
+        
+    analysis = analyze_playbook(paths[0], use_llm="--no-llm" not in args)
+    if "--fail-on-findings" in args and (analysis is None or analysis["issues"] or analysis["security"]):
+        sys.exit(1)
+    
+def handle_batch_generate(args):
+    """Handle batch-generate command."""
+    if not args or "--help" in args:
+        console.print("""
+Usage: ansible-llm batch-generate [OPTIONS] INPUT_JSONL
+
+  Generate playbooks for every task description in a JSON Lines file. Each
+  line is an object with a "description" and optionally an "id",
+  "target_os", "environment_details", "inventory_summary" and
+  "best_practices". Requests are batched by tokenized length. Results are
+  appended to the output file after every batch; re-running the same
+  command resumes an interrupted run.
+
+Options:
+  -o, --output TEXT       Output JSONL file (default: INPUT.results.jsonl)
+  -b, --batch-size INTEGER
+                          Requests per batched generation call (default: 8)
+  --max-batch-tokens INTEGER
+                          Upper bound on padded prompt tokens per batch
+  --max-tokens INTEGER    Maximum tokens to generate per playbook (default: 1024)
+  --restart               Overwrite the output instead of resuming
+  --facts PATH            jsonfile fact cache describing the targets, used as the
+                          environment_details of requests that have none
+  --help                  Show this message and exit.
+""")
+        return
+        
+    output = None
+    facts_path = None
+    options = {"batch_size": 8, "max_batch_tokens": None, "max_tokens": None}
+    numeric_options = {
+        "-b": "batch_size",
+        "--batch-size": "batch_size",
+        "--max-batch-tokens": "max_batch_tokens",
+        "--max-tokens": "max_tokens",
+    }
+    input_path = None
+    skip_next = False
+    
+    for i, arg in enumerate(args):
+        if skip_next:
+            skip_next = False
+            continue
+            
+        if arg in ["-o", "--output", "--facts"] or arg in numeric_options:
+            if i + 1 >= len(args):
+                console.print(f"[bold red]Error:[/bold red] {arg} requires a value")
+                return
+            value = args[i + 1]
+            skip_next = True
+            if arg in ["-o", "--output"]:
+                output = value
+            elif arg == "--facts":
+                facts_path = value
+            elif not value.isdigit() or int(value) < 1:
+                console.print(f"[bold red]Error:[/bold red] {arg} must be a positive integer")
+                return
+            else:
+                options[numeric_options[arg]] = int(value)
+        elif not arg.startswith("-") and input_path is None:
+            input_path = arg
+    
+    if not input_path:
+        console.print("[bold red]Error:[/bold red] Input file is required")
+        return
+        
+    batch_generate(input_path, output=output, restart="--restart" in args, facts_path=facts_path, **options)
+    
+def handle_batch_analyze(args):
+    """Handle batch-analyze command."""
+    if not args or "--help" in args:
+        console.print("""
+Usage: ansible-llm batch-analyze [OPTIONS] PATH [PATH...]
+
+  Analyze every playbook and role task file found in the given directories,
+  glob patterns (e.g. 'roles/*/tasks/*.yml') or files. Results are written
+  as JSON Lines as they complete.
+
+Options:
+  -o, --output TEXT       Output JSONL file (default: analysis-results.jsonl)
+  -w, --workers INTEGER   Worker processes for parsing and validation
+  -b, --batch-size INTEGER
+                          Plays or task files per batched generation call (default: 4)
+  --cache PATH            Analysis cache manifest (default: <dir>/.ansible_llm_cache/analysis.json
+                          for a single directory, else ~/.ansible_llm/cache/analysis.json)
+  --no-cache              Re-analyze everything without reading or writing the cache
+  --help                  Show this message and exit.
+""")
+        return
+        
+    output = None
+    workers = None
+    batch_size = 4
+    cache_path = None
+    use_cache = "--no-cache" not in args
+    paths = []
+    skip_next = False
+    
+    for i, arg in enumerate(args):
+        if skip_next:
+            skip_next = False
+            continue
+            
+        if arg in ["-o", "--output", "-w", "--workers", "-b", "--batch-size", "--cache"]:
+            if i + 1 >= len(args):
+                console.print(f"[bold red]Error:[/bold red] {arg} requires a value")
+                return
+            value = args[i + 1]
+            skip_next = True
+            if arg in ["-o", "--output"]:
+                output = value
+                continue
+            if arg == "--cache":
+                cache_path = value
+                continue
+            if not value.isdigit() or int(value) < 1:
+                console.print(f"[bold red]Error:[/bold red] {arg} must be a positive integer")
+                return
+            if arg in ["-w", "--workers"]:
+                workers = int(value)
+            else:
+                batch_size = int(value)
+        elif not arg.startswith("-"):
+            paths.append(arg)
+    
+    if not paths:
+        console.print("[bold red]Error:[/bold red] At least one path is required")
+        return
+        
+    batch_analyze(paths, output=output, workers=workers, batch_size=batch_size,
+                  cache_path=cache_path, use_cache=use_cache)
+    
+def handle_generate_for_hosts(args):
+    """Handle generate-for-hosts command."""
+    if not args or "--help" in args:
+        console.print("""
+Usage: ansible-llm generate-for-hosts [OPTIONS] DESCRIPTION
+
+  Generate a playbook for every host in a jsonfile fact cache. Hosts are
+  grouped by distribution, major version, package manager and the chosen
+  host variables; the LLM writes one parameterized playbook per group and
+  a variant is rendered for each host.
+
+Options:
+  -f, --facts PATH        Directory of the jsonfile fact cache (required)
+  -o, --output-dir PATH   Directory for the HOST.yml playbooks (default: host_playbooks)
+  --host-vars PATH        YAML or JSON file mapping each host to its variables
+  --profile-vars TEXT     Comma-separated host variables that distinguish profiles (e.g. role)
+  --help                  Show this message and exit.
+""")
+        return
+        
+    options = {"-f": "facts", "--facts": "facts", "-o": "output_dir", "--output-dir": "output_dir",
+               "--host-vars": "host_vars", "--profile-vars": "profile_vars"}
+    values = {"output_dir": "host_playbooks"}
+    description_parts = []
+    skip_next = False
+    
+    for i, arg in enumerate(args):
+        if skip_next:
+            skip_next = False
+            continue
+            
+        if arg in options:
+            if i + 1 >= len(args):
+                console.print(f"[bold red]Error:[/bold red] {arg} requires a value")
+                return
+            values[options[arg]] = args[i + 1]
+            skip_next = True
+        elif not arg.startswith("-"):
+            description_parts.append(arg)
+    
+    if not description_parts:
+        console.print("[bold red]Error:[/bold red] Description is required")
+        return
+    if "facts" not in values:
+        console.print("[bold red]Error:[/bold red] --facts is required")
+        return
+        
+    profile_vars = [name.strip() for name in values.get("profile_vars", "").split(",") if name.strip()]
+    generate_for_hosts(" ".join(description_parts), values["facts"], values["output_dir"],
+                       host_vars_path=values.get("host_vars"), profile_vars=profile_vars)
     
 def handle_analyze_inventory(args):
     """Handle analyze-inventory command."""
@@ -350,15 +909,185 @@ def handle_analyze_inventory(args):
         console.print("""
 Usage: ansible-llm analyze-inventory [OPTIONS] INVENTORY_PATH
 
-  Analyze an Ansible inventory and provide insights.
+  Analyze an Ansible inventory and provide insights. INI, YAML and JSON
+  (ansible-inventory --list) inventories are streamed, so very large
+  inventories can be analyzed; only a compact summary is sent to the LLM.
 
 Options:
-  --help  Show this message and exit.
+  --token-budget INTEGER  Maximum tokens of summary sent to the LLM (default: 1024)
+  --format [ini|yaml|json]
+                          Inventory format (detected by default)
+  --no-llm                Only compute composition statistics
+  --help                  Show this message and exit.
 """)
         return
         
-    inventory_path = args[0]
-    analyze_inventory(inventory_path)
+    token_budget = 1024
+    inventory_format = None
+    inventory_path = None
+    skip_next = False
+    
+    for i, arg in enumerate(args):
+        if skip_next:
+            skip_next = False
+            continue
+            
+        if arg in ["--token-budget", "--format"]:
+            if i + 1 >= len(args):
+                console.print(f"[bold red]Error:[/bold red] {arg} requires a value")
+                return
+            value = args[i + 1]
+            skip_next = True
+            if arg == "--format":
+                if value not in ["ini", "yaml", "json"]:
+                    console.print("[bold red]Error:[/bold red] --format must be ini, yaml or json")
+                    return
+                inventory_format = value
+            elif not value.isdigit() or int(value) < 64:
+                console.print("[bold red]Error:[/bold red] --token-budget must be an integer of at least 64")
+                return
+            else:
+                token_budget = int(value)
+        elif not arg.startswith("-") and inventory_path is None:
+            inventory_path = arg
+    
+    if not inventory_path:
+        console.print("[bold red]Error:[/bold red] Inventory path is required")
+        return
+        
+    analyze_inventory(inventory_path, token_budget=token_budget, use_llm="--no-llm" not in args,
+                      inventory_format=inventory_format)
+    
+def handle_optimize_playbook(args):
+    """Handle optimize-playbook command."""
+    if not args or "--help" in args:
+        console.print("""
+Usage: ansible-llm optimize-playbook [OPTIONS] PLAYBOOK_PATH
+
+  Apply deterministic performance rewrites to a playbook: package loops
+  become one task with a list of names, fact gathering is narrowed to the
+  facts the play uses and long-running commands are flagged. Prints a diff,
+  execution setting recommendations (strategy, pipelining, forks) and the
+  estimated module invocations saved. No LLM is involved.
+
+Options:
+  -o, --output TEXT       Write the optimized playbook to this file
+  -i, --inventory PATH    Inventory used to size the recommendations
+  --hosts INTEGER         Number of hosts, instead of an inventory
+  --async                 Run long-running commands in the background (poll: 0)
+                          and wait for them at the end of their task list
+  --help                  Show this message and exit.
+""")
+        return
+        
+    output = None
+    inventory_path = None
+    host_count = None
+    playbook_path = None
+    skip_next = False
+    
+    for i, arg in enumerate(args):
+        if skip_next:
+            skip_next = False
+            continue
+            
+        if arg in ["-o", "--output", "-i", "--inventory", "--hosts"]:
+            if i + 1 >= len(args):
+                console.print(f"[bold red]Error:[/bold red] {arg} requires a value")
+                return
+            value = args[i + 1]
+            skip_next = True
+            if arg in ["-o", "--output"]:
+                output = value
+            elif arg in ["-i", "--inventory"]:
+                inventory_path = value
+            elif not value.isdigit() or int(value) < 1:
+                console.print(f"[bold red]Error:[/bold red] {arg} must be a positive integer")
+                return
+            else:
+                host_count = int(value)
+        elif not arg.startswith("-") and playbook_path is None:
+            playbook_path = arg
+    
+    if not playbook_path:
+        console.print("[bold red]Error:[/bold red] Playbook path is required")
+        return
+        
+    optimize_playbook(playbook_path, output=output, inventory_path=inventory_path, host_count=host_count,
+                      convert_async="--async" in args)
+    
+def handle_scan_risks(args):
+    """Handle scan-risks command."""
+    if not args or "--help" in args:
+        console.print("""
+Usage: ansible-llm scan-risks [OPTIONS] PATH [PATH...]
+
+  Scan files and directory trees (YAML, templates, scripts, configuration)
+  for private keys, tokens, plaintext passwords, curl | sh, chmod 777,
+  validate_certs: false and disabled host key checking. No LLM is involved.
+
+Options:
+  --fail-on-findings  Exit with status 1 when anything is found
+  --help              Show this message and exit.
+""")
+        return
+        
+    paths = [arg for arg in args if not arg.startswith("-")]
+    if not paths:
+        console.print("[bold red]Error:[/bold red] At least one path is required")
+        return
+        
+    findings = scan_risks(paths)
+    if "--fail-on-findings" in args and findings != []:
+        sys.exit(1)
+    
+def handle_facts_playbook(args):
+    """Handle facts-playbook command."""
+    if "--help" in args:
+        console.print("""
+Usage: ansible-llm facts-playbook [OPTIONS] [OPERATION...]
+
+  Generate a playbook that gathers only the facts the given operations need
+  (packages, services, users, firewall, system, hardware, network; default:
+  system hardware) with a minimal gather_subset, and stores them in a
+  jsonfile fact cache. Hosts with fresh cached facts are skipped. Use the
+  cache with batch-generate --facts or generate-for-hosts --facts.
+
+Options:
+  --hosts TEXT        Host pattern of the play (default: all)
+  --cache-dir PATH    Fact cache directory (default: ~/.ansible_llm/facts)
+  --ttl INTEGER       Seconds cached facts stay fresh, 0 for never refreshing (default: 86400)
+  -o, --output TEXT   Write the playbook to this file
+  --help              Show this message and exit.
+""")
+        return
+        
+    values = {"hosts": "all", "output": None, "cache_dir": None, "ttl": None}
+    options = {"--hosts": "hosts", "--cache-dir": "cache_dir", "--ttl": "ttl", "-o": "output", "--output": "output"}
+    operations = []
+    skip_next = False
+    
+    for i, arg in enumerate(args):
+        if skip_next:
+            skip_next = False
+            continue
+            
+        if arg in options:
+            if i + 1 >= len(args):
+                console.print(f"[bold red]Error:[/bold red] {arg} requires a value")
+                return
+            values[options[arg]] = args[i + 1]
+            skip_next = True
+        elif not arg.startswith("-"):
+            operations.append(arg)
+    
+    if values["ttl"] is not None:
+        if not values["ttl"].isdigit():
+            console.print("[bold red]Error:[/bold red] --ttl must be a non-negative integer")
+            return
+        values["ttl"] = int(values["ttl"])
+        
+    facts_playbook(operations or ["system", "hardware"], **values)
     
 def handle_setup_examples(args):
     """Handle setup-examples command."""
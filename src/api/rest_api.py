@@ -2,18 +2,27 @@
 REST API for the Ansible TinyLlama 3 integration.
 """
 import os
+import json
 import time
+import queue
+import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
 from fastapi import FastAPI, HTTPException, Depends, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 import uvicorn
 
-from src.llm_engine.model_loader import load_model
+from src.llm_engine.model_loader import load_model, generate_batch, generate_stream
+from src.llm_engine.prompt_templates import (
+    DECISION_MAKING_TEMPLATE,
+    TASK_OPTIMIZATION_TEMPLATE,
+    TEXT_PROCESSING_TEMPLATES,
+)
 from src.utils.logger import setup_logger
 
 # Initialize logger
@@ -59,6 +68,9 @@ app.add_middleware(
 model = None
 tokenizer = None
 
+# The model is not safe to call from several threads at once
+generation_lock = threading.Lock()
+
 # Request/response models
 class PlaybookRequest(BaseModel):
     """Request model for playbook generation."""
@@ -81,6 +93,65 @@ class AnalysisResponse(BaseModel):
     suggestions: List[str]
     security_issues: List[str]
 
+class FailureAnalysisRequest(BaseModel):
+    """Request model for task failure analysis."""
+    task: str
+    error: str
+    host: Optional[str] = None
+    playbook: Optional[str] = None
+    play: Optional[str] = None
+    module: Optional[str] = None
+    task_args: Optional[Dict] = None
+    host_details: Optional[str] = None
+    previous_results: Optional[str] = None
+    max_tokens: Optional[int] = 512
+
+class FailureAnalysisResponse(BaseModel):
+    """Response model for task failure analysis."""
+    analysis: str
+    tokens_used: int
+
+class OptimizationRequest(BaseModel):
+    """Request model for task timing optimization suggestions."""
+    timing_report: str
+    playbook: Optional[str] = None
+    max_tokens: Optional[int] = 768
+
+class OptimizationResponse(BaseModel):
+    """Response model for task timing optimization suggestions."""
+    analysis: str
+    tokens_used: int
+
+class GenerateRequest(BaseModel):
+    """Request model for free-form generation of one prompt or a batch of prompts."""
+    prompt: Optional[str] = None
+    prompts: Optional[List[str]] = None
+    max_tokens: Optional[int] = 1024
+    temperature: Optional[float] = 0.7
+
+class GenerationResult(BaseModel):
+    """A single completion."""
+    text: str
+    tokens_used: int
+
+class GenerateResponse(BaseModel):
+    """Response model for generation; ``results`` is set for batch requests."""
+    text: str = ""
+    tokens_used: int
+    results: Optional[List[GenerationResult]] = None
+
+class TextProcessingRequest(BaseModel):
+    """Request model for text processing (simplify, explain, translate)."""
+    operation: str
+    texts: List[str]
+    style: Optional[str] = "technical"
+    max_tokens: Optional[int] = 512
+
+class TextProcessingResponse(BaseModel):
+    """Response model for text processing, with one result per input text."""
+    results: List[str]
+    tokens_used: int
+
 class HealthResponse(BaseModel):
     """Health check response model."""
     status: str
@@ -200,6 +271,228 @@ async def analyze_playbook(request: AnalysisRequest):
             detail=f"Error analyzing playbook: {str(e)}"
         )
 
+@app.post("/analyze_failure", response_model=FailureAnalysisResponse)
+async def analyze_failure(request: FailureAnalysisRequest):
+    """Recommend how to resolve a failed task."""
+    if not model:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Model not loaded, check server health"
+        )
+    
+    logger.info(f"Analyzing failure of task: {request.task[:50]}")
+    
+    failed_task = request.task
+    if request.module:
+        failed_task += f" (module: {request.module}, args: {request.task_args or {}})"
+    prompt = DECISION_MAKING_TEMPLATE.format(
+        playbook_name=request.playbook or "Not specified",
+        failed_task=failed_task,
+        error_message=request.error,
+        host_details=request.host_details or request.host or "Not specified",
+        previous_results=request.previous_results or "Not available",
+    )
+    
+    def _generate():
+        with generation_lock:
+            return generate_batch(model, tokenizer, [prompt],
+                                  max_new_tokens=request.max_tokens or 512,
+                                  temperature=0.3)[0]
+    
+    try:
+        # Generation runs in a worker thread so other requests are not blocked
+        result = await run_in_threadpool(_generate)
+        return {"analysis": result["text"].strip(), "tokens_used": result["tokens_used"]}
+    except Exception as e:
+        logger.error(f"Error analyzing failure: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error analyzing failure: {str(e)}"
+        )
+
+@app.post("/suggest_optimizations", response_model=OptimizationResponse)
+async def suggest_optimizations(request: OptimizationRequest):
+    """Suggest speed-ups for the slowest and most skipped tasks of a playbook."""
+    if not model:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Model not loaded, check server health"
+        )
+    
+    logger.info(f"Suggesting optimizations for playbook: {request.playbook}")
+    
+    prompt = TASK_OPTIMIZATION_TEMPLATE.format(
+        playbook_name=request.playbook or "Not specified",
+        timing_report=request.timing_report,
+    )
+    
+    def _generate():
+        with generation_lock:
+            return generate_batch(model, tokenizer, [prompt],
+                                  max_new_tokens=request.max_tokens or 768,
+                                  temperature=0.3)[0]
+    
+    try:
+        result = await run_in_threadpool(_generate)
+        return {"analysis": result["text"].strip(), "tokens_used": result["tokens_used"]}
+    except Exception as e:
+        logger.error(f"Error suggesting optimizations: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error suggesting optimizations: {str(e)}"
+        )
+
+@app.post("/generate", response_model=GenerateResponse)
+async def generate(request: GenerateRequest):
+    """Generate completions for a prompt, or for a list of prompts in one batch."""
+    if not model:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Model not loaded, check server health"
+        )
+    
+    if request.prompts is None and request.prompt is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Either prompt or prompts is required"
+        )
+    
+    prompts = request.prompts if request.prompts is not None else [request.prompt]
+    logger.info(f"Generating completions for {len(prompts)} prompts")
+    
+    def _generate():
+        with generation_lock:
+            return generate_batch(model, tokenizer, prompts,
+                                  max_new_tokens=request.max_tokens or 1024,
+                                  temperature=request.temperature if request.temperature is not None else 0.7,
+                                  do_sample=bool(request.temperature))
+    
+    try:
+        results = await run_in_threadpool(_generate)
+    except Exception as e:
+        logger.error(f"Error generating text: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error generating text: {str(e)}"
+        )
+    
+    completions = [{"text": result["text"], "tokens_used": result["tokens_used"]} for result in results]
+    tokens_used = sum(completion["tokens_used"] for completion in completions)
+    if request.prompts is not None:
+        return {"tokens_used": tokens_used, "results": completions}
+    return {"text": completions[0]["text"], "tokens_used": tokens_used}
+
+@app.post("/generate_stream")
+async def generate_streaming(request: GenerateRequest):
+    """
+    Generate a completion for one prompt as a stream of newline-delimited JSON.
+    
+    Each line carries the next piece of text as ``{"text": ...}``; the last line
+    is ``{"done": true, "tokens_used": ...}``, or ``{"error": ...}`` if generation
+    failed. Data flows while the model works, so slow generations do not hit
+    idle timeouts.
+    
+    Generation runs in a producer thread that holds the model lock and hands
+    the text over through a queue, so the lock is never held while the
+    response waits on the client. A client that disconnects stops the
+    generation, which releases the lock for the other endpoints.
+    """
+    if not model:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Model not loaded, check server health"
+        )
+    
+    if request.prompt is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="prompt is required"
+        )
+    
+    logger.info("Streaming a completion")
+    temperature = request.temperature if request.temperature is not None else 0.7
+    
+    events = queue.Queue()
+    stop = threading.Event()
+    
+    def _produce():
+        parts = []
+        try:
+            with generation_lock:
+                stream = generate_stream(model, tokenizer, request.prompt,
+                                         max_new_tokens=request.max_tokens or 1024,
+                                         temperature=temperature,
+                                         do_sample=bool(temperature),
+                                         stop_event=stop)
+                try:
+                    for text in stream:
+                        if stop.is_set():
+                            break
+                        parts.append(text)
+                        events.put({"text": text})
+                finally:
+                    # Closing the generator joins the generation thread before the lock is released
+                    if hasattr(stream, "close"):
+                        stream.close()
+            tokens_used = len(tokenizer("".join(parts), add_special_tokens=False)["input_ids"])
+            events.put({"done": True, "tokens_used": tokens_used})
+        except Exception as e:
+            logger.error(f"Error streaming text: {e}")
+            events.put({"error": f"Error generating text: {str(e)}"})
+    
+    async def _events():
+        threading.Thread(target=_produce, name="generate-stream", daemon=True).start()
+        try:
+            while True:
+                event = await run_in_threadpool(events.get)
+                yield json.dumps(event) + "\n"
+                if "text" not in event:
+                    return
+        finally:
+            # Also runs when the client disconnects and the response is cancelled
+            stop.set()
+    
+    return StreamingResponse(_events(), media_type="application/x-ndjson")
+
+@app.post("/process_text", response_model=TextProcessingResponse)
+async def process_text(request: TextProcessingRequest):
+    """Simplify, explain or translate several texts in one batched generation."""
+    if not model:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Model not loaded, check server health"
+        )
+    
+    template = TEXT_PROCESSING_TEMPLATES.get(request.operation)
+    if template is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown operation: {request.operation}"
+        )
+    
+    logger.info(f"Processing {len(request.texts)} texts with operation {request.operation}")
+    
+    prompts = [template.format(text=text, style=request.style or "technical") for text in request.texts]
+    
+    def _generate():
+        with generation_lock:
+            return generate_batch(model, tokenizer, prompts,
+                                  max_new_tokens=request.max_tokens or 512,
+                                  temperature=0.3)
+    
+    try:
+        results = await run_in_threadpool(_generate)
+        return {
+            "results": [result["text"].strip() for result in results],
+            "tokens_used": sum(result["tokens_used"] for result in results),
+        }
+    except Exception as e:
+        logger.error(f"Error processing text: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing text: {str(e)}"
+        )
+
 @app.middleware("http")
 async def add_api_version_header(request: Request, call_next):
     """Add API version header to all responses."""
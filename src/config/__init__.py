@@ -68,7 +68,18 @@ def load_config(config_path=None):
             "ansible": {
                 "callback_plugins_path": "./src/ansible_plugins/callbacks",
                 "library_path": "./src/ansible_plugins/modules",
-                "filter_plugins_path": "./src/ansible_plugins/filters"
+                "module_utils_path": "./src/ansible_plugins/module_utils",
+                "filter_plugins_path": "./src/ansible_plugins/filters",
+                "action_plugins_path": "./src/ansible_plugins/action",
+                "lookup_plugins_path": "./src/ansible_plugins/lookup"
+            },
+            "daemon": {
+                "enabled": True,
+                "socket_path": "~/.ansible_llm/inference.sock",
+                "auto_start": False,
+                "idle_timeout": 900,
+                "startup_timeout": 300,
+                "request_timeout": 600
             },
             "windows_ssh": {
                 "default_user": "Administrator",
@@ -0,0 +1,156 @@
+"""
+Content-hash cache for playbook analysis results.
+
+Each analyzed unit (a play or a role task file) is keyed by a hash of its
+parsed YAML, serialized with sorted keys. Comments, whitespace and key order
+therefore do not change the key, and an edit to one task file only invalidates
+that file. Entries also record the model and prompt version that produced them
+and are ignored when either changes.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger("ansible_llm")
+
+CACHE_FORMAT_VERSION = 1
+CACHE_DIRECTORY_NAME = ".ansible_llm_cache"
+CACHE_FILE_NAME = "analysis.json"
+
+
+def normalized_hash(document) -> str:
+    """
+    Hash a parsed YAML document independently of formatting and key order.
+
+    Args:
+        document: The parsed YAML (dicts, lists and scalars)
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    canonical = json.dumps(document, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def prompt_version(template: str) -> str:
+    """Return a short version identifier for a prompt template."""
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:12]
+
+
+def default_cache_path(paths: Iterable[str]) -> Path:
+    """
+    Choose where to store the cache for a set of analysis targets.
+
+    A single directory target keeps its cache alongside the repository;
+    anything else uses the per-user cache directory.
+
+    Args:
+        paths: The paths passed to the analysis command
+
+    Returns:
+        Path: Location of the cache manifest
+    """
+    paths = list(paths)
+    if len(paths) == 1 and os.path.isdir(paths[0]):
+        return Path(paths[0]) / CACHE_DIRECTORY_NAME / CACHE_FILE_NAME
+    return Path.home() / ".ansible_llm" / "cache" / CACHE_FILE_NAME
+
+
+class AnalysisCache:
+    """
+    Manifest of structured analyses keyed by normalized content hash.
+
+    Args:
+        path: Location of the JSON manifest
+        model_name: Model whose results may be served from the cache
+        prompt_version: Version of the prompt whose results may be served
+    """
+
+    def __init__(self, path, model_name: str, prompt_version: str):
+        self.path = Path(path)
+        self.model_name = model_name
+        self.prompt_version = prompt_version
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+
+    def load(self) -> "AnalysisCache":
+        """Load the manifest from disk, starting empty if it is missing or unreadable."""
+        try:
+            with open(self.path, "r") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return self
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable analysis cache {self.path}: {e}")
+            return self
+
+        if manifest.get("version") != CACHE_FORMAT_VERSION:
+            logger.info(f"Analysis cache {self.path} has an old format, starting fresh")
+            return self
+
+        self.entries = manifest.get("entries", {})
+        return self
+
+    def save(self):
+        """Write the manifest atomically if it changed."""
+        if not self._dirty:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        manifest = {"version": CACHE_FORMAT_VERSION, "entries": self.entries}
+        fd, tmp_path = tempfile.mkstemp(dir=str(self.path.parent), prefix=".analysis-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(manifest, f, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._dirty = False
+
+    def get(self, content_hash: str) -> Optional[Dict]:
+        """
+        Look up the stored analysis for a unit.
+
+        Args:
+            content_hash: Normalized hash of the unit
+
+        Returns:
+            dict: The stored structured_analysis, or None on a miss or when it
+            was produced by a different model or prompt version
+        """
+        entry = self.entries.get(content_hash)
+        if (entry
+                and entry.get("model") == self.model_name
+                and entry.get("prompt_version") == self.prompt_version):
+            self.hits += 1
+            return entry["structured_analysis"]
+
+        self.misses += 1
+        return None
+
+    def put(self, content_hash: str, structured_analysis: Dict, source: Optional[str] = None):
+        """
+        Store the analysis for a unit.
+
+        Args:
+            content_hash: Normalized hash of the unit
+            structured_analysis: The analysis to store
+            source: Path the unit was last seen in, for reference
+        """
+        self.entries[content_hash] = {
+            "structured_analysis": structured_analysis,
+            "model": self.model_name,
+            "prompt_version": self.prompt_version,
+            "source": source,
+            "updated": time.time(),
+        }
+        self._dirty = True
@@ -0,0 +1,390 @@
+"""
+Batch analysis of playbooks and role task files.
+
+Files are discovered from directories, globs or explicit paths, then read,
+parsed and validated in a process pool. Files that pass validation are grouped
+into batches and sent to the generation backend (the inference daemon or an
+in-process model) in a single batched call per group. Each result is reported
+through a callback as soon as it is available.
+
+Playbooks are analyzed play by play and task files as a whole. Each of these
+units is keyed by a normalized content hash, so identical units are generated
+once per run and, with an AnalysisCache, only changed units are generated on
+later runs.
+"""
+import os
+import glob
+import time
+import logging
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import yaml
+
+from src.llm_engine.analysis_cache import normalized_hash
+from src.llm_engine.prompt_templates import PLAYBOOK_REVIEW_TEMPLATE
+from src.llm_engine.response_processor import process_analysis_response
+
+logger = logging.getLogger("ansible_llm")
+
+YAML_EXTENSIONS = (".yml", ".yaml")
+
+# Directories that hold variables or inventory rather than tasks
+NON_TASK_DIRECTORIES = {"group_vars", "host_vars", "vars", "defaults", "meta", "templates", "files"}
+
+ANALYSIS_GENERATION_PARAMS = {
+    "max_new_tokens": 1024,
+    "temperature": 0.5,
+    "repetition_penalty": 1.3,
+    "do_sample": True,
+}
+
+
+def discover_analysis_targets(paths: Iterable[str]) -> List[str]:
+    """
+    Expand directories, globs and file paths into a list of YAML files.
+
+    Directories are walked recursively. Inside a ``roles`` directory only the
+    ``tasks`` files of each role are included.
+
+    Args:
+        paths: Directories, glob patterns or file paths
+
+    Returns:
+        list: Unique file paths in discovery order
+    """
+    targets = []
+    seen = set()
+
+    for entry in paths:
+        if os.path.isdir(entry):
+            candidates = _walk_yaml_files(entry)
+        elif glob.has_magic(entry):
+            candidates = sorted(glob.glob(entry, recursive=True))
+        else:
+            candidates = [entry]
+
+        for candidate in candidates:
+            normalized = os.path.normpath(candidate)
+            if normalized not in seen and os.path.isfile(normalized):
+                seen.add(normalized)
+                targets.append(normalized)
+
+    return targets
+
+
+def _walk_yaml_files(root: str) -> Iterator[str]:
+    """Yield playbook and role task files below a directory."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            d for d in dirnames if not d.startswith(".") and d not in NON_TASK_DIRECTORIES
+        )
+        parts = Path(dirpath).relative_to(root).parts
+
+        if "roles" in parts:
+            role_index = parts.index("roles")
+            # Only roles/<role>/tasks/... holds task files
+            if len(parts) < role_index + 3 or parts[role_index + 2] != "tasks":
+                continue
+
+        for name in sorted(filenames):
+            if name.endswith(YAML_EXTENSIONS):
+                yield os.path.join(dirpath, name)
+
+
+def classify_document(path: str, parsed) -> Optional[str]:
+    """
+    Decide whether a parsed YAML document is a playbook or a task file.
+
+    Args:
+        path: Path of the file, used to recognise role task files
+        parsed: The parsed YAML document
+
+    Returns:
+        str: "playbook", "tasks", or None for anything else
+    """
+    if not isinstance(parsed, list) or not parsed:
+        return None
+    if not all(isinstance(item, dict) for item in parsed):
+        return None
+
+    if any("hosts" in item or "import_playbook" in item for item in parsed):
+        return "playbook"
+
+    parts = Path(path).parts
+    if "tasks" in parts or "handlers" in parts:
+        return "tasks"
+    return None
+
+
+def _validate_plays(plays: List[Dict]) -> Optional[str]:
+    """Return an error message if a parsed playbook is not valid, else None."""
+    for i, play in enumerate(plays):
+        if "import_playbook" in play:
+            continue
+        if "hosts" not in play:
+            return f"Play #{i+1} is missing 'hosts' field"
+        if "tasks" not in play and "roles" not in play:
+            return f"Play #{i+1} should have either 'tasks' or 'roles'"
+    return None
+
+
+def prepare_analysis_target(path: str) -> Dict:
+    """
+    Read, parse and validate one file. Runs in a worker process.
+
+    Args:
+        path: The file to prepare
+
+    Returns:
+        dict: Record with ``path`` and ``status``. Files ready for the LLM have
+        status "pending" and carry ``kind`` and ``units``.
+    """
+    record = {"path": path}
+
+    try:
+        with open(path, "r") as f:
+            content = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        record.update(status="error", error=f"Cannot read file: {e}")
+        return record
+
+    try:
+        parsed = yaml.safe_load(content)
+    except yaml.YAMLError as e:
+        record.update(status="invalid", error=f"Invalid YAML: {e}")
+        return record
+
+    kind = classify_document(path, parsed)
+    if kind is None:
+        record.update(status="skipped", error="Not a playbook or role task file")
+        return record
+
+    if kind == "playbook":
+        error = _validate_plays(parsed)
+        if error:
+            record.update(kind=kind, status="invalid", error=error)
+            return record
+
+    record.update(kind=kind, status="pending", units=split_analysis_units(kind, parsed, content))
+    return record
+
+
+def split_analysis_units(kind: str, parsed: List[Dict], content: str) -> List[Dict]:
+    """
+    Split a document into independently analyzed and cached units.
+
+    Each play of a playbook is its own unit; a task file is a single unit.
+    A document with one unit keeps its original text (including comments)
+    as the prompt content.
+
+    Args:
+        kind: "playbook" or "tasks"
+        parsed: The parsed YAML document
+        content: The original file content
+
+    Returns:
+        list: Dicts with ``hash`` and ``content`` for each unit
+    """
+    if kind == "playbook":
+        plays = [play for play in parsed if "import_playbook" not in play]
+        if len(plays) > 1:
+            return [
+                {"hash": normalized_hash(play),
+                 "content": yaml.safe_dump([play], sort_keys=False, default_flow_style=False)}
+                for play in plays
+            ]
+        if plays:
+            return [{"hash": normalized_hash(plays[0]), "content": content}]
+
+    return [{"hash": normalized_hash(parsed), "content": content}]
+
+
+def merge_analyses(analyses: List[Dict]) -> Dict:
+    """
+    Merge the structured analyses of a document's units.
+
+    Args:
+        analyses: structured_analysis dicts in unit order
+
+    Returns:
+        dict: One structured_analysis with joined summaries and deduplicated lists
+    """
+    if len(analyses) == 1:
+        return analyses[0]
+
+    merged = {"summary": "", "issues": [], "security": [], "best_practices": []}
+    merged["summary"] = "\n\n".join(a.get("summary", "") for a in analyses if a.get("summary"))
+    for key in ("issues", "security", "best_practices"):
+        for item in (item for a in analyses for item in a.get(key, [])):
+            if item not in merged[key]:
+                merged[key].append(item)
+    return merged
+
+
+class BatchAnalyzer:
+    """
+    Analyze many files with a process pool for parsing and batched generation.
+
+    Args:
+        generator: Backend with a ``generate_batch(prompts, **params)`` method
+        workers: Number of worker processes for reading and validation
+        batch_size: Number of units sent to the backend per generation call
+        on_result: Callback invoked with each finished result record
+        cache: Optional AnalysisCache consulted before generating a unit
+    """
+
+    def __init__(self, generator, workers: Optional[int] = None, batch_size: int = 4,
+                 on_result: Optional[Callable[[Dict], None]] = None, cache=None):
+        self.generator = generator
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = max(1, batch_size)
+        self.on_result = on_result
+        self.cache = cache
+        self.summary = {
+            "total": 0,
+            "analyzed": 0,
+            "invalid": 0,
+            "skipped": 0,
+            "error": 0,
+            "issues": 0,
+            "security": 0,
+            "tokens_used": 0,
+            "units_generated": 0,
+            "units_cached": 0,
+        }
+        # Units waiting for generation, keyed by hash, in submission order
+        self._queued = {}
+        # Records waiting on each queued hash: hash -> [(record, unit_index)]
+        self._waiters = {}
+        # Analyses generated during this run, keyed by hash
+        self._generated = {}
+
+    def run(self, targets: List[str]) -> Dict:
+        """
+        Analyze a list of files.
+
+        Args:
+            targets: File paths, typically from discover_analysis_targets
+
+        Returns:
+            dict: Summary counts by status plus issue, unit and token totals
+        """
+        start_time = time.time()
+        self.summary["total"] = len(targets)
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(prepare_analysis_target, target) for target in targets]
+                for future in as_completed(futures):
+                    record = future.result()
+                    if record["status"] == "pending":
+                        self.submit(record)
+                    else:
+                        self._emit(record)
+
+            self.flush()
+        finally:
+            # Keep whatever was generated even if the run is interrupted
+            if self.cache is not None:
+                self.cache.save()
+
+        self.summary["elapsed"] = time.time() - start_time
+        return self.summary
+
+    def submit(self, record: Dict):
+        """Resolve a prepared record from the cache or queue its units for generation."""
+        units = record["units"]
+        record["_results"] = [None] * len(units)
+        record["_remaining"] = len(units)
+
+        for index, unit in enumerate(units):
+            if unit["hash"] in self._generated:
+                self._resolve(record, index, self._generated[unit["hash"]])
+                continue
+
+            cached = self.cache.get(unit["hash"]) if self.cache is not None else None
+            if cached is not None:
+                self.summary["units_cached"] += 1
+                self._resolve(record, index, cached)
+                continue
+
+            # Identical units across files are generated once
+            self._waiters.setdefault(unit["hash"], []).append((record, index))
+            if unit["hash"] not in self._queued:
+                self._queued[unit["hash"]] = unit
+
+        if len(self._queued) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Send queued units to the backend in batches of batch_size."""
+        while self._queued:
+            hashes = list(self._queued)[:self.batch_size]
+            units = [self._queued.pop(h) for h in hashes]
+            prompts = [PLAYBOOK_REVIEW_TEMPLATE.format(playbook_content=u["content"]) for u in units]
+
+            try:
+                results = self.generator.generate_batch(prompts, **ANALYSIS_GENERATION_PARAMS)
+            except Exception as e:
+                logger.error(f"Error during batch generation: {str(e)}")
+                for content_hash in hashes:
+                    self._fail(content_hash, f"Generation failed: {e}")
+                continue
+
+            results = list(results)
+            if len(results) < len(units):
+                error = f"Backend returned {len(results)} results for {len(units)} prompts"
+                logger.error(error)
+                for unit in units[len(results):]:
+                    self._fail(unit["hash"], error)
+                units = units[:len(results)]
+
+            self.summary["units_generated"] += len(units)
+            for unit, result in zip(units, results):
+                analysis = process_analysis_response(result["text"])["structured_analysis"]
+                self._generated[unit["hash"]] = analysis
+                waiters = self._waiters.pop(unit["hash"], [])
+                if self.cache is not None and waiters:
+                    self.cache.put(unit["hash"], analysis, source=waiters[0][0]["path"])
+                for position, (record, index) in enumerate(waiters):
+                    # Attribute the tokens to the first file that needed the unit
+                    if position == 0:
+                        record["tokens_used"] = record.get("tokens_used", 0) + result.get("tokens_used", 0)
+                    record["_generated"] = True
+                    self._resolve(record, index, analysis)
+
+    def _resolve(self, record: Dict, index: int, analysis: Dict):
+        """Store one unit's analysis and emit the record once all units are done."""
+        if record.get("status") != "pending":
+            return
+        record["_results"][index] = analysis
+        record["_remaining"] -= 1
+        if record["_remaining"] == 0:
+            record["structured_analysis"] = merge_analyses(record["_results"])
+            record["status"] = "analyzed"
+            record["cached"] = not record.get("_generated", False)
+            self._emit(record)
+
+    def _fail(self, content_hash: str, error: str):
+        """Mark every record waiting on a unit as failed."""
+        for record, _ in self._waiters.pop(content_hash, []):
+            if record.get("status") == "pending":
+                record.update(status="error", error=error)
+                self._emit(record)
+
+    def _emit(self, record: Dict):
+        """Update the summary and hand a finished record to the callback."""
+        for key in ("units", "_results", "_remaining", "_generated"):
+            record.pop(key, None)
+        record.setdefault("tokens_used", 0)
+
+        self.summary[record["status"]] += 1
+        analysis = record.get("structured_analysis")
+        if analysis:
+            self.summary["issues"] += len(analysis.get("issues", []))
+            self.summary["security"] += len(analysis.get("security", []))
+        self.summary["tokens_used"] += record["tokens_used"]
+        if self.on_result:
+            self.on_result(record)
@@ -0,0 +1,358 @@
+"""
+Offline bulk playbook generation from JSON Lines task descriptions.
+
+Requests are sorted by tokenized prompt length and grouped into batches of
+similar length, so batched generation wastes little work on padding. Results
+are appended to a JSON Lines output file after every batch; that file doubles
+as the checkpoint, so an interrupted run resumes with the requests that have
+no result yet.
+"""
+import os
+import json
+import time
+import logging
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from src.llm_engine.prompt_templates import PLAYBOOK_GENERATION_TEMPLATE, WINDOWS_SSH_TEMPLATE
+from src.llm_engine.response_processor import process_playbook_response
+
+logger = logging.getLogger("ansible_llm")
+
+GENERATION_PARAMS = {
+    "max_new_tokens": 1024,
+    "temperature": 0.7,
+    "repetition_penalty": 1.1,
+    "do_sample": True,
+}
+
+NOT_SPECIFIED = "Not specified"
+
+
+def read_generation_requests(path: str) -> Tuple[List[Dict], List[str]]:
+    """
+    Read task descriptions from a JSON Lines file.
+
+    Each line is an object with a ``description`` and optionally an ``id``,
+    ``target_os``, ``environment_details``, ``inventory_summary`` and
+    ``best_practices``. Lines without an id are identified by line number.
+
+    Args:
+        path: Input JSONL file
+
+    Returns:
+        tuple: (valid requests, error messages for rejected lines)
+    """
+    requests = []
+    errors = []
+    seen_ids = set()
+
+    with open(path, "r") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                errors.append(f"Line {line_number}: invalid JSON: {e}")
+                continue
+
+            if not isinstance(request, dict) or not str(request.get("description", "")).strip():
+                errors.append(f"Line {line_number}: missing 'description'")
+                continue
+
+            request_id = str(request.get("id", f"line-{line_number}"))
+            if request_id in seen_ids:
+                errors.append(f"Line {line_number}: duplicate id '{request_id}'")
+                continue
+            seen_ids.add(request_id)
+
+            request["id"] = request_id
+            requests.append(request)
+
+    return requests, errors
+
+
+def build_generation_prompt(request: Dict) -> str:
+    """Format the generation prompt for one request."""
+    if str(request.get("target_os", "")).lower() == "windows":
+        return WINDOWS_SSH_TEMPLATE.format(user_task_description=request["description"])
+
+    return PLAYBOOK_GENERATION_TEMPLATE.format(
+        user_task_description=request["description"],
+        environment_details=request.get("environment_details", NOT_SPECIFIED),
+        inventory_summary=request.get("inventory_summary", NOT_SPECIFIED),
+        best_practices=request.get("best_practices", NOT_SPECIFIED),
+    )
+
+
+def bucket_by_length(items: List[Dict], lengths: List[int], batch_size: int,
+                     max_batch_tokens: Optional[int] = None) -> List[List[Dict]]:
+    """
+    Group items into batches of similar length.
+
+    Items are sorted by length and cut into consecutive batches, so padding is
+    bounded by the length spread inside each batch. A batch is also closed
+    early when its padded size (longest length times batch count) would exceed
+    max_batch_tokens.
+
+    Args:
+        items: Items to batch
+        lengths: Length of each item, in the same order
+        batch_size: Maximum items per batch
+        max_batch_tokens: Optional bound on padded tokens per batch
+
+    Returns:
+        list: Batches of items, shortest first
+    """
+    order = sorted(range(len(items)), key=lambda i: (lengths[i], i))
+    batches = []
+    current = []
+    longest = 0
+
+    for i in order:
+        padded = max(longest, lengths[i]) * (len(current) + 1)
+        if current and (len(current) >= batch_size
+                        or (max_batch_tokens and padded > max_batch_tokens)):
+            batches.append(current)
+            current, longest = [], 0
+        current.append(items[i])
+        longest = max(longest, lengths[i])
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def load_completed_ids(output_path: str) -> Set[str]:
+    """
+    Read the ids already present in an output file.
+
+    Records with status "error" are not counted, so failed requests are
+    retried on resume. BulkGenerator.run then removes their error records.
+    Lines that cannot be read are logged and skipped. Only a final line
+    without a newline, left by an interrupted write, is removed, so that
+    appending can continue cleanly.
+
+    Args:
+        output_path: The JSONL output file
+
+    Returns:
+        set: Ids of requests that already have a result
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    complete_length = 0
+    with open(output_path, "rb") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.endswith(b"\n"):
+                break
+            complete_length += len(line)
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if record.get("status") != "error":
+                    completed.add(str(record["id"]))
+            except (ValueError, KeyError, TypeError, AttributeError):
+                logger.warning(f"Skipping unreadable line {line_number} of {output_path}")
+
+    if complete_length < os.path.getsize(output_path):
+        logger.warning(f"Discarding incomplete trailing line in {output_path}")
+        with open(output_path, "rb+") as f:
+            f.truncate(complete_length)
+
+    return completed
+
+
+def discard_error_records(output_path: str, ids: Set[str]) -> int:
+    """
+    Remove the error records of requests that are about to be retried.
+
+    The file is rewritten through a temporary file and an atomic rename, so
+    every id keeps a single record once the retries are appended.
+
+    Args:
+        output_path: The JSONL output file
+        ids: Ids of the requests being retried
+
+    Returns:
+        int: Number of records removed
+    """
+    if not ids or not os.path.exists(output_path):
+        return 0
+
+    kept = []
+    discarded = 0
+    with open(output_path, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                if record.get("status") == "error" and str(record["id"]) in ids:
+                    discarded += 1
+                    continue
+            except (ValueError, KeyError, TypeError, AttributeError):
+                pass
+            kept.append(line)
+
+    if discarded:
+        temp_path = output_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.writelines(kept)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, output_path)
+    return discarded
+
+
+class BulkGenerator:
+    """
+    Generate playbooks for many requests with length-bucketed batches.
+
+    Args:
+        generator: Backend with ``generate_batch`` and, ideally, ``count_tokens``
+        batch_size: Maximum requests per generation call
+        max_batch_tokens: Optional bound on padded prompt tokens per call
+        generation_params: Overrides for GENERATION_PARAMS
+        on_result: Callback invoked with each written result record
+    """
+
+    def __init__(self, generator, batch_size: int = 8, max_batch_tokens: Optional[int] = None,
+                 generation_params: Optional[Dict] = None,
+                 on_result: Optional[Callable[[Dict], None]] = None):
+        self.generator = generator
+        self.batch_size = max(1, batch_size)
+        self.max_batch_tokens = max_batch_tokens
+        self.generation_params = dict(GENERATION_PARAMS, **(generation_params or {}))
+        self.on_result = on_result
+
+    def _prompt_lengths(self, prompts: List[str]) -> List[int]:
+        """Tokenize prompts with the backend, estimating when it cannot tokenize."""
+        if hasattr(self.generator, "count_tokens"):
+            try:
+                return self.generator.count_tokens(prompts)
+            except Exception as e:
+                logger.warning(f"Token counting failed, estimating lengths: {e}")
+        return [len(prompt) // 4 + 1 for prompt in prompts]
+
+    def plan(self, requests: List[Dict]) -> List[List[Dict]]:
+        """
+        Build prompts and length buckets for the given requests.
+
+        Args:
+            requests: Requests from read_generation_requests
+
+        Returns:
+            list: Batches of requests, each with ``prompt`` and ``prompt_tokens`` set
+        """
+        for request in requests:
+            request["prompt"] = build_generation_prompt(request)
+        lengths = self._prompt_lengths([r["prompt"] for r in requests])
+        for request, length in zip(requests, lengths):
+            request["prompt_tokens"] = length
+        return bucket_by_length(requests, lengths, self.batch_size, self.max_batch_tokens)
+
+    def run(self, requests: List[Dict], output_path: str, resume: bool = True) -> Dict:
+        """
+        Generate playbooks and append results to the output file.
+
+        Args:
+            requests: Requests from read_generation_requests
+            output_path: JSONL output and checkpoint file
+            resume: Skip requests already present in the output; when False the
+                output file is overwritten
+
+        Returns:
+            dict: Summary with counts, token totals and elapsed time
+        """
+        start_time = time.time()
+        if resume:
+            completed = load_completed_ids(output_path)
+        else:
+            completed = set()
+            open(output_path, "w").close()
+
+        remaining = [r for r in requests if r["id"] not in completed]
+        if resume:
+            # Failed requests are retried, their old error records are superseded
+            discard_error_records(output_path, {str(r["id"]) for r in remaining})
+        summary = {
+            "total": len(requests),
+            "resumed": len(requests) - len(remaining),
+            "generated": 0,
+            "valid": 0,
+            "invalid": 0,
+            "error": 0,
+            "batches": 0,
+            "prompt_tokens": 0,
+            "padded_prompt_tokens": 0,
+            "tokens_used": 0,
+        }
+        if not remaining:
+            summary["elapsed"] = time.time() - start_time
+            return summary
+
+        batches = self.plan(remaining)
+        with open(output_path, "a") as out:
+            for batch in batches:
+                records = self._generate(batch)
+                for record in records:
+                    out.write(json.dumps(record, default=str) + "\n")
+                # Each finished batch is durable before the next one starts
+                out.flush()
+                os.fsync(out.fileno())
+
+                summary["batches"] += 1
+                summary["prompt_tokens"] += sum(r["prompt_tokens"] for r in batch)
+                summary["padded_prompt_tokens"] += max(r["prompt_tokens"] for r in batch) * len(batch)
+                for record in records:
+                    summary["tokens_used"] += record.get("tokens_used", 0)
+                    if record["status"] == "error":
+                        summary["error"] += 1
+                    else:
+                        summary["generated"] += 1
+                        summary["valid" if record["is_valid"] else "invalid"] += 1
+                    if self.on_result:
+                        self.on_result(record)
+
+        summary["elapsed"] = time.time() - start_time
+        return summary
+
+    def _generate(self, batch: List[Dict]) -> List[Dict]:
+        """Run one batch and turn the completions into result records."""
+        try:
+            results = self.generator.generate_batch([r["prompt"] for r in batch],
+                                                    **self.generation_params)
+        except Exception as e:
+            logger.error(f"Error during batch generation: {str(e)}")
+            return [
+                {"id": r["id"], "description": r["description"], "status": "error",
+                 "error": f"Generation failed: {e}"}
+                for r in batch
+            ]
+
+        results = list(results)
+        records = []
+        if len(results) < len(batch):
+            error = f"Backend returned {len(results)} results for {len(batch)} prompts"
+            logger.error(error)
+            records.extend(
+                {"id": r["id"], "description": r["description"], "status": "error", "error": error}
+                for r in batch[len(results):]
+            )
+        for request, result in zip(batch, results):
+            processed = process_playbook_response(result["text"])
+            records.append({
+                "id": request["id"],
+                "description": request["description"],
+                "status": "ok",
+                "is_valid": processed["is_valid"],
+                "validation_message": processed["validation_message"],
+                "risks": processed["risks"],
+                "yaml_content": processed["yaml_content"],
+                "raw_response": processed["raw_response"],
+                "prompt_tokens": request["prompt_tokens"],
+                "tokens_used": result.get("tokens_used", 0),
+            })
+        return records
@@ -0,0 +1,185 @@
+"""
+Bulk access to cached Ansible facts.
+
+Planning for a fleet needs the facts of every host, and gathering them again
+is the slowest part of a run. Ansible's ``jsonfile`` fact cache keeps one JSON
+file per host, named after the host with an optional prefix; this module
+reads such a cache, or an in-memory mapping of host to facts such as the
+``memory`` cache or ``hostvars``, into a plain dict keyed by host.
+
+It also knows which facts each kind of operation needs and the smallest
+``gather_subset`` that collects them, so fact collection plays only gather
+what the requested operations use.
+"""
+import os
+import json
+import time
+import logging
+from typing import Dict, Iterable, List, Mapping, Union
+
+from src.llm_engine.playbook_optimizer import fact_subset
+
+logger = logging.getLogger("ansible_llm")
+
+
+def normalize_facts(facts: Mapping) -> Dict:
+    """
+    Bring facts into the ``ansible_``-prefixed form used by the generators.
+
+    Accepts the contents of a fact cache entry, a ``setup`` result with an
+    ``ansible_facts`` key, or the unprefixed names of ``ansible_facts``.
+
+    Args:
+        facts: Facts of one host
+
+    Returns:
+        dict: The facts with ``ansible_`` prefixed names
+    """
+    if not facts:
+        return {}
+    if isinstance(facts.get("ansible_facts"), Mapping):
+        facts = facts["ansible_facts"]
+    normalized = {}
+    for key, value in facts.items():
+        if key.startswith("ansible_") or key.startswith("discovered_") or key.startswith("facter_"):
+            normalized[key] = value
+        else:
+            normalized.setdefault(f"ansible_{key}", value)
+    return normalized
+
+
+def read_jsonfile_cache(directory, prefix: str = "", timeout: int = 0) -> Dict[str, Dict]:
+    """
+    Read every host of an Ansible jsonfile fact cache.
+
+    Args:
+        directory: The cache directory (``fact_caching_connection``)
+        prefix: File name prefix (``fact_caching_prefix``)
+        timeout: Seconds after which an entry is stale (``fact_caching_timeout``),
+            0 for no expiry
+
+    Returns:
+        dict: Normalized facts by host; stale and unreadable entries are skipped
+    """
+    directory = os.path.expanduser(str(directory))
+    now = time.time()
+    hosts = {}
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        logger.warning(f"Fact cache directory {directory} does not exist")
+        return hosts
+
+    for entry in entries:
+        name = entry.name
+        if name.startswith(".") or not name.startswith(prefix) or not entry.is_file():
+            continue
+        if timeout and now - entry.stat().st_mtime > timeout:
+            continue
+        try:
+            with open(entry.path, "r") as f:
+                facts = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping unreadable fact cache entry {entry.path}: {e}")
+            continue
+        if isinstance(facts, dict):
+            hosts[name[len(prefix):]] = normalize_facts(facts)
+    return hosts
+
+
+def load_fact_cache(source: Union[str, os.PathLike, Mapping], prefix: str = "",
+                    timeout: int = 0) -> Dict[str, Dict]:
+    """
+    Load the facts of many hosts from a jsonfile cache or an in-memory mapping.
+
+    Args:
+        source: jsonfile cache directory, or a mapping of host to facts
+        prefix: File name prefix of the jsonfile cache
+        timeout: Seconds after which a jsonfile entry is stale, 0 for no expiry
+
+    Returns:
+        dict: Normalized facts by host
+    """
+    if isinstance(source, Mapping):
+        return {str(host): normalize_facts(facts or {}) for host, facts in source.items()}
+    return read_jsonfile_cache(source, prefix=prefix, timeout=timeout)
+
+
+DEFAULT_FACT_CACHE_DIR = "~/.ansible_llm/facts"
+
+# Ansible's default fact_caching_timeout
+DEFAULT_FACT_CACHE_TTL = 86400
+
+# Key of a cache entry written by the fact collection play listing the facts
+# (without the ansible_ prefix) gathered into it so far
+GATHERED_FACTS_KEY = "ansible_llm_gathered_facts"
+
+# Facts (without the ansible_ prefix) used by each kind of operation
+OPERATION_FACTS = {
+    "packages": ("distribution", "distribution_version", "os_family", "pkg_mgr"),
+    "services": ("os_family", "service_mgr"),
+    "users": ("os_family",),
+    "firewall": ("distribution", "os_family"),
+    "system": ("distribution", "distribution_version", "kernel", "architecture"),
+    "hardware": ("memtotal_mb", "processor", "processor_vcpus"),
+    "network": ("default_ipv4", "interfaces"),
+}
+
+# The collector of the min subset that gathers each min fact; facts of other
+# collectors fall back to the whole min subset
+MIN_FACT_COLLECTORS = {
+    "distribution": "distribution", "distribution_version": "distribution",
+    "distribution_major_version": "distribution", "distribution_release": "distribution",
+    "os_family": "distribution", "pkg_mgr": "pkg_mgr", "service_mgr": "service_mgr",
+    "kernel": "platform", "kernel_version": "platform", "architecture": "platform", "machine": "platform",
+    "system": "platform", "hostname": "platform", "fqdn": "platform", "nodename": "platform",
+    "domain": "platform", "userspace_architecture": "platform", "userspace_bits": "platform",
+    "python": "python", "python_version": "python", "selinux": "selinux", "date_time": "date_time",
+    "env": "env", "dns": "dns", "lsb": "lsb",
+}
+
+
+def required_facts(operations: Iterable[str]) -> List[str]:
+    """
+    List the facts needed by a set of operations.
+
+    Args:
+        operations: Keys of OPERATION_FACTS
+
+    Returns:
+        list: Sorted fact names without the ``ansible_`` prefix
+
+    Raises:
+        ValueError: If an operation is unknown
+    """
+    facts = set()
+    for operation in operations:
+        if operation not in OPERATION_FACTS:
+            raise ValueError(f"Unknown operation '{operation}', expected one of {', '.join(OPERATION_FACTS)}")
+        facts.update(OPERATION_FACTS[operation])
+    return sorted(facts)
+
+
+def minimal_gather_subset(facts: Iterable[str]) -> List[str]:
+    """
+    Compute the smallest gather_subset that collects the given facts.
+
+    Only the collectors of the min subset that are needed are kept; the
+    hardware, network and virtual subsets are added when one of their facts
+    is needed. Collectors that others depend on are added by Ansible.
+
+    Args:
+        facts: Fact names without the ``ansible_`` prefix
+
+    Returns:
+        list: gather_subset entries, starting with ``!all`` and ``!min``
+    """
+    subsets = set()
+    for fact in facts:
+        subset = MIN_FACT_COLLECTORS.get(fact) or fact_subset(fact)
+        if subset is None:
+            return ["all"]
+        subsets.add(subset)
+    if "min" in subsets:
+        return ["!all"] + sorted(subsets - {"min"} - set(MIN_FACT_COLLECTORS.values()))
+    return ["!all", "!min"] + sorted(subsets)
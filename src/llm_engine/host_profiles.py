@@ -0,0 +1,285 @@
+"""
+Host-specific playbooks at inventory scale, one LLM call per host profile.
+
+Hosts are clustered by the facts a playbook depends on: distribution, major
+version, os_family, package manager and any chosen host variables (such as a
+``role`` variable). The LLM writes one parameterized playbook per cluster, in
+which host-specific values are ``<< variable >>`` placeholders; per-host
+variants are rendered from that template. Generation therefore costs one
+call per distinct profile, however many hosts share it.
+
+The placeholders use their own delimiters (``<< >>`` for values, ``<% %>``
+for statements), so ``{{ }}`` expressions meant for Ansible at run time pass
+through rendering untouched. Each cluster template is compiled once and
+rendered for every host of the cluster.
+"""
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple, Union
+
+import yaml
+
+from src.llm_engine.fact_cache import load_fact_cache
+from src.llm_engine.linux_processor import PLAYBOOK_BLOCK_PATTERN, LinuxProcessor
+from src.llm_engine.prompt_templates import HOST_PROFILE_PLAYBOOK_TEMPLATE
+
+logger = logging.getLogger("ansible_llm")
+
+# Fact names shown to the LLM as available placeholders, besides the host variables
+TEMPLATE_FACTS = ("inventory_hostname", "ansible_hostname", "ansible_fqdn", "ansible_default_ipv4",
+                  "ansible_memtotal_mb", "ansible_processor_vcpus")
+
+
+class HostProfile(NamedTuple):
+    """The facts that decide what a playbook looks like for a host."""
+    distribution: str
+    version: str
+    os_family: str
+    package_manager: str
+    # (name, JSON-encoded value) of the chosen host variables, in name order
+    variables: Tuple[Tuple[str, str], ...] = ()
+
+    def describe(self) -> Dict:
+        """Return the profile as a plain dict with decoded variable values."""
+        profile = {
+            "distribution": self.distribution,
+            "version": self.version,
+            "os_family": self.os_family,
+            "package_manager": self.package_manager,
+        }
+        profile.update((name, json.loads(value)) for name, value in self.variables)
+        return profile
+
+
+def host_profile(facts: Mapping, host_vars: Optional[Mapping] = None, profile_vars: Iterable[str] = (),
+                 processor=None) -> HostProfile:
+    """
+    Build the profile of one host.
+
+    Args:
+        facts: Normalized facts of the host
+        host_vars: Inventory variables of the host
+        profile_vars: Names of host variables (or facts) that distinguish profiles
+        processor: LinuxProcessor whose memoized resolve_distribution is used
+
+    Returns:
+        HostProfile of the host
+    """
+    processor = processor or LinuxProcessor()
+    host_vars = host_vars or {}
+    distribution, os_family, package_manager = processor.resolve_distribution(
+        facts.get("ansible_distribution"), facts.get("ansible_os_family"), facts.get("ansible_pkg_mgr"))
+    version = str(facts.get("ansible_distribution_major_version") or "unknown")
+    variables = tuple(
+        (name, json.dumps(host_vars.get(name, facts.get(name)), sort_keys=True, default=str))
+        for name in sorted(profile_vars)
+    )
+    return HostProfile(distribution, version, os_family, package_manager, variables)
+
+
+def cluster_hosts(source: Union[str, Mapping], host_vars: Optional[Mapping[str, Mapping]] = None,
+                  profile_vars: Iterable[str] = (), processor=None, timeout: int = 0) -> Dict[HostProfile, List[str]]:
+    """
+    Group hosts by profile.
+
+    Args:
+        source: Directory of an Ansible jsonfile fact cache, or a mapping of
+            host to facts
+        host_vars: Inventory variables by host; hosts that only appear here
+            have an unknown distribution
+        profile_vars: Names of host variables (or facts) that distinguish profiles
+        processor: LinuxProcessor used to resolve distributions
+        timeout: Seconds after which a jsonfile entry is stale, 0 for no expiry
+
+    Returns:
+        dict: Sorted hostnames by HostProfile, in order of first host
+    """
+    processor = processor or LinuxProcessor()
+    host_vars = host_vars or {}
+    profile_vars = list(profile_vars)
+    host_facts = load_fact_cache(source, timeout=timeout)
+
+    clusters = {}
+    for host in sorted(set(host_facts) | set(host_vars)):
+        profile = host_profile(host_facts.get(host, {}), host_vars.get(host), profile_vars, processor)
+        clusters.setdefault(profile, []).append(host)
+    return clusters
+
+
+_environment = None
+
+
+def _template_environment():
+    """Return the shared Jinja environment with the placeholder delimiters."""
+    global _environment
+    if _environment is None:
+        from jinja2 import Environment, StrictUndefined
+
+        _environment = Environment(
+            variable_start_string="<<", variable_end_string=">>",
+            block_start_string="<%", block_end_string="%>",
+            comment_start_string="<#", comment_end_string="#>",
+            undefined=StrictUndefined, keep_trailing_newline=True, autoescape=False,
+        )
+    return _environment
+
+
+class PlaybookTemplate:
+    """
+    A cluster's parameterized playbook, compiled once and rendered per host.
+
+    Args:
+        source: Playbook YAML with ``<< variable >>`` placeholders
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self._template = _template_environment().from_string(source)
+
+    def render(self, context: Mapping[str, Any]) -> str:
+        """
+        Render the playbook for one host.
+
+        Args:
+            context: Facts and variables of the host
+
+        Returns:
+            The playbook YAML of the host
+
+        Raises:
+            jinja2.UndefinedError: If the template uses a variable the host lacks
+        """
+        return self._template.render(context)
+
+
+def _host_context(host: str, facts: Mapping, host_vars: Optional[Mapping]) -> Dict:
+    """Variables available to placeholders: facts, then host variables, then the hostname."""
+    context = dict(facts)
+    context.update(host_vars or {})
+    context["inventory_hostname"] = host
+    return context
+
+
+def build_profile_prompt(request: str, profile: HostProfile, hosts: List[str],
+                         variable_names: Iterable[str]) -> str:
+    """
+    Build the generation prompt for one cluster.
+
+    Args:
+        request: Description of the automation task
+        profile: Profile shared by the cluster's hosts
+        hosts: Hosts of the cluster
+        variable_names: Names available as placeholders
+
+    Returns:
+        The prompt
+    """
+    return HOST_PROFILE_PLAYBOOK_TEMPLATE.format(
+        user_task_description=request,
+        host_profile=yaml.safe_dump(profile.describe(), default_flow_style=False, sort_keys=False).strip(),
+        host_count=len(hosts),
+        template_variables=", ".join(sorted(variable_names)),
+    )
+
+
+class ProfilePlaybookGenerator:
+    """
+    Generates host-specific playbooks with one LLM call per host profile.
+
+    Args:
+        model_interface: Backend with ``generate_batch`` (all cluster prompts
+            go in one batched call) or ``generate``
+        processor: LinuxProcessor used to resolve distributions
+        profile_vars: Names of host variables (or facts) that distinguish profiles
+        generation_params: Extra parameters for ``generate_batch``
+    """
+
+    def __init__(self, model_interface, processor=None, profile_vars: Iterable[str] = (),
+                 generation_params: Optional[Dict] = None):
+        self.model_interface = model_interface
+        self.processor = processor or LinuxProcessor()
+        self.profile_vars = list(profile_vars)
+        self.generation_params = generation_params or {}
+
+    def _generate_all(self, prompts: List[str]) -> List[Tuple[Optional[str], Optional[Exception]]]:
+        """Return (text, error) for each prompt."""
+        if hasattr(self.model_interface, "generate_batch"):
+            try:
+                results = self.model_interface.generate_batch(prompts, **self.generation_params)
+            except Exception as e:
+                return [(None, e)] * len(prompts)
+            texts = [None] * len(prompts)
+            for result in results:
+                texts[result["index"]] = result["text"]
+            return [(text, None if text is not None else ValueError("No completion returned"))
+                    for text in texts]
+
+        responses = []
+        for prompt in prompts:
+            try:
+                response = self.model_interface.generate(prompt)
+                responses.append((response["text"] if isinstance(response, dict) else response, None))
+            except Exception as e:
+                responses.append((None, e))
+        return responses
+
+    def generate(self, request: str, source: Union[str, Mapping],
+                 host_vars: Optional[Mapping[str, Mapping]] = None, timeout: int = 0) -> Dict:
+        """
+        Generate a playbook for every host.
+
+        Args:
+            request: Description of the automation task
+            source: Directory of an Ansible jsonfile fact cache, or a mapping
+                of host to facts
+            host_vars: Inventory variables by host
+            timeout: Seconds after which a jsonfile entry is stale, 0 for no expiry
+
+        Returns:
+            dict: ``clusters`` (profile, hosts, template and error of each
+            cluster), ``playbooks`` (rendered YAML by host), ``errors``
+            (message by host) and ``llm_calls``
+        """
+        host_vars = host_vars or {}
+        host_facts = load_fact_cache(source, timeout=timeout)
+        clusters = cluster_hosts(host_facts, host_vars, self.profile_vars, self.processor)
+
+        prompts = []
+        for profile, hosts in clusters.items():
+            names = set(TEMPLATE_FACTS)
+            for host in hosts:
+                names.update(host_vars.get(host, {}))
+            prompts.append(build_profile_prompt(request, profile, hosts, names))
+        logger.info(f"Generating playbooks for {sum(map(len, clusters.values()))} hosts "
+                    f"with {len(clusters)} LLM calls")
+        responses = self._generate_all(prompts) if prompts else []
+
+        result = {"clusters": [], "playbooks": {}, "errors": {}, "llm_calls": len(prompts)}
+        for (profile, hosts), (response, error) in zip(clusters.items(), responses):
+            cluster = {"profile": profile.describe(), "hosts": hosts, "template": None, "error": None}
+            result["clusters"].append(cluster)
+            if error is None:
+                # The template is only valid YAML once rendered, it is parsed per host
+                match = PLAYBOOK_BLOCK_PATTERN.search(response)
+                error = None if match else "Failed to generate valid Ansible playbook"
+            if error is None:
+                try:
+                    template = PlaybookTemplate(match.group(1).strip() + "\n")
+                except Exception as e:
+                    error = f"Invalid template: {e}"
+            if error is not None:
+                cluster["error"] = str(error)
+                for host in hosts:
+                    result["errors"][host] = str(error)
+                continue
+
+            cluster["template"] = template.source
+            for host in hosts:
+                try:
+                    playbook = template.render(_host_context(host, host_facts.get(host, {}), host_vars.get(host)))
+                    yaml.safe_load(playbook)
+                except Exception as e:
+                    result["errors"][host] = f"Rendering failed: {e}"
+                    continue
+                result["playbooks"][host] = playbook
+        return result
@@ -0,0 +1,557 @@
+"""
+Persistent inference daemon for TinyLlama 3.
+
+Loading the model dominates the cost of a single CLI invocation, so this module
+keeps it resident in a background process and serves generation requests over a
+local Unix socket. Requests and responses are newline-delimited JSON objects.
+
+The CLI uses :func:`get_generator` to obtain a backend: a running daemon is used
+when available, one is started on demand when ``auto_start`` is enabled, and
+otherwise the model is loaded in-process.
+"""
+import os
+import sys
+import json
+import time
+import fcntl
+import socket
+import logging
+import threading
+import subprocess
+import socketserver
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("ansible_llm")
+
+project_root = Path(__file__).resolve().parent.parent.parent
+
+DEFAULT_MODEL_NAME = "TinyLlama/TinyLlama-1.1B-Chat-v0.1"
+
+DEFAULT_DAEMON_SETTINGS = {
+    "enabled": True,
+    "socket_path": "~/.ansible_llm/inference.sock",
+    "auto_start": False,
+    "idle_timeout": 900,
+    "startup_timeout": 300,
+    "request_timeout": 600,
+}
+
+
+class DaemonError(RuntimeError):
+    """Raised when the inference daemon cannot be reached or reports an error."""
+
+
+def get_daemon_settings(config=None) -> Dict:
+    """
+    Resolve the daemon settings from the configuration and environment.
+
+    Environment variables take precedence over the ``[daemon]`` section of the
+    configuration file.
+
+    Args:
+        config: Loaded configuration dict, or None to load the default file
+
+    Returns:
+        dict: Daemon settings with all keys of DEFAULT_DAEMON_SETTINGS present
+    """
+    if config is None:
+        try:
+            from src.config import load_config
+            config = load_config()
+        except ImportError as e:
+            logger.debug(f"Configuration loader unavailable: {e}")
+            config = {}
+
+    settings = dict(DEFAULT_DAEMON_SETTINGS)
+    settings.update(config.get("daemon", {}) or {})
+
+    env_overrides = {
+        "ANSIBLE_LLM_DAEMON": ("enabled", _parse_bool),
+        "ANSIBLE_LLM_DAEMON_SOCKET": ("socket_path", str),
+        "ANSIBLE_LLM_DAEMON_AUTO_START": ("auto_start", _parse_bool),
+        "ANSIBLE_LLM_DAEMON_IDLE_TIMEOUT": ("idle_timeout", int),
+    }
+    for env_name, (key, convert) in env_overrides.items():
+        if env_name in os.environ:
+            settings[key] = convert(os.environ[env_name])
+
+    settings["socket_path"] = str(Path(settings["socket_path"]).expanduser())
+    return settings
+
+
+def _parse_bool(value) -> bool:
+    """Parse a boolean setting from an environment string."""
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+class LocalGenerator:
+    """
+    In-process generation backend.
+
+    The model is loaded lazily on first use and kept for the lifetime of the
+    object. The daemon wraps one of these to serve requests.
+    """
+
+    def __init__(self, model_name=None, quantization=None, device=None):
+        self.model_name = model_name or DEFAULT_MODEL_NAME
+        self.quantization = quantization
+        self.device = device
+        self.model = None
+        self.tokenizer = None
+
+    def load(self):
+        """Load the model and tokenizer if they are not loaded yet."""
+        if self.model is not None:
+            return
+
+        from src.llm_engine.model_loader import load_model
+
+        try:
+            self.model, self.tokenizer = load_model(
+                model_name=self.model_name,
+                quantization=self.quantization,
+                device=self.device
+            )
+        except Exception as e:
+            logger.error(f"Error loading specified model: {str(e)}")
+            logger.info("Falling back to default model...")
+            self.model, self.tokenizer = load_model(device=self.device)
+
+    def generate_batch(self, prompts: List[str], **params) -> List[Dict]:
+        """
+        Generate completions for a list of prompts.
+
+        Args:
+            prompts: Prompts to complete
+            **params: Generation parameters accepted by model_loader.generate_batch
+
+        Returns:
+            list: Completion dicts with ``index``, ``text`` and ``tokens_used``
+        """
+        self.load()
+        from src.llm_engine.model_loader import generate_batch
+        return generate_batch(self.model, self.tokenizer, prompts, **params)
+
+    def generate(self, prompt: str, **params) -> Dict:
+        """Generate a single completion for one prompt."""
+        return self.generate_batch([prompt], **params)[0]
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Return the tokenized length of each text."""
+        self.load()
+        return [len(ids) for ids in self.tokenizer(list(texts))["input_ids"]]
+
+    def describe(self) -> str:
+        """Return a short human-readable description of the backend."""
+        return f"in-process model {self.model_name}"
+
+
+class DaemonClient:
+    """Client for a running inference daemon."""
+
+    def __init__(self, socket_path=None, timeout=None):
+        settings = DEFAULT_DAEMON_SETTINGS
+        self.socket_path = str(Path(socket_path or settings["socket_path"]).expanduser())
+        self.timeout = timeout if timeout is not None else settings["request_timeout"]
+        self.model_name = None
+
+    def _request(self, payload: Dict, timeout: Optional[float] = None) -> Dict:
+        """Send one request to the daemon and return its decoded response."""
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout if timeout is not None else self.timeout)
+                sock.connect(self.socket_path)
+                sock.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+                with sock.makefile("rb") as stream:
+                    line = stream.readline()
+        except OSError as e:
+            raise DaemonError(f"Cannot reach inference daemon at {self.socket_path}: {e}") from e
+
+        if not line:
+            raise DaemonError("Inference daemon closed the connection without a response")
+
+        try:
+            response = json.loads(line)
+        except ValueError as e:
+            raise DaemonError(f"Invalid response from inference daemon: {e}") from e
+
+        if not response.get("ok"):
+            raise DaemonError(response.get("error", "Unknown daemon error"))
+        return response
+
+    def status(self) -> Dict:
+        """Return the daemon status (pid, model, uptime, requests served)."""
+        response = self._request({"op": "status"}, timeout=5)
+        self.model_name = response.get("model_name")
+        return response
+
+    def is_running(self) -> bool:
+        """Check whether a daemon is listening on the socket."""
+        if not os.path.exists(self.socket_path):
+            return False
+        try:
+            self.status()
+            return True
+        except DaemonError:
+            return False
+
+    def generate_batch(self, prompts: List[str], **params) -> List[Dict]:
+        """Generate completions for a list of prompts on the daemon."""
+        response = self._request({"op": "generate", "prompts": list(prompts), "params": params})
+        return response["results"]
+
+    def generate(self, prompt: str, **params) -> Dict:
+        """Generate a single completion for one prompt on the daemon."""
+        return self.generate_batch([prompt], **params)[0]
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Return the tokenized length of each text using the daemon's tokenizer."""
+        response = self._request({"op": "count_tokens", "texts": list(texts)})
+        return response["counts"]
+
+    def shutdown(self):
+        """Ask the daemon to stop."""
+        self._request({"op": "shutdown"}, timeout=5)
+
+    def describe(self) -> str:
+        """Return a short human-readable description of the backend."""
+        return f"inference daemon at {self.socket_path} (model {self.model_name or 'unknown'})"
+
+
+def _pid_path(socket_path: str) -> str:
+    """Return the pid file a daemon keeps locked while it owns a socket."""
+    return str(Path(socket_path).expanduser()) + ".pid"
+
+
+def daemon_alive(socket_path: str) -> bool:
+    """
+    Check whether a daemon owns the socket, including one still loading its model.
+
+    Args:
+        socket_path: Unix socket path of the daemon
+
+    Returns:
+        bool: True while a daemon process holds the lock on its pid file
+    """
+    try:
+        with open(_pid_path(socket_path), "r") as pid_file:
+            try:
+                fcntl.flock(pid_file, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(pid_file, fcntl.LOCK_UN)
+    except FileNotFoundError:
+        pass
+    return False
+
+
+class _DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """Handle newline-delimited JSON requests on one connection."""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                response = self.server.inference_daemon.handle_request(request)
+            except ValueError as e:
+                response = {"ok": False, "error": f"Invalid request: {e}"}
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded Unix socket server; generation itself is serialized by the daemon."""
+    daemon_threads = True
+
+
+class InferenceDaemon:
+    """
+    Serve a generation backend over a Unix socket.
+
+    Status requests are answered concurrently while generation requests are
+    serialized, so a long generation never blocks a liveness check. When
+    ``idle_timeout`` is positive the daemon exits after that many seconds
+    without requests.
+    """
+
+    def __init__(self, backend, socket_path, idle_timeout=0):
+        self.backend = backend
+        self.socket_path = str(Path(socket_path).expanduser())
+        self.idle_timeout = idle_timeout
+        self.started_at = time.time()
+        self.last_activity = time.monotonic()
+        self.requests_served = 0
+        self._active_requests = 0
+        self._generate_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._server = None
+        self._pid_file = None
+
+    def bind(self):
+        """
+        Create the listening socket, replacing a stale socket file if needed.
+
+        The daemon locks its pid file first and keeps the lock until it exits,
+        so a socket is only treated as stale when no daemon holds the lock;
+        a daemon that is still loading its model does not answer status
+        requests, but its socket is never replaced.
+
+        Raises:
+            DaemonError: If another daemon owns the socket
+        """
+        path = Path(self.socket_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pid_file = open(_pid_path(self.socket_path), "a+")
+        try:
+            fcntl.flock(pid_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            pid_file.close()
+            raise DaemonError(f"An inference daemon is already running at {self.socket_path}")
+        pid_file.truncate(0)
+        pid_file.write(f"{os.getpid()}\n")
+        pid_file.flush()
+        self._pid_file = pid_file
+
+        try:
+            if path.exists():
+                path.unlink()
+            self._server = _DaemonServer(self.socket_path, _DaemonRequestHandler)
+        except OSError:
+            self._release()
+            raise
+        self._server.inference_daemon = self
+        os.chmod(self.socket_path, 0o600)
+
+    def _release(self):
+        """Release the pid file lock, letting another daemon take the socket."""
+        if self._pid_file is not None:
+            self._pid_file.close()
+            self._pid_file = None
+
+    def serve_forever(self):
+        """Serve requests until shutdown is requested or the idle timeout expires."""
+        if self._server is None:
+            self.bind()
+
+        if self.idle_timeout and self.idle_timeout > 0:
+            threading.Thread(target=self._watch_idle, name="daemon-idle-watch", daemon=True).start()
+
+        logger.info(f"Inference daemon listening on {self.socket_path} (pid {os.getpid()})")
+        try:
+            self._server.serve_forever(poll_interval=0.5)
+        finally:
+            self._stopped.set()
+            self._server.server_close()
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+            self._release()
+            logger.info("Inference daemon stopped")
+
+    def shutdown(self):
+        """Stop serving; safe to call from a request handler thread."""
+        if self._server is not None and not self._stopped.is_set():
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def _watch_idle(self):
+        """Shut the daemon down once it has been idle for idle_timeout seconds."""
+        check_interval = min(5.0, self.idle_timeout / 2)
+        while not self._stopped.wait(check_interval):
+            with self._state_lock:
+                idle_for = time.monotonic() - self.last_activity
+                busy = self._active_requests > 0
+            if not busy and idle_for >= self.idle_timeout:
+                logger.info(f"Inference daemon idle for {idle_for:.0f}s, shutting down")
+                self._server.shutdown()
+                return
+
+    def handle_request(self, request: Dict) -> Dict:
+        """
+        Dispatch one decoded request.
+
+        Args:
+            request: Dict with an ``op`` key (status, generate, count_tokens or shutdown)
+
+        Returns:
+            dict: Response with ``ok`` set, plus op-specific fields
+        """
+        op = request.get("op")
+
+        if op == "status":
+            return {
+                "ok": True,
+                "pid": os.getpid(),
+                "model_name": getattr(self.backend, "model_name", None),
+                "uptime": time.time() - self.started_at,
+                "requests_served": self.requests_served,
+                "idle_timeout": self.idle_timeout,
+            }
+
+        if op == "shutdown":
+            self.shutdown()
+            return {"ok": True}
+
+        if op == "count_tokens":
+            texts = request.get("texts")
+            if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                return {"ok": False, "error": "'texts' must be a list of strings"}
+            try:
+                return {"ok": True, "counts": self.backend.count_tokens(texts)}
+            except Exception as e:
+                logger.error(f"Error counting tokens: {str(e)}")
+                return {"ok": False, "error": f"Tokenization failed: {e}"}
+
+        if op == "generate":
+            prompts = request.get("prompts")
+            if not isinstance(prompts, list) or not all(isinstance(p, str) for p in prompts):
+                return {"ok": False, "error": "'prompts' must be a list of strings"}
+
+            with self._state_lock:
+                self._active_requests += 1
+            try:
+                with self._generate_lock:
+                    results = self.backend.generate_batch(prompts, **(request.get("params") or {}))
+                self.requests_served += 1
+                return {"ok": True, "results": results}
+            except Exception as e:
+                logger.error(f"Error during daemon generation: {str(e)}")
+                return {"ok": False, "error": f"Generation failed: {e}"}
+            finally:
+                with self._state_lock:
+                    self._active_requests -= 1
+                    self.last_activity = time.monotonic()
+
+        return {"ok": False, "error": f"Unknown operation: {op}"}
+
+
+def run_daemon(model_name=None, quantization=None, device=None, settings=None):
+    """
+    Load the model and serve it in the foreground until shutdown.
+
+    Args:
+        model_name: Model to keep resident
+        quantization: Optional quantization level ("4bit" or "8bit")
+        device: Device to load the model on
+        settings: Daemon settings; resolved with get_daemon_settings if None
+    """
+    settings = settings or get_daemon_settings()
+    backend = LocalGenerator(model_name=model_name, quantization=quantization, device=device)
+    daemon = InferenceDaemon(backend, settings["socket_path"], idle_timeout=settings["idle_timeout"])
+
+    # Bind before loading so concurrent auto-starts fail fast instead of loading twice
+    daemon.bind()
+    backend.load()
+    daemon.serve_forever()
+
+
+def start_daemon(model_name=None, quantization=None, settings=None, wait=True) -> DaemonClient:
+    """
+    Start the daemon as a detached background process.
+
+    Args:
+        model_name: Model to keep resident
+        quantization: Optional quantization level
+        settings: Daemon settings; resolved with get_daemon_settings if None
+        wait: Whether to block until the daemon answers status requests
+
+    Returns:
+        DaemonClient: Client connected to the new daemon
+
+    Raises:
+        DaemonError: If the daemon does not come up within startup_timeout
+    """
+    settings = settings or get_daemon_settings()
+    client = DaemonClient(settings["socket_path"], timeout=settings["request_timeout"])
+    if client.is_running():
+        return client
+
+    # A daemon that is still loading its model accepts connections but does
+    # not answer them, so concurrent callers (such as forked Ansible workers)
+    # must not each start one. The first to take the start lock spawns a
+    # daemon unless one already holds its pid file, and everyone waits for it.
+    lock_path = Path(settings["socket_path"] + ".lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if client.is_running():
+            return client
+        if daemon_alive(settings["socket_path"]):
+            logger.info("Inference daemon is still loading its model")
+        else:
+            _spawn_daemon(model_name, quantization, settings)
+
+        if not wait:
+            return client
+
+        deadline = time.monotonic() + settings["startup_timeout"]
+        while time.monotonic() < deadline:
+            if client.is_running():
+                return client
+            time.sleep(0.5)
+    raise DaemonError(f"Inference daemon did not start within {settings['startup_timeout']}s")
+
+
+def _spawn_daemon(model_name, quantization, settings):
+    """Launch a detached daemon process serving the given model."""
+    command = [
+        sys.executable, "-m", "src.main", "daemon", "start", "--foreground",
+        "--socket", settings["socket_path"],
+        "--idle-timeout", str(settings["idle_timeout"]),
+    ]
+    if model_name:
+        command += ["--model", model_name]
+    if quantization:
+        command += ["--quantize", quantization]
+
+    log_dir = project_root / "logs"
+    log_dir.mkdir(exist_ok=True)
+    with open(log_dir / "inference_daemon.log", "ab") as log_file:
+        subprocess.Popen(
+            command,
+            cwd=str(project_root),
+            stdin=subprocess.DEVNULL,
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            start_new_session=True
+        )
+    logger.info(f"Started inference daemon for {model_name or DEFAULT_MODEL_NAME}")
+
+
+def get_generator(model_name=None, quantization=None, settings=None):
+    """
+    Return the fastest available generation backend.
+
+    A running daemon is preferred. If none is running and ``auto_start`` is
+    enabled, one is started and used. Otherwise the model is loaded in-process.
+
+    Args:
+        model_name: Model to use when loading in-process or auto-starting
+        quantization: Optional quantization level
+        settings: Daemon settings; resolved with get_daemon_settings if None
+
+    Returns:
+        DaemonClient or LocalGenerator: Object with generate/generate_batch methods
+    """
+    settings = settings or get_daemon_settings()
+
+    if settings["enabled"]:
+        client = DaemonClient(settings["socket_path"], timeout=settings["request_timeout"])
+        if client.is_running():
+            if model_name and client.model_name and client.model_name != model_name:
+                logger.warning(
+                    f"Inference daemon serves {client.model_name}, not the requested {model_name}"
+                )
+            return client
+
+        if settings["auto_start"]:
+            try:
+                return start_daemon(model_name=model_name, quantization=quantization, settings=settings)
+            except DaemonError as e:
+                logger.warning(f"Could not auto-start inference daemon: {e}")
+
+    return LocalGenerator(model_name=model_name, quantization=quantization)
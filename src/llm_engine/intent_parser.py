@@ -0,0 +1,286 @@
+"""
+Deterministic parsing of common Linux automation requests.
+
+Requests such as "install nginx and git, open port 80 on ubuntu" or "update
+the system" map directly onto the LinuxProcessor generators, so they do not
+need the LLM. The parser splits a request into clauses at the verbs it knows,
+matches each clause against a small set of rules (system upgrade, packages,
+services, users, firewall)
+and records which words it understood. The share of understood words is the
+confidence; anything it cannot place, such as "configure nginx with ssl",
+lowers the confidence so the caller can fall back to the LLM. Package and
+service names outside a known list cap the confidence as well, so a request
+like "disable selinux" is not mistaken for a service operation.
+
+An optional classifier, any callable returning the probability that a
+request is a simple one, can further scale the confidence.
+"""
+import re
+import logging
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("ansible_llm")
+
+# Confidence at which LinuxProcessor builds the playbook without the LLM
+DEFAULT_MIN_CONFIDENCE = 0.85
+
+PACKAGE_VERBS = {
+    'install': 'present', 'add': 'present', 'remove': 'absent', 'uninstall': 'absent',
+    'purge': 'absent', 'delete': 'absent', 'upgrade': 'latest', 'update': 'latest',
+}
+# Verbs that mean something else for most objects ("delete the logs", "update the cache");
+# they only manage packages when the clause says "package(s)"
+PACKAGE_NOUN_VERBS = {'purge', 'delete', 'update'}
+# Service verb: (state, enabled); None leaves the setting as it is
+SERVICE_VERBS = {
+    'start': ('started', None), 'stop': ('stopped', None), 'restart': ('restarted', None),
+    'reload': ('reloaded', None), 'enable': (None, True), 'disable': (None, False),
+}
+SERVICE_STATES = {'running': ('started', None), 'started': ('started', None), 'stopped': ('stopped', None),
+                  'enabled': (None, True), 'disabled': (None, False)}
+FIREWALL_SERVICES = {'ssh', 'http', 'https'}
+
+# Names the rules accept at full confidence; any other name caps the confidence at
+# UNKNOWN_NAME_CONFIDENCE, so "disable selinux" is left to the LLM
+KNOWN_PACKAGES = {
+    'nginx', 'apache2', 'httpd', 'git', 'curl', 'wget', 'vim', 'nano', 'htop', 'tmux', 'screen', 'tree',
+    'unzip', 'zip', 'tar', 'rsync', 'jq', 'make', 'gcc', 'build-essential', 'telnet', 'net-tools',
+    'python3', 'python3-pip', 'nodejs', 'npm', 'php', 'php-fpm', 'docker', 'docker.io', 'docker-ce',
+    'mysql-server', 'mariadb-server', 'postgresql', 'redis', 'redis-server', 'memcached', 'haproxy',
+    'openssh-server', 'openssh-client', 'ufw', 'firewalld', 'fail2ban', 'chrony', 'ntp', 'certbot',
+    'tomcat', 'default-jdk', 'java-17-openjdk', 'sudo', 'cron', 'cronie', 'rsyslog', 'logrotate',
+}
+KNOWN_SERVICES = {
+    'nginx', 'apache2', 'httpd', 'ssh', 'sshd', 'docker', 'containerd', 'mysql', 'mysqld', 'mariadb',
+    'postgresql', 'redis', 'redis-server', 'memcached', 'haproxy', 'ufw', 'firewalld', 'fail2ban',
+    'chrony', 'chronyd', 'ntp', 'ntpd', 'cron', 'crond', 'rsyslog', 'php-fpm', 'tomcat', 'postfix',
+    'named', 'bind9', 'nfs-server', 'smb', 'snmpd', 'auditd', 'kubelet', 'jenkins', 'mongod',
+}
+UNKNOWN_NAME_CONFIDENCE = 0.5
+
+VERBS = set(PACKAGE_VERBS) | set(SERVICE_VERBS) | {'create', 'open', 'allow', 'ensure', 'make'}
+# Verbs no rule handles; they still start a clause so it is not read as part of a package list
+OTHER_VERBS = {'configure', 'set', 'setup', 'copy', 'mount', 'edit', 'change', 'write', 'schedule',
+               'run', 'harden', 'download', 'clone', 'generate', 'reboot', 'block', 'deny', 'close'}
+
+# Words that carry no meaning of their own in a request
+STOPWORDS = {'please', 'the', 'a', 'an', 'and', 'then', 'also', 'to', 'on', 'all', 'my', 'our', 'it', 'its'}
+
+# Words that never name a package, so "install nginx with ssl" is not taken as three packages
+NOT_PACKAGES = VERBS | STOPWORDS | {
+    'configure', 'setup', 'with', 'without', 'using', 'for', 'from', 'in', 'of', 'version', 'latest',
+    'service', 'user', 'port', 'ports', 'firewall', 'config', 'configuration', 'file', 'files', 'if',
+    'system', 'systems', 'everything', 'package', 'packages', 'os', 'server', 'servers', 'machine', 'host',
+    'installed', 'software', 'updates', 'upgrades',
+}
+
+_NAME = r"[a-z0-9][a-z0-9+._@-]*"
+_LIST = rf"{_NAME}(?:\s*(?:,|\band\b|&)\s*{_NAME})*"
+_PACKAGE_NAME = re.compile(rf"^{_NAME}$")
+_LIST_SEPARATOR = re.compile(r"\s*(?:,|\band\b|&)\s*")
+# A port with its own protocol, as in "443/udp"
+_PORT = r"\d+(?:/(?:tcp|udp))?"
+_HOST_NOUNS = r"(?:servers?|hosts?|machines?|nodes?|boxes|systems?|vms?)"
+
+CLAUSE_RULES = [
+    ('system_upgrade', re.compile(r"^(?:update|upgrade)\s+(?:all\s+)?(?:the\s+|my\s+|our\s+)?"
+                                  r"(?:(?:installed|system|os|server|servers?)\s+)?"
+                                  r"(?:everything|system|os|server|servers|machines?|hosts?|all|packages|software)$")),
+    ('packages', re.compile(rf"^(?P<verb>{'|'.join(PACKAGE_VERBS)})\s+(?:the\s+)?(?P<noun>packages?\s+)?"
+                            rf"(?P<names>{_LIST})(?P<suffix>\s+packages?)?$")),
+    ('service', re.compile(rf"^(?P<verb>{'|'.join(SERVICE_VERBS)})\s+(?:and\s+(?P<also>enable|start)\s+)?"
+                           rf"(?:the\s+)?(?P<names>{_LIST})(?:\s+services?)?(?:\s+on\s+boot)?$")),
+    ('service_state', re.compile(rf"^(?:ensure|make\s+sure)\s+(?:that\s+)?(?:the\s+)?(?P<names>{_LIST})"
+                                 rf"(?:\s+services?)?\s+(?:is|are)\s+(?P<state>{'|'.join(SERVICE_STATES)})$")),
+    ('user', re.compile(rf"^(?P<verb>create|add|remove|delete)\s+(?:a\s+|the\s+)?(?:new\s+)?users?\s+"
+                        rf"(?P<names>{_LIST})(?:\s+(?:in|to|with)\s+(?:the\s+)?groups?\s+(?P<groups>{_LIST}))?$")),
+    ('firewall_port', re.compile(rf"^(?:open|allow)\s+(?:(?P<proto1>tcp|udp)\s+)?(?:traffic\s+on\s+)?ports?\s+"
+                                 rf"(?P<ports>{_PORT}(?:\s*(?:,|\band\b|&)\s*{_PORT})*)"
+                                 r"(?:\s+(?P<proto2>tcp|udp))?$")),
+    ('firewall_service', re.compile(rf"^(?:open|allow)\s+(?P<names>{'|'.join(sorted(FIREWALL_SERVICES))})"
+                                    r"(?:\s+traffic)?$")),
+]
+
+_FIREWALL_SUFFIX = re.compile(r"\s+(?:in|on|through)\s+(?:the\s+)?firewall\b")
+_CLAUSE_SPLIT = re.compile(rf"\s*(?:[,;.]|\band\b|\bthen\b|\balso\b)(?:\s*(?:\band\b|\bthen\b|\balso\b))*\s*"
+                           rf"(?=(?:{'|'.join(sorted(VERBS | OTHER_VERBS))})\b)")
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9+._@/-]+", text)
+
+
+def _content_words(text: str) -> int:
+    return sum(1 for word in _words(text) if word not in STOPWORDS)
+
+
+def _split_list(text: str) -> List[str]:
+    return [item for item in _LIST_SEPARATOR.split(text.strip()) if item]
+
+
+def describe_intent(intent: Dict) -> str:
+    """Summarise a parsed intent as the explanation of the generated playbook."""
+    parts = ['Upgrade all installed packages'] if intent.get('system_upgrade') else []
+    for group in intent['packages']:
+        verb = {'present': 'Install', 'absent': 'Remove', 'latest': 'Upgrade'}[group['state']]
+        parts.append(f"{verb} {', '.join(group['names'])}")
+    for user in intent['users']:
+        groups = f" in groups {', '.join(user['groups'])}" if user.get('groups') else ''
+        parts.append(f"{'Create' if user['state'] == 'present' else 'Remove'} user {user['username']}{groups}")
+    for service in intent['services']:
+        settings = [service['state']] if service.get('state') else []
+        if service.get('enabled') is not None:
+            settings.append('enabled on boot' if service['enabled'] else 'disabled on boot')
+        parts.append(f"Make service {service['service_name']} {' and '.join(settings)}")
+    for rule in intent['firewall_rules']:
+        target = rule.get('service_name') or f"port {rule['port']}/{rule['protocol']}"
+        parts.append(f"Allow {target} in the firewall")
+    target = intent['distribution'] or 'any supported distribution'
+    return f"{'; '.join(parts)} on {intent['hosts']} ({target})."
+
+
+class IntentParser:
+    """
+    Rule-based parser for package, service, user and firewall requests.
+
+    Args:
+        distributions: Distribution names recognised in "on <distribution>"
+        classifier: Optional callable returning the probability (0-1) that a
+            request is a simple one; the rule confidence is multiplied by it
+        known_names: Package and service names accepted at full confidence,
+            besides KNOWN_PACKAGES and KNOWN_SERVICES
+    """
+
+    def __init__(self, distributions: Iterable[str] = (),
+                 classifier: Optional[Callable[[str], float]] = None,
+                 known_names: Iterable[str] = ()):
+        self.classifier = classifier
+        self.known_packages = KNOWN_PACKAGES | set(known_names)
+        self.known_services = KNOWN_SERVICES | set(known_names)
+        names = sorted({d.lower() for d in distributions}, key=len, reverse=True)
+        distro = '|'.join(re.escape(name) for name in names) or r'(?!x)x'
+        self._target = re.compile(
+            rf"\s*\b(?:on|for|across)\s+(?:all\s+)?(?:the\s+|my\s+|our\s+)?"
+            rf"(?:(?P<distro>{distro})(?:\s+[\d.]+)?(?:\s+{_HOST_NOUNS})?"
+            rf"|(?:hosts?|group)\s+(?P<pattern>[a-z0-9_.*:-]+)"
+            rf"|(?P<group>[a-z0-9_-]+\s+)?{_HOST_NOUNS})(?=\s|$|[,;.])"
+        )
+
+    def _apply(self, kind: str, match, intent: Dict) -> bool:
+        """Add a matched clause to the intent; False if its values are not plausible."""
+        names = _split_list(match.groupdict().get('names') or '')
+        if kind in ('packages', 'service', 'service_state', 'user'):
+            if not names or any(name in NOT_PACKAGES or not _PACKAGE_NAME.match(name) for name in names):
+                return False
+
+        if kind == 'system_upgrade':
+            intent['system_upgrade'] = True
+        elif kind == 'packages':
+            verb = match.group('verb')
+            if verb in PACKAGE_NOUN_VERBS and not (match.group('noun') or match.group('suffix')):
+                return False
+            intent['unknown_names'].extend(name for name in names if name not in self.known_packages)
+            intent['packages'].append({'names': names, 'state': PACKAGE_VERBS[verb]})
+        elif kind in ('service', 'service_state'):
+            if kind == 'service':
+                state, enabled = SERVICE_VERBS[match.group('verb')]
+                if match.group('also'):
+                    also_state, also_enabled = SERVICE_VERBS[match.group('also')]
+                    state, enabled = state or also_state, enabled if enabled is not None else also_enabled
+            else:
+                state, enabled = SERVICE_STATES[match.group('state')]
+            intent['unknown_names'].extend(name for name in names if name not in self.known_services)
+            for name in names:
+                intent['services'].append({'service_name': name, 'state': state, 'enabled': enabled})
+        elif kind == 'user':
+            state = 'present' if match.group('verb') in ('create', 'add') else 'absent'
+            groups = _split_list(match.group('groups') or '')
+            for name in names:
+                user = {'username': name, 'state': state}
+                if groups:
+                    user['groups'] = groups
+                intent['users'].append(user)
+        elif kind == 'firewall_port':
+            default = match.group('proto1') or match.group('proto2') or 'tcp'
+            rules = []
+            for item in _split_list(match.group('ports')):
+                port, _, protocol = item.partition('/')
+                if not 0 < int(port) < 65536:
+                    return False
+                rules.append({'port': int(port), 'protocol': protocol or default})
+            intent['firewall_rules'].extend(rules)
+        elif kind == 'firewall_service':
+            intent['firewall_rules'].append({'service_name': names[0]})
+        return True
+
+    def parse(self, request: str) -> Dict:
+        """
+        Parse a request into generator arguments.
+
+        Args:
+            request: Natural language request
+
+        Returns:
+            dict: ``system_upgrade`` (upgrade all installed packages),
+            ``packages`` (list of {names, state}), ``services``,
+            ``users`` and ``firewall_rules`` (keyword arguments for TaskPlan),
+            ``distribution``, ``hosts``, ``unparsed`` clauses,
+            ``unknown_names`` (package and service names that are not known)
+            and ``confidence`` between 0 and 1
+        """
+        text = re.sub(r"\s+", " ", request.lower()).strip().rstrip('.!')
+        intent = {'request': request.strip(), 'system_upgrade': False, 'packages': [], 'services': [], 'users': [], 'firewall_rules': [],
+                  'distribution': None, 'hosts': 'all', 'unparsed': [], 'unknown_names': [],
+                  'confidence': 0.0}
+        understood = 0
+
+        target = self._target.search(text)
+        if target:
+            if target.group('distro'):
+                intent['distribution'] = target.group('distro')
+            elif target.group('pattern'):
+                intent['hosts'] = target.group('pattern')
+            elif target.group('group'):
+                intent['hosts'] = target.group('group').strip()
+            understood += _content_words(target.group())
+            text = (text[:target.start()] + text[target.end():]).strip()
+
+        firewall_words = 0
+        for suffix in _FIREWALL_SUFFIX.finditer(text):
+            firewall_words += _content_words(suffix.group())
+        text = _FIREWALL_SUFFIX.sub('', text)
+
+        clauses = []
+        for clause in _CLAUSE_SPLIT.split(text):
+            clause = clause.strip(' ,;')
+            # "start and enable nginx" was split at its second verb
+            if clauses and clauses[-1] in SERVICE_VERBS:
+                clause = f"{clauses.pop()} and {clause}"
+            if clause:
+                clauses.append(clause)
+
+        for clause in clauses:
+            for kind, pattern in CLAUSE_RULES:
+                match = pattern.match(clause)
+                if match and self._apply(kind, match, intent):
+                    understood += _content_words(clause)
+                    break
+            else:
+                intent['unparsed'].append(clause)
+
+        if intent['firewall_rules']:
+            understood += firewall_words
+        unknown = sum(_content_words(clause) for clause in intent['unparsed'])
+        if not intent['firewall_rules']:
+            unknown += firewall_words
+
+        actions = intent['system_upgrade'] or intent['packages'] or intent['services'] or intent['users'] or intent['firewall_rules']
+        if actions and understood:
+            confidence = understood / (understood + unknown)
+            if intent['unknown_names']:
+                confidence = min(confidence, UNKNOWN_NAME_CONFIDENCE)
+            if self.classifier is not None:
+                confidence *= max(0.0, min(1.0, float(self.classifier(request))))
+            intent['confidence'] = round(confidence, 3)
+        logger.debug(f"Parsed intent with confidence {intent['confidence']}: {intent}")
+        return intent
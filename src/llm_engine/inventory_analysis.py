@@ -0,0 +1,630 @@
+"""
+Streaming analysis of large Ansible inventories.
+
+Inventories are read incrementally (INI line by line, YAML and JSON as parser
+events) into a compact index: every host gets an integer id, group membership
+is stored as an integer bitset per group, and variables are reduced to key
+frequency tables plus value counts for a few connection settings. Host
+variable values are never kept, so memory stays small as inventories grow.
+
+Composition statistics are computed deterministically from the index and
+rendered into a summary that fits a token budget, which is all the LLM sees.
+"""
+import os
+import re
+import shlex
+import logging
+from array import array
+from collections import Counter
+from itertools import product
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+logger = logging.getLogger("ansible_llm")
+
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Variables whose values are summarised, not only counted
+TRACKED_VALUE_KEYS = (
+    "ansible_connection",
+    "ansible_user",
+    "ansible_port",
+    "ansible_become",
+    "ansible_python_interpreter",
+    "ansible_shell_type",
+)
+
+# Bound on distinct entries kept in open-ended frequency tables
+MAX_DISTINCT_VALUES = 1000
+
+IMPLICIT_GROUPS = ("all", "ungrouped")
+
+_RANGE_PATTERN = re.compile(r"\[([0-9a-zA-Z]+):([0-9a-zA-Z]+)(?::(\d+))?\]")
+_DIGITS_PATTERN = re.compile(r"\d+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a text (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+class _BoundedCounter(Counter):
+    """Counter that folds new keys into "(other)" once it holds too many."""
+
+    def add(self, key, amount=1):
+        if key in self or len(self) < MAX_DISTINCT_VALUES:
+            self[key] += amount
+        else:
+            self["(other)"] += amount
+
+
+class InventoryIndex:
+    """
+    Compact indexed model of an inventory.
+
+    Attributes:
+        host_ids: Host name to integer id
+        group_members: Group name to bitset (bytearray, bit n = host id n) of
+            directly assigned hosts
+        group_children: Group name to set of child group names
+        group_var_keys: Group name to sorted tuple of variable keys
+        host_var_keys: Variable key to number of host definitions setting it
+    """
+
+    def __init__(self):
+        self.host_ids = {}
+        self.group_members = {}
+        self.group_children = {}
+        self.group_var_keys = {}
+        self.host_var_keys = Counter()
+        self.tracked_values = {key: _BoundedCounter() for key in TRACKED_VALUE_KEYS}
+        self.name_patterns = _BoundedCounter()
+        self.domains = _BoundedCounter()
+        self.hosts_with_address = 0
+        self.duplicate_definitions = 0
+        # Number of explicit groups per host id
+        self._group_counts = array("H")
+
+    def _host_id(self, name: str) -> int:
+        host_id = self.host_ids.get(name)
+        if host_id is None:
+            host_id = len(self.host_ids)
+            self.host_ids[name] = host_id
+            self._group_counts.append(0)
+            self.name_patterns.add(_DIGITS_PATTERN.sub("#", name))
+            if "." in name and not name.replace(".", "").isdigit():
+                self.domains.add(name.split(".", 1)[1])
+        return host_id
+
+    def add_group(self, group: str):
+        """Register a group, even if it ends up empty."""
+        if group not in self.group_members:
+            self.group_members[group] = bytearray()
+            self.group_children[group] = set()
+
+    def add_host(self, name: str, group: Optional[str] = None, variables: Optional[Dict] = None):
+        """
+        Record a host, optionally as a member of a group and with variables.
+
+        Args:
+            name: Host name
+            group: Group the host is listed under, if any
+            variables: Host variables from this definition, if any
+        """
+        host_id = self._host_id(name)
+
+        if group and group not in IMPLICIT_GROUPS:
+            self.add_group(group)
+            bits = self.group_members[group]
+            byte, mask = host_id >> 3, 1 << (host_id & 7)
+            if len(bits) <= byte:
+                bits.extend(bytes(byte - len(bits) + 1))
+            if bits[byte] & mask:
+                self.duplicate_definitions += 1
+            else:
+                bits[byte] |= mask
+                if self._group_counts[host_id] < 0xFFFF:
+                    self._group_counts[host_id] += 1
+        elif group:
+            self.add_group(group)
+
+        if variables:
+            self.add_host_vars(name, variables)
+
+    def add_host_vars(self, name: str, variables: Dict):
+        """Count the variable keys (and tracked values) of one host definition."""
+        self._host_id(name)
+        if not isinstance(variables, dict):
+            return
+        for key, value in variables.items():
+            self.host_var_keys[key] += 1
+            if key == "ansible_host":
+                self.hosts_with_address += 1
+            elif key in self.tracked_values:
+                self.tracked_values[key].add(str(value))
+
+    def add_child(self, parent: str, child: str):
+        """Record that a group is a child of another group."""
+        self.add_group(parent)
+        self.add_group(child)
+        self.group_children[parent].add(child)
+
+    def add_group_vars(self, group: str, variables: Dict):
+        """Record the variable keys defined for a group."""
+        self.add_group(group)
+        if not isinstance(variables, dict):
+            return
+        keys = set(self.group_var_keys.get(group, ())) | set(variables)
+        self.group_var_keys[group] = tuple(sorted(keys))
+        for key in TRACKED_VALUE_KEYS:
+            if key in variables:
+                self.tracked_values[key].add(str(variables[key]))
+
+    def effective_members(self) -> Dict[str, int]:
+        """
+        Compute each group's members including those of its descendants.
+
+        Returns:
+            dict: Group name to bitset of host ids as an int
+        """
+        resolved = {}
+
+        def resolve(group, visiting):
+            if group in resolved:
+                return resolved[group]
+            if group in visiting:
+                logger.warning(f"Inventory group cycle detected at {group}")
+                return 0
+            visiting.add(group)
+            members = int.from_bytes(self.group_members.get(group, b""), "little")
+            for child in self.group_children.get(group, ()):
+                members |= resolve(child, visiting)
+            visiting.discard(group)
+            resolved[group] = members
+            return members
+
+        for group in sorted(self.group_members):
+            resolve(group, set())
+        return resolved
+
+    def _depth(self) -> int:
+        """Return the longest parent-to-child chain length."""
+        depths = {}
+
+        def depth(group, visiting):
+            if group in depths:
+                return depths[group]
+            if group in visiting:
+                return 0
+            visiting.add(group)
+            children = [c for c in self.group_children.get(group, ()) if c not in IMPLICIT_GROUPS]
+            result = 1 + max((depth(c, visiting) for c in children), default=0)
+            visiting.discard(group)
+            depths[group] = result
+            return result
+
+        explicit = [g for g in self.group_members if g not in IMPLICIT_GROUPS]
+        return max((depth(g, set()) for g in explicit), default=0)
+
+    def statistics(self, top: int = 10) -> Dict:
+        """
+        Compute composition statistics.
+
+        Results only depend on the inventory content, and every list is sorted
+        by count (descending) and then by name.
+
+        Args:
+            top: Number of entries to keep in ranked lists
+
+        Returns:
+            dict: Inventory statistics
+        """
+        host_count = len(self.host_ids)
+        effective = self.effective_members()
+        explicit_groups = sorted(g for g in self.group_members if g not in IMPLICIT_GROUPS)
+        sizes = {g: bin(effective[g]).count("1") for g in explicit_groups}
+        size_values = sorted(sizes.values())
+
+        membership = Counter(self._group_counts)
+        child_groups = {
+            child for parent, children in self.group_children.items()
+            if parent not in IMPLICIT_GROUPS for child in children
+        }
+        top_level = sorted(g for g in explicit_groups if g not in child_groups)
+
+        def ranked(counter, limit=top):
+            items = sorted(counter.items(), key=lambda item: (-item[1], str(item[0])))
+            return items[:limit]
+
+        return {
+            "hosts": host_count,
+            "groups": len(explicit_groups),
+            "empty_groups": sorted(g for g in explicit_groups if sizes[g] == 0),
+            "top_level_groups": [(g, sizes[g]) for g in top_level],
+            "max_depth": self._depth(),
+            "group_size": {
+                "min": size_values[0] if size_values else 0,
+                "median": size_values[len(size_values) // 2] if size_values else 0,
+                "max": size_values[-1] if size_values else 0,
+            },
+            "largest_groups": ranked(sizes),
+            "membership": {
+                "ungrouped": membership.get(0, 0),
+                "single_group": membership.get(1, 0),
+                "multiple_groups": sum(n for count, n in membership.items() if count > 1),
+                "max_groups_per_host": max(membership) if membership else 0,
+            },
+            "duplicate_definitions": self.duplicate_definitions,
+            "hosts_with_address": self.hosts_with_address,
+            "host_var_keys": ranked(self.host_var_keys, top * 2),
+            "group_var_keys": sorted(
+                ((g, list(keys)) for g, keys in self.group_var_keys.items()),
+                key=lambda item: (-len(item[1]), item[0])
+            )[:top],
+            "connection_settings": {
+                key: ranked(values, 5) for key, values in self.tracked_values.items() if values
+            },
+            "name_patterns": ranked(self.name_patterns),
+            "domains": ranked(self.domains, 5),
+        }
+
+
+def summarize_statistics(stats: Dict, token_budget: int = 1024) -> str:
+    """
+    Render inventory statistics as text that fits a token budget.
+
+    Sections are added in priority order and long lists are shortened first,
+    so the most important facts survive tight budgets.
+
+    Args:
+        stats: Output of InventoryIndex.statistics
+        token_budget: Maximum estimated tokens for the summary
+
+    Returns:
+        str: The summary text
+    """
+    hosts = stats["hosts"] or 1
+
+    def pct(count):
+        return f"{count * 100 / hosts:.0f}%"
+
+    def listing(items, fmt):
+        return [fmt(*item) for item in items]
+
+    sections = [
+        ("", [
+            f"Inventory: {stats['hosts']} hosts in {stats['groups']} groups, "
+            f"maximum group nesting depth {stats['max_depth']}",
+            f"Group size (including child groups): min {stats['group_size']['min']}, "
+            f"median {stats['group_size']['median']}, max {stats['group_size']['max']}",
+            f"Hosts in no group: {stats['membership']['ungrouped']}, "
+            f"in one group: {stats['membership']['single_group']}, "
+            f"in several groups: {stats['membership']['multiple_groups']} "
+            f"(up to {stats['membership']['max_groups_per_host']})",
+            f"Hosts with ansible_host set: {stats['hosts_with_address']} ({pct(stats['hosts_with_address'])}); "
+            f"duplicate host definitions in the same group: {stats['duplicate_definitions']}",
+        ]),
+        ("Top-level groups", listing(stats["top_level_groups"], lambda g, n: f"{g}: {n} hosts")),
+        ("Largest groups", listing(stats["largest_groups"], lambda g, n: f"{g}: {n} hosts")),
+        ("Empty groups", list(stats["empty_groups"])),
+        ("Host variable keys (host definitions setting them)",
+         listing(stats["host_var_keys"], lambda k, n: f"{k}: {n} ({pct(n)})")),
+        ("Connection settings", [
+            f"{key}: " + ", ".join(f"{value} ({n})" for value, n in values)
+            for key, values in sorted(stats["connection_settings"].items())
+        ]),
+        ("Group variable keys", listing(stats["group_var_keys"], lambda g, keys: f"{g}: {', '.join(keys)}")),
+        ("Host naming patterns (digits shown as #)",
+         listing(stats["name_patterns"], lambda p, n: f"{p}: {n}")),
+        ("Domains", listing(stats["domains"], lambda d, n: f"{d}: {n}")),
+    ]
+
+    # Room kept for the "... and N more" note of a truncated list
+    note_reserve = 8
+
+    lines = []
+    for title, items in sections:
+        if not items:
+            continue
+        section_lines = [f"{title}:"] if title else []
+        prefix = "- " if title else ""
+
+        added = 0
+        for item in items:
+            trial = lines + section_lines + [prefix + item]
+            if estimate_tokens("\n".join(trial)) + note_reserve > token_budget:
+                break
+            section_lines.append(prefix + item)
+            added += 1
+
+        if added == 0:
+            break
+        lines.extend(section_lines)
+        if added < len(items):
+            # Budget exhausted; later sections are lower priority
+            lines.append(f"- ... and {len(items) - added} more")
+            break
+
+    return "\n".join(lines)
+
+
+def detect_inventory_format(path: str) -> str:
+    """
+    Guess the inventory format from the file extension or content.
+
+    Args:
+        path: Inventory file path
+
+    Returns:
+        str: "ini", "yaml" or "json"
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".yml", ".yaml"):
+        return "yaml"
+    if extension == ".json":
+        return "json"
+    if extension in (".ini", ".cfg"):
+        return "ini"
+
+    with open(path, "r") as f:
+        for line in f:
+            stripped = line.strip()
+            if not stripped or stripped.startswith(("#", ";")):
+                continue
+            if stripped.startswith("{"):
+                return "json"
+            if stripped.startswith("[") or "=" in stripped:
+                return "ini"
+            if stripped.endswith(":") or stripped == "---":
+                return "yaml"
+            return "ini"
+    return "ini"
+
+
+def expand_host_pattern(pattern: str) -> Iterator[str]:
+    """
+    Expand INI host range patterns such as ``web[01:20].example.com``.
+
+    Args:
+        pattern: Host name, possibly with one or more ranges
+
+    Returns:
+        Iterator of host names
+    """
+    ranges = list(_RANGE_PATTERN.finditer(pattern))
+    if not ranges:
+        yield pattern
+        return
+
+    choices = []
+    for match in ranges:
+        start, end, step = match.group(1), match.group(2), int(match.group(3) or 1)
+        if start.isdigit() and end.isdigit():
+            width = len(start) if start.startswith("0") else 0
+            choices.append([str(i).zfill(width) for i in range(int(start), int(end) + 1, step)])
+        else:
+            choices.append([chr(c) for c in range(ord(start), ord(end) + 1, step)])
+
+    pieces = _RANGE_PATTERN.split(pattern)[::4]
+    for combination in product(*choices):
+        name = pieces[0]
+        for value, piece in zip(combination, pieces[1:]):
+            name += value + piece
+        yield name
+
+
+def _parse_ini_variables(tokens: List[str]) -> Dict:
+    """Parse ``key=value`` tokens into a dict."""
+    variables = {}
+    for token in tokens:
+        if "=" in token:
+            key, value = token.split("=", 1)
+            variables[key] = value
+    return variables
+
+
+def read_ini_inventory(path: str, index: InventoryIndex):
+    """Stream an INI inventory into the index line by line."""
+    section, kind = "ungrouped", "hosts"
+
+    with open(path, "r") as f:
+        for line_number, line in enumerate(f, 1):
+            stripped = line.strip()
+            if not stripped or stripped.startswith(("#", ";")):
+                continue
+
+            if stripped.startswith("[") and stripped.endswith("]"):
+                header = stripped[1:-1]
+                section, _, kind = header.partition(":")
+                kind = kind or "hosts"
+                index.add_group(section)
+                continue
+
+            try:
+                tokens = shlex.split(stripped, comments=True)
+            except ValueError as e:
+                logger.warning(f"{path}:{line_number}: cannot parse line: {e}")
+                continue
+            if not tokens:
+                continue
+
+            if kind == "children":
+                index.add_child(section, tokens[0])
+            elif kind == "vars":
+                index.add_group_vars(section, _parse_ini_variables(tokens))
+            else:
+                variables = _parse_ini_variables(tokens[1:])
+                for host in expand_host_pattern(tokens[0]):
+                    index.add_host(host, section, variables)
+
+
+class _EventReader:
+    """Pull-style access to YAML parser events."""
+
+    def __init__(self, events):
+        self._events = events
+        self._peeked = None
+
+    def peek(self):
+        if self._peeked is None:
+            self._peeked = next(self._events, None)
+        return self._peeked
+
+    def next(self):
+        event = self.peek()
+        self._peeked = None
+        return event
+
+    def skip_node(self):
+        """Consume one complete node."""
+        depth = 0
+        while True:
+            event = self.next()
+            if event is None:
+                return
+            if isinstance(event, (yaml.MappingStartEvent, yaml.SequenceStartEvent)):
+                depth += 1
+            elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+                depth -= 1
+            if depth == 0:
+                return
+
+    def read_node(self):
+        """Build one (small) node as plain Python data; scalars stay strings."""
+        event = self.next()
+        if isinstance(event, yaml.ScalarEvent):
+            if event.value in ("", "~", "null") and event.implicit[0]:
+                return None
+            return event.value
+        if isinstance(event, yaml.MappingStartEvent):
+            result = {}
+            while not isinstance(self.peek(), yaml.MappingEndEvent):
+                key = self.read_node()
+                result[str(key)] = self.read_node()
+            self.next()
+            return result
+        if isinstance(event, yaml.SequenceStartEvent):
+            result = []
+            while not isinstance(self.peek(), yaml.SequenceEndEvent):
+                result.append(self.read_node())
+            self.next()
+            return result
+        return None
+
+    def iter_mapping(self) -> Iterator[str]:
+        """
+        Yield the keys of a mapping; the caller must consume each value.
+
+        Null or scalar nodes are treated as an empty mapping.
+        """
+        event = self.next()
+        if not isinstance(event, yaml.MappingStartEvent):
+            return
+        while not isinstance(self.peek(), yaml.MappingEndEvent):
+            yield str(self.read_node())
+        self.next()
+
+
+def _read_group(reader: _EventReader, group: str, index: InventoryIndex):
+    """Read a group body (hosts, children, vars) from YAML or JSON events."""
+    index.add_group(group)
+    for key in reader.iter_mapping():
+        event = reader.peek()
+        if key == "hosts":
+            if isinstance(event, yaml.SequenceStartEvent):
+                for host in reader.read_node():
+                    index.add_host(str(host), group)
+            else:
+                for host in reader.iter_mapping():
+                    index.add_host(host, group, reader.read_node())
+        elif key == "children":
+            if isinstance(event, yaml.SequenceStartEvent):
+                for child in reader.read_node():
+                    index.add_child(group, str(child))
+            else:
+                for child in reader.iter_mapping():
+                    index.add_child(group, child)
+                    _read_group(reader, child, index)
+        elif key == "vars":
+            index.add_group_vars(group, reader.read_node())
+        else:
+            reader.skip_node()
+
+
+def read_structured_inventory(path: str, index: InventoryIndex):
+    """
+    Stream a YAML or JSON inventory into the index.
+
+    Handles both the YAML inventory layout and the JSON produced by
+    ``ansible-inventory --list`` (including ``_meta.hostvars``). JSON is
+    parsed with the YAML event parser, so neither format is ever fully loaded.
+    """
+    with open(path, "r") as f:
+        reader = _EventReader(yaml.parse(f, Loader=_YAML_LOADER))
+        while reader.peek() is not None and not isinstance(
+                reader.peek(), (yaml.MappingStartEvent, yaml.ScalarEvent, yaml.SequenceStartEvent)):
+            reader.next()
+        if not isinstance(reader.peek(), yaml.MappingStartEvent):
+            return
+
+        for key in reader.iter_mapping():
+            if key == "_meta":
+                for meta_key in reader.iter_mapping():
+                    if meta_key == "hostvars":
+                        for host in reader.iter_mapping():
+                            index.add_host_vars(host, reader.read_node())
+                    else:
+                        reader.skip_node()
+            else:
+                _read_group(reader, key, index)
+
+
+def build_inventory_index(path: str, inventory_format: Optional[str] = None) -> InventoryIndex:
+    """
+    Build the compact index for an inventory file or directory.
+
+    Args:
+        path: Inventory file, or a directory of inventory files
+        inventory_format: "ini", "yaml" or "json"; detected when None
+
+    Returns:
+        InventoryIndex: The populated index
+    """
+    index = InventoryIndex()
+
+    if os.path.isdir(path):
+        files = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if not name.startswith(".") and os.path.isfile(os.path.join(path, name))
+        )
+    else:
+        files = [path]
+
+    for file_path in files:
+        file_format = inventory_format or detect_inventory_format(file_path)
+        logger.info(f"Reading {file_format} inventory {file_path}")
+        if file_format == "ini":
+            read_ini_inventory(file_path, index)
+        else:
+            read_structured_inventory(file_path, index)
+
+    return index
+
+
+def analyze_inventory(path: str, token_budget: int = 1024, inventory_format: Optional[str] = None
+                      ) -> Tuple[Dict, str]:
+    """
+    Index an inventory and produce its statistics and LLM summary.
+
+    Args:
+        path: Inventory file or directory
+        token_budget: Maximum estimated tokens for the summary
+        inventory_format: Optional explicit format
+
+    Returns:
+        tuple: (statistics dict, summary text)
+    """
+    index = build_inventory_index(path, inventory_format)
+    stats = index.statistics()
+    return stats, summarize_statistics(stats, token_budget)
@@ -8,25 +8,148 @@ import os
 import re
 import yaml
 import logging
-from typing import Dict, List, Optional, Tuple, Union, Any
+from array import array
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Mapping, Optional, Tuple, Union, Any
+
+from src.llm_engine.fact_cache import (
+    DEFAULT_FACT_CACHE_DIR,
+    DEFAULT_FACT_CACHE_TTL,
+    GATHERED_FACTS_KEY,
+    load_fact_cache,
+    minimal_gather_subset,
+    required_facts,
+)
+from src.llm_engine.intent_parser import DEFAULT_MIN_CONFIDENCE, IntentParser, describe_intent
+from src.llm_engine.risk_scanner import scan_text
+from src.llm_engine.task_plan import TaskPlan
 
 # Get the logger
 logger = logging.getLogger(__name__)
 
+# Fenced playbook in an LLM response
+PLAYBOOK_BLOCK_PATTERN = re.compile(r"```(?:yaml|ansible)?\s*(---[\s\S]*?)```")
+
+# ansible_os_family of the hosts using each package manager
+PACKAGE_MANAGER_FAMILIES = {
+    'apt': 'Debian',
+    'yum': 'RedHat',
+    'dnf': 'RedHat',
+    'zypper': 'Suse',
+    'pacman': 'Archlinux',
+    'apk': 'Alpine',
+}
+
+# ansible_os_family of each LinuxProcessor.distro_package_managers key
+DISTRIBUTION_FAMILIES = {
+    'ubuntu': 'Debian',
+    'debian': 'Debian',
+    'centos': 'RedHat',
+    'redhat': 'RedHat',
+    'fedora': 'RedHat',
+    'suse': 'Suse',
+    'arch': 'Archlinux',
+    'alpine': 'Alpine',
+}
+
+# ansible_distribution values (lowercase) that contain none of the
+# distro_package_managers keys, with their package manager and os_family
+DISTRIBUTION_ALIASES = {
+    'archlinux': ('pacman', 'Archlinux'),
+    'rocky': ('dnf', 'RedHat'),
+    'almalinux': ('dnf', 'RedHat'),
+    'oraclelinux': ('dnf', 'RedHat'),
+    'amazon': ('yum', 'RedHat'),
+    'sles': ('zypper', 'Suse'),
+    'sles_sap': ('zypper', 'Suse'),
+    'linuxmint': ('apt', 'Debian'),
+    'pop!_os': ('apt', 'Debian'),
+    'kali': ('apt', 'Debian'),
+    # Same as 'redhat': yum exists on every RHEL release (an alias of dnf from 8 on), dnf only from 8
+    'rhel': ('yum', 'RedHat'),
+}
+
+class DistributionTable:
+    """
+    Columnar table of the distribution of many hosts.
+    
+    Each host is stored as an index into ``distributions``, the list of
+    distinct (distribution, os_family, package_manager) tuples, so a fleet of
+    thousands of hosts with a handful of distributions stays compact.
+    """
+    
+    def __init__(self):
+        self.hosts = []
+        self.distro_ids = array('H')
+        self.distributions = []
+        self._host_index = None
+    
+    def add(self, host: str, distro_id: int):
+        """Append a host with the id of its distribution."""
+        self.hosts.append(host)
+        self.distro_ids.append(distro_id)
+        self._host_index = None
+    
+    def __len__(self) -> int:
+        return len(self.hosts)
+    
+    def get(self, host: str) -> Optional[Dict]:
+        """
+        Look up one host.
+        
+        Args:
+            host: Inventory hostname
+            
+        Returns:
+            Dictionary with distribution, os_family and package_manager, or None
+        """
+        if self._host_index is None:
+            self._host_index = {name: row for row, name in enumerate(self.hosts)}
+        row = self._host_index.get(host)
+        if row is None:
+            return None
+        distribution, os_family, package_manager = self.distributions[self.distro_ids[row]]
+        return {'distribution': distribution, 'os_family': os_family, 'package_manager': package_manager}
+    
+    def hosts_by_distribution(self) -> Dict[Tuple[str, str, str], List[str]]:
+        """Group the hosts by their (distribution, os_family, package_manager)."""
+        groups = {}
+        for host, distro_id in zip(self.hosts, self.distro_ids):
+            groups.setdefault(self.distributions[distro_id], []).append(host)
+        return groups
+    
+    def to_dict(self) -> Dict:
+        """Return the table as JSON-serializable columns."""
+        return {
+            'hosts': list(self.hosts),
+            'distro_ids': list(self.distro_ids),
+            'distributions': [list(row) for row in self.distributions]
+        }
+
 class LinuxProcessor:
     """
     Processes Linux-specific requests and generates appropriate Ansible automation.
     Designed to integrate with the LLM engine.
     """
     
-    def __init__(self, model_interface=None):
+    def __init__(self, model_interface=None, intent_parser: Optional[IntentParser] = None,
+                 min_confidence: float = DEFAULT_MIN_CONFIDENCE, candidates: int = 1):
         """
         Initialize the Linux Processor.
         
         Args:
             model_interface: The LLM model interface to use for generating responses
+            intent_parser: Parser for requests answered without the LLM; defaults
+                to an IntentParser that knows the supported distributions
+            min_confidence: Parser confidence from which the LLM is skipped;
+                above 1 always uses the LLM
+            candidates: Number of LLM completions generated per request; the
+                first one containing a valid playbook is used
         """
         self.model_interface = model_interface
+        self.min_confidence = min_confidence
+        self.candidates = max(1, candidates)
         self.distro_package_managers = {
             'ubuntu': 'apt',
             'debian': 'apt',
@@ -37,6 +160,101 @@ class LinuxProcessor:
             'arch': 'pacman',
             'alpine': 'apk'
         }
+        # Package manager whose tasks apply to each ansible_os_family
+        self.family_package_managers = {
+            'Debian': 'apt',
+            'RedHat': 'dnf',
+            'Suse': 'zypper',
+            'Archlinux': 'pacman',
+            'Alpine': 'apk'
+        }
+        self._build_distribution_index()
+        self.intent_parser = intent_parser or IntentParser(self.distribution_index)
+    
+    def _build_distribution_index(self):
+        """Precompute the exact-match lookup of (package manager, os_family) by distribution."""
+        self.distribution_index = {
+            key: (manager, DISTRIBUTION_FAMILIES.get(key, PACKAGE_MANAGER_FAMILIES.get(manager)))
+            for key, manager in self.distro_package_managers.items()
+        }
+        self.distribution_index.update(DISTRIBUTION_ALIASES)
+        self._resolved = {}
+    
+    def resolve_distribution(self,
+                             distribution: Optional[str],
+                             os_family: Optional[str] = None,
+                             pkg_mgr: Optional[str] = None) -> Tuple[str, str, str]:
+        """
+        Resolve a distribution, its os_family and package manager.
+        
+        A package manager reported in the facts wins. Otherwise the distribution
+        is looked up in a precomputed exact-match index, then by substring, and
+        finally the os_family's usual package manager is used. Results are
+        memoized, so a fleet costs one lookup per distinct fact combination.
+        
+        Args:
+            distribution: ansible_distribution
+            os_family: ansible_os_family, if gathered
+            pkg_mgr: ansible_pkg_mgr, if gathered
+            
+        Returns:
+            Tuple of (distribution_name, os_family, package_manager), using 'unknown'
+            for anything that cannot be determined
+        """
+        key = (distribution, os_family, pkg_mgr)
+        resolved = self._resolved.get(key)
+        if resolved is not None:
+            return resolved
+        
+        distro = (distribution or 'unknown').lower()
+        entry = self.distribution_index.get(distro)
+        if entry is None:
+            for name, manager in self.distro_package_managers.items():
+                if name in distro:
+                    entry = self.distribution_index[name]
+                    break
+        manager, family = entry or (None, None)
+        family = os_family or family
+        if pkg_mgr in PACKAGE_MANAGER_FAMILIES:
+            manager = pkg_mgr
+        if not manager and family:
+            manager = self.family_package_managers.get(family)
+        family = family or PACKAGE_MANAGER_FAMILIES.get(manager)
+        
+        resolved = (distro, family or 'unknown', manager or 'unknown')
+        self._resolved[key] = resolved
+        return resolved
+    
+    def detect_distributions(self,
+                             source: Union[str, Mapping],
+                             prefix: str = '',
+                             timeout: int = 0) -> DistributionTable:
+        """
+        Detect the distribution of every host in a fact cache.
+        
+        Args:
+            source: Directory of an Ansible jsonfile fact cache, or a mapping of
+                host to facts (such as the memory cache or hostvars)
+            prefix: File name prefix of the jsonfile cache
+            timeout: Seconds after which a jsonfile entry is stale, 0 for no expiry
+            
+        Returns:
+            DistributionTable of the hosts, in hostname order
+        """
+        table = DistributionTable()
+        ids = {}
+        host_facts = load_fact_cache(source, prefix=prefix, timeout=timeout)
+        for host in sorted(host_facts):
+            facts = host_facts[host]
+            resolved = self.resolve_distribution(facts.get('ansible_distribution'),
+                                                 facts.get('ansible_os_family'),
+                                                 facts.get('ansible_pkg_mgr'))
+            distro_id = ids.get(resolved)
+            if distro_id is None:
+                distro_id = ids[resolved] = len(table.distributions)
+                table.distributions.append(resolved)
+            table.add(host, distro_id)
+        return table
     
     def detect_linux_distribution(self, facts: Dict) -> Tuple[str, str]:
         """
@@ -50,15 +268,11 @@ class LinuxProcessor:
         """
         if not facts or 'ansible_distribution' not in facts:
             return 'unknown', 'unknown'
-            
-        distro = facts['ansible_distribution'].lower()
-        
-        # Find matching package manager
-        for key, manager in self.distro_package_managers.items():
-            if key in distro:
-                return distro, manager
-                
-        return distro, 'unknown'
+        
+        distro, _, manager = self.resolve_distribution(facts['ansible_distribution'],
+                                                       facts.get('ansible_os_family'),
+                                                       facts.get('ansible_pkg_mgr'))
+        return distro, manager
     
     def generate_package_tasks(self, 
                               packages: List[str], 
@@ -319,16 +533,312 @@ class LinuxProcessor:
         
         return tasks
     
-    def process_linux_request(self, user_request: str) -> Dict:
+    @staticmethod
+    def _family_condition(os_family: str) -> str:
+        """Return the ``when`` condition the task generators use for an os_family."""
+        return f'ansible_facts["os_family"] == "{os_family}"'
+    
+    @staticmethod
+    def _host_os_family(facts: Dict) -> Optional[str]:
+        """Read the os_family from gathered facts, with or without the ansible_ prefix."""
+        if not facts:
+            return None
+        facts = facts.get('ansible_facts', facts)
+        return facts.get('ansible_os_family') or facts.get('os_family')
+    
+    def group_hosts_by_family(self, host_facts: Dict[str, Dict]) -> Dict[str, List[str]]:
         """
-        Process a Linux-specific request using LLM and generate Ansible code.
+        Group hosts by the os_family in their gathered facts.
+        
+        Args:
+            host_facts: Gathered facts by inventory hostname
+            
+        Returns:
+            Dictionary of sorted hostnames by os_family; hosts without facts
+            are grouped under 'unknown'
+        """
+        groups = {}
+        for host, facts in host_facts.items():
+            groups.setdefault(self._host_os_family(facts) or 'unknown', []).append(host)
+        return {family: sorted(hosts) for family, hosts in sorted(groups.items())}
+    
+    def filter_tasks_for_family(self, tasks: List[Dict], os_family: str) -> List[Dict]:
+        """
+        Keep only the tasks that would run on hosts of one os_family.
+        
+        Tasks guarded for another family are dropped and the family guard is
+        removed from the rest, so the tasks no longer need gathered facts.
+        
+        Args:
+            tasks: Tasks from the generate_* methods
+            os_family: The ansible_os_family of the target hosts
+            
+        Returns:
+            List of Ansible tasks
+        """
+        condition = self._family_condition(os_family)
+        filtered = []
+        for task in tasks:
+            when = task.get('when')
+            if when is None:
+                filtered.append(task)
+            elif when == condition:
+                filtered.append({key: value for key, value in task.items() if key != 'when'})
+        return filtered
+    
+    def compile_family_plays(self,
+                             host_facts: Dict[str, Dict],
+                             packages: List[str] = None,
+                             package_state: str = 'present',
+                             services: List[Union[str, Dict]] = None,
+                             users: List[Union[str, Dict]] = None,
+                             firewall_rules: List[Dict] = None,
+                             name: str = 'Configure Linux hosts') -> List[Dict]:
+        """
+        Compile a request into one play per os_family of the target hosts.
+        
+        Each play targets the hosts of one family and contains only the tasks
+        for that family, without ``when`` guards and without fact gathering.
+        Hosts whose family is unknown get a play with every guarded task and
+        fact gathering enabled. The tasks are coalesced through a TaskPlan.
+        
+        Args:
+            host_facts: Gathered facts by inventory hostname
+            packages: Packages to manage
+            package_state: State of the packages (present, absent, latest)
+            services: Service names, or keyword arguments for generate_service_tasks
+            users: Usernames, or keyword arguments for generate_user_tasks
+            firewall_rules: Keyword arguments for generate_firewall_tasks, one dict per rule
+            name: Base name of the plays
+            
+        Returns:
+            List of Ansible plays
+            
+        Raises:
+            ValueError: If firewall rules are requested for hosts of a family
+                without ufw or firewalld
+        """
+        groups = self.group_hosts_by_family(host_facts)
+        if firewall_rules:
+            unsupported = {family: hosts for family, hosts in groups.items()
+                           if family not in ('Debian', 'RedHat', 'unknown')}
+            if unsupported:
+                raise ValueError("Firewall rules cannot be applied to hosts without ufw or firewalld: " +
+                                 "; ".join(f"{family} ({', '.join(hosts)})"
+                                           for family, hosts in sorted(unsupported.items())))
+        
+        def build_tasks(package_manager):
+            plan = TaskPlan(package_manager)
+            if packages:
+                plan.add_packages(packages, package_state)
+            for service in services or []:
+                plan.add_service(**(service if isinstance(service, dict) else {'service_name': service}))
+            for user in users or []:
+                plan.add_user(**(user if isinstance(user, dict) else {'username': user}))
+            for rule in firewall_rules or []:
+                plan.add_firewall_rule(**rule)
+            return plan.build()
+        
+        plays = []
+        for family, hosts in groups.items():
+            if family == 'unknown':
+                tasks = build_tasks(None)
+            else:
+                # Families without specific tasks get the generic package module
+                package_manager = self.family_package_managers.get(family, 'generic')
+                tasks = self.filter_tasks_for_family(build_tasks(package_manager), family)
+            plays.append({
+                'name': f'{name} ({family})',
+                'hosts': ','.join(hosts),
+                'gather_facts': family == 'unknown',
+                'tasks': tasks
+            })
+        return plays
+    
+    def build_intent_playbook(self, intent: Dict) -> Optional[List[Dict]]:
+        """
+        Build a playbook from a parsed intent with the task generators.
+        
+        With a known distribution the tasks are specialised to its family and
+        facts are not gathered; otherwise every family gets guarded tasks.
+        
+        Args:
+            intent: Result of IntentParser.parse
+            
+        Returns:
+            List with one Ansible play, or None if the intent cannot be
+            expressed for the distribution (such as firewall rules on a family
+            without ufw or firewalld)
+        """
+        family = None
+        package_manager = None
+        if intent.get('distribution'):
+            _, family, package_manager = self.resolve_distribution(intent['distribution'])
+            if family == 'unknown':
+                return None
+            if intent['firewall_rules'] and family not in ('Debian', 'RedHat'):
+                return None
+        
+        plan = TaskPlan(package_manager)
+        if intent.get('system_upgrade'):
+            plan.add_system_upgrade()
+        for group in intent['packages']:
+            plan.add_packages(group['names'], group['state'])
+        for service in intent['services']:
+            plan.add_service(**service)
+        for user in intent['users']:
+            plan.add_user(**user)
+        for rule in intent['firewall_rules']:
+            plan.add_firewall_rule(**rule)
+        tasks = plan.build()
+        if family:
+            tasks = self.filter_tasks_for_family(tasks, family)
+        
+        name = intent['request'].rstrip('.!') or 'Configure Linux hosts'
+        return [{
+            'name': name[0].upper() + name[1:],
+            'hosts': intent['hosts'],
+            'become': True,
+            'gather_facts': family is None,
+            'tasks': tasks
+        }]
+    
+    def generate_candidates(self, prompt: str, count: int):
+        """
+        Generate completions for a prompt, yielding each as soon as it is done.
+        
+        Interfaces with ``generate_batch`` (the inference daemon and local
+        generator) produce all candidates in one batched call with
+        ``num_return_sequences``. Other interfaces get ``count`` concurrent
+        ``generate`` calls; closing the generator cancels the calls that have
+        not started yet.
+        
+        Args:
+            prompt: Prompt to complete
+            count: Number of completions
+            
+        Yields:
+            Tuple of (response text, exception), one of them None
+        """
+        if count > 1 and hasattr(self.model_interface, 'generate_batch'):
+            try:
+                results = self.model_interface.generate_batch([prompt], num_return_sequences=count)
+            except Exception as e:
+                yield None, e
+                return
+            for result in results:
+                yield result['text'], None
+            return
+        
+        def generate():
+            response = self.model_interface.generate(prompt)
+            # Generator backends return completion dicts, plain interfaces return text
+            return response['text'] if isinstance(response, dict) else response
+        
+        if count == 1:
+            try:
+                yield generate(), None
+            except Exception as e:
+                yield None, e
+            return
+        
+        executor = ThreadPoolExecutor(max_workers=count)
+        try:
+            futures = [executor.submit(generate) for _ in range(count)]
+            for future in as_completed(futures):
+                try:
+                    yield future.result(), None
+                except Exception as e:
+                    yield None, e
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    @staticmethod
+    def parse_playbook_response(response: str) -> Dict:
+        """
+        Extract and parse the playbook from an LLM response.
+        
+        Args:
+            response: Text generated by the LLM
+            
+        Returns:
+            Dictionary with ``success`` and either the playbook, its YAML and
+            the explanation, or an ``error`` and the ``raw_response``
+        """
+        playbook_match = PLAYBOOK_BLOCK_PATTERN.search(response)
+        
+        if not playbook_match:
+            logger.warning("Could not extract valid Ansible playbook from LLM response.")
+            return {
+                "success": False,
+                "error": "Failed to generate valid Ansible playbook",
+                "raw_response": response
+            }
+        
+        playbook_yaml = playbook_match.group(1).strip()
+        
+        # Validate the YAML
+        try:
+            playbook = yaml.safe_load(playbook_yaml)
+        except Exception as e:
+            logger.warning(f"Generated YAML is invalid: {e}")
+            return {
+                "success": False,
+                "error": f"Generated YAML is invalid: {e}",
+                "raw_response": response
+            }
+        
+        # Extract explanation (everything before the first code block)
+        explanation = response.split("```")[0].strip()
+        
+        return {
+            "success": True,
+            "explanation": explanation,
+            "playbook": playbook,
+            "playbook_yaml": playbook_yaml,
+            "risks": scan_text(response)
+        }
+    
+    def process_linux_request(self, user_request: str, candidates: Optional[int] = None,
+                              fact_context: Optional[Dict] = None) -> Dict:
+        """
+        Process a Linux-specific request and generate Ansible code.
+        
+        Requests the intent parser understands with at least ``min_confidence``
+        are built directly from the task generators; everything else is sent
+        to the LLM. ``source`` in the result tells which path was taken.
+        
+        With several candidates the completions are generated in parallel and
+        validated as each one finishes; the first valid playbook is returned
+        and the remaining candidates are abandoned, instead of the caller
+        retrying failed generations one after another.
         
         Args:
             user_request: User's request for Linux automation
+            candidates: Number of LLM completions to generate; defaults to the
+                processor's ``candidates``
+            fact_context: Result of load_fact_context, describing the targets to the LLM
             
         Returns:
-            Dictionary with the generated automation code and explanation
+            Dictionary with the generated automation code and explanation;
+            LLM results include ``candidates_tried``
         """
+        intent = self.intent_parser.parse(user_request)
+        if intent['confidence'] >= self.min_confidence:
+            playbook = self.build_intent_playbook(intent)
+            if playbook:
+                playbook_yaml = '---\n' + yaml.safe_dump(playbook, default_flow_style=False, sort_keys=False)
+                return {
+                    "success": True,
+                    "explanation": describe_intent(intent),
+                    "playbook": playbook,
+                    "playbook_yaml": playbook_yaml,
+                    "risks": scan_text(playbook_yaml),
+                    "source": "rules",
+                    "confidence": intent['confidence']
+                }
+        logger.debug(f"Intent confidence {intent['confidence']} below {self.min_confidence}, using the LLM")
+        
         if not self.model_interface:
             logger.warning("No model interface provided. Cannot process request.")
             return {
@@ -336,97 +846,223 @@ class LinuxProcessor:
                 "error": "Model interface not available for Linux processing"
             }
         
+        target = ""
+        if fact_context and fact_context.get("hosts"):
+            target = f"""
+        Target distribution: {fact_context['linux_distribution']}
+        Available package manager: {fact_context['package_manager']}
+        Target environment: {fact_context['environment_details']}
+        """
+        
         # Generate prompt for the LLM
         prompt = f"""
         You are an expert in Linux system administration and Ansible automation.
         Please generate Ansible code for the following Linux automation request:
         
         REQUEST: {user_request}
-        
+        {target}
         Provide your response in the following format:
         1. A brief explanation of the task
         2. A complete Ansible playbook in YAML format
         """
         
-        # Get response from LLM
+        count = max(1, candidates or self.candidates)
+        result = None
+        tried = 0
+        responses = self.generate_candidates(prompt, count)
         try:
-            response = self.model_interface.generate(prompt)
+            for response, error in responses:
+                tried += 1
+                if error is not None:
+                    logger.error(f"Error processing Linux request: {error}")
+                    result = {
+                        "success": False,
+                        "error": f"Error processing request: {error}"
+                    }
+                    continue
+                result = self.parse_playbook_response(response)
+                if result["success"]:
+                    break
+        finally:
+            responses.close()
+        
+        if result is None:
+            result = {"success": False, "error": "The model returned no candidates"}
+        result["candidates_tried"] = tried
+        if result["success"]:
+            result.update({"source": "llm", "confidence": intent['confidence']})
+        return result
+    
+    def generate_fact_collection_play(self,
+                                      operations: List[str],
+                                      hosts: str = 'all',
+                                      cache_dir: str = DEFAULT_FACT_CACHE_DIR,
+                                      ttl: int = DEFAULT_FACT_CACHE_TTL,
+                                      name: str = 'Gather Linux system facts') -> List[Dict]:
+        """
+        Generate a play that collects only the facts some operations need.
+        
+        Full fact gathering is replaced by a ``setup`` call with the minimal
+        gather_subset and a filter on the needed facts. The facts are merged
+        into a jsonfile fact cache on the controller, whose entries list the
+        facts gathered so far under GATHERED_FACTS_KEY. Hosts whose entry is
+        younger than the TTL and already holds every needed fact are skipped
+        without connecting to gather again.
+        
+        Args:
+            operations: Keys of fact_cache.OPERATION_FACTS (packages, services,
+                users, firewall, system, hardware, network)
+            hosts: Host pattern of the play
+            cache_dir: Directory of the jsonfile fact cache
+            ttl: Seconds cached facts stay fresh, 0 to never refresh them
+            name: Name of the play
             
-            # Extract the playbook from the response
-            playbook_match = re.search(r"```(?:yaml|ansible)?\s*(---[\s\S]*?)```", response)
+        Returns:
+            List with one Ansible play
             
-            if not playbook_match:
-                logger.warning("Could not extract valid Ansible playbook from LLM response.")
-                return {
-                    "success": False,
-                    "error": "Failed to generate valid Ansible playbook",
-                    "raw_response": response
+        Raises:
+            ValueError: If an operation is unknown
+        """
+        facts = required_facts(operations)
+        cache_file = '{{ fact_cache_dir }}/{{ inventory_hostname }}'
+        gathered = f"(fact_cache_previous['{GATHERED_FACTS_KEY}'] | default([]))"
+        tasks = [
+            {
+                'name': 'Check the cached facts',
+                'ansible.builtin.stat': {'path': cache_file},
+                'delegate_to': 'localhost',
+                'become': False,
+                'register': 'fact_cache_entry'
+            },
+            {
+                # Stale entries are replaced rather than merged into
+                'name': 'Read the fresh cached facts',
+                'ansible.builtin.set_fact': {
+                    'fact_cache_previous': "{{ (lookup('ansible.builtin.file', fact_cache_dir ~ '/' ~ "
+                                           "inventory_hostname) | from_json) if fact_cache_entry.stat.exists and "
+                                           "(fact_cache_ttl | int == 0 or (now().timestamp() - "
+                                           "fact_cache_entry.stat.mtime) < fact_cache_ttl | int) else {} }}"
                 }
-            
-            playbook_yaml = playbook_match.group(1).strip()
-            
-            # Validate the YAML
-            try:
-                playbook = yaml.safe_load(playbook_yaml)
-            except Exception as e:
-                logger.warning(f"Generated YAML is invalid: {e}")
-                return {
-                    "success": False,
-                    "error": f"Generated YAML is invalid: {e}",
-                    "raw_response": response
+            },
+            {
+                'name': 'Skip hosts whose cached facts are fresh',
+                'ansible.builtin.meta': 'end_host',
+                'when': f'fact_cache_facts | difference({gathered}) | length == 0'
+            },
+            {
+                'name': 'Gather the required facts',
+                'ansible.builtin.setup': {
+                    'gather_subset': minimal_gather_subset(facts),
+                    'filter': [f'ansible_{fact}' for fact in facts]
                 }
-            
-            # Extract explanation (everything before the first code block)
-            explanation = response.split("```")[0].strip()
-            
-            return {
-                "success": True,
-                "explanation": explanation,
-                "playbook": playbook,
-                "playbook_yaml": playbook_yaml
-            }
-            
-        except Exception as e:
-            logger.error(f"Error processing Linux request: {e}")
-            return {
-                "success": False,
-                "error": f"Error processing request: {e}"
-            }
+            },
+            {
+                'name': 'Create the fact cache directory',
+                'ansible.builtin.file': {'path': '{{ fact_cache_dir }}', 'state': 'directory', 'mode': '0700'},
+                'delegate_to': 'localhost',
+                'become': False,
+                'run_once': True
+            },
+            {
+                'name': 'Write the facts to the fact cache',
+                'ansible.builtin.copy': {
+                    'content': f"{{{{ fact_cache_previous | combine(ansible_facts) | combine("
+                               f"{{'{GATHERED_FACTS_KEY}': {gathered} | union(fact_cache_facts) | sort}}) "
+                               f"| to_nice_json }}}}",
+                    'dest': cache_file,
+                    'mode': '0600'
+                },
+                'delegate_to': 'localhost',
+                'become': False
+            },
+        ]
+        return [{
+            'name': name,
+            'hosts': hosts,
+            'gather_facts': False,
+            'vars': {'fact_cache_dir': os.path.expanduser(cache_dir), 'fact_cache_ttl': ttl,
+                     'fact_cache_facts': facts},
+            'tasks': tasks
+        }]
     
-    def get_linux_facts_prompt(self) -> str:
+    def get_linux_facts_prompt(self,
+                               operations: List[str] = ('system', 'hardware'),
+                               hosts: str = 'linux',
+                               cache_dir: str = DEFAULT_FACT_CACHE_DIR,
+                               ttl: int = DEFAULT_FACT_CACHE_TTL) -> str:
         """
-        Generate a prompt for collecting Linux system facts.
+        Generate a playbook for collecting Linux system facts.
+        
+        Args:
+            operations: Operations whose facts are collected; by default the
+                distribution, kernel, architecture, memory and processors
+            hosts: Host pattern of the play
+            cache_dir: Directory of the jsonfile fact cache
+            ttl: Seconds cached facts stay fresh, 0 to never refresh them
         
         Returns:
             Ansible playbook as string for fact gathering
         """
-        return """---
-- name: Gather Linux system facts
-  hosts: linux
-  gather_facts: true
-  
-  tasks:
-    - name: Display Linux distribution information
-      ansible.builtin.debug:
-        var: ansible_distribution
-        
-    - name: Display Linux version
-      ansible.builtin.debug:
-        var: ansible_distribution_version
-        
-    - name: Display kernel information
-      ansible.builtin.debug:
-        var: ansible_kernel
-        
-    - name: Display system architecture
-      ansible.builtin.debug:
-        var: ansible_architecture
-        
-    - name: Display memory information
-      ansible.builtin.debug:
-        msg: "{{ ansible_memtotal_mb }} MB total memory"
-        
-    - name: Display processor information
-      ansible.builtin.debug:
-        var: ansible_processor
-"""
+        play = self.generate_fact_collection_play(list(operations), hosts=hosts, cache_dir=cache_dir, ttl=ttl)
+        return '---\n' + yaml.safe_dump(play, default_flow_style=False, sort_keys=False)
+    
+    def load_fact_context(self,
+                          source: Union[str, Mapping] = DEFAULT_FACT_CACHE_DIR,
+                          hosts: Optional[List[str]] = None,
+                          ttl: int = DEFAULT_FACT_CACHE_TTL,
+                          prefix: str = '') -> Dict[str, Any]:
+        """
+        Summarise cached facts as prompt context.
+        
+        Args:
+            source: Directory of a jsonfile fact cache, or a mapping of host to facts
+            hosts: Only describe these hosts
+            ttl: Seconds after which a cache entry is stale, 0 for no expiry
+            prefix: File name prefix of the jsonfile cache
+            
+        Returns:
+            Dictionary with ``environment_details``, ``linux_distribution`` and
+            ``package_manager`` for the prompt templates, and the number of
+            ``hosts`` described
+        """
+        host_facts = load_fact_cache(source, prefix=prefix, timeout=ttl)
+        if hosts is not None:
+            wanted = set(hosts)
+            host_facts = {host: facts for host, facts in host_facts.items() if host in wanted}
+        if not host_facts:
+            return {'environment_details': 'Not specified', 'linux_distribution': 'unknown',
+                    'package_manager': 'unknown', 'hosts': 0}
+        
+        table = self.detect_distributions(host_facts)
+        groups = table.hosts_by_distribution()
+        
+        def counted(values):
+            counts = Counter(value for value in values if value)
+            if len(counts) == 1:
+                return next(iter(counts))
+            return ', '.join(f'{value} ({count})' for value, count in counts.most_common())
+        
+        distributions = counted(
+            f"{facts.get('ansible_distribution') or 'unknown'} {facts.get('ansible_distribution_version') or ''}".strip()
+            for facts in host_facts.values())
+        package_manager = ', '.join(sorted({manager for _, _, manager in groups}))
+        
+        details = [f'{len(host_facts)} Linux host{"s" if len(host_facts) > 1 else ""}: {distributions}',
+                   f"os_family {', '.join(sorted({family for _, family, _ in groups}))}"]
+        for fact, label in (('ansible_architecture', 'architecture'), ('ansible_service_mgr', 'service manager'),
+                            ('ansible_kernel', 'kernel')):
+            values = counted(str(facts[fact]) for facts in host_facts.values() if facts.get(fact))
+            if values:
+                details.append(f'{label} {values}')
+        for fact, unit in (('ansible_memtotal_mb', ' MB memory'), ('ansible_processor_vcpus', ' vCPUs')):
+            values = [int(facts[fact]) for facts in host_facts.values() if isinstance(facts.get(fact), int)]
+            if values:
+                low, high = min(values), max(values)
+                details.append(f'{low}{unit}' if low == high else f'{low}-{high}{unit}')
+        
+        return {
+            'environment_details': '; '.join(details),
+            'linux_distribution': distributions,
+            'package_manager': package_manager,
+            'hosts': len(host_facts)
+        }
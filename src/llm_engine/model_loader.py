@@ -112,3 +112,124 @@ def download_model(model_name="TinyLlama/TinyLlama-1.1B-intermediate-step-1431k-
         Path to the downloaded model or None if download failed.
     """
     return download_model_func(model_id=model_name, quantize=quantization)
+
+def generate_batch(model, tokenizer, prompts,
+                   max_new_tokens=1024,
+                   temperature=0.7,
+                   repetition_penalty=1.0,
+                   do_sample=True,
+                   num_return_sequences=1):
+    """
+    Generate completions for several prompts in a single batched call.
+    
+    Prompts are left-padded so that every sequence ends at the same position,
+    which lets the model decode all of them together.
+    
+    Args:
+        model: The loaded model.
+        tokenizer: The tokenizer matching the model.
+        prompts: List of prompt strings.
+        max_new_tokens: Maximum number of tokens to generate per completion.
+        temperature: Sampling temperature.
+        repetition_penalty: Penalty applied to repeated tokens.
+        do_sample: Whether to sample instead of greedy decoding.
+        num_return_sequences: Number of completions to return per prompt.
+        
+    Returns:
+        list: One dict per completion with ``index`` (the prompt it belongs to),
+        ``text`` (the generated text without the prompt) and ``tokens_used``.
+        Completions for the same prompt are consecutive.
+    """
+    prompts = list(prompts)
+    if not prompts:
+        return []
+    
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = "left"
+    
+    inputs = tokenizer(prompts, return_tensors="pt", padding=True).to(model.device)
+    generation_args = {
+        "max_new_tokens": max_new_tokens,
+        "repetition_penalty": repetition_penalty,
+        "do_sample": do_sample,
+        "num_return_sequences": num_return_sequences,
+        "pad_token_id": tokenizer.pad_token_id,
+    }
+    if do_sample:
+        generation_args["temperature"] = temperature
+    
+    with torch.no_grad():
+        outputs = model.generate(**inputs, **generation_args)
+    
+    prompt_length = inputs["input_ids"].shape[1]
+    results = []
+    for row, sequence in enumerate(outputs):
+        new_tokens = sequence[prompt_length:]
+        results.append({
+            "index": row // num_return_sequences,
+            "text": tokenizer.decode(new_tokens, skip_special_tokens=True),
+            "tokens_used": int((new_tokens != tokenizer.pad_token_id).sum()),
+        })
+    return results
+
+def generate_stream(model, tokenizer, prompt,
+                    max_new_tokens=1024,
+                    temperature=0.7,
+                    repetition_penalty=1.0,
+                    do_sample=True,
+                    stop_event=None):
+    """
+    Generate a completion for one prompt, yielding text as it is decoded.
+    
+    Generation runs in a background thread; the caller consumes the text
+    chunks while later tokens are still being generated. Setting
+    ``stop_event`` ends generation after the current token, so an abandoned
+    stream does not keep the model busy.
+    
+    Args:
+        model: The loaded model.
+        tokenizer: The tokenizer matching the model.
+        prompt: The prompt string.
+        max_new_tokens: Maximum number of tokens to generate.
+        temperature: Sampling temperature.
+        repetition_penalty: Penalty applied to repeated tokens.
+        do_sample: Whether to sample instead of greedy decoding.
+        stop_event: Optional threading.Event that cancels generation when set.
+        
+    Yields:
+        str: Consecutive pieces of the generated text.
+    """
+    from threading import Thread
+    from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+    
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    generation_args = {
+        "max_new_tokens": max_new_tokens,
+        "repetition_penalty": repetition_penalty,
+        "do_sample": do_sample,
+        "pad_token_id": tokenizer.pad_token_id or tokenizer.eos_token_id,
+        "streamer": streamer,
+    }
+    if do_sample:
+        generation_args["temperature"] = temperature
+    if stop_event is not None:
+        class _Stopped(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return stop_event.is_set()
+        
+        generation_args["stopping_criteria"] = StoppingCriteriaList([_Stopped()])
+    
+    def _generate():
+        with torch.no_grad():
+            model.generate(**inputs, **generation_args)
+    
+    thread = Thread(target=_generate, daemon=True)
+    thread.start()
+    try:
+        for text in streamer:
+            if text:
+                yield text
+    finally:
+        thread.join()
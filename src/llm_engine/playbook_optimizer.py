@@ -0,0 +1,598 @@
+"""
+Deterministic performance rewrites for Ansible playbooks.
+
+Most slow playbooks are slow for mechanical reasons: package modules called
+once per loop item, full fact gathering for plays that use one or two facts,
+long-running commands holding a connection open, and the linear strategy with
+the default of five forks on a large inventory. This module applies the
+rewrites that keep a playbook's behaviour and reports the rest as
+recommendations, together with a unified diff and an estimate of the module
+invocations saved.
+
+Rewrites:
+    * ``loop``/``with_items`` over a package module whose item is only the
+      package name becomes a single task with a list ``name``
+    * ``gather_facts`` is narrowed to the ``gather_subset`` covering the facts
+      the play references, or disabled when it references none; plays with
+      templates, included files, vars_files, module_defaults or variables
+      from the inventory keep full gathering, as their fact use is not visible
+    * long-running ``command``/``shell`` tasks are flagged, and with
+      ``convert_async`` started with ``async``/``poll: 0`` and awaited at the
+      end of their task list
+
+The playbook is parsed and dumped again, so comments and formatting of the
+original are not preserved (``!vault`` and ``!unsafe`` values are); the diff
+compares both versions in dumped form.
+"""
+import re
+import difflib
+import logging
+from copy import deepcopy
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+from src.llm_engine.playbook_tasks import module_key, module_name
+from src.llm_engine.static_analysis import dump_playbook, load_playbook
+
+logger = logging.getLogger("ansible_llm")
+
+# Package modules whose name option accepts a list of packages
+PACKAGE_MODULES = {"apt", "yum", "dnf", "package", "zypper", "pacman", "apk", "pip"}
+
+COMMAND_MODULES = {"command", "shell"}
+
+LOOP_KEYWORDS = ("loop", "with_items", "with_list")
+
+# Task keywords that make a loop's per-item results observable
+LOOP_RESULT_KEYWORDS = ("register", "loop_control", "until", "notify", "changed_when", "failed_when")
+
+# Task keywords that depend on a command finishing before the next task runs
+ASYNC_BLOCKING_KEYWORDS = ("register", "notify", "until", "changed_when", "failed_when", "delegate_to",
+                           "run_once", "async", "poll") + LOOP_KEYWORDS
+
+# Plays that reference facts from content they include cannot be narrowed
+INCLUDE_MODULES = {"include_role", "import_role", "include_tasks", "import_tasks", "include", "setup",
+                   "gather_facts", "include_vars"}
+
+# Modules rendering template files, which may reference facts the play does not show
+TEMPLATE_MODULES = {"template", "win_template"}
+
+# Play and task keywords that pull in variables from files or apply hidden module arguments
+HIDDEN_CONTENT_KEYWORDS = ("vars_files", "module_defaults")
+
+# Variables Ansible defines for every play, besides the ansible_ ones
+MAGIC_VARIABLES = {
+    "item", "inventory_hostname", "inventory_hostname_short", "inventory_dir", "inventory_file", "hostvars",
+    "groups", "group_names", "play_hosts", "playbook_dir", "role_path", "role_name", "omit", "environment",
+    "lookup", "query", "q", "range", "dict", "now", "undef", "true", "false", "none", "True", "False", "None",
+    "and", "or", "not", "in", "is", "if", "else", "recursive", "loop",
+}
+
+LONG_RUNNING_COMMAND = re.compile(
+    r"\b(?:apt(?:-get)?\s+(?:-\S+\s+)*(?:upgrade|dist-upgrade|full-upgrade)"
+    r"|(?:yum|dnf|zypper)\s+(?:-\S+\s+)*(?:update|upgrade|up|dup)\b"
+    r"|pacman\s+-Syu|make(?:\s|$)|cmake\s+--build|ninja(?:\s|$)|mvn\s|gradle|cargo\s+build"
+    r"|npm\s+(?:install|ci|run\s+build)|yarn(?:\s+install)?(?:\s|$)|pip3?\s+install|docker\s+(?:build|pull)"
+    r"|podman\s+(?:build|pull)|wget\s|curl\s.*(?:-o|-O|--output)\s|rsync\s|tar\s+-?\w*[xc]|dd\s+if="
+    r"|pg_dump|pg_restore|mysqldump|fstrim|updatedb|restorecon\s+-R|find\s+/\s)"
+)
+
+# Seconds a converted command may run before async gives up on it
+DEFAULT_ASYNC_SECONDS = 3600
+ASYNC_POLL_DELAY = 10
+
+# Forks never recommended beyond this, the controller runs out of CPU first
+MAX_RECOMMENDED_FORKS = 50
+DEFAULT_FORKS = 5
+
+# Facts by gather_subset; anything not listed is assumed to need every subset
+MIN_FACTS = {
+    "apparmor", "architecture", "cmdline", "date_time", "distribution", "distribution_file_parsed",
+    "distribution_file_path", "distribution_file_variety", "distribution_major_version",
+    "distribution_release", "distribution_version", "dns", "domain", "effective_group_id",
+    "effective_user_id", "env", "fips", "fqdn", "hostname", "hostnqn", "is_chroot", "kernel",
+    "kernel_version", "local", "lsb", "machine", "machine_id", "nodename", "os_family", "pkg_mgr",
+    "proc_cmdline", "python", "python_version", "real_group_id", "real_user_id", "selinux",
+    "selinux_python_present", "service_mgr", "system", "system_capabilities",
+    "system_capabilities_enforced", "user_dir", "user_gecos", "user_gid", "user_id", "user_shell",
+    "user_uid", "userspace_architecture", "userspace_bits",
+}
+SUBSET_FACTS = {
+    "network": {"all_ipv4_addresses", "all_ipv6_addresses", "default_ipv4", "default_ipv6", "interfaces",
+                "locally_reachable_ips"},
+    "hardware": {"bios_date", "bios_vendor", "bios_version", "board_name", "board_serial", "board_vendor",
+                 "board_version", "chassis_vendor", "chassis_version", "device_links", "devices",
+                 "form_factor", "lvm", "memfree_mb", "memory_mb", "memtotal_mb", "mounts", "processor",
+                 "processor_cores", "processor_count", "processor_nproc", "processor_threads_per_core",
+                 "processor_vcpus", "product_name", "product_serial", "product_uuid", "product_version",
+                 "swapfree_mb", "swaptotal_mb", "system_vendor", "uptime_seconds"},
+    "virtual": {"virtualization_role", "virtualization_type", "virtualization_tech_guest",
+                "virtualization_tech_host"},
+}
+# Facts named after network interfaces
+INTERFACE_FACT = re.compile(r"^(?:eth|ens|enp|eno|em|wlan|wlp|lo|bond|br|docker|veth|virbr|tun|tap)\w*$")
+SSH_KEY_FACT = re.compile(r"^ssh_host_key_\w+_public(?:_keytype)?$")
+
+# ansible_ variables that are connection settings or magic variables, not facts
+NON_FACT_VARIABLES = re.compile(
+    r"^(?:host|port|user|password|connection|shell_type|shell_executable|python_interpreter|"
+    r"private_key_file|check_mode|diff_mode|version|forks|limit|verbosity|run_tags|skip_tags|"
+    r"inventory_sources|playbook_python|config_file|search_path|index_var|collection_name|"
+    r"become\w*|ssh_\w+|sftp_\w+|scp_\w+|winrm_\w+|psrp_\w+|play_\w+|loop\w*|parent_role_\w+|role_\w+|"
+    r"dependent_role_names|failed_\w+|module_\w+|job_id)$"
+)
+
+_FACT_SUBSCRIPT = re.compile(r"ansible_facts\s*(?:\.\s*(\w+)|\[\s*['\"](\w+)['\"]\s*\])")
+_ANSIBLE_VARIABLE = re.compile(r"\bansible_(\w+)")
+_ITEM_TEMPLATE = re.compile(r"\{\{\s*item\s*\}\}")
+_ITEM_REFERENCE = re.compile(r"\bitem\b")
+_VARIABLE_TEMPLATE = re.compile(r"^\{\{\s*([\w.\[\]'\"]+)\s*\}\}$")
+_TEMPLATE_LOOKUP = re.compile(r"\b(?:lookup|query|q)\(\s*['\"]template['\"]")
+_JINJA_EXPRESSION = re.compile(r"\{\{(.*?)\}\}|\{%(.*?)%\}", re.S)
+_QUOTED = re.compile(r"'[^']*'|\"[^\"]*\"")
+# Identifiers of an expression with what precedes and follows them
+_IDENTIFIER = re.compile(r"(\|\s*|\.\s*|\bis\s+(?:not\s+)?)?\b([A-Za-z_]\w*)\b(\s*\(|\s*=(?!=))?")
+CONDITIONAL_KEYWORDS = ("when", "until", "changed_when", "failed_when")
+
+
+def _module_name(task: Dict) -> Optional[str]:
+    """Return the unqualified module a task calls."""
+    return module_name(module_key(task))
+
+
+def _references(value, pattern) -> bool:
+    """Whether any string inside a value matches a pattern."""
+    if isinstance(value, str):
+        return bool(pattern.search(value))
+    if isinstance(value, dict):
+        return any(_references(k, pattern) or _references(v, pattern) for k, v in value.items())
+    if isinstance(value, list):
+        return any(_references(v, pattern) for v in value)
+    return False
+
+
+def _iter_task_lists(play: Dict) -> Iterator[Tuple[str, List]]:
+    """Yield every task list of a play, including those nested in blocks."""
+    def walk(section, tasks):
+        if not isinstance(tasks, list):
+            return
+        yield section, tasks
+        for task in tasks:
+            if isinstance(task, dict):
+                for key in ("block", "rescue", "always"):
+                    yield from walk(section, task.get(key))
+
+    for section in ("pre_tasks", "tasks", "post_tasks", "handlers"):
+        yield from walk(section, play.get(section))
+
+
+def _iter_tasks(play: Dict) -> Iterator[Dict]:
+    for _, tasks in _iter_task_lists(play):
+        for task in tasks:
+            if isinstance(task, dict) and not any(key in task for key in ("block", "rescue", "always")):
+                yield task
+
+
+def collapse_package_loop(task: Dict) -> Optional[Tuple[Dict, Optional[int]]]:
+    """
+    Rewrite a looped package task into one task with a list of names.
+
+    The rewrite only applies when the loop item is used as the package name
+    and nowhere else, and no keyword exposes the per-item results.
+
+    Args:
+        task: The task to rewrite
+
+    Returns:
+        tuple: (rewritten task, invocations saved per host or None when the
+        loop is a variable), or None when the task cannot be collapsed
+    """
+    if _module_name(task) not in PACKAGE_MODULES:
+        return None
+    loop_keys = [key for key in LOOP_KEYWORDS if key in task]
+    if len(loop_keys) != 1 or any(key in task for key in LOOP_RESULT_KEYWORDS):
+        return None
+    loop_key = loop_keys[0]
+    key_of_module = module_key(task)
+    args = task[key_of_module]
+    if not isinstance(args, dict) or not _ITEM_TEMPLATE.fullmatch(str(args.get("name", "")).strip()):
+        return None
+    if _references({k: v for k, v in args.items() if k != "name"}, _ITEM_REFERENCE):
+        return None
+
+    items = task[loop_key]
+    if isinstance(items, list) and items and all(isinstance(item, str) for item in items):
+        names = list(items)
+        label = ", ".join(items)
+        saved = len(items) - 1
+    elif isinstance(items, str) and _VARIABLE_TEMPLATE.match(items.strip()):
+        variable = _VARIABLE_TEMPLATE.match(items.strip()).group(1)
+        # with_items flattens one level of nested lists
+        names = f"{{{{ {variable} | flatten(levels=1) }}}}" if loop_key == "with_items" else items.strip()
+        label = variable
+        saved = None
+    else:
+        return None
+
+    rewritten = {}
+    for key, value in task.items():
+        if key == loop_key:
+            continue
+        if key == "name" and isinstance(value, str):
+            value = _ITEM_TEMPLATE.sub(label, value)
+        elif key == key_of_module:
+            value = dict(value, name=names)
+        elif _references(value, _ITEM_REFERENCE):
+            return None
+        rewritten[key] = value
+    if _references(rewritten.get("name", ""), _ITEM_REFERENCE):
+        return None
+    return rewritten, saved
+
+
+def fact_subset(fact: str) -> Optional[str]:
+    """Return the gather_subset that collects a fact, or None if unknown."""
+    if fact in MIN_FACTS or SSH_KEY_FACT.match(fact):
+        return "min"
+    for subset, facts in SUBSET_FACTS.items():
+        if fact in facts:
+            return subset
+    if INTERFACE_FACT.match(fact):
+        return "network"
+    return None
+
+
+def referenced_facts(value) -> Optional[set]:
+    """
+    Collect the names of the facts a play, task or template references.
+
+    Args:
+        value: Any parsed YAML value
+
+    Returns:
+        set: Fact names without the ``ansible_`` prefix, or None when all of
+        ``ansible_facts`` is used as a whole
+    """
+    facts = set()
+    strings = []
+
+    def collect(node):
+        if isinstance(node, str):
+            strings.append(node)
+        elif isinstance(node, dict):
+            for key, item in node.items():
+                collect(key)
+                collect(item)
+        elif isinstance(node, list):
+            for item in node:
+                collect(item)
+
+    collect(value)
+    for text in strings:
+        for match in _FACT_SUBSCRIPT.finditer(text):
+            facts.add(match.group(1) or match.group(2))
+        for match in _ANSIBLE_VARIABLE.finditer(_FACT_SUBSCRIPT.sub("", text)):
+            name = match.group(1)
+            if name == "facts":
+                return None
+            if not NON_FACT_VARIABLES.match(name):
+                facts.add(name)
+    return facts
+
+
+def _has_key(value, keys) -> bool:
+    """Whether any mapping inside a value has one of the keys."""
+    if isinstance(value, dict):
+        return any(key in value for key in keys) or any(_has_key(item, keys) for item in value.values())
+    if isinstance(value, list):
+        return any(_has_key(item, keys) for item in value)
+    return False
+
+
+def _defined_variables(play: Dict) -> set:
+    """Names the play itself defines: vars, prompts, registered results, set_fact and loop variables."""
+    names = set()
+
+    def collect(node):
+        if isinstance(node, dict):
+            if isinstance(node.get("vars"), dict):
+                names.update(node["vars"])
+            if isinstance(node.get("register"), str):
+                names.add(node["register"])
+            if isinstance(node.get("loop_control"), dict) and node["loop_control"].get("loop_var"):
+                names.add(node["loop_control"]["loop_var"])
+            for key in ("set_fact", "ansible.builtin.set_fact"):
+                if isinstance(node.get(key), dict):
+                    names.update(node[key])
+            for item in node.values():
+                collect(item)
+        elif isinstance(node, list):
+            for item in node:
+                collect(item)
+
+    collect(play)
+    for prompt in play.get("vars_prompt") or []:
+        if isinstance(prompt, dict) and prompt.get("name"):
+            names.add(prompt["name"])
+    return names
+
+
+def _expressions(value) -> Iterator[str]:
+    """Yield the Jinja expressions inside a value, including bare conditionals."""
+    if isinstance(value, str):
+        for match in _JINJA_EXPRESSION.finditer(value):
+            yield match.group(1) or match.group(2)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if key in CONDITIONAL_KEYWORDS:
+                for condition in item if isinstance(item, list) else [item]:
+                    if isinstance(condition, str):
+                        yield condition
+            else:
+                yield from _expressions(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _expressions(item)
+
+
+def external_variables(play: Dict) -> set:
+    """
+    Collect the variables a play uses without defining them.
+
+    Such variables come from the inventory (group_vars, host_vars) or extra
+    vars, and may themselves be templates referencing facts.
+
+    Args:
+        play: The play
+
+    Returns:
+        set: Variable names, excluding ansible_ and magic variables
+    """
+    defined = _defined_variables(play) | MAGIC_VARIABLES
+    used = set()
+    for expression in _expressions({key: value for key, value in play.items() if key != "hosts"}):
+        for match in _IDENTIFIER.finditer(_QUOTED.sub("''", expression)):
+            before, name, after = match.groups()
+            # Filters, attributes, tests, functions and keyword arguments are not variables
+            if before or after or name.startswith("ansible_"):
+                continue
+            if name not in defined:
+                used.add(name)
+    return used
+
+
+def _hidden_fact_use(play: Dict) -> Optional[str]:
+    """Describe content that may use facts the play does not show, or None."""
+    if play.get("roles") or any(_module_name(task) in INCLUDE_MODULES for task in _iter_tasks(play)):
+        return "roles or included files"
+    if _has_key(play, HIDDEN_CONTENT_KEYWORDS):
+        return "vars_files or module_defaults"
+    if any(_module_name(task) in TEMPLATE_MODULES for task in _iter_tasks(play)):
+        return "template files"
+    if _references(play, _TEMPLATE_LOOKUP):
+        return "template lookups"
+    variables = external_variables(play)
+    if variables:
+        return f"inventory or extra variables ({', '.join(sorted(variables))})"
+    return None
+
+
+def narrow_fact_gathering(play: Dict) -> Optional[Tuple[Dict, int, str]]:
+    """
+    Choose the smallest fact gathering that covers a play.
+
+    Args:
+        play: The play
+
+    Returns:
+        tuple: (play keywords to set, invocations saved per host, description),
+        or None when gathering is already configured or cannot be narrowed
+        safely, because facts may be used by templates, included files,
+        vars_files, module_defaults or variables defined outside the play
+    """
+    if play.get("gather_facts") in (False, "no", "false", "False") or "gather_subset" in play:
+        return None
+    hidden = _hidden_fact_use(play)
+    if hidden:
+        logger.debug(f"Keeping fact gathering, facts may be used by {hidden}")
+        return None
+
+    facts = referenced_facts({key: value for key, value in play.items() if key != "hosts"})
+    if facts is None:
+        return None
+    subsets = set()
+    for fact in facts:
+        subset = fact_subset(fact)
+        if subset is None:
+            return None
+        subsets.add(subset)
+
+    if not subsets:
+        return {"gather_facts": False}, 1, "no facts are referenced, fact gathering disabled"
+    subset = ["!all"] + sorted(subsets - {"min"})
+    return ({"gather_subset": subset}, 0,
+            f"facts limited to gather_subset {subset} for {', '.join(sorted(facts))}")
+
+
+def _command_text(task: Dict) -> str:
+    args = task.get(module_key(task))
+    if isinstance(args, dict):
+        return str(args.get("cmd") or args.get("_raw_params") or args.get("argv") or "")
+    return str(args or "")
+
+
+def _job_variable(task: Dict, index: int) -> str:
+    words = re.findall(r"[a-z0-9]+", str(task.get("name", "")).lower())
+    return "_".join(["async"] + words[:4] + [str(index)])
+
+
+def _insert_keywords(mapping: Dict, keywords: Dict, after: str) -> Dict:
+    """Return a copy of a mapping with keywords set in place, new ones placed after a key (or first)."""
+    pending = {key: value for key, value in keywords.items() if key not in mapping}
+    result = {} if after in mapping else dict(pending)
+    for key, value in mapping.items():
+        result[key] = keywords.get(key, value)
+        if key == after:
+            result.update(pending)
+    return result
+
+
+def _describe_task(task: Dict) -> str:
+    return str(task.get("name") or module_key(task) or "unnamed task")
+
+
+def recommend_settings(plays: List[Dict], host_count: Optional[int] = None) -> List[Dict]:
+    """
+    Recommend execution settings for the plays and inventory size.
+
+    Args:
+        plays: Parsed plays
+        host_count: Number of hosts in the inventory, if known
+
+    Returns:
+        list: Recommendations with ``setting``, ``value``, ``play`` and ``reason``
+    """
+    recommendations = []
+    uses_become = any(play.get("become") or any(task.get("become") for task in _iter_tasks(play))
+                      for play in plays)
+    recommendations.append({
+        "setting": "pipelining", "value": True, "play": None,
+        "reason": "[ssh_connection] pipelining = True runs modules without copying them to the host first"
+                  + ("; sudoers must not require a tty for become" if uses_become else "")
+    })
+
+    if host_count and host_count > DEFAULT_FORKS:
+        forks = min(host_count, MAX_RECOMMENDED_FORKS)
+        recommendations.append({
+            "setting": "forks", "value": forks, "play": None,
+            "reason": f"{host_count} hosts run in batches of {DEFAULT_FORKS} with the default forks; "
+                      f"forks = {forks} in [defaults] runs {forks} at a time"
+        })
+
+    if host_count is not None and host_count <= 1:
+        return recommendations
+    for play in plays:
+        if play.get("strategy") or any(key in play for key in ("serial", "throttle", "any_errors_fatal",
+                                                                 "max_fail_percentage")):
+            continue
+        if any(task.get("run_once") for task in _iter_tasks(play)):
+            continue
+        recommendations.append({
+            "setting": "strategy", "value": "free", "play": play.get("name"),
+            "reason": "no serial, run_once or failure threshold ties the hosts together, so each host "
+                      "can run ahead instead of waiting for the slowest one at every task"
+        })
+    return recommendations
+
+
+def _dump(plays: List[Dict]) -> str:
+    return "---\n" + dump_playbook(plays)
+
+
+def optimize_playbook(content: str, host_count: Optional[int] = None, convert_async: bool = False,
+                      path: str = "playbook.yml") -> Dict:
+    """
+    Apply the deterministic performance rewrites to a playbook.
+
+    Args:
+        content: Playbook YAML
+        host_count: Number of hosts in the inventory, used for recommendations
+            and to scale the invocation estimate
+        convert_async: Start long-running commands with ``poll: 0`` and wait
+            for them at the end of their task list, instead of only flagging them.
+            Later tasks then run while the command is still going, so only use
+            it when they do not depend on its outcome
+        path: Name of the playbook in the diff
+
+    Returns:
+        dict: ``playbook`` (optimized YAML), ``diff``, ``changes``,
+        ``recommendations``, ``invocations_saved_per_host`` and
+        ``invocations_saved`` (per host times host_count when known)
+
+    Raises:
+        ValueError: If the content is not a playbook
+    """
+    try:
+        plays = load_playbook(content)
+    except yaml.YAMLError as e:
+        raise ValueError(f"Invalid YAML: {e}")
+    if not isinstance(plays, list) or not all(isinstance(play, dict) for play in plays):
+        raise ValueError("A playbook must be a list of plays")
+
+    optimized = deepcopy(plays)
+    changes = []
+    async_jobs = 0
+
+    for play_index, play in enumerate(optimized):
+        play_name = play.get("name") or f"play {play_index + 1}"
+
+        for section, tasks in _iter_task_lists(play):
+            waits = []
+            for i, task in enumerate(tasks):
+                if not isinstance(task, dict):
+                    continue
+                collapsed = collapse_package_loop(task)
+                if collapsed:
+                    tasks[i], saved = collapsed
+                    changes.append({
+                        "type": "package_loop", "play": play_name, "task": _describe_task(tasks[i]),
+                        "detail": f"one {module_key(task)} call replaces one call per loop item",
+                        "invocations_saved_per_host": saved
+                    })
+                    continue
+
+                if _module_name(task) not in COMMAND_MODULES or "async" in task:
+                    continue
+                command = _command_text(task)
+                if not LONG_RUNNING_COMMAND.search(command):
+                    continue
+                change = {"type": "long_running_command", "play": play_name, "task": _describe_task(task),
+                          "detail": f"'{command.strip()[:80]}' holds the connection until it completes; "
+                                    "consider async with poll: 0 and async_status",
+                          "invocations_saved_per_host": 0}
+                if convert_async and section != "handlers" and not any(k in task for k in ASYNC_BLOCKING_KEYWORDS):
+                    async_jobs += 1
+                    job = _job_variable(task, async_jobs)
+                    tasks[i] = _insert_keywords(task, {"async": DEFAULT_ASYNC_SECONDS, "poll": 0, "register": job},
+                                                module_key(task))
+                    wait = {
+                        "name": f"Wait for {_describe_task(task)}",
+                        "ansible.builtin.async_status": {"jid": f"{{{{ {job}.ansible_job_id }}}}"},
+                        "register": f"{job}_result",
+                        "until": f"{job}_result.finished",
+                        "retries": DEFAULT_ASYNC_SECONDS // ASYNC_POLL_DELAY,
+                        "delay": ASYNC_POLL_DELAY,
+                    }
+                    for key in ("become", "become_user", "when"):
+                        if key in task:
+                            wait[key] = task[key]
+                    waits.append(wait)
+                    change["type"] = "async_command"
+                    change["detail"] = (f"'{command.strip()[:80]}' runs in the background and is awaited "
+                                        "at the end of its task list")
+                changes.append(change)
+            tasks.extend(waits)
+
+        narrowed = narrow_fact_gathering(play)
+        if narrowed:
+            keywords, saved, detail = narrowed
+            optimized[play_index] = _insert_keywords(play, keywords, "become" if "become" in play else "hosts")
+            changes.append({"type": "fact_gathering", "play": play_name, "task": None, "detail": detail,
+                            "invocations_saved_per_host": saved})
+
+    original_dump, optimized_dump = _dump(plays), _dump(optimized)
+    diff = "".join(difflib.unified_diff(original_dump.splitlines(True), optimized_dump.splitlines(True),
+                                        fromfile=f"a/{path}", tofile=f"b/{path}"))
+    per_host = sum(change["invocations_saved_per_host"] or 0 for change in changes)
+    logger.info(f"Optimized {path}: {len(changes)} changes, {per_host} module invocations saved per host")
+
+    return {
+        "playbook": optimized_dump if diff else content,
+        "diff": diff,
+        "changes": changes,
+        "recommendations": recommend_settings(plays, host_count),
+        "invocations_saved_per_host": per_host,
+        "invocations_saved": per_host * host_count if host_count else per_host,
+        "host_count": host_count,
+    }
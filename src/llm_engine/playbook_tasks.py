@@ -0,0 +1,37 @@
+"""
+Recognition of the module a playbook task calls.
+
+Shared by the static analysis rules and the playbook optimizer, so both agree
+on which task keys are keywords and which collections qualify module names.
+"""
+
+from typing import Dict, Optional
+
+# Collections a module name may be qualified with
+MODULE_PREFIXES = ("ansible.builtin.", "ansible.legacy.", "ansible.posix.", "community.general.")
+
+# Keys of a task that are not the module it calls
+TASK_KEYWORDS = {
+    "name", "action", "args", "async", "become", "become_method", "become_user", "changed_when",
+    "check_mode", "collections", "connection", "debugger", "delay", "delegate_facts", "delegate_to",
+    "diff", "environment", "failed_when", "ignore_errors", "ignore_unreachable", "local_action",
+    "loop", "loop_control", "module_defaults", "no_log", "notify", "poll", "register", "remote_user",
+    "retries", "run_once", "tags", "throttle", "timeout", "until", "vars", "when", "listen",
+    "block", "rescue", "always", "any_errors_fatal",
+}
+
+
+def module_key(task: Dict) -> Optional[str]:
+    """Return the key naming the module a task calls, or None for blocks."""
+    for key in task:
+        if key not in TASK_KEYWORDS and not key.startswith("with_"):
+            return key
+    return None
+
+
+def module_name(key: Optional[str]) -> Optional[str]:
+    """Strip the collection from a module name."""
+    for prefix in MODULE_PREFIXES:
+        if key and key.startswith(prefix):
+            return key[len(prefix):]
+    return key
@@ -27,6 +27,48 @@ Playbook:
 {playbook_content}
 """
 
+# Template for the detailed playbook review used by the CLI analysis commands
+PLAYBOOK_REVIEW_TEMPLATE = """
+You are an expert Ansible consultant tasked with analyzing playbooks for best practices, optimizations, and potential issues.
+Please analyze the following Ansible playbook and provide:
+
+1. A brief overview of what the playbook does
+2. Potential issues or bugs you identify
+3. Optimization recommendations
+4. Security considerations
+5. Best practice improvements
+
+Playbook:
+```yaml
+{playbook_content}
+```
+
+Please provide a comprehensive analysis.
+"""
+
+# Template for reviewing a playbook after the static rules have run; the model
+# only covers what the rules cannot decide
+PLAYBOOK_FOCUSED_REVIEW_TEMPLATE = """
+You are an expert Ansible consultant reviewing a playbook. Automated checks have already reported these findings:
+
+{static_findings}
+
+Do not repeat them. Please analyze the following Ansible playbook and provide:
+
+1. A brief overview of what the playbook does
+2. Other potential issues or bugs, such as logic errors, ordering and idempotency problems
+3. Optimization recommendations
+4. Other security considerations
+5. Other best practice improvements
+
+Playbook:
+```yaml
+{playbook_content}
+```
+
+Please keep the analysis concise.
+"""
+
 # Template for Windows SSH automation
 WINDOWS_SSH_TEMPLATE = """
 You are an Ansible automation expert specialized in Windows automation using SSH instead of WinRM. 
@@ -56,6 +98,24 @@ Follow Linux security best practices and idempotent automation principles.
 Generate a complete, production-ready playbook following Ansible best practices.
 """
 
+# Template for one parameterized playbook shared by the hosts of a profile
+HOST_PROFILE_PLAYBOOK_TEMPLATE = """
+You are an Ansible automation expert specialized in Linux system administration.
+Create one Ansible playbook that accomplishes the following task on the {host_count} host(s) sharing this profile:
+
+{user_task_description}
+
+Host profile:
+{host_profile}
+
+The playbook is rendered once per host before it runs. Write host-specific values as
+<< variable >> placeholders, using only these variables: {template_variables}
+Use <% if ... %> ... <% endif %> only when a section differs between hosts.
+Keep {{{{ ... }}}} for expressions Ansible evaluates at run time.
+
+Return the playbook in a ```yaml block starting with ---.
+"""
+
 # Template for Linux security hardening
 LINUX_SECURITY_TEMPLATE = """
 You are a Linux security expert. Create an Ansible playbook that implements security hardening 
@@ -87,6 +147,20 @@ Inventory:
 {inventory_content}
 """
 
+# Template for analyzing a precomputed summary of a (possibly very large) inventory
+INVENTORY_SUMMARY_ANALYSIS_TEMPLATE = """
+You are an infrastructure automation expert. The following is a statistical summary of an
+Ansible inventory; individual hosts are not listed. Based on it, provide insights on:
+
+1. Infrastructure composition and organization
+2. Potential optimization opportunities
+3. Security considerations
+4. Recommendations for better management
+
+Inventory summary:
+{inventory_summary}
+"""
+
 # Template for dynamic decision making during playbook execution
 DECISION_MAKING_TEMPLATE = """
 You are an Ansible automation expert. Based on the following playbook execution results,
@@ -100,3 +174,51 @@ Previous task results: {previous_results}
 
 Provide specific recommendations on how to resolve this issue and continue the automation.
 """
+
+# Template for suggesting speed-ups from measured task timings
+TASK_OPTIMIZATION_TEMPLATE = """
+You are an Ansible performance expert. The following tasks were measured across recent runs
+of the playbook {playbook_name}:
+
+{timing_report}
+
+For each listed task, suggest a concrete change that would make the playbook faster, such as:
+1. Running long tasks asynchronously with async/poll
+2. Passing a list to package modules instead of looping over items
+3. Limiting fact gathering with gather_subset or gather_facts: false
+4. Using strategy: free, pipelining or more forks
+5. Removing or restructuring tasks that are usually skipped
+
+Only suggest changes that apply to the listed tasks.
+"""
+
+# Templates for the llm_simplify, llm_explain and llm_translate filters
+TEXT_SIMPLIFY_TEMPLATE = """
+Rewrite the following text in simpler words without changing its meaning.
+Reply with the rewritten text only.
+
+Text:
+{text}
+"""
+
+TEXT_EXPLAIN_TEMPLATE = """
+Explain the following technical text in simple terms for someone new to system administration.
+Reply with the explanation only.
+
+Text:
+{text}
+"""
+
+TEXT_TRANSLATE_TEMPLATE = """
+Rewrite the following text in a {style} style without changing its meaning.
+Reply with the rewritten text only.
+
+Text:
+{text}
+"""
+
+TEXT_PROCESSING_TEMPLATES = {
+    "simplify": TEXT_SIMPLIFY_TEMPLATE,
+    "explain": TEXT_EXPLAIN_TEMPLATE,
+    "translate": TEXT_TRANSLATE_TEMPLATE,
+}
@@ -6,6 +6,8 @@ import json
 import logging
 import re
 
+from src.llm_engine.risk_scanner import scan_text
+
 logger = logging.getLogger("ansible_llm")
 
 def extract_yaml_from_response(response):
@@ -112,7 +114,8 @@ def process_playbook_response(response):
         response: The raw response from the LLM
         
     Returns:
-        dict: Processed response with validation information
+        dict: Processed response with validation information and the
+        secrets and risky patterns found in the response
     """
     yaml_content = extract_yaml_from_response(response)
     is_valid, validation_result = validate_ansible_playbook(yaml_content)
@@ -122,7 +125,8 @@ def process_playbook_response(response):
         "yaml_content": yaml_content,
         "is_valid": is_valid,
         "validation_message": validation_result if not is_valid else "Valid Ansible playbook",
-        "processed_playbook": validation_result if is_valid else None
+        "processed_playbook": validation_result if is_valid else None,
+        "risks": scan_text(response)
     }
 
 def process_binary_pattern(text):
@@ -0,0 +1,376 @@
+"""
+Rule-based static analysis of playbooks and task files.
+
+Many of the issues a review reports need no model at all: a package module
+without ``become``, ``shell`` running a command that has a module, a literal
+password, a ``notify`` without a handler. Rules are indexed by the module
+they apply to, so each task is only checked against the rules for its module
+plus the few that apply to every task.
+
+Findings are returned in the ``structured_analysis`` format produced by
+``process_analysis_response``, so they can be shown on their own (no LLM, as
+in CI) or summarised in the review prompt and merged with the model's answer,
+which then only has to cover what the rules cannot.
+"""
+import re
+import shlex
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import yaml
+
+from src.llm_engine.playbook_tasks import module_key, module_name
+from src.llm_engine.risk_scanner import RISK_RULES, scan_text
+
+logger = logging.getLogger("ansible_llm")
+
+# Rules registered for this key apply to every task
+ANY_MODULE = "*"
+
+PRIVILEGED_MODULES = ("apt", "yum", "dnf", "package", "zypper", "pacman", "apk", "service", "systemd",
+                      "user", "group", "ufw", "firewalld", "mount", "sysctl")
+
+# First word of a command, and the module that should replace it
+COMMAND_MODULES = {
+    "apt": "apt", "apt-get": "apt", "yum": "yum", "dnf": "dnf", "zypper": "zypper", "pacman": "pacman",
+    "apk": "apk", "pip": "pip", "pip3": "pip", "systemctl": "systemd", "service": "service",
+    "useradd": "user", "usermod": "user", "userdel": "user", "groupadd": "group", "groupdel": "group",
+    "mkdir": "file", "rm": "file", "chmod": "file", "chown": "file", "ln": "file", "touch": "file",
+    "cp": "copy", "wget": "get_url", "curl": "get_url or uri", "git": "git", "tar": "unarchive",
+    "unzip": "unarchive", "crontab": "cron", "mount": "mount", "sysctl": "sysctl", "hostnamectl": "hostname",
+    "ufw": "ufw", "firewall-cmd": "firewalld", "sed": "lineinfile or replace",
+}
+
+SECRET_KEY = re.compile(r"(?:^|_)(?:password|passwd|pass|secret|token|api_key|apikey|private_key)$", re.IGNORECASE)
+# crypt(3) hashes, e.g. the password of the user module, are not plaintext
+_PASSWORD_HASH = re.compile(r"^\$[0-9a-z]+\$\S{8,}$")
+_TEMPLATE = re.compile(r"\{\{.*?\}\}|\{%.*?%\}")
+_COMMAND_PREFIX = re.compile(r"^(?:sudo\s+(?:-\S+\s+)*)?(?:\w+=\S*\s+)*")
+# key=value in free-form module arguments; quoted and templated values may contain spaces
+_KEY_VALUE = re.compile(r"""(?:^|\s)(\w+)=((?:"[^"]*"|'[^']*'|\{\{.*?\}\}|\{%.*?%\}|[^\s"'{]|\{(?![{%]))*)""")
+
+
+class VaultValue(str):
+    """An ``!vault`` encrypted value, kept as its ciphertext."""
+
+
+class UnsafeValue(str):
+    """An ``!unsafe`` value, which Ansible does not template."""
+
+
+class _PlaybookLoader(yaml.SafeLoader):
+    """Safe loader that accepts the tags Ansible adds to YAML."""
+
+
+class _PlaybookDumper(yaml.SafeDumper):
+    """Safe dumper that writes the values of _PlaybookLoader back with their tags."""
+
+
+_PlaybookLoader.add_constructor("!vault", lambda loader, node: VaultValue(loader.construct_scalar(node)))
+_PlaybookLoader.add_constructor("!unsafe", lambda loader, node: UnsafeValue(loader.construct_scalar(node)))
+_PlaybookDumper.add_representer(VaultValue, lambda dumper, value: dumper.represent_scalar("!vault", str(value),
+                                                                                          style="|"))
+_PlaybookDumper.add_representer(UnsafeValue, lambda dumper, value: dumper.represent_scalar("!unsafe", str(value)))
+
+
+class Rule(NamedTuple):
+    """
+    A static check.
+
+    ``check`` receives the task and its context (play name, module, module
+    arguments and whether privilege escalation applies) and returns a message
+    for each problem found.
+    """
+    rule_id: str
+    section: str
+    modules: Tuple[str, ...]
+    check: Callable[[Dict, Dict], List[str]]
+
+
+def _is_literal(value) -> bool:
+    return (isinstance(value, (str, int)) and not isinstance(value, (bool, VaultValue))
+            and str(value) != "" and not _TEMPLATE.search(str(value)) and not _PASSWORD_HASH.match(str(value)))
+
+
+def _module_args(args) -> Dict:
+    """Return module arguments as a dict, splitting free-form ``key=value`` strings."""
+    if isinstance(args, dict):
+        return args
+    if not isinstance(args, str):
+        return {}
+    parsed = {}
+    for match in _KEY_VALUE.finditer(args):
+        key, value = match.groups()
+        try:
+            value = " ".join(shlex.split(value))
+        except ValueError:
+            pass
+        parsed[key] = value
+    return parsed
+
+
+def _command_line(args) -> str:
+    if isinstance(args, dict):
+        args = args.get("cmd") or args.get("_raw_params") or " ".join(map(str, args.get("argv") or []))
+    return str(args or "").strip()
+
+
+def check_become(task: Dict, context: Dict) -> List[str]:
+    if context["become"] or task.get("delegate_to") in ("localhost", "127.0.0.1"):
+        return []
+    return [f"'{context['module']}' usually needs root but no become applies to the task"]
+
+
+def check_command_module(task: Dict, context: Dict) -> List[str]:
+    command = _COMMAND_PREFIX.sub("", _command_line(context["args"]))
+    words = command.split()
+    if not words or any(char in command for char in "|;&<>`$"):
+        return []
+    program = words[0].rsplit("/", 1)[-1]
+    replacement = COMMAND_MODULES.get(program)
+    if replacement is None or (program == "git" and words[1:2] != ["clone"]):
+        return []
+    return [f"'{program}' is run through {context['module']}; the {replacement} module is idempotent "
+            "and reports changes accurately"]
+
+
+def check_secrets(task: Dict, context: Dict) -> List[str]:
+    messages = []
+
+    def walk(value, path):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                walk(item, path + [str(key)])
+        elif path and SECRET_KEY.search(path[-1]) and _is_literal(value):
+            messages.append(f"'{'.'.join(path)}' is a plaintext secret; use Ansible Vault or a lookup")
+
+    args = _module_args(context["args"])
+    walk(args, [])
+    walk(task.get("vars") or {}, ["vars"])
+    if not messages and not task.get("no_log") and any(
+            SECRET_KEY.search(str(key)) and _TEMPLATE.search(str(value)) for key, value in args.items()):
+        messages.append("a secret is passed to the module without no_log: true, so it can appear in logs")
+    return messages
+
+
+def check_task_name(task: Dict, context: Dict) -> List[str]:
+    if task.get("name"):
+        return []
+    return [f"'{context['module']}' task has no name, which makes output and --start-at-task harder to use"]
+
+
+RULES = [
+    Rule("privileged-without-become", "issues", PRIVILEGED_MODULES, check_become),
+    Rule("command-instead-of-module", "best_practices", ("command", "shell"), check_command_module),
+    Rule("plaintext-secret", "security", (ANY_MODULE,), check_secrets),
+    Rule("unnamed-task", "best_practices", (ANY_MODULE,), check_task_name),
+]
+
+
+def index_rules(rules: List[Rule]) -> Dict[str, List[Rule]]:
+    """Index rules by the module names they apply to."""
+    index = defaultdict(list)
+    for rule in rules:
+        for module in rule.modules:
+            index[module].append(rule)
+    return dict(index)
+
+
+RULE_INDEX = index_rules(RULES)
+
+# Rules checked once per play rather than per task
+PLAY_RULE_IDS = ("missing-handler", "unused-handler")
+
+
+def _is_true(value) -> bool:
+    return value is True or str(value).lower() in ("yes", "true", "1")
+
+
+def _iter_tasks(tasks, become: bool, section: str) -> Iterator[Tuple[Dict, bool, str]]:
+    """Yield (task, become, section) for every task, descending into blocks."""
+    if not isinstance(tasks, list):
+        return
+    for task in tasks:
+        if not isinstance(task, dict):
+            continue
+        task_become = _is_true(task["become"]) if "become" in task else become
+        if any(key in task for key in ("block", "rescue", "always")):
+            for key in ("block", "rescue", "always"):
+                yield from _iter_tasks(task.get(key), task_become, section)
+        else:
+            yield task, task_become, section
+
+
+def _handler_names(play: Dict) -> set:
+    names = set()
+    for handler, _, _ in _iter_tasks(play.get("handlers"), False, "handlers"):
+        if handler.get("name"):
+            names.add(str(handler["name"]))
+        listen = handler.get("listen")
+        names.update(map(str, listen if isinstance(listen, list) else [listen] if listen else []))
+    return names
+
+
+def _notified(task: Dict) -> List[str]:
+    notify = task.get("notify")
+    return [str(n) for n in (notify if isinstance(notify, list) else [notify] if notify else [])]
+
+
+def _finding(rule_id: str, section: str, play: str, task: Optional[str], message: str) -> Dict:
+    return {"rule": rule_id, "section": section, "play": play, "task": task, "message": message}
+
+
+def _check_handlers(play: Dict, play_name: str, tasks: List[Tuple[Dict, bool, str]]) -> List[Dict]:
+    """Play-level checks: notified handlers must exist and defined handlers should be used."""
+    if play.get("roles"):
+        # Roles bring handlers the play itself does not list
+        return []
+    findings = []
+    handlers = _handler_names(play)
+    notified = set()
+    for task, _, _ in tasks:
+        for name in _notified(task):
+            notified.add(name)
+            if name not in handlers:
+                findings.append(_finding("missing-handler", "issues", play_name, task.get("name"),
+                                         f"notifies '{name}', but the play defines no such handler"))
+    for handler, _, _ in _iter_tasks(play.get("handlers"), False, "handlers"):
+        name = str(handler.get("name", ""))
+        listen = handler.get("listen")
+        topics = set(map(str, listen if isinstance(listen, list) else [listen] if listen else []))
+        if name not in notified and not topics & notified:
+            findings.append(_finding("unused-handler", "best_practices", play_name, name or None,
+                                     "handler is never notified"))
+    return findings
+
+
+def load_playbook(content: str):
+    """Parse playbook YAML, accepting ``!vault`` and ``!unsafe`` values."""
+    return yaml.load(content, Loader=_PlaybookLoader)
+
+
+def dump_playbook(plays) -> str:
+    """Serialize plays to YAML, keeping ``!vault`` and ``!unsafe`` values as loaded."""
+    return yaml.dump(plays, Dumper=_PlaybookDumper, sort_keys=False, default_flow_style=False, width=120)
+
+
+def analyze_statically(parsed, rule_index: Optional[Dict[str, List[Rule]]] = None,
+                        content: Optional[str] = None) -> Dict:
+    """
+    Run the static rules over a parsed playbook or task file.
+
+    Args:
+        parsed: The parsed YAML (a list of plays or a list of tasks)
+        rule_index: Rules by module name; defaults to the built-in rules
+        content: The YAML text; when given it is also scanned for secrets
+            and risky patterns such as ``curl | sh``
+
+    Returns:
+        dict: ``structured_analysis`` with the findings as issues, security
+        and best_practices entries, ``findings`` with one dict per finding
+        and ``counts`` of plays and tasks checked
+    """
+    rule_index = RULE_INDEX if rule_index is None else rule_index
+    items = parsed if isinstance(parsed, list) else []
+    if any(isinstance(item, dict) and ("hosts" in item or "import_playbook" in item) for item in items):
+        plays = [item for item in items if isinstance(item, dict) and "hosts" in item]
+    else:
+        plays = [{"name": "tasks", "tasks": items, "_task_file": True}]
+
+    findings = []
+    task_count = 0
+    for index, play in enumerate(plays):
+        play_name = str(play.get("name") or f"play {index + 1}")
+        become = _is_true(play.get("become", False))
+        tasks = []
+        for section in ("pre_tasks", "tasks", "post_tasks", "handlers"):
+            tasks.extend(_iter_tasks(play.get(section), become, section))
+        task_count += len(tasks)
+
+        for message in check_secrets({"vars": play.get("vars") or {}}, {"args": {}}):
+            findings.append(_finding("plaintext-secret", "security", play_name, None, message))
+
+        for task, task_become, _ in tasks:
+            key = module_key(task)
+            if key is None:
+                continue
+            context = {"play": play_name, "module": module_name(key), "args": task.get(key),
+                       "become": task_become}
+            for rule in rule_index.get(context["module"], []) + rule_index.get(ANY_MODULE, []):
+                for message in rule.check(task, context):
+                    findings.append(_finding(rule.rule_id, rule.section, play_name, task.get("name"), message))
+
+        if not play.get("_task_file"):
+            findings.extend(_check_handlers(play, play_name, tasks))
+
+    if content is not None:
+        for risk in scan_text(content):
+            # Secret assignments are checked on the parsed YAML, which knows vault values and hashes
+            if risk["rule"] != "password-literal":
+                findings.append(dict(_finding(risk["rule"], "security", None, None,
+                                              f"{risk['message']} ({risk['match']})"), line=risk["line"]))
+
+    analysis = {"summary": "", "issues": [], "security": [], "best_practices": []}
+    for finding in findings:
+        analysis[finding["section"]].append(format_finding(finding))
+    analysis["summary"] = (f"Static analysis checked {task_count} tasks in {len(plays)} plays and found "
+                           f"{len(analysis['issues'])} issues, {len(analysis['security'])} security concerns "
+                           f"and {len(analysis['best_practices'])} best practice deviations.")
+    logger.debug(analysis["summary"])
+    return {"structured_analysis": analysis, "findings": findings,
+            "counts": {"plays": len(plays), "tasks": task_count}}
+
+
+def format_finding(finding: Dict) -> str:
+    """Render a finding as a structured_analysis entry."""
+    if finding.get("line"):
+        where = f"Line {finding['line']}"
+    else:
+        where = f"Task '{finding['task']}'" if finding["task"] else f"Play '{finding['play']}'"
+    return f"{where}: {finding['message']} [{finding['rule']}]"
+
+
+def summarize_findings(findings: List[Dict], limit: int = 20) -> str:
+    """
+    Summarise findings for the review prompt.
+
+    Args:
+        findings: Findings from analyze_statically
+        limit: Maximum number of findings listed one by one
+
+    Returns:
+        str: One line per finding, or "None" when there are none
+    """
+    if not findings:
+        return "None"
+    lines = [f"- {format_finding(finding)}" for finding in findings[:limit]]
+    if len(findings) > limit:
+        lines.append(f"- ... and {len(findings) - limit} more")
+    return "\n".join(lines)
+
+
+def merge_analysis(static: Dict, llm_analysis: Optional[Dict]) -> Dict:
+    """
+    Combine static findings with the model's structured analysis.
+
+    The model's summary is kept when it has one; entries where the model
+    repeats a static finding (they carry its rule tag) are dropped.
+
+    Args:
+        static: structured_analysis from analyze_statically
+        llm_analysis: structured_analysis from process_analysis_response
+
+    Returns:
+        dict: The merged structured_analysis
+    """
+    if not llm_analysis:
+        return static
+    rule_ids = [rule.rule_id for rule in RULES] + list(PLAY_RULE_IDS) + [rule.rule_id for rule in RISK_RULES]
+    tags = {f"[{rule_id}]" for rule_id in rule_ids}
+    merged = {"summary": (llm_analysis.get("summary") or "").strip() or static["summary"]}
+    for section in ("issues", "security", "best_practices"):
+        merged[section] = list(static.get(section, [])) + [
+            entry for entry in llm_analysis.get(section, []) if not any(tag in entry for tag in tags)
+        ]
+    return merged
@@ -0,0 +1,293 @@
+"""
+Task plans that coalesce Linux automation intents into few module calls.
+
+Combining the outputs of the LinuxProcessor generators for several requests
+repeats work on every host: each request brings its own apt cache update and
+package task, and every firewall rule re-enables the firewall. A TaskPlan
+collects the intents first and emits each kind of operation once: one package
+transaction per package manager and state (with the apt cache refreshed by the
+first one), one task per service and user, deduplicated firewall rules and a
+single firewall enablement.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Union
+
+# Package manager branches, in emission order, with their module and os_family guard
+PACKAGE_BRANCHES = OrderedDict([
+    ('apt', ('ansible.builtin.apt', 'Debian')),
+    ('yum', ('ansible.builtin.package', 'RedHat')),
+    ('zypper', ('ansible.builtin.zypper', 'Suse')),
+    ('pacman', ('ansible.builtin.pacman', 'Archlinux')),
+    ('generic', ('ansible.builtin.package', None)),
+])
+
+# How each branch is described in task names
+BRANCH_NAMES = {
+    'apt': 'with apt',
+    'yum': 'with yum/dnf',
+    'zypper': 'with zypper',
+    'pacman': 'with pacman',
+    'generic': 'using generic package module',
+}
+
+# Verb used in package task names for each state
+STATE_VERBS = {'present': 'Install', 'latest': 'Upgrade', 'absent': 'Remove'}
+
+
+def _family_condition(os_family: str) -> str:
+    """Return the ``when`` condition for hosts of an os_family."""
+    return f'ansible_facts["os_family"] == "{os_family}"'
+
+
+class TaskPlan:
+    """
+    Accumulates Linux automation intents and emits a minimal ordered task list.
+
+    Args:
+        package_manager: Package manager of the targets, or None to emit a
+            guarded branch for every supported os_family like
+            LinuxProcessor.generate_package_tasks does
+    """
+
+    def __init__(self, package_manager: Optional[str] = None):
+        self.package_manager = package_manager
+        self.packages = OrderedDict()
+        self.users = OrderedDict()
+        self.services = OrderedDict()
+        self.firewall_rules = OrderedDict()
+        self.firewall_state = None
+        self.system_upgrade = False
+
+    def _branches(self) -> List[str]:
+        """Package manager branches the plan's packages are installed with."""
+        if not self.package_manager:
+            return ['apt', 'yum', 'zypper', 'pacman']
+        if self.package_manager in ('yum', 'dnf'):
+            return ['yum']
+        if self.package_manager in PACKAGE_BRANCHES:
+            return [self.package_manager]
+        return ['generic']
+
+    def _firewall_backends(self) -> List[str]:
+        """Firewalls configured for the plan's targets (ufw on Debian, firewalld on RedHat)."""
+        branches = self._branches()
+        if branches == ['apt']:
+            return ['ufw']
+        if branches == ['yum']:
+            return ['firewalld']
+        return ['ufw', 'firewalld']
+
+    @staticmethod
+    def _add_package(packages: Dict, branch: str, name: str, state: str):
+        # A later intent for the same package replaces an earlier state
+        for (other_branch, other_state), names in packages.items():
+            if other_branch == branch and other_state != state:
+                names.pop(name, None)
+        packages.setdefault((branch, state), OrderedDict())[name] = True
+
+    def add_packages(self, packages: List[str], state: str = 'present') -> 'TaskPlan':
+        """
+        Request packages in a state.
+
+        Args:
+            packages: Package names
+            state: State of the packages (present, absent, latest)
+
+        Returns:
+            The plan, for chaining
+        """
+        for branch in self._branches():
+            for name in packages:
+                self._add_package(self.packages, branch, name, state)
+        return self
+
+    def add_system_upgrade(self) -> 'TaskPlan':
+        """
+        Request an upgrade of all installed packages.
+
+        Returns:
+            The plan, for chaining
+        """
+        self.system_upgrade = True
+        return self
+
+    def add_service(self, service_name: str, state: Optional[str] = 'started',
+                    enabled: Optional[bool] = True) -> 'TaskPlan':
+        """
+        Request a service state; a later request for the same service wins.
+
+        Args:
+            service_name: Name of the service
+            state: State of the service (started, stopped, restarted), or None to leave it
+            enabled: Whether to enable the service on boot, or None to leave it
+
+        Returns:
+            The plan, for chaining
+        """
+        self.services.pop(service_name, None)
+        self.services[service_name] = {'name': service_name, 'state': state, 'enabled': enabled}
+        return self
+
+    def add_user(self, username: str, state: str = 'present', groups: List[str] = None,
+                 shell: str = '/bin/bash', create_home: bool = True) -> 'TaskPlan':
+        """
+        Request a user; requests for the same user are merged and their groups combined.
+
+        Args:
+            username: Username to create/modify
+            state: present or absent
+            groups: List of groups to add the user to
+            shell: Default shell
+            create_home: Whether to create home directory
+
+        Returns:
+            The plan, for chaining
+        """
+        user = self.users.get(username)
+        merged_groups = list(user.get('groups', [])) if user else []
+        for group in groups or []:
+            if group not in merged_groups:
+                merged_groups.append(group)
+        user = {'name': username, 'state': state, 'shell': shell, 'create_home': create_home}
+        if merged_groups:
+            user['groups'] = merged_groups
+        self.users[username] = user
+        return self
+
+    def add_firewall_rule(self, service_name: str = None, port: Union[int, str] = None,
+                          protocol: str = 'tcp', state: str = 'enabled') -> 'TaskPlan':
+        """
+        Request a firewall opening for a service and/or port.
+
+        Args:
+            service_name: Name of the service to allow
+            port: Port number to allow
+            protocol: Protocol (tcp, udp)
+            state: State of the firewall (enabled or disabled)
+
+        Returns:
+            The plan, for chaining
+        """
+        if service_name:
+            self.firewall_rules[('service', service_name)] = True
+        if port:
+            self.firewall_rules[('port', f'{port}/{protocol}')] = True
+        self.firewall_state = state
+        return self
+
+    def _package_tasks(self) -> List[Dict]:
+        packages = OrderedDict((key, OrderedDict(names)) for key, names in self.packages.items())
+        if self.firewall_rules:
+            # Firewall packages join the package transaction of their manager
+            for backend in self._firewall_backends():
+                self._add_package(packages, 'apt' if backend == 'ufw' else 'yum', backend, 'present')
+
+        tasks = []
+        cache_updated = set()
+        for branch, (module, family) in PACKAGE_BRANCHES.items():
+            for state in ('absent', 'present', 'latest'):
+                names = packages.get((branch, state))
+                if not names:
+                    continue
+                args = {'name': list(names), 'state': state}
+                # Refresh the cache once per manager, with its first install
+                if branch in ('apt', 'pacman') and state != 'absent' and branch not in cache_updated:
+                    args['update_cache'] = True
+                    if branch == 'apt':
+                        args['cache_valid_time'] = 3600
+                    cache_updated.add(branch)
+                task = {
+                    'name': f'{STATE_VERBS.get(state, "Manage")} packages {BRANCH_NAMES[branch]}',
+                    module: args,
+                    'become': True
+                }
+                if family:
+                    task['when'] = _family_condition(family)
+                tasks.append(task)
+            if self.system_upgrade and branch in self._branches():
+                tasks.append(self._system_upgrade_task(branch, module, family, branch not in cache_updated))
+                cache_updated.add(branch)
+        return tasks
+
+    @staticmethod
+    def _system_upgrade_task(branch: str, module: str, family: Optional[str], update_cache: bool) -> Dict:
+        """Return the task upgrading all installed packages of a branch, after its installs."""
+        if branch == 'apt':
+            args = {'upgrade': 'dist'}
+        elif branch == 'pacman':
+            args = {'upgrade': True}
+        else:
+            args = {'name': '*', 'state': 'latest'}
+        if branch in ('apt', 'pacman') and update_cache:
+            args['update_cache'] = True
+            if branch == 'apt':
+                args['cache_valid_time'] = 3600
+        task = {'name': f'Upgrade all packages {BRANCH_NAMES[branch]}', module: args, 'become': True}
+        if family:
+            task['when'] = _family_condition(family)
+        return task
+
+    def _firewall_tasks(self) -> List[Dict]:
+        tasks = []
+        for backend in self._firewall_backends():
+            family = 'Debian' if backend == 'ufw' else 'RedHat'
+            backend_tasks = []
+            if backend == 'ufw' and self.firewall_state == 'enabled':
+                # ufw denies incoming connections once enabled; keep the connection Ansible uses open
+                backend_tasks.append({
+                    'name': 'Allow SSH in ufw',
+                    'ansible.builtin.ufw': {'rule': 'allow', 'port': '{{ ansible_port | default(22) }}',
+                                            'proto': 'tcp'}
+                })
+            elif backend == 'firewalld':
+                # The rules are applied to the running daemon as well as its permanent configuration
+                backend_tasks.append({
+                    'name': 'Enable firewalld',
+                    'ansible.builtin.service': {'name': 'firewalld', 'state': 'started', 'enabled': True}
+                })
+            for kind, value in self.firewall_rules:
+                label = value if kind == 'service' else f'port {value}'
+                if backend == 'ufw':
+                    if kind == 'service':
+                        args = {'rule': 'allow', 'name': value}
+                    else:
+                        port, protocol = value.split('/')
+                        args = {'rule': 'allow', 'port': port, 'proto': protocol}
+                    backend_tasks.append({'name': f'Allow {label} in ufw', 'ansible.builtin.ufw': args})
+                else:
+                    backend_tasks.append({
+                        'name': f'Allow {label} in firewalld',
+                        'ansible.posix.firewalld': {kind: value, 'permanent': True, 'immediate': True,
+                                                    'state': 'enabled'}
+                    })
+            if backend == 'ufw':
+                backend_tasks.append({'name': 'Enable ufw', 'ansible.builtin.ufw': {'state': self.firewall_state}})
+            for task in backend_tasks:
+                task['become'] = True
+                task['when'] = _family_condition(family)
+            tasks.extend(backend_tasks)
+        return tasks
+
+    def build(self) -> List[Dict]:
+        """
+        Emit the plan as an ordered task list.
+
+        Packages come first, followed by users, services and the firewall.
+        ufw allows SSH and the requested rules before it is enabled;
+        firewalld is started before the rules are added.
+
+        Returns:
+            List of Ansible tasks
+        """
+        tasks = self._package_tasks()
+        for user in self.users.values():
+            tasks.append({'name': f'Manage user {user["name"]}', 'ansible.builtin.user': dict(user), 'become': True})
+        for service in self.services.values():
+            tasks.append({
+                'name': f'Manage service {service["name"]}',
+                'ansible.builtin.service': {key: value for key, value in service.items() if value is not None},
+                'become': True
+            })
+        if self.firewall_rules:
+            tasks.extend(self._firewall_tasks())
+        return tasks
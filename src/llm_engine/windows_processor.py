@@ -4,6 +4,7 @@ Response processor for Windows-specific tasks.
 import logging
 import re
 from src.llm_engine.response_processor import extract_yaml_from_response, validate_ansible_playbook
+from src.llm_engine.risk_scanner import scan_text
 
 logger = logging.getLogger("ansible_llm")
 
@@ -30,7 +31,8 @@ def process_windows_ssh_response(response):
             "yaml_content": yaml_content,
             "is_valid": False,
             "validation_message": validation_result,
-            "processed_playbook": None
+            "processed_playbook": None,
+            "risks": scan_text(response)
         }
     
     # Check and fix Windows SSH connection settings
@@ -42,7 +44,8 @@ def process_windows_ssh_response(response):
         "modified_yaml": modified_yaml,
         "is_valid": True,
         "validation_message": "Valid Windows SSH Ansible playbook",
-        "processed_playbook": validation_result
+        "processed_playbook": validation_result,
+        "risks": scan_text(response)
     }
 
 def ensure_windows_ssh_settings(yaml_content):
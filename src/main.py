@@ -49,8 +49,65 @@ def parse_args():
     download_parser.add_argument("--quantize", choices=["4bit", "8bit"], help="Quantize the model")
     download_parser.add_argument("--force", "-f", action="store_true", help="Force download even if model exists")
     
+    # Inference daemon commands
+    daemon_parser = subparsers.add_parser("daemon", help="Manage the resident inference daemon")
+    daemon_subparsers = daemon_parser.add_subparsers(dest="daemon_command", help="Daemon command to run")
+    
+    # Daemon start command
+    daemon_start_parser = daemon_subparsers.add_parser("start", help="Start the inference daemon")
+    daemon_start_parser.add_argument("--model", help="Model to keep loaded (defaults to MODEL_NAME)")
+    daemon_start_parser.add_argument("--quantize", choices=["4bit", "8bit"], help="Quantize the model")
+    daemon_start_parser.add_argument("--socket", help="Unix socket path to listen on")
+    daemon_start_parser.add_argument("--idle-timeout", type=int, help="Exit after this many idle seconds (0 disables)")
+    daemon_start_parser.add_argument("--foreground", action="store_true", help="Run in the foreground instead of detaching")
+    
+    # Daemon stop and status commands
+    daemon_subparsers.add_parser("stop", help="Stop the inference daemon")
+    daemon_subparsers.add_parser("status", help="Show inference daemon status")
+    
     return parser.parse_args()
 
+def run_daemon_command(args, logger):
+    """Handle the daemon subcommands."""
+    from src.llm_engine.inference_daemon import (
+        DaemonClient, DaemonError, get_daemon_settings, run_daemon, start_daemon
+    )
+    
+    settings = get_daemon_settings()
+    if getattr(args, "socket", None):
+        settings["socket_path"] = os.path.expanduser(args.socket)
+    if getattr(args, "idle_timeout", None) is not None:
+        settings["idle_timeout"] = args.idle_timeout
+    client = DaemonClient(settings["socket_path"])
+    
+    if args.daemon_command == "start":
+        model_name = args.model or os.environ.get("MODEL_NAME")
+        if args.foreground:
+            run_daemon(model_name=model_name, quantization=args.quantize, settings=settings)
+            return
+        try:
+            start_daemon(model_name=model_name, quantization=args.quantize, settings=settings)
+            logger.info(f"Inference daemon running at {settings['socket_path']}")
+        except DaemonError as e:
+            logger.error(str(e))
+    elif args.daemon_command == "stop":
+        try:
+            client.shutdown()
+            logger.info("Inference daemon stopped")
+        except DaemonError as e:
+            logger.error(str(e))
+    elif args.daemon_command == "status":
+        try:
+            status = client.status()
+            logger.info(
+                f"Inference daemon running (pid {status['pid']}, model {status['model_name']}, "
+                f"uptime {status['uptime']:.0f}s, {status['requests_served']} requests served)"
+            )
+        except DaemonError:
+            logger.info(f"No inference daemon running at {settings['socket_path']}")
+    else:
+        logger.error("Invalid daemon command. Use 'start', 'stop' or 'status'.")
+
 def main():
     """Main entry point."""
     # Special case for 'cli' command - we need to handle this before argparse
@@ -94,6 +151,8 @@ def main():
             )
         else:
             logger.error("Invalid model command. Use 'list' or 'download'.")
+    elif args.command == "daemon":
+        run_daemon_command(args, logger)
     elif not args.command:
         # Default to showing help
         logger.info("No command specified. Use --help to see available commands.")
@@ -7,11 +7,15 @@ import os
 import sys
 import pytest
 import subprocess
+import threading
+import time
+import yaml
 from unittest.mock import MagicMock
 
 # Add the src directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
+from src.llm_engine.fact_cache import GATHERED_FACTS_KEY
 from src.llm_engine.linux_processor import LinuxProcessor
 
 class TestLinuxProcessor:
@@ -38,6 +42,48 @@ class TestLinuxProcessor:
         assert distro == "centos"
         assert pkg_mgr == "yum"
         
+    def test_detect_linux_distribution_prefers_gathered_facts(self):
+        """Test that ansible_pkg_mgr and ansible_os_family are used when present."""
+        processor = LinuxProcessor()
+        
+        facts = {"ansible_distribution": "CentOS", "ansible_os_family": "RedHat", "ansible_pkg_mgr": "dnf"}
+        assert processor.detect_linux_distribution(facts) == ("centos", "dnf")
+        
+        facts = {"ansible_distribution": "Rocky"}
+        assert processor.detect_linux_distribution(facts) == ("rocky", "dnf")
+        
+        # Both names of Red Hat Enterprise Linux resolve alike
+        assert processor.resolve_distribution("rhel")[1:] == processor.resolve_distribution("RedHat")[1:]
+        
+        facts = {"ansible_distribution": "MyCorpOS", "ansible_os_family": "Debian"}
+        assert processor.detect_linux_distribution(facts) == ("mycorpos", "apt")
+        
+    def test_detect_distributions(self, tmp_path):
+        """Test bulk detection from a jsonfile fact cache."""
+        import json
+        facts = {
+            "web1": {"ansible_distribution": "Ubuntu", "ansible_os_family": "Debian", "ansible_pkg_mgr": "apt"},
+            "web2": {"ansible_distribution": "Ubuntu", "ansible_os_family": "Debian", "ansible_pkg_mgr": "apt"},
+            "db1": {"ansible_distribution": "openSUSE Leap"},
+            "new1": {},
+        }
+        for host, host_facts in facts.items():
+            (tmp_path / host).write_text(json.dumps(host_facts))
+        
+        processor = LinuxProcessor()
+        table = processor.detect_distributions(str(tmp_path))
+        
+        assert len(table) == 4
+        assert table.hosts == ["db1", "new1", "web1", "web2"]
+        assert table.distributions == [
+            ("opensuse leap", "Suse", "zypper"), ("unknown", "unknown", "unknown"), ("ubuntu", "Debian", "apt")
+        ]
+        assert list(table.distro_ids) == [0, 1, 2, 2]
+        assert table.get("web2") == {"distribution": "ubuntu", "os_family": "Debian", "package_manager": "apt"}
+        assert table.get("missing") is None
+        assert table.hosts_by_distribution()[("ubuntu", "Debian", "apt")] == ["web1", "web2"]
+        assert table.to_dict()["distro_ids"] == [0, 1, 2, 2]
+        
     def test_generate_package_tasks(self):
         """Test generating package installation tasks."""
         processor = LinuxProcessor()
@@ -81,6 +127,48 @@ class TestLinuxProcessor:
         assert len(fw_tasks) > 0
         assert any("ssh" in str(task) for task in fw_tasks)
         
+    def test_compile_family_plays(self):
+        """Test compiling a request into one play per os_family."""
+        processor = LinuxProcessor()
+        host_facts = {
+            "web2": {"ansible_os_family": "Debian"},
+            "web1": {"ansible_facts": {"os_family": "Debian"}},
+            "db1": {"ansible_os_family": "RedHat"},
+            "edge1": {"ansible_os_family": "Alpine"},
+            "new1": {},
+        }
+        plays = processor.compile_family_plays(host_facts, packages=["nginx"], services=["nginx"])
+        assert plays[[play["name"] for play in plays].index("Configure Linux hosts (Alpine)")]["tasks"][0]["name"] == \
+            "Install packages using generic package module"
+        with pytest.raises(ValueError, match=r"Alpine \(edge1\)"):
+            processor.compile_family_plays(host_facts, packages=["nginx"], firewall_rules=[{"port": 80}])
+        
+        del host_facts["edge1"]
+        plays = processor.compile_family_plays(host_facts, packages=["nginx"], services=["nginx"],
+                                               firewall_rules=[{"port": 80}])
+        by_family = {play["name"].split("(")[1].rstrip(")"): play for play in plays}
+        
+        assert sorted(by_family) == ["Debian", "RedHat", "unknown"]
+        assert by_family["Debian"]["hosts"] == "web1,web2"
+        
+        debian_tasks = by_family["Debian"]["tasks"]
+        assert not any("when" in task for task in debian_tasks)
+        assert "firewalld" not in str(debian_tasks) and "yum" not in str(debian_tasks)
+        assert [task["name"] for task in debian_tasks] == [
+            "Install packages with apt", "Manage service nginx", "Allow SSH in ufw", "Allow port 80/tcp in ufw",
+            "Enable ufw"
+        ]
+        assert debian_tasks[0]["ansible.builtin.apt"]["name"] == ["nginx", "ufw"]
+        assert by_family["Debian"]["gather_facts"] is False
+        
+        redhat_tasks = by_family["RedHat"]["tasks"]
+        assert "ufw" not in str(redhat_tasks)
+        assert "Allow port 80/tcp in firewalld" in [task["name"] for task in redhat_tasks]
+        
+        unknown = by_family["unknown"]
+        assert unknown["gather_facts"] is True
+        assert any(task.get("when") for task in unknown["tasks"])
+        
     @pytest.mark.skipif(not os.path.exists("/app/tests/mock_linux_host"), 
                        reason="Linux mock host environment not available")
     def test_process_linux_request_with_mock_llm(self):
@@ -130,3 +218,137 @@ class TestLinuxProcessor:
         assert prompt is not None
         assert "Gather Linux system facts" in prompt
         assert "ansible_distribution" in prompt
+        
+    def test_fact_collection_play_is_minimal_and_cached(self, tmp_path):
+        """Test that only the needed facts are gathered and written to the fact cache."""
+        processor = LinuxProcessor()
+        
+        play = processor.generate_fact_collection_play(["packages"], cache_dir=str(tmp_path), ttl=600)[0]
+        
+        assert play["gather_facts"] is False
+        assert play["vars"] == {"fact_cache_dir": str(tmp_path), "fact_cache_ttl": 600,
+                                "fact_cache_facts": ["distribution", "distribution_version", "os_family", "pkg_mgr"]}
+        tasks = {task["name"]: task for task in play["tasks"]}
+        setup = tasks["Gather the required facts"]["ansible.builtin.setup"]
+        assert setup["gather_subset"] == ["!all", "!min", "distribution", "pkg_mgr"]
+        assert "ansible_pkg_mgr" in setup["filter"]
+        assert tasks["Skip hosts whose cached facts are fresh"]["ansible.builtin.meta"] == "end_host"
+        assert tasks["Write the facts to the fact cache"]["delegate_to"] == "localhost"
+        
+    def test_fact_collection_play_merges_into_the_cache_entry(self, tmp_path):
+        """Test that freshness depends on the facts in the entry and new facts are merged into it."""
+        processor = LinuxProcessor()
+        
+        play = processor.generate_fact_collection_play(["network"], cache_dir=str(tmp_path))[0]
+        
+        tasks = {task["name"]: task for task in play["tasks"]}
+        skip = tasks["Skip hosts whose cached facts are fresh"]["when"]
+        assert "fact_cache_facts | difference(" in skip
+        assert GATHERED_FACTS_KEY in skip
+        content = tasks["Write the facts to the fact cache"]["ansible.builtin.copy"]["content"]
+        assert content.startswith("{{ fact_cache_previous | combine(ansible_facts)")
+        assert f"'{GATHERED_FACTS_KEY}'" in content and "union(fact_cache_facts)" in content
+        
+    def test_fact_context_for_prompts(self, tmp_path):
+        """Test that cached facts become the prompt context of generation requests."""
+        (tmp_path / "web1").write_text('{"distribution": "Ubuntu", "distribution_version": "22.04", '
+                                       '"os_family": "Debian", "memtotal_mb": 2048}')
+        (tmp_path / "db1").write_text('{"ansible_distribution": "Rocky", "ansible_distribution_version": "9.3", '
+                                      '"ansible_memtotal_mb": 8192}')
+        mock_model = MagicMock(spec=["generate"])
+        mock_model.generate.return_value = "```yaml\n---\n- hosts: all\n```"
+        processor = LinuxProcessor(model_interface=mock_model)
+        
+        context = processor.load_fact_context(str(tmp_path))
+        
+        assert context["hosts"] == 2
+        assert context["package_manager"] == "apt, dnf"
+        assert "Ubuntu 22.04 (1)" in context["linux_distribution"]
+        assert "2048-8192 MB memory" in context["environment_details"]
+        assert processor.load_fact_context(str(tmp_path), hosts=["web1"])["linux_distribution"] == "Ubuntu 22.04"
+        assert processor.load_fact_context(str(tmp_path / "missing"))["hosts"] == 0
+        
+        processor.process_linux_request("Install and configure Nginx", fact_context=context)
+        assert "Available package manager: apt, dnf" in mock_model.generate.call_args.args[0]
+        
+    def test_simple_request_skips_the_llm(self):
+        """Test that a request the intent parser understands is built without the LLM."""
+        mock_model = MagicMock()
+        processor = LinuxProcessor(model_interface=mock_model)
+        
+        result = processor.process_linux_request("Install nginx and open port 80 on Ubuntu")
+        
+        mock_model.generate.assert_not_called()
+        assert result["success"] is True
+        assert result["source"] == "rules"
+        play = result["playbook"][0]
+        assert play["gather_facts"] is False
+        assert [task["name"] for task in play["tasks"]] == [
+            "Install packages with apt", "Allow SSH in ufw", "Allow port 80/tcp in ufw", "Enable ufw"]
+        assert yaml.safe_load(result["playbook_yaml"]) == result["playbook"]
+        
+        result = processor.process_linux_request("update the system on ubuntu")
+        assert result["source"] == "rules"
+        assert result["playbook"][0]["tasks"] == [{
+            "name": "Upgrade all packages with apt",
+            "ansible.builtin.apt": {"upgrade": "dist", "update_cache": True, "cache_valid_time": 3600},
+            "become": True
+        }]
+        mock_model.generate.assert_not_called()
+        
+    def test_unclear_request_uses_the_llm(self):
+        """Test that low confidence and unsupported intents fall back to the LLM."""
+        mock_model = MagicMock()
+        mock_model.generate.return_value = "Done.\n```yaml\n---\n- hosts: all\n  tasks: []\n```"
+        processor = LinuxProcessor(model_interface=mock_model)
+        
+        assert processor.process_linux_request("Install and configure Nginx")["source"] == "llm"
+        assert processor.process_linux_request("open port 80 on alpine")["source"] == "llm"
+        assert LinuxProcessor(min_confidence=1.1).process_linux_request("install git")["success"] is False
+        assert mock_model.generate.call_count == 2
+        
+    def test_best_of_n_returns_first_valid_candidate(self):
+        """Test that parallel candidates are validated as they finish and the slow ones are not awaited."""
+        valid = "Installs it.\n```yaml\n---\n- hosts: all\n  tasks: []\n```"
+        responses = [("No playbook here", 0.0), (valid, 0.05), (valid, 2.0)]
+        lock = threading.Lock()
+        
+        class Interface:
+            def generate(self, prompt):
+                with lock:
+                    text, delay = responses.pop(0)
+                time.sleep(delay)
+                return text
+        
+        processor = LinuxProcessor(model_interface=Interface(), candidates=3)
+        
+        start = time.perf_counter()
+        result = processor.process_linux_request("Install and configure Nginx")
+        
+        assert time.perf_counter() - start < 1.0
+        assert result["success"] is True
+        assert result["candidates_tried"] == 2
+        assert result["playbook"] == [{"hosts": "all", "tasks": []}]
+        
+    def test_best_of_n_uses_one_batched_call(self):
+        """Test that backends with generate_batch produce all candidates with num_return_sequences."""
+        backend = MagicMock(spec=["generate", "generate_batch"])
+        backend.generate_batch.return_value = [
+            {"index": 0, "text": "```yaml\n---\n- hosts: [\n```"},
+            {"index": 0, "text": "```yaml\n---\n- hosts: all\n```"},
+            {"index": 0, "text": "unused"},
+        ]
+        processor = LinuxProcessor(model_interface=backend)
+        
+        result = processor.process_linux_request("Install and configure Nginx", candidates=3)
+        
+        backend.generate_batch.assert_called_once()
+        assert backend.generate_batch.call_args.kwargs == {"num_return_sequences": 3}
+        backend.generate.assert_not_called()
+        assert result["success"] is True
+        assert result["candidates_tried"] == 2
+        
+        backend.generate_batch.return_value = [{"index": 0, "text": "nothing"}] * 2
+        failed = processor.process_linux_request("Install and configure Nginx", candidates=2)
+        assert failed["success"] is False
+        assert failed["candidates_tried"] == 2
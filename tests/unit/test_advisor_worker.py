@@ -0,0 +1,93 @@
+"""
+Unit tests for the llm_advisor background worker pool.
+"""
+import os
+import sys
+import time
+import threading
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.ansible_plugins.advisor_worker import AdvisorWorkerPool
+
+
+class TestAdvisorWorkerPool:
+    """Tests for the advisor worker pool."""
+
+    def test_submit_does_not_wait_for_analysis(self):
+        """Test that submitting returns immediately while analyses run in the background."""
+        release = threading.Event()
+
+        def analyze(payload):
+            release.wait(5)
+            return {"analysis": f"fix {payload['task']}"}
+
+        pool = AdvisorWorkerPool(analyze, workers=2)
+        start = time.monotonic()
+        for i in range(4):
+            assert pool.submit(f"host{i}", {"task": "t"})
+        assert time.monotonic() - start < 0.5
+        assert pool.poll() == []
+
+        release.set()
+        results, outstanding = pool.drain(timeout=5)
+        assert outstanding == 0
+        assert sorted(r.key for r in results) == ["host0", "host1", "host2", "host3"]
+        assert results[0].result == {"analysis": "fix t"}
+        assert pool.stats["completed"] == 4
+        pool.shutdown()
+
+    def test_queue_is_bounded(self):
+        """Test that requests beyond max_pending are dropped, not blocked on."""
+        release = threading.Event()
+        pool = AdvisorWorkerPool(lambda payload: release.wait(5), workers=1, max_pending=2)
+
+        accepted = [pool.submit(i, {"task": "t"}) for i in range(6)]
+        assert accepted.count(False) >= 3
+        assert pool.stats["dropped"] == accepted.count(False)
+
+        release.set()
+        pool.drain(timeout=5)
+        pool.shutdown()
+
+    def test_drain_respects_time_budget(self):
+        """Test that draining gives up on slow analyses after the budget."""
+        release = threading.Event()
+        pool = AdvisorWorkerPool(lambda payload: release.wait(5), workers=1)
+        pool.submit("slow", {"task": "t"})
+        pool.submit("queued", {"task": "t"})
+
+        start = time.monotonic()
+        results, outstanding = pool.drain(timeout=0.2)
+        assert time.monotonic() - start < 1
+        assert results == []
+        assert outstanding == 2
+
+        pool.shutdown()
+        assert pool.stats["abandoned"] == 2
+        assert not pool.submit("late", {"task": "t"})
+        release.set()
+
+    def test_errors_are_reported(self):
+        """Test that a failing analysis produces an error result."""
+        def analyze(payload):
+            raise ConnectionError("service unavailable")
+
+        pool = AdvisorWorkerPool(analyze, workers=1)
+        pool.submit("host", {"task": "t"})
+        results, _ = pool.drain(timeout=5)
+
+        assert results[0].error == "service unavailable"
+        assert pool.stats["failed"] == 1
+        pool.shutdown()
+
+    def test_submit_with_other_callable(self):
+        """Test that a request can use a different analyze callable."""
+        pool = AdvisorWorkerPool(lambda payload: {"analysis": "failure"}, workers=1)
+        pool.submit("a", {"task": "t"})
+        pool.submit("b", {"task": "t"}, analyze=lambda payload: {"analysis": "speed-up"})
+        results, _ = pool.drain(timeout=5)
+
+        assert {r.key: r.result["analysis"] for r in results} == {"a": "failure", "b": "speed-up"}
+        pool.shutdown()
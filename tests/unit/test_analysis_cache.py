@@ -0,0 +1,81 @@
+"""
+Unit tests for the analysis cache.
+"""
+import os
+import sys
+import json
+import pytest
+import yaml
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.llm_engine.analysis_cache import (
+    AnalysisCache,
+    default_cache_path,
+    normalized_hash,
+    prompt_version,
+)
+
+ANALYSIS = {"summary": "ok", "issues": [], "security": [], "best_practices": []}
+
+
+class TestNormalizedHash:
+    """Tests for content normalization."""
+
+    def test_ignores_comments_whitespace_and_key_order(self):
+        """Test that formatting-only changes keep the same hash."""
+        original = yaml.safe_load("- name: a\n  hosts: all\n  tasks: []\n")
+        reformatted = yaml.safe_load("# comment\n-   hosts:   all\n    name: a   # inline\n\n    tasks: []\n")
+        assert normalized_hash(original) == normalized_hash(reformatted)
+
+    def test_detects_content_changes(self):
+        """Test that a changed value changes the hash."""
+        assert normalized_hash({"hosts": "all"}) != normalized_hash({"hosts": "web"})
+
+    def test_prompt_version_is_stable(self):
+        """Test that prompt versions depend only on the template text."""
+        assert prompt_version("template") == prompt_version("template")
+        assert prompt_version("template") != prompt_version("template v2")
+
+
+class TestAnalysisCache:
+    """Tests for the cache manifest."""
+
+    def test_round_trip(self, tmp_path):
+        """Test that stored analyses survive a save and load."""
+        path = tmp_path / "analysis.json"
+        cache = AnalysisCache(path, "model-a", "v1")
+        cache.put("abc", ANALYSIS, source="site.yml")
+        cache.save()
+
+        reloaded = AnalysisCache(path, "model-a", "v1").load()
+        assert reloaded.get("abc") == ANALYSIS
+        assert reloaded.hits == 1
+
+    def test_model_or_prompt_change_is_a_miss(self, tmp_path):
+        """Test that entries from another model or prompt version are ignored."""
+        path = tmp_path / "analysis.json"
+        cache = AnalysisCache(path, "model-a", "v1")
+        cache.put("abc", ANALYSIS)
+        cache.save()
+
+        assert AnalysisCache(path, "model-b", "v1").load().get("abc") is None
+        assert AnalysisCache(path, "model-a", "v2").load().get("abc") is None
+
+    def test_corrupt_manifest_starts_empty(self, tmp_path):
+        """Test that an unreadable manifest does not break analysis."""
+        path = tmp_path / "analysis.json"
+        path.write_text("{not json")
+        assert AnalysisCache(path, "m", "v").load().entries == {}
+
+    def test_save_only_when_dirty(self, tmp_path):
+        """Test that an unchanged cache is not rewritten."""
+        path = tmp_path / "analysis.json"
+        AnalysisCache(path, "m", "v").save()
+        assert not path.exists()
+
+    def test_default_cache_path(self, tmp_path):
+        """Test that single directories keep the cache alongside the repository."""
+        assert default_cache_path([str(tmp_path)]).parent.parent == tmp_path
+        assert ".ansible_llm" in str(default_cache_path(["a.yml", "b.yml"]))
@@ -0,0 +1,208 @@
+"""
+Unit tests for batch playbook analysis.
+"""
+import os
+import sys
+import pytest
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.llm_engine.analysis_cache import AnalysisCache
+from src.llm_engine.batch_analysis import (
+    BatchAnalyzer,
+    classify_document,
+    discover_analysis_targets,
+    merge_analyses,
+    prepare_analysis_target,
+)
+
+PLAYBOOK = """---
+- name: Install nginx
+  hosts: web
+  tasks:
+    - name: Install nginx
+      apt:
+        name: nginx
+"""
+
+TASKS = """---
+- name: Start nginx
+  service:
+    name: nginx
+    state: started
+"""
+
+ANALYSIS = """Summary:
+Installs nginx.
+
+Issues:
+- Missing become
+
+Security:
+- No firewall rules
+"""
+
+
+class FakeGenerator:
+    """Generator that returns a canned analysis and records batch sizes."""
+
+    def __init__(self):
+        self.batches = []
+
+    def generate_batch(self, prompts, **params):
+        self.batches.append(len(prompts))
+        return [{"index": i, "text": ANALYSIS, "tokens_used": 10} for i in range(len(prompts))]
+
+
+@pytest.fixture
+def repo(tmp_path):
+    (tmp_path / "site.yml").write_text(PLAYBOOK)
+    (tmp_path / "broken.yml").write_text("- name: [unclosed\n")
+    (tmp_path / "group_vars").mkdir()
+    (tmp_path / "group_vars" / "all.yml").write_text("ntp_server: pool.ntp.org\n")
+    for role in ("web", "db"):
+        tasks = tmp_path / "roles" / role / "tasks"
+        tasks.mkdir(parents=True)
+        (tasks / "main.yml").write_text(TASKS)
+        defaults = tmp_path / "roles" / role / "defaults"
+        defaults.mkdir()
+        (defaults / "main.yml").write_text("port: 80\n")
+    (tmp_path / "vars.yml").write_text("key: value\n")
+    return tmp_path
+
+
+class TestDiscovery:
+    """Tests for target discovery and preparation."""
+
+    def test_discover_directory(self, repo):
+        """Test that directories yield playbooks and role task files only."""
+        targets = discover_analysis_targets([str(repo)])
+        relative = sorted(os.path.relpath(t, repo) for t in targets)
+
+        assert relative == [
+            "broken.yml",
+            os.path.join("roles", "db", "tasks", "main.yml"),
+            os.path.join("roles", "web", "tasks", "main.yml"),
+            "site.yml",
+            "vars.yml",
+        ]
+
+    def test_discover_glob(self, repo):
+        """Test that glob patterns are expanded."""
+        targets = discover_analysis_targets([str(repo / "roles" / "*" / "tasks" / "*.yml")])
+        assert len(targets) == 2
+
+    def test_classify_document(self):
+        """Test playbook and task file classification."""
+        assert classify_document("site.yml", [{"hosts": "all", "tasks": []}]) == "playbook"
+        assert classify_document("roles/x/tasks/main.yml", [{"name": "t", "ping": None}]) == "tasks"
+        assert classify_document("vars.yml", {"key": "value"}) is None
+
+    def test_prepare_statuses(self, repo):
+        """Test that preparation reports invalid and skipped files."""
+        assert prepare_analysis_target(str(repo / "site.yml"))["status"] == "pending"
+        assert prepare_analysis_target(str(repo / "broken.yml"))["status"] == "invalid"
+        assert prepare_analysis_target(str(repo / "vars.yml"))["status"] == "skipped"
+        assert prepare_analysis_target(str(repo / "missing.yml"))["status"] == "error"
+
+
+class TestBatchAnalyzer:
+    """Tests for the batch analyzer."""
+
+    def test_run_batches_and_summarizes(self, repo):
+        """Test that valid files are analyzed in batches and all results are reported."""
+        generator = FakeGenerator()
+        results = []
+        analyzer = BatchAnalyzer(generator, workers=2, batch_size=2, on_result=results.append)
+
+        summary = analyzer.run(discover_analysis_targets([str(repo)]))
+
+        assert summary["total"] == 5
+        assert summary["analyzed"] == 3
+        assert summary["invalid"] == 1
+        assert summary["skipped"] == 1
+        assert summary["issues"] == 3
+        # Both roles share identical task files, so only two units are generated
+        assert summary["units_generated"] == 2
+        assert summary["tokens_used"] == 20
+        assert generator.batches == [2]
+
+        assert len(results) == 5
+        analyzed = [r for r in results if r["status"] == "analyzed"]
+        assert all("content" not in r for r in results)
+        assert analyzed[0]["structured_analysis"]["issues"] == ["Missing become"]
+
+    def test_generation_failure_marks_errors(self, repo):
+        """Test that a failing backend produces error records instead of raising."""
+        class FailingGenerator:
+            def generate_batch(self, prompts, **params):
+                raise RuntimeError("model crashed")
+
+        results = []
+        analyzer = BatchAnalyzer(FailingGenerator(), workers=1, on_result=results.append)
+        summary = analyzer.run([str(repo / "site.yml")])
+
+        assert summary["error"] == 1
+        assert "model crashed" in results[0]["error"]
+
+    def test_missing_results_mark_errors(self, repo):
+        """Test that units the backend returned no result for produce error records."""
+        class ShortGenerator(FakeGenerator):
+            def generate_batch(self, prompts, **params):
+                return super().generate_batch(prompts, **params)[:1]
+
+        results = []
+        analyzer = BatchAnalyzer(ShortGenerator(), workers=1, batch_size=2, on_result=results.append)
+        summary = analyzer.run([str(repo / "site.yml"), str(repo / "roles" / "web" / "tasks" / "main.yml")])
+
+        assert len(results) == 2
+        assert summary["analyzed"] == 1
+        assert summary["error"] == 1
+        assert summary["units_generated"] == 1
+        assert [r["error"] for r in results if r["status"] == "error"] == [
+            "Backend returned 1 results for 2 prompts"]
+
+    def test_playbooks_are_split_into_plays(self, tmp_path):
+        """Test that each play of a multi-play playbook is a separate unit."""
+        playbook = tmp_path / "multi.yml"
+        playbook.write_text(PLAYBOOK + PLAYBOOK.replace("---\n", "").replace("web", "db"))
+
+        record = prepare_analysis_target(str(playbook))
+        assert len(record["units"]) == 2
+        assert record["units"][0]["hash"] != record["units"][1]["hash"]
+
+    def test_merge_analyses(self):
+        """Test that unit analyses merge into one deduplicated analysis."""
+        merged = merge_analyses([
+            {"summary": "Play one", "issues": ["a"], "security": [], "best_practices": ["x"]},
+            {"summary": "Play two", "issues": ["a", "b"], "security": ["s"], "best_practices": []},
+        ])
+        assert merged["summary"] == "Play one\n\nPlay two"
+        assert merged["issues"] == ["a", "b"]
+        assert merged["security"] == ["s"]
+
+    def test_cache_skips_unchanged_units(self, repo, tmp_path):
+        """Test that a second run only generates units whose content changed."""
+        cache_path = tmp_path / "cache" / "analysis.json"
+        targets = discover_analysis_targets([str(repo)])
+
+        first = FakeGenerator()
+        cache = AnalysisCache(cache_path, "model", "v1").load()
+        BatchAnalyzer(first, workers=1, cache=cache).run(targets)
+        assert sum(first.batches) == 2
+
+        # Comments and formatting changes do not invalidate the cache
+        (repo / "site.yml").write_text("# reformatted\n" + PLAYBOOK.replace("  apt:", "  apt:  "))
+        (repo / "roles" / "web" / "tasks" / "main.yml").write_text(TASKS.replace("started", "restarted"))
+
+        second = FakeGenerator()
+        results = []
+        cache = AnalysisCache(cache_path, "model", "v1").load()
+        summary = BatchAnalyzer(second, workers=1, cache=cache, on_result=results.append).run(targets)
+
+        assert second.batches == [1]
+        assert summary["units_cached"] == 2
+        cached = {os.path.basename(os.path.dirname(os.path.dirname(r["path"]))): r["cached"]
+                  for r in results if r["status"] == "analyzed" and "roles" in r["path"]}
+        assert cached == {"web": False, "db": True}
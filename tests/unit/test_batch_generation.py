@@ -0,0 +1,177 @@
+"""
+Unit tests for offline bulk playbook generation.
+"""
+import os
+import sys
+import json
+import pytest
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.llm_engine.batch_generation import (
+    BulkGenerator,
+    bucket_by_length,
+    load_completed_ids,
+    read_generation_requests,
+)
+
+PLAYBOOK_RESPONSE = """```yaml
+---
+- name: Install nginx
+  hosts: all
+  tasks:
+    - name: Install nginx
+      apt:
+        name: nginx
+```"""
+
+
+class FakeGenerator:
+    """Generator that returns a canned playbook and records batches."""
+
+    def __init__(self, fail_on_batch=None):
+        self.batches = []
+        self.fail_on_batch = fail_on_batch
+
+    def count_tokens(self, texts):
+        return [len(text.split()) for text in texts]
+
+    def generate_batch(self, prompts, **params):
+        self.batches.append(len(prompts))
+        if self.fail_on_batch == len(self.batches):
+            raise KeyboardInterrupt
+        return [{"index": i, "text": PLAYBOOK_RESPONSE, "tokens_used": 7} for i in range(len(prompts))]
+
+
+@pytest.fixture
+def input_file(tmp_path):
+    path = tmp_path / "tasks.jsonl"
+    lines = [json.dumps({"id": f"t{i}", "description": "Install nginx " + "on web servers " * i})
+             for i in range(5)]
+    lines.insert(2, "not json")
+    lines.append(json.dumps({"description": "Configure IIS", "target_os": "windows"}))
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+class TestBucketing:
+    """Tests for length bucketing."""
+
+    def test_buckets_group_similar_lengths(self):
+        """Test that items are sorted by length before being cut into batches."""
+        items = ["a", "b", "c", "d", "e"]
+        batches = bucket_by_length(items, [50, 1, 40, 2, 45], batch_size=2)
+        assert batches == [["b", "d"], ["c", "e"], ["a"]]
+
+    def test_max_batch_tokens_closes_batches_early(self):
+        """Test that the padded-token bound limits batch size."""
+        batches = bucket_by_length(["a", "b", "c"], [10, 10, 30], batch_size=8, max_batch_tokens=40)
+        assert batches == [["a", "b"], ["c"]]
+
+
+class TestBulkGenerator:
+    """Tests for the bulk generator."""
+
+    def test_read_requests(self, input_file):
+        """Test that bad lines are reported and ids default to line numbers."""
+        requests, errors = read_generation_requests(str(input_file))
+        assert len(requests) == 6
+        assert requests[-1]["id"] == "line-7"
+        assert errors == [
+            "Line 3: invalid JSON: Expecting value: line 1 column 1 (char 0)"
+        ]
+
+    def test_run_writes_validated_results(self, input_file, tmp_path):
+        """Test that every request gets a validated result record."""
+        output = tmp_path / "out.jsonl"
+        generator = FakeGenerator()
+        requests, _ = read_generation_requests(str(input_file))
+
+        summary = BulkGenerator(generator, batch_size=4).run(requests, str(output))
+
+        records = [json.loads(line) for line in output.read_text().splitlines()]
+        assert sorted(r["id"] for r in records) == sorted(r["id"] for r in requests)
+        assert all(r["is_valid"] for r in records)
+        assert records[0]["validation_message"]
+        assert generator.batches == [4, 2]
+        assert summary["valid"] == 6
+        assert summary["tokens_used"] == 42
+        assert summary["padded_prompt_tokens"] >= summary["prompt_tokens"]
+
+    def test_interrupted_run_resumes(self, input_file, tmp_path):
+        """Test that a second run only generates requests missing from the output."""
+        output = tmp_path / "out.jsonl"
+        requests, _ = read_generation_requests(str(input_file))
+
+        with pytest.raises(KeyboardInterrupt):
+            BulkGenerator(FakeGenerator(fail_on_batch=2), batch_size=2).run(requests, str(output))
+        with open(output, "a") as f:
+            f.write('{"id": "partial')
+        assert len(load_completed_ids(str(output))) == 2
+
+        generator = FakeGenerator()
+        requests, _ = read_generation_requests(str(input_file))
+        summary = BulkGenerator(generator, batch_size=2).run(requests, str(output))
+
+        assert summary["resumed"] == 2
+        assert generator.batches == [2, 2]
+        ids = [json.loads(line)["id"] for line in output.read_text().splitlines()]
+        assert sorted(ids) == sorted(r["id"] for r in requests)
+
+    def test_generation_failure_records_errors(self, input_file, tmp_path):
+        """Test that a failing backend produces error records instead of raising."""
+        class FailingGenerator:
+            def generate_batch(self, prompts, **params):
+                raise RuntimeError("out of memory")
+
+        output = tmp_path / "out.jsonl"
+        requests, _ = read_generation_requests(str(input_file))
+        summary = BulkGenerator(FailingGenerator()).run(requests, str(output))
+
+        assert summary["error"] == 6
+        assert "out of memory" in json.loads(output.read_text().splitlines()[0])["error"]
+
+    def test_bad_lines_in_the_middle_are_kept(self, tmp_path):
+        """Test that only an unterminated last line is truncated, unreadable lines are skipped."""
+        output = tmp_path / "out.jsonl"
+        output.write_text('{"id": "a", "status": "ok"}\n\nnot json\n{"id": "b", "status": "ok"}\n{"id": "c"')
+
+        assert load_completed_ids(str(output)) == {"a", "b"}
+        assert output.read_text().endswith('{"id": "b", "status": "ok"}\n')
+        assert "not json" in output.read_text()
+
+    def test_missing_results_are_recorded_as_errors(self, input_file, tmp_path):
+        """Test that requests without a result from the backend get error records."""
+        class ShortGenerator(FakeGenerator):
+            def generate_batch(self, prompts, **params):
+                return super().generate_batch(prompts, **params)[:1]
+
+        output = tmp_path / "out.jsonl"
+        requests, _ = read_generation_requests(str(input_file))
+        summary = BulkGenerator(ShortGenerator(), batch_size=2).run(requests, str(output))
+
+        records = [json.loads(line) for line in output.read_text().splitlines()]
+        assert len(records) == len(requests)
+        assert summary["generated"] + summary["error"] == len(requests)
+        assert summary["error"] == 3
+        assert "returned 1 results for 2 prompts" in [r for r in records if r["status"] == "error"][0]["error"]
+
+    def test_retried_errors_are_replaced(self, input_file, tmp_path):
+        """Test that resuming keeps one record per id, dropping the superseded errors."""
+        class FailingGenerator:
+            def generate_batch(self, prompts, **params):
+                raise RuntimeError("out of memory")
+
+        output = tmp_path / "out.jsonl"
+        requests, _ = read_generation_requests(str(input_file))
+        BulkGenerator(FailingGenerator()).run(requests, str(output))
+
+        requests, _ = read_generation_requests(str(input_file))
+        summary = BulkGenerator(FakeGenerator()).run(requests, str(output))
+
+        records = [json.loads(line) for line in output.read_text().splitlines()]
+        assert summary["generated"] == 6
+        assert sorted(r["id"] for r in records) == sorted(r["id"] for r in requests)
+        assert all(r["status"] == "ok" for r in records)
+        assert not os.path.exists(str(output) + ".tmp")
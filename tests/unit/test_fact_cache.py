@@ -0,0 +1,83 @@
+"""
+Unit tests for reading cached Ansible facts.
+"""
+import os
+import sys
+import json
+import time
+import pytest
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.llm_engine.fact_cache import load_fact_cache, minimal_gather_subset, normalize_facts, required_facts
+
+
+def _write_entry(directory, name, facts, age=0):
+    path = directory / name
+    path.write_text(json.dumps(facts))
+    if age:
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+
+
+class TestFactCache:
+    """Tests for the fact cache loader."""
+
+    def test_reads_jsonfile_cache(self, tmp_path):
+        """Test that every host entry with the prefix is read."""
+        _write_entry(tmp_path, "facts_web1", {"ansible_distribution": "Ubuntu", "ansible_os_family": "Debian"})
+        _write_entry(tmp_path, "facts_db1", {"ansible_distribution": "Rocky"})
+        _write_entry(tmp_path, "other_web2", {"ansible_distribution": "Debian"})
+        _write_entry(tmp_path, ".facts_tmp", {})
+
+        hosts = load_fact_cache(tmp_path, prefix="facts_")
+        assert sorted(hosts) == ["db1", "web1"]
+        assert hosts["web1"]["ansible_os_family"] == "Debian"
+
+    def test_skips_stale_and_corrupt_entries(self, tmp_path):
+        """Test that entries older than the timeout and invalid files are ignored."""
+        _write_entry(tmp_path, "fresh", {"ansible_distribution": "Ubuntu"})
+        _write_entry(tmp_path, "stale", {"ansible_distribution": "Ubuntu"}, age=7200)
+        (tmp_path / "corrupt").write_text("{not json")
+
+        assert sorted(load_fact_cache(tmp_path, timeout=3600)) == ["fresh"]
+        assert sorted(load_fact_cache(tmp_path)) == ["fresh", "stale"]
+
+    def test_missing_directory(self, tmp_path):
+        """Test that a missing cache directory yields no hosts."""
+        assert load_fact_cache(tmp_path / "missing") == {}
+
+    @pytest.mark.parametrize("facts", [
+        {"ansible_os_family": "RedHat"},
+        {"os_family": "RedHat"},
+        {"ansible_facts": {"os_family": "RedHat"}},
+    ])
+    def test_normalize_facts(self, facts):
+        """Test that setup results and unprefixed facts are normalized."""
+        assert normalize_facts(facts)["ansible_os_family"] == "RedHat"
+
+    def test_mapping_source(self):
+        """Test that an in-memory mapping is accepted."""
+        hosts = load_fact_cache({"web1": {"distribution": "Ubuntu"}, "web2": None})
+        assert hosts == {"web1": {"ansible_distribution": "Ubuntu"}, "web2": {}}
+
+
+class TestMinimalGathering:
+    """Tests for the facts and gather_subset of operations."""
+
+    def test_required_facts(self):
+        """Test that the facts of several operations are merged."""
+        assert required_facts(["packages", "services"]) == [
+            "distribution", "distribution_version", "os_family", "pkg_mgr", "service_mgr"]
+        with pytest.raises(ValueError):
+            required_facts(["everything"])
+
+    def test_minimal_gather_subset(self):
+        """Test that only the needed collectors are gathered."""
+        assert minimal_gather_subset(required_facts(["packages"])) == ["!all", "!min", "distribution", "pkg_mgr"]
+        assert minimal_gather_subset(["kernel", "memtotal_mb", "default_ipv4"]) == [
+            "!all", "!min", "hardware", "network", "platform"]
+        # Facts of other min collectors need the whole min subset
+        assert minimal_gather_subset(["user_id", "processor"]) == ["!all", "hardware"]
+        assert minimal_gather_subset(["custom_fact"]) == ["all"]
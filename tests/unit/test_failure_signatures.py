@@ -0,0 +1,102 @@
+"""
+Unit tests for llm_advisor failure signatures.
+"""
+import os
+import sys
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.ansible_plugins.failure_signatures import (
+    FailureGroups,
+    failure_signature,
+    normalize_failure_text,
+)
+from src.llm_engine.analysis_cache import AnalysisCache
+
+
+def _payload(host, error):
+    return {
+        "task": "Start nginx",
+        "module": "service",
+        "task_args": {"name": "nginx", "state": "started"},
+        "error": error,
+        "host": host,
+        "playbook": "site.yml",
+    }
+
+
+class TestNormalization:
+    """Tests for masking host-specific details."""
+
+    def test_masks_host_details(self):
+        """Test that hosts, addresses, timestamps, paths and ids are masked."""
+        text = ("web01: connect to web01.dc1.example.com (10.0.0.5:22) failed at "
+                "2024-05-01T10:00:00Z, see /var/log/app/web01.log (pid 48213)")
+        assert normalize_failure_text(text, ["web01"]) == (
+            "<HOST>: connect to <HOST> (<IP>) failed at <TIME>, see <PATH> (pid <N>)"
+        )
+
+    def test_keeps_meaningful_text(self):
+        """Test that ordinary words, short numbers and file names survive."""
+        text = "No package matching 'nginx' found, rc=1 in nginx.conf"
+        assert normalize_failure_text(text) == text
+
+    def test_same_failure_on_different_hosts_has_same_signature(self):
+        """Test that host-specific errors share a signature while different errors do not."""
+        first, _ = failure_signature("t", "service", {"name": "nginx"},
+                                     "Unable to start service on web01 at 12:00:01", ["web01"])
+        second, _ = failure_signature("t", "service", {"name": "nginx"},
+                                      "Unable to start service on db7 at 13:14:15", ["db7"])
+        other, _ = failure_signature("t", "service", {"name": "httpd"},
+                                     "Unable to start service on db7 at 13:14:15", ["db7"])
+        assert first == second
+        assert first != other
+
+
+class TestFailureGroups:
+    """Tests for grouping failures by signature."""
+
+    def test_failures_fan_in_to_one_group(self):
+        """Test that identical failures on many hosts form one group."""
+        groups = FailureGroups()
+        results = [groups.add(f"web{i:03d}", _payload(f"web{i:03d}", f"web{i:03d}: service not found"))
+                   for i in range(500)]
+
+        assert [is_new for _, is_new in results].count(True) == 1
+        assert len(groups.groups) == 1
+        assert groups.host_count == 500
+        assert results[-1][0]["hosts"][0] == "web000"
+
+    def test_released_group_is_analyzed_again(self):
+        """Test that a group whose analysis could not be queued is offered again."""
+        groups = FailureGroups()
+        group, is_new = groups.add("web01", _payload("web01", "web01: service not found"))
+        assert is_new
+        groups.release(group["signature"])
+
+        group, is_new = groups.add("web02", _payload("web02", "web02: service not found"))
+        assert is_new
+        assert group["payload"]["host"] == "web02"
+        assert group["hosts"] == ["web01", "web02"]
+        assert not groups.add("web03", _payload("web03", "web03: service not found"))[1]
+
+    def test_advice_is_cached_across_runs(self, tmp_path):
+        """Test that resolved advice is served from the cache in a later run."""
+        path = tmp_path / "advice.json"
+        cache = AnalysisCache(path, "http://svc", "v1").load()
+        groups = FailureGroups(cache)
+        group, _ = groups.add("web01", _payload("web01", "web01: service not found"))
+        assert group["advice"] is None
+        groups.resolve(group["signature"], {"analysis": "Install nginx first", "tokens_used": 5})
+        cache.save()
+
+        later = FailureGroups(AnalysisCache(path, "http://svc", "v1").load())
+        group, is_new = later.add("db02", _payload("db02", "db02: service not found"))
+        assert is_new
+        assert group["cached"]
+        assert group["advice"]["analysis"] == "Install nginx first"
+
+        other_service = FailureGroups(AnalysisCache(path, "http://other", "v1").load())
+        group, _ = other_service.add("db02", _payload("db02", "db02: service not found"))
+        assert group["advice"] is None
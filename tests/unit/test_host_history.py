@@ -0,0 +1,72 @@
+"""
+Unit tests for the llm_advisor per-host history.
+"""
+import os
+import sys
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.ansible_plugins.host_history import HostHistory, TaskOutcome
+from src.llm_engine.inventory_analysis import estimate_tokens
+
+
+class TestHostHistory:
+    """Tests for the per-host ring buffers."""
+
+    def test_buffer_keeps_most_recent_outcomes(self):
+        """Test that each host keeps at most ``size`` outcomes, newest last."""
+        history = HostHistory(size=3)
+        for i in range(5):
+            history.record("web01", f"uuid-{i}", f"task {i}", "command", "ok", {"msg": f"done {i}"})
+
+        outcomes = list(history.outcomes["web01"])
+        assert [o.task for o in outcomes] == ["task 2", "task 3", "task 4"]
+        assert not hasattr(outcomes[0], "__dict__")
+
+    def test_hosts_are_tracked_independently(self):
+        """Test that interleaved results (free strategy) are attributed by host."""
+        history = HostHistory()
+        history.record("web01", "u1", "install", "apt", "changed", {})
+        history.record("db01", "u2", "configure", "template", "ok", {})
+        history.record("web01", "u3", "start", "service", "failed", {"msg": "boom"})
+
+        assert [o.task for o in history.outcomes["web01"]] == ["install", "start"]
+        assert [o.task for o in history.outcomes["db01"]] == ["configure"]
+
+    def test_same_task_updates_record(self):
+        """Test that a repeated result for the same task replaces the previous record."""
+        history = HostHistory()
+        history.record("web01", "u1", "loop", "apt", "ok", {"msg": "item 1"})
+        history.record("web01", "u1", "loop", "apt", "failed", {"msg": "item 2 failed"})
+
+        assert len(history.outcomes["web01"]) == 1
+        assert history.outcomes["web01"][0].status == "failed"
+
+    def test_messages_are_truncated(self):
+        """Test that stored messages are bounded."""
+        history = HostHistory(message_chars=20)
+        history.record("web01", "u1", "t", "shell", "failed", {"stderr": "x" * 1000})
+        assert len(history.outcomes["web01"][0].message) == 20
+
+    def test_failure_context_respects_budget(self):
+        """Test that context includes host details and the newest outcomes that fit."""
+        history = HostHistory(size=50)
+        history.record("web01", "setup", "Gathering Facts", "setup", "ok",
+                       {"ansible_facts": {"ansible_distribution": "Ubuntu", "ansible_os_family": "Debian"}})
+        for i in range(40):
+            history.record("web01", f"u{i}", f"task {i}", "command", "ok", {"msg": "done"})
+
+        details, previous = history.failure_context("web01", token_budget=60, exclude_uuid="u39",
+                                                     address="10.0.0.5", groups=["all", "web"])
+
+        assert details == "web01; address 10.0.0.5; groups web; distribution Ubuntu; os_family Debian"
+        assert estimate_tokens(details) + estimate_tokens(previous) <= 62
+        lines = previous.splitlines()
+        assert lines[-1].startswith("- task 38 ")
+        assert "task 39" not in previous
+
+    def test_outcome_line(self):
+        """Test the prompt line of an outcome."""
+        outcome = TaskOutcome("u1", "Start nginx", "service", "failed", "not found")
+        assert outcome.describe() == "- Start nginx (service): failed: not found"
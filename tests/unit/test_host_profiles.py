@@ -0,0 +1,113 @@
+"""
+Unit tests for profile-based playbook generation.
+"""
+import os
+import sys
+import json
+import pytest
+from unittest.mock import MagicMock
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.llm_engine.host_profiles import ProfilePlaybookGenerator, build_profile_prompt, cluster_hosts
+
+FACTS = {
+    "web1": {"ansible_distribution": "Ubuntu", "ansible_distribution_major_version": "22",
+             "ansible_default_ipv4": {"address": "10.0.0.1"}},
+    "web2": {"ansible_distribution": "Ubuntu", "ansible_distribution_major_version": "22",
+             "ansible_default_ipv4": {"address": "10.0.0.2"}},
+    "web3": {"ansible_distribution": "Ubuntu", "ansible_distribution_major_version": "20",
+             "ansible_default_ipv4": {"address": "10.0.0.3"}},
+    "db1": {"ansible_distribution": "Rocky", "ansible_distribution_major_version": "9",
+            "ansible_default_ipv4": {"address": "10.0.1.1"}},
+}
+
+HOST_VARS = {"web1": {"role": "web"}, "web2": {"role": "web"}, "web3": {"role": "web"},
+             "db1": {"role": "db", "db_port": 5432}}
+
+TEMPLATE = """Done.
+```yaml
+---
+- hosts: << inventory_hostname >>
+  tasks:
+    - name: Listen on << ansible_default_ipv4.address >>
+      ansible.builtin.lineinfile:
+        path: /etc/app.conf
+        line: "listen {{ app_port | default(80) }}"
+<% if role == "db" %>
+    - name: Open << db_port >>
+      ansible.builtin.command: echo << db_port >>
+<% endif %>
+```"""
+
+
+class TestClustering:
+    """Tests for grouping hosts by profile."""
+
+    def test_hosts_are_grouped_by_distribution_version_and_vars(self):
+        """Test that only hosts with the same profile share a cluster."""
+        clusters = cluster_hosts(FACTS, HOST_VARS, profile_vars=["role"])
+
+        assert sorted(clusters.values()) == [["db1"], ["web1", "web2"], ["web3"]]
+        profile = next(p for p, hosts in clusters.items() if hosts == ["web1", "web2"])
+        assert profile.describe() == {"distribution": "ubuntu", "version": "22", "os_family": "Debian",
+                                      "package_manager": "apt", "role": "web"}
+
+    def test_fact_cache_directory(self, tmp_path):
+        """Test that a jsonfile fact cache can be clustered directly."""
+        for host, facts in FACTS.items():
+            (tmp_path / host).write_text(json.dumps(facts))
+
+        assert len(cluster_hosts(str(tmp_path))) == 3
+
+    def test_prompt_lists_profile_and_variables(self):
+        """Test that the prompt describes the profile and the available placeholders."""
+        profile, hosts = next(iter(cluster_hosts(FACTS).items()))
+
+        prompt = build_profile_prompt("Install nginx", profile, hosts, ["inventory_hostname", "role"])
+
+        assert "Install nginx" in prompt
+        assert "os_family: RedHat" in prompt
+        assert "<< variable >>" in prompt
+        assert "inventory_hostname, role" in prompt
+        assert "{{ ... }}" in prompt
+
+
+class TestProfilePlaybookGenerator:
+    """Tests for one LLM call per profile and per-host rendering."""
+
+    def test_one_batched_call_per_profile(self):
+        """Test that every profile costs one completion in a single batch and every host gets a playbook."""
+        pytest.importorskip("jinja2")
+        backend = MagicMock(spec=["generate_batch"])
+        backend.generate_batch.side_effect = lambda prompts, **params: [
+            {"index": i, "text": TEMPLATE} for i in range(len(prompts))]
+
+        result = ProfilePlaybookGenerator(backend, profile_vars=["role"]).generate(
+            "Configure the app", FACTS, host_vars=HOST_VARS)
+
+        backend.generate_batch.assert_called_once()
+        assert result["llm_calls"] == 3
+        assert result["errors"] == {}
+        assert sorted(result["playbooks"]) == ["db1", "web1", "web2", "web3"]
+        assert "- hosts: web2\n" in result["playbooks"]["web2"]
+        assert "Listen on 10.0.0.2" in result["playbooks"]["web2"]
+        assert "listen {{ app_port | default(80) }}" in result["playbooks"]["web2"]
+        assert "Open 5432" in result["playbooks"]["db1"]
+        assert "Open" not in result["playbooks"]["web1"]
+
+    def test_failures_are_reported_per_host(self):
+        """Test that missing playbooks and undefined placeholders become host errors."""
+        pytest.importorskip("jinja2")
+        responses = iter(["no playbook", "```yaml\n---\n- hosts: << missing >>\n```"])
+        backend = MagicMock(spec=["generate"])
+        backend.generate.side_effect = lambda prompt: next(responses)
+
+        result = ProfilePlaybookGenerator(backend).generate(
+            "Configure the app", {host: FACTS[host] for host in ("db1", "web1")})
+
+        assert result["playbooks"] == {}
+        assert result["errors"]["db1"] == "Failed to generate valid Ansible playbook"
+        assert result["errors"]["web1"].startswith("Rendering failed:")
+        assert [cluster["error"] is None for cluster in result["clusters"]] == [False, True]
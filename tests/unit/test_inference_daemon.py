@@ -0,0 +1,204 @@
+"""
+Unit tests for the inference daemon.
+"""
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+import pytest
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.llm_engine.inference_daemon import (
+    DaemonClient,
+    DaemonError,
+    InferenceDaemon,
+    LocalGenerator,
+    daemon_alive,
+    get_daemon_settings,
+    get_generator,
+    start_daemon,
+)
+
+
+class FakeBackend:
+    """Backend that echoes prompts instead of running a model."""
+    model_name = "fake-model"
+
+    def __init__(self):
+        self.calls = []
+
+    def generate_batch(self, prompts, **params):
+        self.calls.append((prompts, params))
+        return [
+            {"index": i, "text": f"echo: {prompt}", "tokens_used": len(prompt.split())}
+            for i, prompt in enumerate(prompts)
+        ]
+
+    def count_tokens(self, texts):
+        return [len(text.split()) for text in texts]
+
+
+@pytest.fixture
+def socket_dir():
+    # Unix socket paths are length-limited, so keep them short
+    path = tempfile.mkdtemp(prefix="llmd-")
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def _start_daemon(socket_path, backend, idle_timeout=0):
+    daemon = InferenceDaemon(backend, socket_path, idle_timeout=idle_timeout)
+    daemon.bind()
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    return daemon, thread
+
+
+class TestInferenceDaemon:
+    """Tests for the inference daemon and client."""
+
+    def test_generate_round_trip(self, socket_dir):
+        """Test that generation requests reach the backend and results come back."""
+        socket_path = os.path.join(socket_dir, "d.sock")
+        backend = FakeBackend()
+        daemon, thread = _start_daemon(socket_path, backend)
+
+        client = DaemonClient(socket_path)
+        assert client.is_running()
+        assert client.model_name == "fake-model"
+
+        result = client.generate("hello world", max_new_tokens=16)
+        assert result == {"index": 0, "text": "echo: hello world", "tokens_used": 2}
+        assert backend.calls[-1][1] == {"max_new_tokens": 16}
+
+        results = client.generate_batch(["a", "b c"])
+        assert [r["text"] for r in results] == ["echo: a", "echo: b c"]
+        assert client.status()["requests_served"] == 2
+        assert client.count_tokens(["one", "two words"]) == [1, 2]
+
+        client.shutdown()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+        assert not os.path.exists(socket_path)
+
+    def test_invalid_request_reports_error(self, socket_dir):
+        """Test that malformed generate requests raise DaemonError on the client."""
+        socket_path = os.path.join(socket_dir, "d.sock")
+        daemon, thread = _start_daemon(socket_path, FakeBackend())
+
+        client = DaemonClient(socket_path)
+        with pytest.raises(DaemonError):
+            client._request({"op": "generate", "prompts": "not a list"})
+        with pytest.raises(DaemonError):
+            client._request({"op": "unknown"})
+
+        client.shutdown()
+        thread.join(timeout=5)
+
+    def test_idle_timeout_stops_daemon(self, socket_dir):
+        """Test that the daemon exits after the idle timeout."""
+        socket_path = os.path.join(socket_dir, "d.sock")
+        daemon, thread = _start_daemon(socket_path, FakeBackend(), idle_timeout=0.2)
+
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+        assert not DaemonClient(socket_path).is_running()
+
+    def test_refuses_to_replace_running_daemon(self, socket_dir):
+        """Test that a second daemon cannot bind a live socket."""
+        socket_path = os.path.join(socket_dir, "d.sock")
+        daemon, thread = _start_daemon(socket_path, FakeBackend())
+
+        with pytest.raises(DaemonError):
+            InferenceDaemon(FakeBackend(), socket_path).bind()
+
+        DaemonClient(socket_path).shutdown()
+        thread.join(timeout=5)
+
+    def test_loading_daemon_keeps_its_socket(self, socket_dir, monkeypatch):
+        """Test that a daemon still loading its model is neither replaced nor started twice."""
+        socket_path = os.path.join(socket_dir, "d.sock")
+        loading = InferenceDaemon(FakeBackend(), socket_path)
+        loading.bind()
+        assert daemon_alive(socket_path)
+        assert not DaemonClient(socket_path).is_running()
+
+        with pytest.raises(DaemonError):
+            InferenceDaemon(FakeBackend(), socket_path).bind()
+        assert os.path.exists(socket_path)
+
+        spawned = []
+        monkeypatch.setattr("src.llm_engine.inference_daemon._spawn_daemon", lambda *args: spawned.append(args))
+        # The model finishes loading while start_daemon waits
+        thread = threading.Thread(target=loading.serve_forever, daemon=True)
+        threading.Timer(0.3, thread.start).start()
+        settings = get_daemon_settings({"daemon": {"socket_path": socket_path, "startup_timeout": 30}})
+        client = start_daemon(settings=settings)
+
+        assert spawned == []
+        assert client.generate("hi")["text"] == "echo: hi"
+
+        client.shutdown()
+        thread.join(timeout=5)
+        assert not daemon_alive(socket_path)
+
+    def test_get_generator_falls_back_to_local(self, socket_dir):
+        """Test that get_generator loads in-process when no daemon is running."""
+        settings = get_daemon_settings({"daemon": {"socket_path": os.path.join(socket_dir, "none.sock")}})
+        generator = get_generator(model_name="some/model", settings=settings)
+
+        assert isinstance(generator, LocalGenerator)
+        assert generator.model_name == "some/model"
+        assert generator.model is None
+
+    def test_get_generator_prefers_daemon(self, socket_dir):
+        """Test that get_generator returns a client when a daemon is running."""
+        socket_path = os.path.join(socket_dir, "d.sock")
+        daemon, thread = _start_daemon(socket_path, FakeBackend())
+
+        settings = get_daemon_settings({"daemon": {"socket_path": socket_path}})
+        generator = get_generator(settings=settings)
+        assert isinstance(generator, DaemonClient)
+
+        generator.shutdown()
+        thread.join(timeout=5)
+
+    def test_concurrent_starts_spawn_one_daemon(self, socket_dir, monkeypatch):
+        """Test that callers racing to auto-start share a single daemon."""
+        socket_path = os.path.join(socket_dir, "d.sock")
+        spawned = []
+
+        def spawn(model_name, quantization, settings):
+            # Simulate a daemon that takes a while to come up
+            time.sleep(0.3)
+            spawned.append(_start_daemon(settings["socket_path"], FakeBackend()))
+
+        monkeypatch.setattr("src.llm_engine.inference_daemon._spawn_daemon", spawn)
+        settings = get_daemon_settings({"daemon": {"socket_path": socket_path}})
+        clients = []
+        starters = [threading.Thread(target=lambda: clients.append(start_daemon(settings=settings)))
+                    for _ in range(4)]
+        for starter in starters:
+            starter.start()
+        for starter in starters:
+            starter.join(timeout=10)
+
+        assert len(spawned) == 1
+        assert len(clients) == 4
+        assert clients[0].generate("hi there")["text"] == "echo: hi there"
+
+        clients[0].shutdown()
+        spawned[0][1].join(timeout=5)
+
+    def test_settings_environment_overrides(self, monkeypatch):
+        """Test that environment variables override configured daemon settings."""
+        monkeypatch.setenv("ANSIBLE_LLM_DAEMON_AUTO_START", "true")
+        monkeypatch.setenv("ANSIBLE_LLM_DAEMON_IDLE_TIMEOUT", "30")
+
+        settings = get_daemon_settings({"daemon": {"auto_start": False, "idle_timeout": 900}})
+        assert settings["auto_start"] is True
+        assert settings["idle_timeout"] == 30
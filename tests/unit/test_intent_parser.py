@@ -0,0 +1,104 @@
+"""
+Unit tests for the rule-based intent parser.
+"""
+import os
+import sys
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.llm_engine.intent_parser import DEFAULT_MIN_CONFIDENCE, IntentParser, describe_intent
+
+parser = IntentParser(["ubuntu", "debian", "centos", "rocky"])
+
+
+class TestIntentParser:
+    """Tests for parsing requests into generator arguments."""
+
+    def test_packages_and_firewall(self):
+        """Test that a fully understood request has full confidence."""
+        intent = parser.parse("Install nginx and open port 80 on Ubuntu")
+
+        assert intent["confidence"] == 1.0
+        assert intent["packages"] == [{"names": ["nginx"], "state": "present"}]
+        assert intent["firewall_rules"] == [{"port": 80, "protocol": "tcp"}]
+        assert intent["distribution"] == "ubuntu"
+        assert intent["hosts"] == "all"
+
+    def test_lists_and_combined_verbs(self):
+        """Test that package lists stay together and "start and enable" is one clause."""
+        intent = parser.parse("Install nginx, git and curl, then start and enable nginx on web servers")
+
+        assert intent["confidence"] == 1.0
+        assert intent["packages"] == [{"names": ["nginx", "git", "curl"], "state": "present"}]
+        assert intent["services"] == [{"service_name": "nginx", "state": "started", "enabled": True}]
+        assert intent["hosts"] == "web"
+
+    def test_users_services_and_firewall_services(self):
+        """Test the user, service state and firewall service rules."""
+        intent = parser.parse("create user deploy in groups sudo and docker; ensure sshd is running; "
+                              "allow https through the firewall on hosts db01")
+
+        assert intent["confidence"] == 1.0
+        assert intent["users"] == [{"username": "deploy", "state": "present", "groups": ["sudo", "docker"]}]
+        assert intent["services"] == [{"service_name": "sshd", "state": "started", "enabled": None}]
+        assert intent["firewall_rules"] == [{"service_name": "https"}]
+        assert intent["hosts"] == "db01"
+        assert describe_intent(intent) == ("Create user deploy in groups sudo, docker; Make service sshd started; "
+                                           "Allow https in the firewall on db01 (any supported distribution).")
+
+    def test_unknown_parts_lower_confidence(self):
+        """Test that requests with parts the rules do not cover fall below the threshold."""
+        assert parser.parse("Install and configure Nginx")["confidence"] == 0.0
+        assert parser.parse("install nginx with ssl")["confidence"] == 0.0
+
+        intent = parser.parse("install nginx and configure a reverse proxy to the app")
+        assert 0 < intent["confidence"] < 0.5
+        assert intent["unparsed"] == ["configure a reverse proxy to the app"]
+
+    def test_system_upgrades(self):
+        """Test that whole-system upgrades are not read as packages named "system" or "everything"."""
+        for request in ("update the system on ubuntu", "update system packages", "upgrade everything",
+                        "upgrade all packages"):
+            intent = parser.parse(request)
+            assert intent["system_upgrade"] is True, request
+            assert intent["packages"] == [], request
+            assert intent["confidence"] == 1.0, request
+
+        assert describe_intent(parser.parse("update the system on ubuntu")) == (
+            "Upgrade all installed packages on all (ubuntu).")
+        assert parser.parse("install everything")["confidence"] == 0.0
+        assert parser.parse("install system packages")["confidence"] == 0.0
+
+    def test_ambiguous_verbs_need_the_word_package(self):
+        """Test that "delete" and "update" only manage packages when the request says so."""
+        for request in ("delete the logs on ubuntu", "update the cache", "purge old backups"):
+            intent = parser.parse(request)
+            assert intent["packages"] == [], request
+            assert intent["confidence"] == 0.0, request
+
+        assert parser.parse("delete package nginx")["packages"] == [{"names": ["nginx"], "state": "absent"}]
+        assert parser.parse("update the nginx packages")["packages"] == [{"names": ["nginx"], "state": "latest"}]
+
+    def test_unknown_names_cap_confidence(self):
+        """Test that names the parser does not know keep the confidence below the fast path threshold."""
+        intent = parser.parse("disable selinux")
+        assert intent["unknown_names"] == ["selinux"]
+        assert intent["confidence"] < DEFAULT_MIN_CONFIDENCE
+
+        assert parser.parse("remove foo")["confidence"] < DEFAULT_MIN_CONFIDENCE
+        assert IntentParser(known_names=["foo"]).parse("remove foo")["confidence"] == 1.0
+
+    def test_protocol_per_port(self):
+        """Test that a protocol written after one port applies to that port only."""
+        intent = parser.parse("open port 80 and 443/udp")
+        assert intent["firewall_rules"] == [{"port": 80, "protocol": "tcp"}, {"port": 443, "protocol": "udp"}]
+
+        intent = parser.parse("open udp ports 53 and 123")
+        assert intent["firewall_rules"] == [{"port": 53, "protocol": "udp"}, {"port": 123, "protocol": "udp"}]
+
+    def test_classifier_scales_confidence(self):
+        """Test that the optional classifier multiplies the rule confidence."""
+        intent = IntentParser(classifier=lambda request: 0.5).parse("install git")
+
+        assert intent["confidence"] == 0.5
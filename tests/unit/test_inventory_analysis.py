@@ -0,0 +1,185 @@
+"""
+Unit tests for streaming inventory analysis.
+"""
+import os
+import sys
+import json
+import pytest
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.llm_engine.inventory_analysis import (
+    analyze_inventory,
+    build_inventory_index,
+    detect_inventory_format,
+    estimate_tokens,
+    expand_host_pattern,
+    summarize_statistics,
+)
+
+INI_INVENTORY = """
+# Top-level hosts
+bastion.example.com ansible_user=admin
+
+[web]
+web[01:03].example.com ansible_connection=ssh
+web01.example.com
+
+[db]
+db1.example.com ansible_host=10.0.0.5 ansible_port=2222
+
+[prod:children]
+web
+db
+
+[prod:vars]
+ntp_server=pool.ntp.org
+ansible_user=deploy
+
+[empty]
+"""
+
+YAML_INVENTORY = """
+all:
+  hosts:
+    bastion.example.com:
+      ansible_user: admin
+  children:
+    prod:
+      vars:
+        ntp_server: pool.ntp.org
+      children:
+        web:
+          hosts:
+            web01.example.com:
+              ansible_connection: ssh
+            web02.example.com:
+            web03.example.com:
+        db:
+          hosts:
+            db1.example.com:
+              ansible_host: 10.0.0.5
+    empty:
+"""
+
+JSON_INVENTORY = {
+    "_meta": {
+        "hostvars": {
+            "bastion.example.com": {"ansible_user": "admin"},
+            "db1.example.com": {"ansible_host": "10.0.0.5"},
+        }
+    },
+    "all": {"children": ["ungrouped", "prod", "empty"]},
+    "ungrouped": {"hosts": ["bastion.example.com"]},
+    "prod": {"children": ["web", "db"], "vars": {"ntp_server": "pool.ntp.org"}},
+    "web": {"hosts": ["web01.example.com", "web02.example.com", "web03.example.com"]},
+    "db": {"hosts": ["db1.example.com"]},
+    "empty": {},
+}
+
+
+@pytest.fixture(params=["ini", "yaml", "json"])
+def inventory_file(request, tmp_path):
+    if request.param == "ini":
+        path = tmp_path / "hosts"
+        path.write_text(INI_INVENTORY)
+    elif request.param == "yaml":
+        path = tmp_path / "hosts.yml"
+        path.write_text(YAML_INVENTORY)
+    else:
+        path = tmp_path / "hosts.json"
+        path.write_text(json.dumps(JSON_INVENTORY))
+    return str(path)
+
+
+class TestInventoryIndex:
+    """Tests for reading inventories into the index."""
+
+    def test_composition_is_the_same_for_every_format(self, inventory_file):
+        """Test that INI, YAML and JSON inventories produce the same composition."""
+        stats = build_inventory_index(inventory_file).statistics()
+
+        assert stats["hosts"] == 5
+        assert stats["groups"] == 4
+        assert stats["empty_groups"] == ["empty"]
+        assert stats["top_level_groups"] == [("empty", 0), ("prod", 4)]
+        assert stats["max_depth"] == 2
+        assert stats["membership"]["ungrouped"] == 1
+        assert stats["hosts_with_address"] == 1
+        assert ("prod", 4) in stats["largest_groups"]
+        assert stats["domains"] == [("example.com", 5)]
+
+    def test_ini_details(self, tmp_path):
+        """Test INI-specific parsing: ranges, duplicates and group vars."""
+        path = tmp_path / "hosts.ini"
+        path.write_text(INI_INVENTORY)
+        stats = build_inventory_index(str(path)).statistics()
+
+        assert stats["duplicate_definitions"] == 1
+        assert ("web#.example.com", 3) in stats["name_patterns"]
+        assert stats["group_var_keys"] == [("prod", ["ansible_user", "ntp_server"])]
+        assert ("deploy", 1) in stats["connection_settings"]["ansible_user"]
+
+    def test_statistics_are_deterministic(self, inventory_file):
+        """Test that repeated analysis gives identical results."""
+        first = analyze_inventory(inventory_file)
+        second = analyze_inventory(inventory_file)
+        assert first == second
+
+    def test_large_inventory(self, tmp_path):
+        """Test that a large generated inventory is indexed correctly."""
+        path = tmp_path / "large.ini"
+        with open(path, "w") as f:
+            for group in range(20):
+                f.write(f"[group{group}]\n")
+                for host in range(500):
+                    f.write(f"host{group}-{host}.dc.example.com ansible_host=10.{group}.{host // 256}.{host % 256}\n")
+            f.write("[all_groups:children]\n")
+            for group in range(20):
+                f.write(f"group{group}\n")
+
+        stats = build_inventory_index(str(path)).statistics()
+        assert stats["hosts"] == 10000
+        assert stats["largest_groups"][0] == ("all_groups", 10000)
+        assert stats["host_var_keys"] == [("ansible_host", 10000)]
+
+
+class TestHelpers:
+    """Tests for helper functions."""
+
+    def test_expand_host_pattern(self):
+        """Test numeric, zero-padded and alphabetic ranges."""
+        assert list(expand_host_pattern("web[01:03].x")) == ["web01.x", "web02.x", "web03.x"]
+        assert list(expand_host_pattern("db-[a:c]")) == ["db-a", "db-b", "db-c"]
+        assert list(expand_host_pattern("n[1:5:2]")) == ["n1", "n3", "n5"]
+        assert list(expand_host_pattern("plain")) == ["plain"]
+
+    def test_detect_inventory_format(self, tmp_path):
+        """Test format detection by extension and content."""
+        yaml_path = tmp_path / "inventory"
+        yaml_path.write_text("all:\n  hosts:\n")
+        ini_path = tmp_path / "hosts"
+        ini_path.write_text("[web]\nhost1\n")
+        json_path = tmp_path / "dump"
+        json_path.write_text('{"all": {}}')
+
+        assert detect_inventory_format(str(yaml_path)) == "yaml"
+        assert detect_inventory_format(str(ini_path)) == "ini"
+        assert detect_inventory_format(str(json_path)) == "json"
+
+    def test_summary_respects_token_budget(self, tmp_path):
+        """Test that summaries are trimmed to the budget, keeping the headline."""
+        path = tmp_path / "hosts.ini"
+        with open(path, "w") as f:
+            for group in range(50):
+                f.write(f"[group{group}]\nhost{group}\n")
+        stats = build_inventory_index(str(path)).statistics()
+
+        full = summarize_statistics(stats, token_budget=100000)
+        small = summarize_statistics(stats, token_budget=150)
+
+        assert estimate_tokens(small) <= 150
+        assert small.startswith("Inventory: 50 hosts in 50 groups")
+        assert "more" in small
+        assert len(small) < len(full)
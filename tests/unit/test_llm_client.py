@@ -0,0 +1,436 @@
+"""
+Unit tests for the shared plugin client.
+"""
+import os
+import sys
+import json
+import time
+import threading
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+pytest.importorskip("requests")
+
+from src.ansible_plugins.llm_client import (DiskCache, LLMClient, LLMClientError, PromptBatcher, cache_key,
+                                            get_client_settings)
+from src.ansible_plugins.module_utils.llm_http import post_with_retries, retry_delay
+
+
+class RecordingClient(LLMClient):
+    """Client that answers requests locally and records them."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.payloads = []
+
+    def post(self, path, payload):
+        self.payloads.append((path, payload))
+        return {"results": [f"{payload['operation']}: {text}" for text in payload["texts"]],
+                "tokens_used": 1}
+
+
+class GeneratingClient(LLMClient):
+    """Client that answers generation requests locally and records them."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.payloads = []
+
+    def post_url(self, url, payload, **kwargs):
+        self.payloads.append((url, payload))
+        return {"results": [{"text": f"completion of {prompt}", "tokens_used": 3}
+                            for prompt in payload["prompts"]], "tokens_used": 3 * len(payload["prompts"])}
+
+
+class TestLLMClient:
+    """Tests for memoization and cross-process coalescing."""
+
+    def test_identical_inputs_are_sent_once(self):
+        """Test that the in-process LRU answers repeated inputs."""
+        client = RecordingClient()
+        results = [client.process_text("disk full", operation="explain") for _ in range(1000)]
+
+        assert set(results) == {"explain: disk full"}
+        assert len(client.payloads) == 1
+        assert client.stats["memory_hits"] == 999
+
+    def test_key_includes_operation_and_style(self):
+        """Test that different operations or styles are not confused."""
+        client = RecordingClient()
+        client.process_text("text", operation="simplify")
+        client.process_text("text", operation="translate", style="formal")
+        client.process_text("text", operation="translate", style="casual")
+        assert len(client.payloads) == 3
+        assert client.payloads[1][1]["style"] == "formal"
+
+    def test_lists_are_batched_and_deduplicated(self, tmp_path):
+        """Test that a list is sent as batched requests of unique, uncached texts."""
+        client = RecordingClient(cache_dir=str(tmp_path))
+        client.process_text("b", operation="simplify")
+
+        texts = ["a", "b", "a", "c"] + [f"line {i}" for i in range(40)]
+        results = client.process_texts(texts, operation="simplify")
+
+        assert results == [f"simplify: {text}" for text in texts]
+        sent = [payload["texts"] for _, payload in client.payloads[1:]]
+        assert [len(batch) for batch in sent] == [32, 10]
+        assert sent[0][:2] == ["a", "c"]
+
+    def test_disk_cache_survives_processes(self, tmp_path):
+        """Test that a new client finds results stored by an earlier one."""
+        RecordingClient(cache_dir=str(tmp_path)).process_text("text", operation="explain")
+
+        later = RecordingClient(cache_dir=str(tmp_path))
+        assert later.process_text("text", operation="explain") == "explain: text"
+        assert later.payloads == []
+        assert later.stats["disk_hits"] == 1
+
+    def test_lru_is_bounded(self):
+        """Test that the in-process LRU evicts the least recently used entries."""
+        client = RecordingClient(lru_size=2)
+        for text in ("a", "b", "a", "c", "a", "b"):
+            client.process_text(text, operation="explain")
+        assert [p["texts"][0] for _, p in client.payloads] == ["a", "b", "c", "b"]
+
+    def test_disk_cache_ttl(self, tmp_path):
+        """Test that expired entries are ignored."""
+        cache = DiskCache(tmp_path, ttl=60)
+        cache.put("ab12", "value")
+        assert cache.get("ab12") == "value"
+
+        entry = tmp_path / "ab" / "ab12.json"
+        entry.write_text(json.dumps({"created": time.time() - 120, "value": "value"}))
+        assert cache.get("ab12") is None
+        assert DiskCache(tmp_path).get("ab12") == "value"
+
+    def test_settings_from_environment(self, monkeypatch):
+        """Test that environment variables override the defaults."""
+        monkeypatch.setenv("ANSIBLE_LLM_API_URL", "http://llm:9000")
+        monkeypatch.setenv("ANSIBLE_LLM_CACHE_DIR", "")
+        settings = get_client_settings()
+        assert settings["api_url"] == "http://llm:9000"
+        assert settings["cache_dir"] == ""
+
+
+class TestCachedGenerate:
+    """Tests for generation with a persistent result cache."""
+
+    def test_results_persist_across_runs(self, tmp_path):
+        """Test that a later client reuses results and sends only new prompts in one batch."""
+        first = GeneratingClient(cache_dir=str(tmp_path))
+        assert first.cached_generate(["a", "b", "a"]) == ["completion of a", "completion of b", "completion of a"]
+        assert [p["prompts"] for _, p in first.payloads] == [["a", "b"]]
+
+        second = GeneratingClient(cache_dir=str(tmp_path))
+        assert second.cached_generate(["b", "c"]) == ["completion of b", "completion of c"]
+        assert [p["prompts"] for _, p in second.payloads] == [["c"]]
+        assert second.stats["disk_hits"] == 1
+
+    def test_key_includes_generation_parameters(self, tmp_path):
+        """Test that other parameters or endpoints are not served from the cache."""
+        client = GeneratingClient(cache_dir=str(tmp_path), lru_size=0)
+        client.cached_generate(["a"], max_tokens=64)
+        client.cached_generate(["a"], max_tokens=128)
+        client.cached_generate(["a"], max_tokens=64, endpoint="http://other:8000/generate")
+        client.cached_generate(["a"], max_tokens=64)
+        assert len(client.payloads) == 3
+        assert client.payloads[0][0] == "http://127.0.0.1:8000/generate"
+
+    def test_ttl_expires_results(self, tmp_path):
+        """Test that results older than the ttl are generated again."""
+        GeneratingClient(cache_dir=str(tmp_path)).cached_generate(["a"])
+        for path in tmp_path.rglob("*.json"):
+            entry = json.loads(path.read_text())
+            entry["created"] -= 120
+            path.write_text(json.dumps(entry))
+
+        client = GeneratingClient(cache_dir=str(tmp_path))
+        client.cached_generate(["a"], ttl=600)
+        assert client.payloads == []
+
+        client = GeneratingClient(cache_dir=str(tmp_path))
+        client.cached_generate(["a"], ttl=60)
+        assert len(client.payloads) == 1
+
+    def test_offline_mode(self, tmp_path):
+        """Test that offline mode serves cached results and fails on a miss."""
+        GeneratingClient(cache_dir=str(tmp_path)).cached_generate(["a"])
+
+        client = GeneratingClient(cache_dir=str(tmp_path))
+        assert client.cached_generate(["a"], offline=True) == ["completion of a"]
+        with pytest.raises(LLMClientError, match="Offline mode"):
+            client.cached_generate(["a", "b"], offline=True)
+        assert client.payloads == []
+
+        with pytest.raises(LLMClientError, match="requires the on-disk cache"):
+            GeneratingClient().cached_generate(["a"], offline=True)
+
+
+class ScriptedService:
+    """HTTP server answering requests with a scripted list of responses."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                service.requests.append(json.loads(self.rfile.read(length)))
+                status, headers, chunks = service.responses.pop(0)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                for chunk in chunks:
+                    self.wfile.write(chunk.encode("utf-8"))
+                    self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/generate"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _json_response(body, status=200, headers=None):
+    return status, dict({"Content-Type": "application/json"}, **(headers or {})), [json.dumps(body)]
+
+
+class TestRetriesAndStreaming:
+    """Tests for retries, deadlines and streaming responses."""
+
+    def test_busy_service_is_retried(self):
+        """Test that 503 and 429 responses are retried until the service answers."""
+        service = ScriptedService([
+            _json_response({"detail": "busy"}, 503, {"Retry-After": "0"}),
+            _json_response({"detail": "slow down"}, 429, {"Retry-After": "0"}),
+            _json_response({"text": "done", "tokens_used": 2}),
+        ])
+        client = LLMClient()
+        try:
+            assert client.post_url(service.url, {"prompt": "p"}) == {"text": "done", "tokens_used": 2}
+        finally:
+            service.close()
+        assert client.stats["retries"] == 2
+        assert len(service.requests) == 3
+
+    def test_gives_up_after_retries(self):
+        """Test that a service that stays busy fails once the retries are used up."""
+        service = ScriptedService([_json_response({}, 503, {"Retry-After": "0"})] * 2)
+        try:
+            with pytest.raises(LLMClientError, match="gave up after 2 attempts"):
+                LLMClient(retries=1).post_url(service.url, {"prompt": "p"})
+        finally:
+            service.close()
+
+    def test_retry_after_beyond_deadline_fails_fast(self):
+        """Test that a Retry-After past the deadline fails without waiting."""
+        service = ScriptedService([_json_response({}, 429, {"Retry-After": "120"})])
+        start = time.monotonic()
+        try:
+            with pytest.raises(LLMClientError, match="status 429"):
+                LLMClient(deadline=10).post_url(service.url, {"prompt": "p"})
+        finally:
+            service.close()
+        assert time.monotonic() - start < 5
+
+    def test_other_errors_are_not_retried(self):
+        """Test that client errors fail immediately."""
+        service = ScriptedService([_json_response({"detail": "bad"}, 400)])
+        try:
+            with pytest.raises(LLMClientError, match="status 400"):
+                LLMClient().post_url(service.url, {"prompt": "p"})
+        finally:
+            service.close()
+        assert len(service.requests) == 1
+
+    def test_streaming_response_is_assembled(self):
+        """Test that newline-delimited and server-sent event streams are assembled."""
+        service = ScriptedService([
+            (200, {"Content-Type": "application/x-ndjson"},
+             ['{"text": "- name: "}\n', '{"text": "ok"}\n', '{"done": true, "tokens_used": 5}\n']),
+            (200, {"Content-Type": "text/event-stream"},
+             ['data: {"token": {"text": "a"}}\n\n', 'data: {"token": {"text": "b"}}\n\n', "data: [DONE]\n\n"]),
+        ])
+        client = LLMClient()
+        try:
+            assert client.generate(service.url, ["x"], 64, 0.0, stream=True) == [
+                {"text": "- name: ok", "tokens_used": 5}
+            ]
+            assert client.post_url(service.url, {"prompt": "y"}, stream=True) == {"text": "ab", "tokens_used": 2}
+        finally:
+            service.close()
+        assert service.requests[0] == {"max_tokens": 64, "temperature": 0.0, "prompt": "x"}
+
+    def test_stream_error_event(self):
+        """Test that an error reported mid-stream fails the request."""
+        service = ScriptedService([
+            (200, {"Content-Type": "application/x-ndjson"}, ['{"text": "a"}\n', '{"error": "out of memory"}\n']),
+        ])
+        try:
+            with pytest.raises(LLMClientError, match="out of memory"):
+                LLMClient().post_url(service.url, {"prompt": "p"}, stream=True)
+        finally:
+            service.close()
+
+    def test_retry_delay(self):
+        """Test Retry-After parsing and the jittered backoff bounds."""
+        assert retry_delay(0, "7") == 7
+        http_date = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 60))
+        assert 55 < retry_delay(0, http_date) <= 60
+        delays = [retry_delay(3) for _ in range(200)]
+        assert all(0 <= delay <= 4 for delay in delays)
+        assert len(set(delays)) > 1
+        assert retry_delay(20, "invalid") <= 30
+
+    def test_timeouts_and_rejected_responses(self):
+        """Test that timeouts become LLMClientError and rejected responses are closed."""
+        import requests
+
+        class Response:
+            status_code = 503
+            text = "busy"
+            headers = {"Retry-After": "0"}
+            closed = False
+
+            def close(self):
+                self.closed = True
+
+        class Session:
+            def __init__(self, outcomes):
+                self.outcomes = list(outcomes)
+
+            def post(self, url, **kwargs):
+                outcome = self.outcomes.pop(0)
+                if isinstance(outcome, Exception):
+                    raise outcome
+                return outcome
+
+        busy = Response()
+        with pytest.raises(LLMClientError, match="timed out"):
+            post_with_retries(Session([busy, requests.Timeout("timed out")]), "http://llm/generate", {},
+                              time.monotonic() + 10)
+        assert busy.closed
+        attempts = []
+        with pytest.raises(LLMClientError, match="gave up after 2 attempts"):
+            post_with_retries(Session([Response(), Response()]), "http://llm/generate", {},
+                              time.monotonic() + 10, retries=1, on_attempt=attempts.append)
+        assert attempts == [0, 1]
+
+
+def _batched_request(directory, log_path, prompt, expected, results):
+    def send_batch(payloads):
+        with open(log_path, "a") as f:
+            f.write(json.dumps([p["prompt"] for p in payloads]) + "\n")
+        return [p["prompt"].upper() for p in payloads]
+
+    batcher = PromptBatcher(directory, send_batch, window=5, expected=expected)
+    results.put((prompt, batcher.request(cache_key("generate", prompt), {"prompt": prompt})))
+
+
+class TestPromptBatcher:
+    """Tests for batching requests across processes."""
+
+    def test_concurrent_requests_share_one_batch(self, tmp_path):
+        """Test that forked workers send one deduplicated batch and each gets its result."""
+        log_path = str(tmp_path / "batches.log")
+        prompts = ["web", "db", "web", "cache"]
+        expected = len({cache_key("generate", p) for p in prompts})
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=_batched_request,
+                                           args=(str(tmp_path / "batch"), log_path, p, expected, results))
+                   for p in prompts]
+        for worker in workers:
+            worker.start()
+        received = sorted(results.get(timeout=10) for _ in workers)
+        for worker in workers:
+            worker.join()
+
+        assert received == sorted((p, p.upper()) for p in prompts)
+        with open(log_path) as f:
+            batches = [json.loads(line) for line in f]
+        assert len(batches) == 1
+        assert sorted(batches[0]) == ["cache", "db", "web"]
+
+    def test_later_request_is_sent_in_a_new_batch(self, tmp_path):
+        """Test that a request arriving after a batch was sent is not lost."""
+        sent = []
+
+        def send_batch(payloads):
+            sent.append([p["prompt"] for p in payloads])
+            return [p["prompt"] for p in payloads]
+
+        batcher = PromptBatcher(tmp_path, send_batch, window=0)
+        assert batcher.request("a", {"prompt": "a"}) == "a"
+        assert batcher.request("b", {"prompt": "b"}) == "b"
+        assert batcher.request("a", {"prompt": "a"}) == "a"
+        assert sent == [["a"], ["b"]]
+
+    def test_batch_error_is_raised_for_each_request(self, tmp_path):
+        """Test that a failed batch is reported to its requests."""
+        def send_batch(payloads):
+            raise RuntimeError("service down")
+
+        batcher = PromptBatcher(tmp_path, send_batch, window=0)
+        with pytest.raises(LLMClientError, match="service down"):
+            batcher.request("a", {"prompt": "a"})
+
+    def test_failed_requests_are_retried_by_the_next_leader(self, tmp_path):
+        """Test that a batch error is not stored, so a later request sends the batch again."""
+        calls = []
+
+        def send_batch(payloads):
+            calls.append([p["prompt"] for p in payloads])
+            if len(calls) == 1:
+                raise RuntimeError("service down")
+            return [p["prompt"] for p in payloads]
+
+        batcher = PromptBatcher(tmp_path, send_batch, window=0)
+        with pytest.raises(LLMClientError, match="service down"):
+            batcher.request("a", {"prompt": "a"})
+        assert batcher.request("a", {"prompt": "a"}) == "a"
+        assert calls == [["a"], ["a"]]
+
+
+class TestFilters:
+    """Tests for the llm filters on top of the client."""
+
+    def test_filters_accept_lists(self, monkeypatch):
+        """Test that list input returns a list in order from one batched request."""
+        from src.ansible_plugins.filters import llm_filter
+
+        client = RecordingClient()
+        monkeypatch.setattr(llm_filter, "_get_llm_client", lambda: client)
+        filters = llm_filter.FilterModule().filters()
+
+        assert filters["llm_explain"]("disk full") == "explain: disk full"
+        assert filters["llm_explain"](iter(["x", "disk full", "x"])) == [
+            "explain: x", "explain: disk full", "explain: x"
+        ]
+        assert filters["llm_translate"](["x"], style="formal") == ["translate: x"]
+        assert [p["texts"] for _, p in client.payloads] == [["disk full"], ["x"], ["x"]]
+
+    def test_filter_errors_are_reported_per_item(self, monkeypatch):
+        """Test that a failing service marks every item instead of raising."""
+        from src.ansible_plugins.filters import llm_filter
+
+        class FailingClient(RecordingClient):
+            def post(self, path, payload):
+                raise RuntimeError("service down")
+
+        monkeypatch.setattr(llm_filter, "_get_llm_client", lambda: FailingClient())
+        results = llm_filter._simplify_filter(["a", "b"])
+        assert [r.split("\n")[0] for r in results] == [
+            "[ERROR DURING SIMPLIFICATION] a", "[ERROR DURING SIMPLIFICATION] b"
+        ]
@@ -0,0 +1,232 @@
+"""
+Unit tests for the playbook performance optimizer.
+"""
+import os
+import sys
+
+import pytest
+import yaml
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.llm_engine.playbook_optimizer import (
+    collapse_package_loop,
+    external_variables,
+    narrow_fact_gathering,
+    optimize_playbook,
+    referenced_facts,
+)
+from src.llm_engine.static_analysis import UnsafeValue, VaultValue, load_playbook
+
+PLAYBOOK = """---
+- name: Web servers
+  hosts: web
+  become: true
+  tasks:
+    - name: Install {{ item }}
+      apt:
+        name: "{{ item }}"
+        state: present
+      loop:
+        - nginx
+        - git
+        - curl
+    - name: Show address
+      debug:
+        msg: "{{ ansible_facts['os_family'] }} {{ ansible_default_ipv4.address }}"
+    - name: Upgrade everything
+      shell: apt-get -y dist-upgrade
+"""
+
+
+class TestPackageLoops:
+    """Tests for collapsing package loops."""
+
+    def test_literal_loop_becomes_list(self):
+        """Test that a literal loop becomes one task with a list of names."""
+        task = {"name": "Install {{ item }}", "ansible.builtin.dnf": {"name": "{{ item }}", "state": "latest"},
+                "with_items": ["vim", "tmux"], "become": True}
+
+        rewritten, saved = collapse_package_loop(task)
+
+        assert rewritten == {"name": "Install vim, tmux",
+                             "ansible.builtin.dnf": {"name": ["vim", "tmux"], "state": "latest"},
+                             "become": True}
+        assert saved == 1
+
+    def test_variable_loop_is_passed_through(self):
+        """Test that a looped variable becomes the name, flattened for with_items."""
+        rewritten, saved = collapse_package_loop({"package": {"name": "{{ item }}"},
+                                                  "with_items": "{{ packages }}"})
+
+        assert rewritten == {"package": {"name": "{{ packages | flatten(levels=1) }}"}}
+        assert saved is None
+
+    @pytest.mark.parametrize("task", [
+        {"apt": {"name": "{{ item }}"}, "loop": ["a", "b"], "register": "out"},
+        {"apt": {"name": "{{ item }}", "state": "{{ 'absent' if item == 'a' else 'present' }}"},
+         "loop": ["a", "b"]},
+        {"apt": {"name": "{{ item.name }}"}, "loop": [{"name": "a"}]},
+        {"apt": {"name": "{{ item }}"}, "loop": ["a", "b"], "when": "item != 'a'"},
+        {"copy": {"src": "{{ item }}", "dest": "/tmp"}, "loop": ["a", "b"]},
+    ])
+    def test_unsafe_loops_are_kept(self, task):
+        """Test that loops whose items are used beyond the package name are left alone."""
+        assert collapse_package_loop(task) is None
+
+
+class TestFactGathering:
+    """Tests for narrowing fact gathering."""
+
+    def test_referenced_facts(self):
+        """Test that fact references are found and connection variables ignored."""
+        facts = referenced_facts({"msg": "{{ ansible_facts.distribution }} {{ ansible_memtotal_mb }}",
+                                  "vars": {"ansible_user": "deploy"}})
+
+        assert facts == {"distribution", "memtotal_mb"}
+        assert referenced_facts({"msg": "{{ ansible_facts | to_json }}"}) is None
+
+    def test_subset_covers_referenced_facts(self):
+        """Test that gather_subset is limited to the subsets of the referenced facts."""
+        play = {"hosts": "all", "tasks": [{"debug": {"msg": "{{ ansible_processor_vcpus }}"}}]}
+
+        keywords, saved, _ = narrow_fact_gathering(play)
+
+        assert keywords == {"gather_subset": ["!all", "hardware"]}
+        assert saved == 0
+
+    def test_unused_facts_are_not_gathered(self):
+        """Test that a play referencing no facts stops gathering them."""
+        keywords, saved, _ = narrow_fact_gathering({"hosts": "all", "tasks": [{"command": "/bin/true"}]})
+
+        assert keywords == {"gather_facts": False}
+        assert saved == 1
+
+    @pytest.mark.parametrize("play", [
+        {"hosts": "all", "roles": ["common"]},
+        {"hosts": "all", "tasks": [{"include_tasks": "more.yml"}]},
+        {"hosts": "all", "gather_facts": False},
+        {"hosts": "all", "tasks": [{"debug": {"msg": "{{ ansible_facter_custom }}"}}]},
+        {"hosts": "all", "tasks": [{"template": {"src": "motd.j2", "dest": "/etc/motd"}}]},
+        {"hosts": "all", "tasks": [{"ansible.builtin.template": {"src": "motd.j2", "dest": "/etc/motd"}},
+                                   {"debug": {"msg": "{{ ansible_default_ipv4.address }}"}}]},
+        {"hosts": "all", "vars_files": ["vars.yml"], "tasks": [{"command": "/bin/true"}]},
+        {"hosts": "all", "module_defaults": {"apt": {"cache_valid_time": 3600}},
+         "tasks": [{"apt": {"name": "git"}}]},
+        {"hosts": "all", "tasks": [{"block": [{"command": "/bin/true"}],
+                                    "module_defaults": {"command": {"chdir": "/tmp"}}}]},
+        {"hosts": "all", "tasks": [{"copy": {"content": "{{ lookup('template', 'motd.j2') }}",
+                                             "dest": "/etc/motd"}}]},
+        {"hosts": "all", "tasks": [{"include_vars": "vars.yml"}]},
+        {"hosts": "all", "tasks": [{"debug": {"msg": "{{ listen_address }}"}}]},
+        {"hosts": "all", "tasks": [{"command": "/bin/true", "when": "deploy_enabled | bool"}]},
+    ])
+    def test_unknown_fact_use_is_kept(self, play):
+        """Test that plays whose fact use cannot be determined keep full gathering."""
+        assert narrow_fact_gathering(play) is None
+
+    def test_external_variables(self):
+        """Test that only variables defined outside the play are reported."""
+        play = {
+            "hosts": "all",
+            "vars": {"port": 80},
+            "tasks": [
+                {"command": "echo {{ port | default(8080) }} {{ item.name }} {{ ansible_hostname }}",
+                 "loop": "{{ users }}", "register": "result"},
+                {"set_fact": {"greeting": "hello"}},
+                {"debug": {"msg": "{{ greeting ~ result.stdout }} {{ 'literal' | upper }}"},
+                 "when": "result is changed and inventory_hostname in groups['web']"},
+            ],
+        }
+
+        assert external_variables(play) == {"users"}
+
+    def test_play_variables_do_not_block_narrowing(self):
+        """Test that variables defined by the play itself still allow narrowing."""
+        play = {"hosts": "all", "vars": {"packages": ["git"]},
+                "tasks": [{"apt": {"name": "{{ packages }}"}, "register": "result"},
+                          {"debug": {"var": "result"}, "when": "result is changed"}]}
+
+        keywords, _, _ = narrow_fact_gathering(play)
+
+        assert keywords == {"gather_facts": False}
+
+
+class TestOptimizePlaybook:
+    """Tests for the playbook rewrite report."""
+
+    def test_rewrites_and_savings(self):
+        """Test that the optimizer rewrites the playbook and estimates savings."""
+        result = optimize_playbook(PLAYBOOK, host_count=20)
+        play = yaml.safe_load(result["playbook"])[0]
+
+        assert play["gather_subset"] == ["!all", "network"]
+        assert play["tasks"][0]["apt"]["name"] == ["nginx", "git", "curl"]
+        assert "async" not in play["tasks"][2]
+        assert [change["type"] for change in result["changes"]] == [
+            "package_loop", "long_running_command", "fact_gathering"]
+        assert result["invocations_saved_per_host"] == 2
+        assert result["invocations_saved"] == 40
+        assert "-    loop:\n" in result["diff"]
+        assert "+      - nginx\n" in result["diff"]
+
+        settings = {r["setting"]: r["value"] for r in result["recommendations"]}
+        assert settings == {"pipelining": True, "forks": 20, "strategy": "free"}
+
+    def test_template_play_keeps_gathering(self):
+        """Test that a play rendering a template file is not narrowed."""
+        playbook = ("- hosts: all\n  tasks:\n    - template:\n        src: motd.j2\n        dest: /etc/motd\n"
+                    "    - debug:\n        msg: \"{{ ansible_default_ipv4.address }}\"\n")
+        result = optimize_playbook(playbook)
+        play = yaml.safe_load(result["playbook"])[0]
+
+        assert "gather_subset" not in play
+        assert "gather_facts" not in play
+        assert "fact_gathering" not in [change["type"] for change in result["changes"]]
+
+    def test_async_conversion(self):
+        """Test that long-running commands are started in the background and awaited."""
+        tasks = yaml.safe_load(optimize_playbook(PLAYBOOK, convert_async=True)["playbook"])[0]["tasks"]
+
+        upgrade, wait = tasks[2], tasks[3]
+        assert upgrade["async"] == 3600 and upgrade["poll"] == 0
+        assert wait["ansible.builtin.async_status"]["jid"] == f"{{{{ {upgrade['register']}.ansible_job_id }}}}"
+        assert wait["until"] == f"{upgrade['register']}_result.finished"
+
+    def test_strategy_not_recommended_for_serial_plays(self):
+        """Test that serial plays and small inventories get no strategy or forks advice."""
+        result = optimize_playbook("- hosts: all\n  serial: 2\n  tasks: []\n", host_count=3)
+
+        assert [r["setting"] for r in result["recommendations"]] == ["pipelining"]
+
+    def test_unchanged_playbook_keeps_content(self):
+        """Test that a playbook without rewrites is returned as is."""
+        content = "- hosts: all\n  gather_facts: false\n  tasks:\n    - ping:\n"
+
+        result = optimize_playbook(content)
+
+        assert result["playbook"] == content
+        assert result["diff"] == ""
+        assert result["invocations_saved"] == 0
+
+    def test_vault_values_are_kept(self):
+        """Test that !vault and !unsafe values survive the rewrite unchanged."""
+        ciphertext = "$ANSIBLE_VAULT;1.1;AES256\n6162636465666768\n"
+        playbook = ("- hosts: all\n  vars:\n    db_password: !vault |\n      $ANSIBLE_VAULT;1.1;AES256\n"
+                    "      6162636465666768\n    raw: !unsafe '{{ not templated }}'\n  tasks:\n"
+                    "    - apt:\n        name: \"{{ item }}\"\n      loop: [nginx, git]\n")
+
+        result = optimize_playbook(playbook)
+
+        assert "db_password: !vault |" in result["playbook"]
+        play = load_playbook(result["playbook"])[0]
+        assert isinstance(play["vars"]["db_password"], VaultValue)
+        assert play["vars"]["db_password"] == ciphertext
+        assert isinstance(play["vars"]["raw"], UnsafeValue)
+        assert play["tasks"][0]["apt"]["name"] == ["nginx", "git"]
+
+    def test_invalid_playbook(self):
+        """Test that content that is not a list of plays is rejected."""
+        with pytest.raises(ValueError):
+            optimize_playbook("name: not a playbook\n")
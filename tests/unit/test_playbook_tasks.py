@@ -0,0 +1,26 @@
+"""
+Unit tests for recognizing the module of a playbook task.
+"""
+import os
+import sys
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.llm_engine.playbook_tasks import module_key, module_name
+
+
+class TestModuleRecognition:
+    """Tests for module_key and module_name."""
+
+    def test_keywords_are_skipped(self):
+        """Test that the module is found after task keywords and with_ loops."""
+        task = {"name": "Open port", "become": True, "with_items": [80], "ansible.posix.firewalld": {}}
+
+        assert module_key(task) == "ansible.posix.firewalld"
+        assert module_name(module_key(task)) == "firewalld"
+
+    def test_blocks_have_no_module(self):
+        """Test that a block names no module."""
+        assert module_key({"name": "Setup", "block": [], "when": "true"}) is None
+        assert module_name(None) is None
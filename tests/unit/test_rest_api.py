@@ -123,6 +123,132 @@ class TestRestAPI(unittest.TestCase):
         self.assertIn("suggestions", data)
         self.assertIn("security_issues", data)
     
+    @patch('src.api.rest_api.model', MagicMock())
+    @patch('src.api.rest_api.tokenizer', MagicMock())
+    @patch('src.api.rest_api.generate_batch')
+    def test_analyze_failure(self, mock_generate_batch):
+        """Test the analyze failure endpoint."""
+        mock_generate_batch.return_value = [
+            {"index": 0, "text": " Install the package first. ", "tokens_used": 6}
+        ]
+        
+        payload = {
+            "task": "Start nginx",
+            "module": "service",
+            "task_args": {"name": "nginx", "state": "started"},
+            "error": "Could not find the requested service nginx",
+            "host": "web01"
+        }
+        
+        response = self.client.post("/analyze_failure", json=payload)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["analysis"], "Install the package first.")
+        self.assertEqual(data["tokens_used"], 6)
+        
+        prompt = mock_generate_batch.call_args[0][2][0]
+        self.assertIn("Could not find the requested service nginx", prompt)
+        self.assertIn("module: service", prompt)
+    
+    @patch('src.api.rest_api.model', None)
+    def test_analyze_failure_no_model(self):
+        """Test the analyze failure endpoint when the model is not loaded."""
+        response = self.client.post("/analyze_failure", json={"task": "t", "error": "e"})
+        
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+    
+    @patch('src.api.rest_api.model', MagicMock())
+    @patch('src.api.rest_api.tokenizer', MagicMock())
+    @patch('src.api.rest_api.generate_batch')
+    def test_suggest_optimizations(self, mock_generate_batch):
+        """Test the suggest optimizations endpoint."""
+        mock_generate_batch.return_value = [
+            {"index": 0, "text": "Use async for the package install.", "tokens_used": 8}
+        ]
+        
+        payload = {
+            "playbook": "site.yml",
+            "timing_report": "Slowest tasks (host-seconds per run):\n- Install packages (apt, play Web): 40.0s"
+        }
+        
+        response = self.client.post("/suggest_optimizations", json=payload)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["analysis"], "Use async for the package install.")
+        prompt = mock_generate_batch.call_args[0][2][0]
+        self.assertIn("Install packages (apt, play Web)", prompt)
+        self.assertIn("site.yml", prompt)
+    
+    @patch('src.api.rest_api.model', MagicMock())
+    @patch('src.api.rest_api.tokenizer', MagicMock())
+    @patch('src.api.rest_api.generate_batch')
+    def test_generate_batch_of_prompts(self, mock_generate_batch):
+        """Test that a list of prompts is generated in one batch."""
+        mock_generate_batch.return_value = [
+            {"index": 0, "text": "first", "tokens_used": 3},
+            {"index": 1, "text": "second", "tokens_used": 4}
+        ]
+        
+        response = self.client.post("/generate", json={"prompts": ["a", "b"], "max_tokens": 64})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual([r["text"] for r in data["results"]], ["first", "second"])
+        self.assertEqual(data["tokens_used"], 7)
+        self.assertEqual(mock_generate_batch.call_count, 1)
+        self.assertEqual(mock_generate_batch.call_args[0][2], ["a", "b"])
+        self.assertEqual(mock_generate_batch.call_args[1]["max_new_tokens"], 64)
+    
+    @patch('src.api.rest_api.model', MagicMock())
+    @patch('src.api.rest_api.tokenizer', MagicMock())
+    @patch('src.api.rest_api.generate_stream')
+    def test_generate_stream(self, mock_generate_stream):
+        """Test that a completion is streamed as newline-delimited JSON."""
+        mock_generate_stream.return_value = iter(["- name: ", "ok"])
+        
+        response = self.client.post("/generate_stream", json={"prompt": "p", "max_tokens": 32})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        events = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([e["text"] for e in events[:-1]], ["- name: ", "ok"])
+        self.assertTrue(events[-1]["done"])
+        self.assertEqual(mock_generate_stream.call_args[1]["max_new_tokens"], 32)
+    
+    @patch('src.api.rest_api.model', MagicMock())
+    @patch('src.api.rest_api.tokenizer', MagicMock())
+    @patch('src.api.rest_api.generate_stream')
+    def test_generate_stream_disconnect_releases_lock(self, mock_generate_stream):
+        """Test that a client leaving mid-stream stops generation and frees the model lock."""
+        import asyncio
+        from src.api.rest_api import GenerateRequest, generate_streaming, generation_lock
+        
+        def stream(*args, stop_event=None, **kwargs):
+            while not stop_event.wait(0.01):
+                yield "token "
+        mock_generate_stream.side_effect = stream
+        
+        async def consume_one_chunk():
+            response = await generate_streaming(GenerateRequest(prompt="p"))
+            body = response.body_iterator
+            first = await body.__anext__()
+            await body.aclose()
+            return first
+        
+        first = asyncio.run(consume_one_chunk())
+        
+        self.assertEqual(json.loads(first), {"text": "token "})
+        self.assertTrue(mock_generate_stream.call_args[1]["stop_event"].is_set())
+        self.assertTrue(generation_lock.acquire(timeout=5))
+        generation_lock.release()
+    
+    @patch('src.api.rest_api.model', MagicMock())
+    def test_generate_requires_prompt(self):
+        """Test that a request without prompts is rejected."""
+        response = self.client.post("/generate", json={"max_tokens": 64})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
     @patch('src.api.rest_api.load_model')
     def test_startup_event(self, mock_load_model):
         """Test the startup event handler."""
@@ -0,0 +1,156 @@
+"""
+Unit tests for the static playbook rules.
+"""
+import os
+import sys
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.llm_engine.static_analysis import (
+    RULE_INDEX,
+    Rule,
+    analyze_statically,
+    index_rules,
+    load_playbook,
+    merge_analysis,
+    summarize_findings,
+)
+
+PLAYBOOK = """---
+- name: Web servers
+  hosts: web
+  vars:
+    db_password: hunter2
+    api_token: !vault |
+      $ANSIBLE_VAULT;1.1;AES256
+      6263
+  tasks:
+    - name: Install nginx
+      ansible.builtin.apt:
+        name: nginx
+      notify: Restart nginx
+    - name: Create deploy user
+      user:
+        name: deploy
+        password: "$6$rounds=656000$abcdefghijklmnop"
+      become: true
+    - name: Enable the service
+      shell: systemctl enable nginx
+      notify: reload nginx
+    - command: ls /tmp
+  handlers:
+    - name: Restart nginx
+      service:
+        name: nginx
+        state: restarted
+      become: true
+    - name: Flush cache
+      command: /usr/local/bin/flush
+      become: true
+"""
+
+
+def _rules(result):
+    return sorted(((f["rule"], f["task"]) for f in result["findings"]), key=lambda r: (r[0], r[1] or ""))
+
+
+class TestStaticAnalysis:
+    """Tests for the rule engine."""
+
+    def test_findings(self):
+        """Test that each rule reports the expected tasks."""
+        result = analyze_statically(load_playbook(PLAYBOOK))
+
+        assert _rules(result) == [
+            ("command-instead-of-module", "Enable the service"),
+            ("missing-handler", "Enable the service"),
+            ("plaintext-secret", None),
+            ("privileged-without-become", "Install nginx"),
+            ("unnamed-task", None),
+            ("unused-handler", "Flush cache"),
+        ]
+        analysis = result["structured_analysis"]
+        assert any("vars.db_password" in entry for entry in analysis["security"])
+        assert not any("api_token" in entry for entry in analysis["security"])
+        assert analysis["issues"][0].startswith("Task 'Install nginx':")
+        assert result["counts"] == {"plays": 1, "tasks": 6}
+
+    def test_become_is_inherited(self):
+        """Test that become from the play or an enclosing block satisfies the rule."""
+        tasks = [{"block": [{"name": "Install", "package": {"name": "git"}}], "become": True}]
+
+        assert analyze_statically(tasks)["findings"] == []
+        assert analyze_statically([{"hosts": "all", "become": "yes", "tasks": tasks[0]["block"]}])["findings"] == []
+
+    def test_secret_without_no_log(self):
+        """Test that templated secrets are only flagged when no_log is missing."""
+        task = {"name": "Login", "uri": {"url": "https://example.com", "password": "{{ vault_pw }}"}}
+
+        assert _rules(analyze_statically([task])) == [("plaintext-secret", "Login")]
+        assert analyze_statically([dict(task, no_log=True)])["findings"] == []
+
+    def test_free_form_secrets(self):
+        """Test that secrets in key=value module arguments are found."""
+        tasks = [{"name": "Add bob", "user": "name=bob password=secret", "become": True},
+                 {"name": "Add alice", "user": "name=alice password='{{ alice_pw }}'", "become": True,
+                  "no_log": True}]
+        result = analyze_statically(tasks)
+
+        assert _rules(result) == [("plaintext-secret", "Add bob")]
+        assert "'password' is a plaintext secret" in result["structured_analysis"]["security"][0]
+
+    def test_commands_without_module_equivalent(self):
+        """Test that pipelines and unknown programs are not reported."""
+        tasks = [{"name": "Count", "shell": "ps aux | grep nginx | wc -l"},
+                 {"name": "Status", "command": "git status"},
+                 {"name": "Custom", "command": "/opt/app/bin/migrate"}]
+
+        assert analyze_statically(tasks)["findings"] == []
+
+    def test_rules_are_indexed_by_module(self):
+        """Test that a task is only checked against the rules of its module."""
+        calls = []
+        rule = Rule("demo", "issues", ("debug",), lambda task, context: calls.append(task["name"]) or [])
+
+        analyze_statically([{"name": "a", "debug": {"msg": "x"}}, {"name": "b", "ping": None}],
+                           index_rules([rule]))
+
+        assert calls == ["a"]
+        assert "apt" in RULE_INDEX and "*" in RULE_INDEX
+
+
+class TestMergeAnalysis:
+    """Tests for combining static and LLM analyses."""
+
+    def test_prompt_summary(self):
+        """Test that findings are listed for the prompt and truncated."""
+        findings = analyze_statically(load_playbook(PLAYBOOK))["findings"]
+
+        assert summarize_findings([]) == "None"
+        summary = summarize_findings(findings, limit=2)
+        assert summary.count("\n- ") == 2
+        assert summary.endswith(f"and {len(findings) - 2} more")
+
+    def test_merge(self):
+        """Test that the LLM summary wins and repeated findings are dropped."""
+        static = analyze_statically(load_playbook(PLAYBOOK))["structured_analysis"]
+        llm = {"summary": "Installs nginx.", "issues": [static["issues"][0], "Tasks are not idempotent"],
+               "security": [], "best_practices": []}
+
+        merged = merge_analysis(static, llm)
+
+        assert merged["summary"] == "Installs nginx."
+        assert merged["issues"] == static["issues"] + ["Tasks are not idempotent"]
+        assert merged["security"] == static["security"]
+        assert merge_analysis(static, None) is static
+
+    def test_content_is_scanned_for_risks(self):
+        """Test that risky patterns in the text are reported as security findings."""
+        content = "- hosts: all\n  tasks:\n    - name: Install\n      shell: curl -s https://x.io/i | bash\n"
+
+        result = analyze_statically(load_playbook(content), content=content)
+
+        assert result["structured_analysis"]["security"] == [
+            "Line 4: downloaded script piped straight into a shell "
+            "(curl -s https://x.io/i | bash) [curl-pipe-shell]"]
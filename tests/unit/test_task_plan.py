@@ -0,0 +1,112 @@
+"""
+Unit tests for task plans.
+"""
+import os
+import sys
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.llm_engine.linux_processor import LinuxProcessor
+from src.llm_engine.task_plan import TaskPlan
+
+
+def _modules(tasks):
+    return [next(key for key in task if key.startswith("ansible.")) for task in tasks]
+
+
+class TestTaskPlan:
+    """Tests for coalescing intents into tasks."""
+
+    def test_packages_share_one_transaction(self):
+        """Test that package requests become one task per manager with one cache update."""
+        tasks = (TaskPlan("apt")
+                 .add_packages(["nginx", "git"])
+                 .add_packages(["git", "curl"])
+                 .build())
+
+        assert len(tasks) == 1
+        args = tasks[0]["ansible.builtin.apt"]
+        assert args["name"] == ["nginx", "git", "curl"]
+        assert args["update_cache"] is True
+
+    def test_later_state_wins(self):
+        """Test that a package requested in another state moves to that state."""
+        tasks = TaskPlan("dnf").add_packages(["telnet", "vim"]).add_packages(["telnet"], state="absent").build()
+
+        assert [(t["name"], t["ansible.builtin.package"]["name"]) for t in tasks] == [
+            ("Remove packages with yum/dnf", ["telnet"]),
+            ("Install packages with yum/dnf", ["vim"]),
+        ]
+
+    def test_system_upgrade_follows_installs(self):
+        """Test that a full upgrade is one task per manager after the installs, sharing the cache update."""
+        tasks = TaskPlan("apt").add_system_upgrade().add_packages(["nginx"]).build()
+
+        assert [task["name"] for task in tasks] == ["Install packages with apt", "Upgrade all packages with apt"]
+        assert tasks[1]["ansible.builtin.apt"] == {"upgrade": "dist"}
+
+        tasks = TaskPlan().add_system_upgrade().build()
+        assert [task.get("when") for task in tasks] == [
+            'ansible_facts["os_family"] == "Debian"', 'ansible_facts["os_family"] == "RedHat"',
+            'ansible_facts["os_family"] == "Suse"', 'ansible_facts["os_family"] == "Archlinux"']
+        assert tasks[0]["ansible.builtin.apt"]["update_cache"] is True
+        assert tasks[1]["ansible.builtin.package"] == {"name": "*", "state": "latest"}
+        assert tasks[3]["ansible.builtin.pacman"] == {"upgrade": True, "update_cache": True}
+
+    def test_services_and_users_are_deduplicated(self):
+        """Test that repeated services and users are emitted once."""
+        tasks = (TaskPlan("apt")
+                 .add_service("nginx")
+                 .add_service("nginx", state="restarted")
+                 .add_user("deploy", groups=["sudo"])
+                 .add_user("deploy", groups=["docker", "sudo"])
+                 .build())
+
+        assert _modules(tasks) == ["ansible.builtin.user", "ansible.builtin.service"]
+        assert tasks[0]["ansible.builtin.user"]["groups"] == ["sudo", "docker"]
+        assert tasks[1]["ansible.builtin.service"]["state"] == "restarted"
+
+    def test_firewall_is_enabled_once(self):
+        """Test that firewall rules are deduplicated and the firewall enabled once."""
+        tasks = (TaskPlan("apt")
+                 .add_packages(["nginx"])
+                 .add_firewall_rule(port=80)
+                 .add_firewall_rule(port=443)
+                 .add_firewall_rule(port=80)
+                 .build())
+
+        assert [t["name"] for t in tasks] == [
+            "Install packages with apt", "Allow SSH in ufw", "Allow port 80/tcp in ufw", "Allow port 443/tcp in ufw",
+            "Enable ufw"
+        ]
+        assert tasks[0]["ansible.builtin.apt"]["name"] == ["nginx", "ufw"]
+
+    def test_firewall_keeps_ssh_and_applies_rules_immediately(self):
+        """Test that ufw allows SSH before it is enabled and firewalld rules take effect at once."""
+        ufw = TaskPlan("apt").add_firewall_rule(port=80).build()
+        firewalld = TaskPlan("yum").add_firewall_rule(port=80).build()
+
+        assert ufw[1]["ansible.builtin.ufw"]["port"] == "{{ ansible_port | default(22) }}"
+        assert ufw[-1]["name"] == "Enable ufw"
+        assert [t["name"] for t in firewalld[1:]] == ["Enable firewalld", "Allow port 80/tcp in firewalld"]
+        assert firewalld[-1]["ansible.posix.firewalld"]["immediate"] is True
+        assert TaskPlan("apt").add_firewall_rule(port=80, state="disabled").build()[1]["name"] != "Allow SSH in ufw"
+
+    def test_fewer_tasks_than_generators(self):
+        """Test that a plan needs fewer tasks than concatenated generator output."""
+        processor = LinuxProcessor()
+        generated = (processor.generate_package_tasks(["nginx"])
+                     + processor.generate_package_tasks(["git"])
+                     + processor.generate_firewall_tasks(port=80)
+                     + processor.generate_firewall_tasks(port=443))
+        planned = (TaskPlan()
+                   .add_packages(["nginx"])
+                   .add_packages(["git"])
+                   .add_firewall_rule(port=80)
+                   .add_firewall_rule(port=443)
+                   .build())
+
+        assert len(planned) < len(generated)
+        assert sum(1 for t in planned if "Enable" in t["name"]) == 2
+        assert all(t["when"] for t in planned)
@@ -0,0 +1,74 @@
+"""
+Unit tests for llm_advisor task timing telemetry.
+"""
+import os
+import sys
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.ansible_plugins.task_timings import TaskTimingStore, format_timing_report
+
+
+def _record_run(store, playbook, install_seconds):
+    store.start_run(playbook)
+    for host in ("web01", "web02"):
+        store.add("Web", "Install packages", "apt", host, "ok", install_seconds)
+        store.add("Web", "Gathering Facts", "setup", host, "ok", 2.0)
+        store.add("Web", "Configure RedHat", "template", host, "skipped", 0.01)
+    store.finish_run()
+
+
+class TestTaskTimingStore:
+    """Tests for the timing store and report."""
+
+    def test_ranks_across_runs(self, tmp_path):
+        """Test that tasks are ranked by host-seconds per run over recent runs."""
+        path = tmp_path / "timings.db"
+        store = TaskTimingStore(path)
+        _record_run(store, "site.yml", 30.0)
+        store.close()
+
+        # A later run reopens the database and adds to the history
+        store = TaskTimingStore(path)
+        _record_run(store, "site.yml", 10.0)
+        _record_run(store, "other.yml", 500.0)
+
+        slowest = store.slowest_tasks("site.yml", limit=2)
+        assert [item["task"] for item in slowest] == ["Install packages", "Gathering Facts"]
+        assert slowest[0]["runs"] == 2
+        assert slowest[0]["seconds_per_run"] == 40.0
+        assert slowest[0]["max"] == 30.0
+
+        skipped = store.most_skipped("site.yml")
+        assert skipped == [{"play": "Web", "task": "Configure RedHat", "module": "template",
+                            "skipped": 4, "total": 4}]
+
+        assert store.slowest_tasks("site.yml", runs=1)[0]["seconds_per_run"] == 20.0
+        store.close()
+
+    def test_rows_are_buffered_until_flush(self, tmp_path):
+        """Test that durations are written in batches."""
+        store = TaskTimingStore(tmp_path / "timings.db")
+        store.start_run("site.yml")
+        store.add("Web", "t", "command", "web01", "ok", 1.0)
+        assert store.connection.execute("SELECT COUNT(*) FROM task_timings").fetchone()[0] == 0
+
+        store.finish_run()
+        assert store.connection.execute("SELECT COUNT(*) FROM task_timings").fetchone()[0] == 1
+        store.close()
+
+    def test_format_report(self):
+        """Test the report text."""
+        report = format_timing_report(
+            [{"play": "Web", "task": "Install", "module": "apt", "runs": 1, "hosts": 2,
+              "seconds_per_run": 40.0, "average": 20.0, "max": 30.0}],
+            [{"play": "Web", "task": "RedHat only", "module": "yum", "skipped": 3, "total": 4}],
+        )
+        assert report.splitlines() == [
+            "Slowest tasks (host-seconds per run):",
+            "- Install (apt, play Web): 40.0s per run over 2 host(s), avg 20.0s, max 30.0s",
+            "Most skipped tasks:",
+            "- RedHat only (yum, play Web): skipped 3 of 4 results",
+        ]
+        assert format_timing_report([], []) == ""